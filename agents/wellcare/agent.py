@@ -1,21 +1,84 @@
 """Agent WellCare - Mental health support and wellness guidance system."""
 
+import functools
 import os
+import re
+import sys
+from collections import namedtuple
 from pathlib import Path
-from google.adk import Agent
+from typing import Annotated
 from dotenv import load_dotenv
+from pydantic import Field, field_validator
 
-# Load environment variables
-load_dotenv()
+# Make the shared wellcare_core package importable when loaded via `adk web agents`
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from wellcare_core.crisis import detector as crisis_detector
+from wellcare_core.plan_store import current_owner, plan_store
+from wellcare_core.progress import progress_store
+from wellcare_core.resources import CRISIS_HOTLINES, resource_directory
+from wellcare_core.retrieval import retriever
+from wellcare_core.tools import ToolArgs, tool
 
 # Configuration
 MODEL_ID = "gemini-2.0-flash"  # Using a model that's available
 
 
+# ============================================================================
+# TOOL ARGUMENT SCHEMAS
+# ============================================================================
+
+Answer = Annotated[int, Field(ge=0, le=3)]
+
+
+def responses_args(items: int) -> type:
+    """Arguments of a questionnaire tool: one 0-3 answer for each of q1..qN ("3" is read as "q3")."""
+    expected = {f"q{i}" for i in range(1, items + 1)}
+
+    class ResponsesArgs(ToolArgs):
+        responses: dict[str, Answer]
+
+        @field_validator("responses", mode="before")
+        @classmethod
+        def item_keys(cls, responses):
+            if isinstance(responses, dict):
+                responses = {re.sub(r"^(?:q|item)?\s*(\d+)$", r"q\1", str(key).strip().lower()): answer
+                             for key, answer in responses.items()}
+            return responses
+
+        @field_validator("responses")
+        @classmethod
+        def every_item(cls, responses):
+            if set(responses) != expected:
+                raise ValueError(f"expected one answer for each of q1..q{items}, got {', '.join(responses) or 'none'}")
+            return responses
+
+    return ResponsesArgs
+
+
+class FindResourcesArgs(ToolArgs):
+    latitude: float = Field(0.0, ge=-90, le=90)
+    longitude: float = Field(0.0, ge=-180, le=180)
+    country: str = Field("", max_length=64)
+    region: str = Field("", max_length=64)
+    resource_type: str = Field("", max_length=64)
+    max_cost: str = Field("", max_length=32)
+    service: str = Field("", max_length=64)
+    limit: int = 5
+
+
+class LogMoodArgs(ToolArgs):
+    mood: int = Field(ge=1, le=10)
+    energy: int = Field(0, ge=0, le=10)
+    sleep_hours: float = Field(0, ge=0, le=24)
+    note: str = Field("", max_length=1000)
+
+
 # ============================================================================
 # TOOLS
 # ============================================================================
 
+@tool(responses_args(9), pure=True)
 def conduct_phq9_assessment(responses: dict) -> dict:
     """Conducts PHQ-9 depression screening assessment."""
     score = sum(responses.values())
@@ -44,6 +107,7 @@ def conduct_phq9_assessment(responses: dict) -> dict:
     }
 
 
+@tool(responses_args(7), pure=True)
 def conduct_gad7_assessment(responses: dict) -> dict:
     """Conducts GAD-7 anxiety screening assessment."""
     score = sum(responses.values())
@@ -69,71 +133,88 @@ def conduct_gad7_assessment(responses: dict) -> dict:
     }
 
 
+@tool(pure=True)
 def assess_crisis_risk(user_input: str) -> dict:
     """Assesses crisis risk based on user input."""
-    crisis_keywords = [
-        "suicide", "kill myself", "end it all", "no reason to live",
-        "better off dead", "hurt myself", "self harm"
-    ]
-    
-    user_lower = user_input.lower()
-    indicators = [kw for kw in crisis_keywords if kw in user_lower]
-    
-    if indicators:
-        return {
-            "risk_level": "high",
-            "crisis_indicators": indicators,
-            "immediate_action_required": True
-        }
-    
-    return {
-        "risk_level": "low",
-        "crisis_indicators": [],
-        "immediate_action_required": False
-    }
+    return crisis_detector.assess(user_input)
 
 
+@tool(pure=True)
 def get_crisis_hotlines(country: str = "US") -> dict:
     """Retrieves crisis hotline information by country."""
-    resources = {
-        "US": {
-            "suicide_prevention": "988 (Suicide & Crisis Lifeline)",
-            "crisis_text": "Text HOME to 741741 (Crisis Text Line)",
-            "emergency": "911",
-            "website": "https://988lifeline.org"
-        },
-        "UK": {
-            "samaritans": "116 123",
-            "crisis_text": "Text SHOUT to 85258",
-            "emergency": "999",
-            "website": "https://www.samaritans.org"
-        },
-        "IN": {
-            "vandrevala": "+91 9999 666 555",
-            "aasra": "+91 22 2754 6669",
-            "emergency": "112",
-            "website": "http://www.aasra.info"
-        }
-    }
-    
-    return resources.get(country, resources["US"])
-
-
+    country = (country or "US").strip().upper()
+    return CRISIS_HOTLINES.get(country) or resource_directory.hotlines(country) or CRISIS_HOTLINES["US"]
+
+
+@tool(FindResourcesArgs, pure=True)
+def find_resources(latitude: float = 0.0, longitude: float = 0.0, country: str = "", region: str = "",
+                   resource_type: str = "", max_cost: str = "", service: str = "", limit: int = 5) -> dict:
+    """Finds mental health resources (therapist, psychiatrist, clinic, support_group, hotline) from the local
+    directory, nearest first when latitude/longitude are given (0, 0 = no location). max_cost is "free", "low"
+    (includes sliding scale) or "standard"; service filters by specialty, e.g. "trauma" or "youth"."""
+    located = bool(latitude or longitude)
+    results = resource_directory.search(
+        lat=latitude if located else None, lon=longitude if located else None, country=country or None,
+        region=region or None, resource_type=resource_type or None, max_cost=max_cost or None,
+        service=service or None, limit=max(1, min(limit, 20)),
+    )
+    return {"results": results, "directory_size": len(resource_directory)}
+
+
+@tool(pure=True)
+def find_coping_strategies(topic: str, limit: int = 3) -> dict:
+    """Looks up evidence-based coping techniques (CBT, behavioral activation, mindfulness, relaxation, sleep,
+    grounding, social, crisis management) for a topic, e.g. "racing thoughts at night" or "low motivation"."""
+    snippets = retriever.search(topic, k=max(1, min(limit, 10)))
+    return {"strategies": [{key: snippet.get(key) for key in ("title", "category", "text")} for snippet in snippets]}
+
+
+@tool()
 def save_wellness_plan(plan_content: str, filename: str = "my_wellness_plan.md") -> str:
-    """Saves wellness plan to a markdown file."""
+    """Saves wellness plan to the user's plan store."""
     try:
-        with open(filename, 'w', encoding='utf-8') as f:
-            f.write(plan_content)
-        return f"Wellness plan saved successfully to {filename}"
+        plan = plan_store.save(current_owner.get(), plan_content, title=filename)
+        return f"Wellness plan \"{plan['title']}\" saved successfully (plan id {plan['id']})"
     except Exception as e:
         return f"Error saving wellness plan: {str(e)}"
 
 
+@tool(LogMoodArgs)
+def log_mood(mood: int, energy: int = 0, sleep_hours: float = 0, note: str = "") -> dict:
+    """Records today's mood (1-10) in the progress log, plus energy (1-10) and hours slept if given (0 = not given)."""
+    values = {"mood": mood}
+    if energy:
+        values["energy"] = energy
+    if sleep_hours:
+        values["sleep_hours"] = sleep_hours
+    try:
+        progress_store.record(current_owner.get(), values, note=note or None)
+    except ValueError as e:
+        return {"error": str(e)}
+    return {"status": "logged", "logged": values}
+
+
+@tool()
+def get_progress_summary() -> dict:
+    """Returns 7/30-day averages and weekly trends for mood, energy and sleep, and PHQ-9/GAD-7 score changes."""
+    return progress_store.summary(current_owner.get())
+
+
 # ============================================================================
 # SUB-AGENTS
 # ============================================================================
 
-wellness_assessor_agent = Agent(
+# Agent definitions are plain data so that importing this module stays cheap;
+# the web apps only need name, model, instruction and tools. ADK Agent objects
+# are built from them on first use of root_agent (see build_agents).
+AgentSpec = namedtuple(
+    "AgentSpec",
+    ["name", "model", "description", "instruction", "tools", "sub_agents"],
+    defaults=((), ()),
+)
+
+
+wellness_assessor_agent = AgentSpec(
     name="wellness_assessor_agent",
     model=MODEL_ID,
     description="Conducts comprehensive mental health assessments using validated screening tools",
@@ -181,7 +262,7 @@ After completing assessments, provide scores and interpretations.""",
 )
 
 
-crisis_support_agent = Agent(
+crisis_support_agent = AgentSpec(
     name="crisis_support_agent",
     model=MODEL_ID,
     description="Provides immediate crisis intervention and connects to emergency resources",
@@ -213,7 +294,7 @@ IMPORTANT: You are not a replacement for professional crisis intervention. Your
 )
 
 
-personalized_wellness_planner = Agent(
+personalized_wellness_planner = AgentSpec(
     name="personalized_wellness_planner",
     model=MODEL_ID,
     description="Creates customized, evidence-based wellness plans",
@@ -226,37 +307,9 @@ Your role:
 4. Ensure recommendations are realistic and sustainable
 5. Provide clear instructions and rationale
 
-Your wellness plan should include:
+Your wellness plan should cover cognitive strategies (CBT-based), behavioral activation, mindfulness and relaxation, physical wellness (exercise, sleep, nutrition), social connection, and crisis management (warning signs, coping strategies, emergency contacts).
 
-**Cognitive Strategies** (CBT-based):
-- Thought challenging exercises
-- Cognitive restructuring techniques
-- Journaling prompts
-
-**Behavioral Activation**:
-- Pleasant activity scheduling
-- Goal setting and achievement
-- Routine building
-
-**Mindfulness & Relaxation**:
-- Meditation practices (start with 5 minutes)
-- Progressive muscle relaxation
-- Breathing exercises
-
-**Physical Wellness**:
-- Exercise recommendations (appropriate to fitness level)
-- Sleep hygiene practices
-- Nutrition guidance
-
-**Social Connection**:
-- Relationship building activities
-- Support group suggestions
-- Communication skills
-
-**Crisis Management**:
-- Warning sign identification
-- Coping strategies list
-- Emergency contacts
+Base specific techniques on the coping content retrieved for the user's message, or look them up with find_coping_strategies, rather than on general knowledge.
 
 Make plans:
 - Specific and actionable
@@ -266,11 +319,11 @@ Make plans:
 - Culturally sensitive
 
 Include rationale for each recommendation so users understand WHY it helps.""",
-    tools=[save_wellness_plan]
+    tools=[save_wellness_plan, find_coping_strategies]
 )
 
 
-wellness_progress_agent = Agent(
+wellness_progress_agent = AgentSpec(
     name="wellness_progress_agent",
     model=MODEL_ID,
     description="Tracks progress, analyzes patterns, and adjusts wellness plans",
@@ -297,11 +350,14 @@ Provide feedback that is:
 - Forward-looking and solution-focused
 - Empowering (user is in control)
 
-Remember: Progress isn't linear. Setbacks are normal and part of the journey. Help users learn from difficult periods rather than feel discouraged."""
+Use get_progress_summary to see the user's logged mood, energy, sleep and assessment history before commenting on trends, and log_mood when they tell you how they are feeling today.
+
+Remember: Progress isn't linear. Setbacks are normal and part of the journey. Help users learn from difficult periods rather than feel discouraged.""",
+    tools=[log_mood, get_progress_summary]
 )
 
 
-community_resource_agent = Agent(
+community_resource_agent = AgentSpec(
     name="community_resource_agent",
     model=MODEL_ID,
     description="Connects users with mental health resources and support services",
@@ -354,8 +410,10 @@ Provide practical information:
 - What to do if first provider isn't a good fit
 - Insurance and payment options
 
+Look up specific providers and hotlines with find_resources before relying on general knowledge, and say when the directory has nothing nearby.
+
 Normalize seeking help and reduce stigma.""",
-    tools=[get_crisis_hotlines]
+    tools=[get_crisis_hotlines, find_resources]
 )
 
 
@@ -363,7 +421,7 @@ Normalize seeking help and reduce stigma.""",
 # MAIN INTERACTIVE AGENT
 # ============================================================================
 
-interactive_wellcare_agent = Agent(
+interactive_wellcare_agent = AgentSpec(
     name="interactive_wellcare_agent",
     model=MODEL_ID,
     description="Compassionate mental health support coordinator that guides users through wellness journey",
@@ -419,8 +477,47 @@ Delegate tasks to these specialists while maintaining the overall relationship w
         wellness_progress_agent,
         community_resource_agent
     ],
-    tools=[save_wellness_plan, get_crisis_hotlines, assess_crisis_risk]
+    tools=[save_wellness_plan, get_crisis_hotlines, assess_crisis_risk, log_mood]
 )
 
-# Expose the main agent as root_agent for ADK compatibility
-root_agent = interactive_wellcare_agent
+# ============================================================================
+# ADK AGENT TREE
+# ============================================================================
+
+@functools.lru_cache(maxsize=None)
+def build_agents() -> dict:
+    """
+    Builds the ADK agent tree on first use and caches it for the process.
+
+    Importing google.adk dominates cold-start time, so it is deferred until
+    an ADK Agent is actually needed (e.g. by `adk web agents`).
+
+    Returns:
+        Dictionary of Agent objects keyed by agent name
+    """
+    from google.adk import Agent
+
+    load_dotenv()
+    agents = {}
+
+    def build(spec):
+        if spec.name not in agents:
+            agents[spec.name] = Agent(
+                name=spec.name,
+                model=spec.model,
+                description=spec.description,
+                instruction=spec.instruction,
+                tools=list(spec.tools),
+                sub_agents=[build(sub_agent) for sub_agent in spec.sub_agents],
+            )
+        return agents[spec.name]
+
+    build(interactive_wellcare_agent)
+    return agents
+
+
+def __getattr__(name):
+    # Expose the main agent as root_agent for ADK compatibility, built lazily
+    if name == "root_agent":
+        return build_agents()[interactive_wellcare_agent.name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -3,10 +3,35 @@ Flask web interface for Agent WellCare.
 Provides a simple web UI to interact with the ADK agent.
 """
 
+import functools
+import hmac
 import os
-from flask import Flask, render_template, request, jsonify
-from google.genai import Client
-from agent import interactive_wellcare_agent
+import time
+import uuid
+from flask import Flask, Response, g, render_template, request, jsonify, stream_with_context
+from agents.wellcare.agent import (interactive_wellcare_agent, assess_crisis_risk, conduct_gad7_assessment,
+                                   conduct_phq9_assessment, get_crisis_hotlines)
+from wellcare_core.admission import Overloaded, create_admission
+from wellcare_core.analytics import analytics
+from wellcare_core.chat import GREETING, crisis_alert, run_turn, sse_event, stream_turn
+from wellcare_core.clients import LazyClient
+from wellcare_core.context_cache import create_context_cache
+from wellcare_core.fanout import create_fanout
+from wellcare_core.history import create_history_manager, crisis_pins, escape_user_text
+from wellcare_core.identity import COOKIE_MAX_AGE, COOKIE_NAME, identities
+from wellcare_core.plan_store import plan_owner, plan_store
+from wellcare_core.progress import progress_store
+from wellcare_core.questionnaire import CRISIS_INDICATOR, create_questionnaire_manager
+from wellcare_core.resources import resource_directory
+from wellcare_core.response_cache import cached_exchange, create_response_cache
+from wellcare_core.retrieval import retriever, strip_context
+from wellcare_core.router import create_router
+from wellcare_core.scoring import score_text, to_json
+from wellcare_core.session_store import create_session_store
+from wellcare_core.tiering import create_tiers
+from wellcare_core.tools import runtime as tool_runtime
+from wellcare_core.tracing import tracer
+from wellcare_core.upstream import policy as upstream_policy
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -15,15 +40,134 @@ load_dotenv()
 # Initialize Flask app
 app = Flask(__name__)
 
-# Initialize ADK client
-api_key = os.environ.get("GOOGLE_API_KEY")
-if not api_key:
-    raise ValueError("GOOGLE_API_KEY not found in environment variables")
+# Genai client, built on the first model call (raises there if GOOGLE_API_KEY is missing)
+client = LazyClient()
 
-client = Client(api_key=api_key)
+# Cached-content handles for the static agent prefixes, plus per-turn token counts
+context_cache = create_context_cache(client)
+
+# Keeps stored history to a recent window plus a running summary and pinned scores
+history_manager = create_history_manager(client, interactive_wellcare_agent.model)
+
+# Conversation history per session; set WELLCARE_SESSION_BACKEND=sqlite to share across workers
+sessions = create_session_store()
+
+# Opt-in cache for common openers; None unless WELLCARE_RESPONSE_CACHE=1
+response_cache = create_response_cache()
+
+# Sends clear intents straight to a specialist sub-agent instead of the coordinator
+router = create_router(interactive_wellcare_agent)
+
+# Serves PHQ-9/GAD-7 questions locally; only the final summary goes to the model
+questionnaires = create_questionnaire_manager({'phq9': conduct_phq9_assessment, 'gad7': conduct_gad7_assessment},
+                                             sessions)
+assessor = router.agents['wellness_assessor_agent']
+
+# Bearer token for clinic-wide endpoints such as /reports; they stay closed while it is unset
+ADMIN_TOKEN = os.environ.get('WELLCARE_ADMIN_TOKEN')
+
+# Full-plan requests run the planner and resource specialist concurrently
+fanout = create_fanout(interactive_wellcare_agent)
+
+# Per-session/IP rate limits and a bounded, crisis-first queue in front of model work
+admission = create_admission()
+
+# Small talk and lighter agents run on a lite model, escalating to the full one on a bad reply
+tiers = create_tiers()
+
+
+def create_chat(agent, history=None, model=None):
+    """Create a chat session configured from an ADK agent definition, optionally on another model tier."""
+    model = model or agent.model
+    config = context_cache.config(model, agent.instruction, agent.tools)
+    return client.chats.create(model=model, config=config, history=history)
+
+
+def run_tiered(turn, agent, history, message, alert=None):
+    """A full turn on the TieredTurn's tier, escalating if needed; its session then holds the history."""
+    return turn.run(lambda model: create_chat(agent, history, model),
+                    lambda session, usage: run_turn(session, with_coping_content(message, alert), agent.tools, usage),
+                    context_cache.usage)
+
+
+def with_coping_content(message, alert):
+    """Attach coping content relevant to the message; crisis turns and tool responses go as they are."""
+    return message if alert else retriever.augment(message)
+
+
+def run_branch(agent, history, message):
+    """One fan-out branch: a full turn on its own chat, returning the reply text."""
+    return run_tiered(tiers.start(agent, message), agent, history, message).text
+
+
+def check_crisis(data):
+    """Screen the message locally so crisis resources never wait on the model."""
+    message = data.get('message') or ''
+    # A positive PHQ-9 item 9 answer raises the same alert as crisis language
+    flagged = questionnaires.crisis_flags(data.get('session_id'), message) if questionnaires else []
+    return crisis_alert(message, assess_crisis_risk, get_crisis_hotlines, data.get('country') or 'US', flagged)
+
+
+def owns(owner):
+    """Whether the request's ?session_id= is a live session whose plans and progress are filed under owner."""
+    session_id = request.args.get('session_id')
+    return bool(session_id) and sessions.owner(session_id) == owner
+
+
+def is_admin():
+    """Whether the request carries the admin bearer token."""
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {ADMIN_TOKEN}')
+
+
+def admin_only(view):
+    """Close a route, such as the *_stats counters, to requests without the admin token."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not is_admin():
+            return jsonify({'error': 'Admin token required'}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def forbidden():
+    return jsonify({'error': 'Pass the session_id of a live session that owns this data'}), 403
+
+
+def overloaded(e, alert=None):
+    """429 with Retry-After for a rate-limited or shed request; a shed crisis turn still gets the resources."""
+    return jsonify({**e.payload(), 'crisis': alert}), 429, e.headers()
+
+
+def questionnaire_step(session_id, owner, message, alert, route):
+    """Answer questionnaire turns locally; a crisis ends the questionnaire and goes to the model."""
+    if not questionnaires:
+        return None
+    # A crisis answer to the questionnaire itself still completes it, for the crisis agent to see
+    if alert and CRISIS_INDICATOR not in alert['crisis_indicators']:
+        questionnaires.cancel(session_id)
+        return None
+    step = questionnaires.step(session_id, message, route.intent)
+    if step and step.completion:
+        completion = step.completion
+        progress_store.record(owner, {completion.scale: completion.result['score']},
+                              answers={completion.scale: completion.answers})
+    return step
+
+
+def crisis_reply(session_id, history, message, alert, completion=None):
+    """
+    Answer a flagged JSON turn with the crisis resources at once, without a model slot or call.
+
+    The exchange is stored with the crisis pinned once the response has gone out, so
+    later turns carry it. Streaming clients also get the crisis agent's reply, after
+    the resources.
+    """
+    response = jsonify({'response': alert['message'], 'crisis': alert,
+                        'assessment': completion.result if completion else None})
+    response.call_on_close(lambda: sessions.put(session_id, history_manager.compact(
+        history + cached_exchange(message, alert['message']), crisis_pins(alert))))
+    return response
 
-# Store active sessions (in production, use a proper database)
-sessions = {}
 
 @app.route('/')
 def index():
@@ -34,45 +178,203 @@ def index():
 def start_session():
     """Start a new agent session."""
     try:
-        # Create a new agent session
-        session = client.agents.create(interactive_wellcare_agent)
-        session_id = session.id if hasattr(session, 'id') else str(id(session))
-        sessions[session_id] = session
-        
-        # Get initial greeting
-        greeting = "Hello! I'm Agent WellCare, your compassionate mental health support assistant. How can I help you today?"
-        
-        return jsonify({
+        # Plans and progress follow the browser's server-issued user id across sessions
+        user_id = identities.verify(request.cookies.get(COOKIE_NAME)) or identities.new_id()
+        session_id = uuid.uuid4().hex
+        sessions.create(session_id, user_id)
+
+        response = jsonify({
             'session_id': session_id,
-            'response': greeting
+            'user_id': user_id,
+            'response': GREETING
         })
+        response.set_cookie(COOKIE_NAME, identities.cookie(user_id), max_age=COOKIE_MAX_AGE,
+                            httponly=True, samesite='Lax')
+        return response
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/send_message', methods=['POST'])
 def send_message():
     """Send a message to the agent and get response."""
+    alert = None
     try:
         data = request.json
         session_id = data.get('session_id')
-        message = data.get('message')
+        message = escape_user_text(data.get('message'))
         
         if not session_id or not message:
             return jsonify({'error': 'Missing session_id or message'}), 400
             
-        if session_id not in sessions:
-            return jsonify({'error': 'Invalid session_id'}), 400
+        alert = check_crisis(data)
+        history = sessions.get(session_id)
+        if history is None:
+            return jsonify({'error': 'Invalid session_id', 'crisis': alert}), 400
+        # Plans and progress are filed under the user the session was created for
+        owner = sessions.owner(session_id) or session_id
+        admission.limit(session_id, request.remote_addr, alert)
+        route = router.route(message, alert)
+        agent = route.agent
+
+        step = questionnaire_step(session_id, owner, message, alert, route)
+        completion = step and step.completion
+        if alert:
+            return crisis_reply(session_id, history, completion.transcript if completion else message,
+                                alert, completion)
+        # Held for the rest of the request, see release_turn
+        g.turn_ticket = admission.acquire()
+        if step and not completion:
+            return jsonify({'response': step.text, 'crisis': None, 'questionnaire': step.prompt})
+        if completion:
+            # The model only writes the summary of the scored answers
+            agent, history, message = assessor, history + completion.history, completion.message
+        if not step and fanout.matches(message):
+            with tracer.span('fanout', 'agent'), plan_owner(owner):
+                reply, sections = fanout.run(history, message, run_branch)
+                sessions.put(session_id, history_manager.compact(history + cached_exchange(message, reply)))
+            return jsonify({'response': reply, 'crisis': None,
+                            'branches': {section.branch.agent.name: section.error is None for section in sections}})
+            
+        cache_key = (not step and response_cache
+                     and response_cache.key_for(message, agent, history, None, tiers.select(agent, message)))
+        cached = cache_key and response_cache.get(cache_key)
+        if cached:
+            sessions.put(session_id, history + cached_exchange(message, cached))
+            return jsonify({'response': cached, 'crisis': None})
             
         # Send message to agent
-        session = sessions[session_id]
-        response = session.send_message(message)
-        
+        with tracer.span(agent.name, 'agent'), plan_owner(owner):
+            turn = tiers.start(agent, message)
+            started = time.perf_counter()
+            response = run_tiered(turn, agent, history, message)
+            sessions.put(session_id, history_manager.compact(strip_context(turn.session.get_history())))
+            if cache_key:
+                response_cache.put(cache_key, response.text, time.perf_counter() - started,
+                                   turn.session.get_history())
+
         return jsonify({
-            'response': response.text
+            'response': response.text,
+            'crisis': None,
+            'assessment': completion.result if completion else None
         })
+    except Overloaded as e:
+        return overloaded(e, alert)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/send_message_stream', methods=['POST'])
+def send_message_stream():
+    """Send a message to the agent and stream the response as Server-Sent Events."""
+    data = request.json or {}
+    session_id = data.get('session_id')
+    message = escape_user_text(data.get('message'))
+
+    if not session_id or not message:
+        return jsonify({'error': 'Missing session_id or message'}), 400
+
+    alert = check_crisis(data)
+    history = sessions.get(session_id)
+    if history is None:
+        return jsonify({'error': 'Invalid session_id', 'crisis': alert}), 400
+    owner = sessions.owner(session_id) or session_id
+    try:
+        admission.limit(session_id, request.remote_addr, alert)
+        ticket = admission.acquire(alert)
+    except Overloaded as e:
+        return overloaded(e, alert)
+
+    try:
+        route = router.route(message, alert)
+        agent = route.agent
+
+        step = questionnaire_step(session_id, owner, message, alert, route)
+        completion = step and step.completion
+        if completion and completion.crisis:
+            # A positive self-harm item goes to the crisis agent, with the answers as the user's turn
+            message = completion.transcript
+        elif completion:
+            # The model only writes the summary of the scored answers
+            agent, history, message = assessor, history + completion.history, completion.message
+        fan_out = not step and fanout.matches(message, alert)
+
+        cache_key = (not step and not fan_out and response_cache
+                     and response_cache.key_for(message, agent, history, alert, tiers.select(agent, message, alert)))
+        cached = cache_key and response_cache.get(cache_key)
+        turn = None if cached or fan_out or (step and not completion) else tiers.start(agent, message, alert)
+    except BaseException:
+        ticket.release()
+        raise
+
+    def generate():
+        if cached:
+            sessions.put(session_id, history + cached_exchange(message, cached))
+            yield sse_event({'text': cached})
+            yield sse_event({}, event='done')
+            return
+
+        if step and not completion:
+            yield sse_event({'text': step.text})
+            if step.prompt:
+                yield sse_event(step.prompt, event='questionnaire')
+            yield sse_event({}, event='done')
+            return
+        if completion:
+            yield sse_event(completion.result, event='assessment')
+        if fan_out:
+            # Each specialist's section goes out as soon as that branch finishes
+            try:
+                with tracer.span('fanout', 'agent', stream=True), plan_owner(owner):
+                    sections = []
+                    for section in fanout.stream(history, message, run_branch):
+                        yield sse_event({'text': ('\n\n' if sections else '') + fanout.merge([section])})
+                        sections.append(section)
+                    reply = fanout.merge(sections)
+                    sessions.put(session_id, history_manager.compact(history + cached_exchange(message, reply)))
+                yield sse_event({}, event='done')
+            except Exception as e:
+                yield sse_event({'error': str(e)}, event='error')
+            return
+
+        # Crisis resources go out before the model call starts
+        if alert:
+            yield sse_event(alert, event='crisis')
+        started = time.perf_counter()
+        try:
+            with tracer.span(agent.name, 'agent', crisis=bool(alert), stream=True), plan_owner(owner):
+                # Pass model chunks through as soon as they arrive
+                reply = []
+                chunks = turn.stream(
+                    lambda model: create_chat(agent, history, model),
+                    lambda session, usage: stream_turn(session, with_coping_content(message, alert), agent.tools, usage),
+                    context_cache.usage)
+                for chunk in chunks:
+                    if chunk.text:
+                        reply.append(chunk.text)
+                        yield sse_event({'text': chunk.text})
+                sessions.put(session_id, history_manager.compact(strip_context(turn.session.get_history()), crisis_pins(alert)))
+                if cache_key:
+                    response_cache.put(cache_key, ''.join(reply), time.perf_counter() - started,
+                                       turn.session.get_history())
+                yield sse_event({}, event='done')
+        except Exception as e:
+            yield sse_event({'error': str(e)}, event='error')
+
+    response = Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    # The slot is held until the stream is closed, however it ends
+    response.call_on_close(ticket.release)
+    return response
+
+@app.teardown_request
+def release_turn(error=None):
+    """Free the admission slot taken by send_message."""
+    ticket = g.pop('turn_ticket', None)
+    if ticket:
+        ticket.release()
+
 @app.route('/end_session', methods=['POST'])
 def end_session():
     """End an agent session."""
@@ -80,13 +382,146 @@ def end_session():
         data = request.json
         session_id = data.get('session_id')
         
-        if session_id in sessions:
-            del sessions[session_id]
+        if questionnaires:
+            questionnaires.cancel(session_id)
+        sessions.delete(session_id)
             
         return jsonify({'status': 'success'})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/score/<scale>', methods=['POST'])
+def score(scale):
+    """Score a CSV or JSONL upload of PHQ-9/GAD-7 questionnaires in one batch."""
+    fmt = 'jsonl' if 'json' in (request.content_type or '') else 'csv'
+    try:
+        result = score_text(scale, request.get_data(as_text=True), fmt)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(to_json(scale, result))
+
+@app.route('/plans/<owner>')
+def list_plans(owner):
+    """List the wellness plans saved by a user (or session), newest first."""
+    if not owns(owner):
+        return forbidden()
+    return jsonify({'plans': plan_store.list(owner)})
+
+@app.route('/plans/<owner>/<plan_id>')
+def get_plan(owner, plan_id):
+    """Download one saved wellness plan as markdown."""
+    if not owns(owner):
+        return forbidden()
+    content = plan_store.get(owner, plan_id)
+    if content is None:
+        return jsonify({'error': 'Plan not found'}), 404
+    return Response(content, mimetype='text/markdown; charset=utf-8')
+
+@app.route('/progress/<owner>')
+def progress(owner):
+    """Rolling mood, energy and sleep aggregates and assessment score changes for a user (or session)."""
+    if not owns(owner):
+        return forbidden()
+    return jsonify(progress_store.summary(owner))
+
+@app.route('/reports')
+@admin_only
+def reports():
+    """Population PHQ-9/GAD-7 report: severity distribution, per-question means, weekly trend and cohorts."""
+    try:
+        return jsonify(analytics.report(request.args.get('scale'), request.args.get('weeks')))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/report_stats')
+@admin_only
+def report_stats():
+    """Report assessments aggregated, incremental refreshes and report build times."""
+    return jsonify(analytics.stats())
+
+@app.route('/plan_stats')
+@admin_only
+def plan_stats():
+    """Report plans saved, deduplicated and written by the background writer."""
+    return jsonify(plan_store.stats())
+
+@app.route('/resource_stats')
+@admin_only
+def resource_stats():
+    """Report resource directory size and search counters."""
+    return jsonify(resource_directory.stats())
+
+@app.route('/retrieval_stats')
+@admin_only
+def retrieval_stats():
+    """Report messages searched for coping content and snippets attached."""
+    return jsonify(retriever.stats())
+
+@app.route('/fanout_stats')
+@admin_only
+def fanout_stats():
+    """Report fan-out requests, failed branches and wall time against the sequential equivalent."""
+    return jsonify(fanout.stats())
+
+@app.route('/admission_stats')
+@admin_only
+def admission_stats():
+    """Report admitted, queued, rate-limited and shed turns, and turns active and waiting."""
+    return jsonify(admission.stats())
+
+@app.route('/tier_stats')
+@admin_only
+def tier_stats():
+    """Report turns, latency and tokens per model tier, escalations and estimated savings."""
+    return jsonify(tiers.stats())
+
+@app.route('/tool_stats')
+@admin_only
+def tool_stats():
+    """Report tool calls, cache hits, timeouts, invalid arguments and per-tool latency."""
+    return jsonify(tool_runtime.stats())
+
+@app.route('/upstream_stats')
+@admin_only
+def upstream_stats():
+    """Report model API calls, retries, coalesced requests, rejections and circuit breaker state."""
+    return jsonify(upstream_policy.stats() if upstream_policy else {'enabled': False})
+
+@app.route('/session_stats')
+@admin_only
+def session_stats():
+    """Report session store hit, miss and eviction counters."""
+    return jsonify(sessions.stats())
+
+@app.route('/cache_stats')
+@admin_only
+def cache_stats():
+    """Report response cache hit rate and latency saved per hit."""
+    return jsonify(response_cache.stats() if response_cache else {'enabled': False})
+
+@app.route('/metrics')
+def metrics():
+    """Expose span latencies, token counts and tool-call depth in Prometheus text format."""
+    return Response(tracer.prometheus(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/questionnaire_stats')
+@admin_only
+def questionnaire_stats():
+    """Report questionnaires started, completed and answered locally."""
+    return jsonify(questionnaires.stats() if questionnaires else {'enabled': False})
+
+@app.route('/router_stats')
+@admin_only
+def router_stats():
+    """Report how many turns each agent handled and the share routed past the coordinator."""
+    return jsonify(router.stats())
+
+@app.route('/token_stats')
+@admin_only
+def token_stats():
+    """Report per-request prompt tokens and how many are served from the context cache."""
+    return jsonify(context_cache.stats())
+
 if __name__ == '__main__':
     print("Starting Agent WellCare Web Interface...")
     print("Open your browser to http://localhost:5000")
@@ -0,0 +1,590 @@
+"""
+ASGI web interface for Agent WellCare.
+Async counterpart of app.py: model calls go through the genai async client,
+so a request waiting on Gemini does not hold a worker thread.
+
+Run with: uvicorn asgi_app:app --host 0.0.0.0 --port 5000
+"""
+
+import asyncio
+import functools
+import hmac
+import os
+import time
+import uuid
+from collections import namedtuple
+import httpx
+from starlette.applications import Starlette
+from starlette.background import BackgroundTask
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+from starlette.templating import Jinja2Templates
+from agents.wellcare.agent import (interactive_wellcare_agent, assess_crisis_risk, conduct_gad7_assessment,
+                                   conduct_phq9_assessment, get_crisis_hotlines)
+from wellcare_core.admission import Overloaded, create_admission
+from wellcare_core.analytics import analytics
+from wellcare_core.chat import GREETING, arun_turn, astream_turn, crisis_alert, sse_event
+from wellcare_core.clients import LazyClient, create_client
+from wellcare_core.context_cache import create_context_cache
+from wellcare_core.fanout import create_fanout
+from wellcare_core.history import create_history_manager, crisis_pins, escape_user_text
+from wellcare_core.identity import COOKIE_MAX_AGE, COOKIE_NAME, identities
+from wellcare_core.plan_store import plan_owner, plan_store
+from wellcare_core.progress import progress_store
+from wellcare_core.questionnaire import CRISIS_INDICATOR, create_questionnaire_manager
+from wellcare_core.resources import resource_directory
+from wellcare_core.response_cache import cached_exchange, create_response_cache
+from wellcare_core.retrieval import retriever, strip_context
+from wellcare_core.router import create_router
+from wellcare_core.scoring import score_text, to_json
+from wellcare_core.session_store import create_session_store
+from wellcare_core.tiering import create_tiers
+from wellcare_core.tools import runtime as tool_runtime
+from wellcare_core.tracing import tracer
+from wellcare_core.upstream import create_http_options, policy as upstream_policy
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+templates = Jinja2Templates(directory=os.path.join(os.path.dirname(__file__), 'templates'))
+
+# Pool enough upstream connections that thousands of concurrent chats are not
+# throttled by httpx's default limit of 100
+MAX_CONNECTIONS = int(os.environ.get("WELLCARE_MAX_CONNECTIONS", "2000"))
+
+# Genai client, built on the first model call (raises there if GOOGLE_API_KEY is missing)
+client = LazyClient(lambda: create_client(create_http_options(MAX_CONNECTIONS) or {
+    "async_client_args": {
+        "limits": httpx.Limits(max_connections=MAX_CONNECTIONS,
+                               max_keepalive_connections=MAX_CONNECTIONS)
+    }
+}))
+
+# Cached-content handles for the static agent prefixes, plus per-turn token counts
+context_cache = create_context_cache(client)
+
+# Keeps stored history to a recent window plus a running summary and pinned scores
+history_manager = create_history_manager(client, interactive_wellcare_agent.model)
+
+# Conversation history per session; set WELLCARE_SESSION_BACKEND=sqlite to share across workers
+sessions = create_session_store()
+
+# Opt-in cache for common openers; None unless WELLCARE_RESPONSE_CACHE=1
+response_cache = create_response_cache()
+
+# Sends clear intents straight to a specialist sub-agent instead of the coordinator
+router = create_router(interactive_wellcare_agent)
+
+# Serves PHQ-9/GAD-7 questions locally; only the final summary goes to the model
+questionnaires = create_questionnaire_manager({'phq9': conduct_phq9_assessment, 'gad7': conduct_gad7_assessment},
+                                             sessions)
+assessor = router.agents['wellness_assessor_agent']
+
+# Bearer token for clinic-wide endpoints such as /reports; they stay closed while it is unset
+ADMIN_TOKEN = os.environ.get('WELLCARE_ADMIN_TOKEN')
+
+# Full-plan requests run the planner and resource specialist concurrently
+fanout = create_fanout(interactive_wellcare_agent)
+
+# Per-session/IP rate limits and a bounded, crisis-first queue in front of model work
+admission = create_admission(max_active=1000, max_waiting=4000)
+
+# Small talk and lighter agents run on a lite model, escalating to the full one on a bad reply
+tiers = create_tiers()
+
+# A parsed send request: who it is for, which agent answers and how
+Turn = namedtuple('Turn', ['session_id', 'owner', 'agent', 'tiered', 'history', 'message', 'alert',
+                           'cache_key', 'cached', 'step', 'fan_out', 'ticket'])
+
+
+async def create_chat(agent, history=None, model=None):
+    """Create an async chat session configured from an ADK agent definition, optionally on another model tier."""
+    model = model or agent.model
+    config = await context_cache.aconfig(model, agent.instruction, agent.tools)
+    return client.aio.chats.create(model=model, config=config, history=history)
+
+
+async def run_tiered(turn, agent, history, message, alert=None):
+    """A full turn on the TieredTurn's tier, escalating if needed; its session then holds the history."""
+    async def send(session, usage):
+        return await arun_turn(session, with_coping_content(message, alert), agent.tools, usage)
+
+    return await turn.arun(lambda model: create_chat(agent, history, model), send, context_cache.usage)
+
+
+def with_coping_content(message, alert):
+    """Attach coping content relevant to the message; crisis turns and tool responses go as they are."""
+    return message if alert else retriever.augment(message)
+
+
+async def run_branch(agent, history, message):
+    """One fan-out branch: a full turn on its own chat, returning the reply text."""
+    response = await run_tiered(tiers.start(agent, message), agent, history, message)
+    return response.text
+
+
+async def session_call(fn, *args):
+    """Calls a session store method, in a thread when the store blocks (SQLite)."""
+    return await asyncio.to_thread(fn, *args) if sessions.blocking else fn(*args)
+
+
+async def questionnaire_step(session_id, owner, message, alert, route):
+    """Answer questionnaire turns locally; a crisis ends the questionnaire and goes to the model."""
+    if not questionnaires:
+        return None
+    # A crisis answer to the questionnaire itself still completes it, for the crisis agent to see
+    if alert and CRISIS_INDICATOR not in alert['crisis_indicators']:
+        await session_call(questionnaires.cancel, session_id)
+        return None
+    # Progress is kept in the session store
+    step = await session_call(questionnaires.step, session_id, message, route.intent)
+    if step and step.completion:
+        completion = step.completion
+        await asyncio.to_thread(progress_store.record, owner, {completion.scale: completion.result['score']},
+                                answers={completion.scale: completion.answers})
+    return step
+
+
+async def read_message(request, crisis_reply=False):
+    """
+    Parse and validate the session_id/message body shared by the send routes.
+
+    With crisis_reply set, a flagged turn is answered with the crisis resources
+    alone (see crisis_reply), so it takes no model slot and has no tier.
+    """
+    data = await request.json()
+    session_id = data.get('session_id')
+    message = escape_user_text(data.get('message'))
+
+    if not session_id or not message:
+        return None, JSONResponse({'error': 'Missing session_id or message'}, status_code=400)
+
+    # Screen the message locally so crisis resources never wait on the model;
+    # a positive PHQ-9 item 9 answer raises the same alert as crisis language
+    flagged = await session_call(questionnaires.crisis_flags, session_id, message) if questionnaires else []
+    alert = crisis_alert(message, assess_crisis_risk, get_crisis_hotlines, data.get('country') or 'US', flagged)
+    history = await session_call(sessions.get, session_id)
+    if history is None:
+        return None, JSONResponse({'error': 'Invalid session_id', 'crisis': alert}, status_code=400)
+    # Plans and progress are filed under the user the session was created for
+    owner = await session_call(sessions.owner, session_id) or session_id
+    try:
+        admission.limit(session_id, request.client.host if request.client else None, alert)
+        # Held until the handler finishes the turn (or the stream closes)
+        ticket = None if alert and crisis_reply else await admission.aacquire(alert)
+    except Overloaded as e:
+        # A shed crisis turn still gets the resources
+        return None, JSONResponse({**e.payload(), 'crisis': alert}, status_code=429, headers=e.headers())
+
+    try:
+        route = router.route(message, alert)
+        agent = route.agent
+
+        step = await questionnaire_step(session_id, owner, message, alert, route)
+        completion = step and step.completion
+        if completion and completion.crisis:
+            # A positive self-harm item goes to the crisis agent, with the answers as the user's turn
+            message = completion.transcript
+        elif completion:
+            # The model only writes the summary of the scored answers
+            agent, history, message = assessor, history + completion.history, completion.message
+        if alert and crisis_reply:
+            return Turn(session_id, owner, agent, None, history, message, alert, None, None, step, False, None), None
+        fan_out = not step and fanout.matches(message, alert)
+
+        cache_key = (not step and not fan_out and response_cache
+                     and response_cache.key_for(message, agent, history, alert, tiers.select(agent, message, alert)))
+        cached = cache_key and response_cache.get(cache_key)
+        if cached:
+            await session_call(sessions.put, session_id, history + cached_exchange(message, cached))
+
+        tiered = None if cached or fan_out or (step and not completion) else tiers.start(agent, message, alert)
+    except BaseException:
+        if ticket:
+            ticket.release()
+        raise
+    return Turn(session_id, owner, agent, tiered, history, message, alert, cache_key, cached, step, fan_out,
+                ticket), None
+
+
+async def save_history(session_id, session, alert):
+    """Store the windowed history; summarizing may call the model, so it runs off the event loop."""
+    history = await asyncio.to_thread(history_manager.compact, strip_context(session.get_history()), crisis_pins(alert))
+    await session_call(sessions.put, session_id, history)
+
+
+async def save_exchange(session_id, history, message, reply, alert=None):
+    """save_history() for a reply that has no single chat to read back: a merged fan-out or crisis reply."""
+    history = await asyncio.to_thread(history_manager.compact, history + cached_exchange(message, reply),
+                                      crisis_pins(alert))
+    await session_call(sessions.put, session_id, history)
+
+
+def crisis_reply(session_id, history, message, alert, completion=None):
+    """
+    Answer a flagged JSON turn with the crisis resources at once, without a model slot or call.
+
+    The exchange is stored with the crisis pinned once the response has gone out, so
+    later turns carry it. Streaming clients also get the crisis agent's reply, after
+    the resources.
+    """
+    return JSONResponse({'response': alert['message'], 'crisis': alert,
+                         'assessment': completion.result if completion else None},
+                        background=BackgroundTask(save_exchange, session_id, history, message, alert['message'], alert))
+
+
+async def index(request):
+    """Serve the main chat interface."""
+    return templates.TemplateResponse(request, 'index.html')
+
+
+async def start_session(request):
+    """Start a new agent session."""
+    try:
+        # Plans and progress follow the browser's server-issued user id across sessions
+        user_id = identities.verify(request.cookies.get(COOKIE_NAME)) or identities.new_id()
+        session_id = uuid.uuid4().hex
+        await session_call(sessions.create, session_id, user_id)
+
+        response = JSONResponse({
+            'session_id': session_id,
+            'user_id': user_id,
+            'response': GREETING
+        })
+        response.set_cookie(COOKIE_NAME, identities.cookie(user_id), max_age=COOKIE_MAX_AGE,
+                            httponly=True, samesite='lax')
+        return response
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+
+async def send_message(request):
+    """Send a message to the agent and get response."""
+    parsed = None
+    try:
+        parsed, error = await read_message(request, crisis_reply=True)
+        if error:
+            return error
+
+        session_id, owner, agent, tiered, history, message, alert, cache_key, cached, step, fan_out, _ = parsed
+        completion = step and step.completion
+        if alert:
+            return crisis_reply(session_id, history, message, alert, completion)
+        if cached:
+            return JSONResponse({'response': cached, 'crisis': None})
+        if step and not completion:
+            return JSONResponse({'response': step.text, 'crisis': None, 'questionnaire': step.prompt})
+        if fan_out:
+            with tracer.span('fanout', 'agent'), plan_owner(owner):
+                reply, sections = await fanout.arun(history, message, run_branch)
+                await save_exchange(session_id, history, message, reply)
+            return JSONResponse({'response': reply, 'crisis': None,
+                                 'branches': {section.branch.agent.name: section.error is None for section in sections}})
+
+        with tracer.span(agent.name, 'agent'), plan_owner(owner):
+            started = time.perf_counter()
+            response = await run_tiered(tiered, agent, history, message)
+            await save_history(session_id, tiered.session, None)
+            if cache_key:
+                response_cache.put(cache_key, response.text, time.perf_counter() - started,
+                                   tiered.session.get_history())
+
+        return JSONResponse({
+            'response': response.text,
+            'crisis': None,
+            'assessment': completion.result if completion else None
+        })
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, status_code=500)
+    finally:
+        if parsed and parsed.ticket:
+            parsed.ticket.release()
+
+
+async def send_message_stream(request):
+    """Send a message to the agent and stream the response as Server-Sent Events."""
+    parsed, error = await read_message(request)
+    if error:
+        return error
+
+    session_id, owner, agent, tiered, history, message, alert, cache_key, cached, step, fan_out, ticket = parsed
+    completion = step and step.completion
+
+    async def generate():
+        if cached:
+            yield sse_event({'text': cached})
+            yield sse_event({}, event='done')
+            return
+
+        if step and not completion:
+            yield sse_event({'text': step.text})
+            if step.prompt:
+                yield sse_event(step.prompt, event='questionnaire')
+            yield sse_event({}, event='done')
+            return
+        if completion:
+            yield sse_event(completion.result, event='assessment')
+        if fan_out:
+            # Each specialist's section goes out as soon as that branch finishes
+            try:
+                with tracer.span('fanout', 'agent', stream=True), plan_owner(owner):
+                    sections = []
+                    async for section in fanout.astream(history, message, run_branch):
+                        yield sse_event({'text': ('\n\n' if sections else '') + fanout.merge([section])})
+                        sections.append(section)
+                    await save_exchange(session_id, history, message, fanout.merge(sections))
+                yield sse_event({}, event='done')
+            except Exception as e:
+                yield sse_event({'error': str(e)}, event='error')
+            return
+
+        # Crisis resources go out before the model call starts
+        if alert:
+            yield sse_event(alert, event='crisis')
+        started = time.perf_counter()
+        try:
+            with tracer.span(agent.name, 'agent', crisis=bool(alert), stream=True), plan_owner(owner):
+                reply = []
+                chunks = tiered.astream(
+                    lambda model: create_chat(agent, history, model),
+                    lambda session, usage: astream_turn(session, with_coping_content(message, alert), agent.tools, usage),
+                    context_cache.usage)
+                async for chunk in chunks:
+                    if chunk.text:
+                        reply.append(chunk.text)
+                        yield sse_event({'text': chunk.text})
+                await save_history(session_id, tiered.session, alert)
+                if cache_key:
+                    response_cache.put(cache_key, ''.join(reply), time.perf_counter() - started,
+                                       tiered.session.get_history())
+                yield sse_event({}, event='done')
+        except Exception as e:
+            yield sse_event({'error': str(e)}, event='error')
+
+    async def released():
+        # The slot is held until the stream ends, is cancelled or fails; a stream dropped before it
+        # started frees it when the ticket is collected
+        try:
+            async for event in generate():
+                yield event
+        finally:
+            ticket.release()
+
+    return StreamingResponse(
+        released(),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+async def end_session(request):
+    """End an agent session."""
+    try:
+        data = await request.json()
+        if questionnaires:
+            await session_call(questionnaires.cancel, data.get('session_id'))
+        await session_call(sessions.delete, data.get('session_id'))
+
+        return JSONResponse({'status': 'success'})
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+
+async def score(request):
+    """Score a CSV or JSONL upload of PHQ-9/GAD-7 questionnaires in one batch."""
+    scale = request.path_params['scale']
+    fmt = 'jsonl' if 'json' in request.headers.get('content-type', '') else 'csv'
+    text = (await request.body()).decode('utf-8')
+    try:
+        # Parsing large uploads is CPU-bound; keep it off the event loop
+        result = await asyncio.to_thread(score_text, scale, text, fmt)
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+    return JSONResponse(to_json(scale, result))
+
+
+async def owns(request):
+    """Whether the request's ?session_id= is a live session whose plans and progress are filed under owner."""
+    session_id = request.query_params.get('session_id')
+    return bool(session_id) and await session_call(sessions.owner, session_id) == request.path_params['owner']
+
+
+def is_admin(request):
+    """Whether the request carries the admin bearer token."""
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {ADMIN_TOKEN}')
+
+
+def admin_only(endpoint):
+    """Close a route, such as the *_stats counters, to requests without the admin token."""
+    @functools.wraps(endpoint)
+    async def wrapper(request):
+        if not is_admin(request):
+            return JSONResponse({'error': 'Admin token required'}, status_code=403)
+        return await endpoint(request)
+    return wrapper
+
+
+def forbidden():
+    return JSONResponse({'error': 'Pass the session_id of a live session that owns this data'}, status_code=403)
+
+
+async def list_plans(request):
+    """List the wellness plans saved by a user (or session), newest first."""
+    if not await owns(request):
+        return forbidden()
+    return JSONResponse({'plans': await asyncio.to_thread(plan_store.list, request.path_params['owner'])})
+
+
+async def get_plan(request):
+    """Download one saved wellness plan as markdown."""
+    if not await owns(request):
+        return forbidden()
+    content = await asyncio.to_thread(plan_store.get, request.path_params['owner'], request.path_params['plan_id'])
+    if content is None:
+        return JSONResponse({'error': 'Plan not found'}, status_code=404)
+    return PlainTextResponse(content, media_type='text/markdown; charset=utf-8')
+
+
+async def progress(request):
+    """Rolling mood, energy and sleep aggregates and assessment score changes for a user (or session)."""
+    if not await owns(request):
+        return forbidden()
+    # SQLite reads block, so keep them off the event loop
+    return JSONResponse(await asyncio.to_thread(progress_store.summary, request.path_params['owner']))
+
+
+@admin_only
+async def reports(request):
+    """Population PHQ-9/GAD-7 report: severity distribution, per-question means, weekly trend and cohorts."""
+    try:
+        # The refresh reads new rows from SQLite, so keep it off the event loop
+        return JSONResponse(await asyncio.to_thread(
+            analytics.report, request.query_params.get('scale'), request.query_params.get('weeks')))
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+
+
+@admin_only
+async def report_stats(request):
+    """Report assessments aggregated, incremental refreshes and report build times."""
+    return JSONResponse(analytics.stats())
+
+
+@admin_only
+async def resource_stats(request):
+    """Report resource directory size and search counters."""
+    return JSONResponse(resource_directory.stats())
+
+
+@admin_only
+async def retrieval_stats(request):
+    """Report messages searched for coping content and snippets attached."""
+    return JSONResponse(retriever.stats())
+
+
+@admin_only
+async def fanout_stats(request):
+    """Report fan-out requests, failed branches and wall time against the sequential equivalent."""
+    return JSONResponse(fanout.stats())
+
+
+@admin_only
+async def admission_stats(request):
+    """Report admitted, queued, rate-limited and shed turns, and turns active and waiting."""
+    return JSONResponse(admission.stats())
+
+
+@admin_only
+async def tier_stats(request):
+    """Report turns, latency and tokens per model tier, escalations and estimated savings."""
+    return JSONResponse(tiers.stats())
+
+
+@admin_only
+async def tool_stats(request):
+    """Report tool calls, cache hits, timeouts, invalid arguments and per-tool latency."""
+    return JSONResponse(tool_runtime.stats())
+
+
+@admin_only
+async def upstream_stats(request):
+    """Report model API calls, retries, coalesced requests, rejections and circuit breaker state."""
+    return JSONResponse(upstream_policy.stats() if upstream_policy else {'enabled': False})
+
+
+@admin_only
+async def plan_stats(request):
+    """Report plans saved, deduplicated and written by the background writer."""
+    return JSONResponse(plan_store.stats())
+
+
+@admin_only
+async def session_stats(request):
+    """Report session store hit, miss and eviction counters."""
+    return JSONResponse(await session_call(sessions.stats))
+
+
+@admin_only
+async def cache_stats(request):
+    """Report response cache hit rate and latency saved per hit."""
+    return JSONResponse(response_cache.stats() if response_cache else {'enabled': False})
+
+
+async def metrics(request):
+    """Expose span latencies, token counts and tool-call depth in Prometheus text format."""
+    return PlainTextResponse(tracer.prometheus(), media_type='text/plain; version=0.0.4')
+
+
+@admin_only
+async def questionnaire_stats(request):
+    """Report questionnaires started, completed and answered locally."""
+    return JSONResponse(questionnaires.stats() if questionnaires else {'enabled': False})
+
+
+@admin_only
+async def router_stats(request):
+    """Report how many turns each agent handled and the share routed past the coordinator."""
+    return JSONResponse(router.stats())
+
+
+@admin_only
+async def token_stats(request):
+    """Report per-request prompt tokens and how many are served from the context cache."""
+    return JSONResponse(context_cache.stats())
+
+
+app = Starlette(routes=[
+    Route('/', index),
+    Route('/start_session', start_session, methods=['POST']),
+    Route('/send_message', send_message, methods=['POST']),
+    Route('/send_message_stream', send_message_stream, methods=['POST']),
+    Route('/end_session', end_session, methods=['POST']),
+    Route('/score/{scale}', score, methods=['POST']),
+    Route('/plans/{owner}', list_plans),
+    Route('/plans/{owner}/{plan_id}', get_plan),
+    Route('/progress/{owner}', progress),
+    Route('/reports', reports),
+    Route('/report_stats', report_stats),
+    Route('/plan_stats', plan_stats),
+    Route('/fanout_stats', fanout_stats),
+    Route('/resource_stats', resource_stats),
+    Route('/retrieval_stats', retrieval_stats),
+    Route('/admission_stats', admission_stats),
+    Route('/tier_stats', tier_stats),
+    Route('/tool_stats', tool_stats),
+    Route('/upstream_stats', upstream_stats),
+    Route('/session_stats', session_stats),
+    Route('/cache_stats', cache_stats),
+    Route('/questionnaire_stats', questionnaire_stats),
+    Route('/router_stats', router_stats),
+    Route('/token_stats', token_stats),
+    Route('/metrics', metrics),
+])
+
+if __name__ == '__main__':
+    import uvicorn
+
+    print("Starting Agent WellCare Web Interface (ASGI)...")
+    print("Open your browser to http://localhost:5000")
+    uvicorn.run(app, host='0.0.0.0', port=5000)
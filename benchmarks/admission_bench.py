@@ -0,0 +1,124 @@
+"""
+Admission control under overload: shedding, crisis priority and flooding.
+
+Drives the ASGI app in-process against benchmarks/fake_gemini.py with the
+upstream limited to --upstream-concurrency model calls at once, so turns
+queue for the model as they would against a saturated API.
+
+- overload: --chats casual chats arrive at once, then --crisis crisis
+  messages. Without admission control every turn queues for the model and
+  crisis turns wait behind the casual ones. With it, turns beyond the queue
+  are shed at once with a 429 and crisis turns skip the line. Crisis turns
+  are streamed and timed to the end of the crisis agent's reply: on
+  /send_message they get the resources without a model call at all.
+- flood: one session sends --flood messages at once; the per-session token
+  bucket answers the excess with 429s.
+
+    python benchmarks/admission_bench.py --chats 400 --crisis 10 --latency 0.5
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fake_gemini import run_in_thread  # noqa: E402
+
+CASUAL = "I've been feeling a bit flat this week and wanted to talk it through"
+CRISIS = "I want to kill myself, I can't do this anymore"
+
+
+async def one_turn(http, message: str, route: str = '/send_message'):
+    """(status, seconds) for a fresh session's first message, read to the end of the reply."""
+    session_id = (await http.post('/start_session')).json()['session_id']
+    start = time.perf_counter()
+    reply = await http.post(route, json={'session_id': session_id, 'message': message})
+    return reply.status_code, time.perf_counter() - start
+
+
+async def overload(app, chats: int, crisis: int):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://wellcare", timeout=None) as http:
+        casual = [asyncio.ensure_future(one_turn(http, CASUAL)) for _ in range(chats)]
+        # Let the casual turns fill the queue before the crisis messages arrive
+        await asyncio.sleep(0.2)
+        urgent = [asyncio.ensure_future(one_turn(http, CRISIS, '/send_message_stream')) for _ in range(crisis)]
+        return await asyncio.gather(*casual), await asyncio.gather(*urgent)
+
+
+async def flood(app, messages: int):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://wellcare", timeout=None) as http:
+        session_id = (await http.post('/start_session')).json()['session_id']
+        replies = await asyncio.gather(*(
+            http.post('/send_message', json={'session_id': session_id, 'message': f"{CASUAL} ({i})"})
+            for i in range(messages)))
+        return [reply.status_code for reply in replies], replies[-1].headers.get('retry-after')
+
+
+def ms(samples: list) -> str:
+    return f"{statistics.fmean(samples) * 1000:>8.0f}{max(samples) * 1000:>8.0f}" if samples else f"{'-':>8}{'-':>8}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure shedding and crisis priority under overload.")
+    parser.add_argument("--chats", type=int, default=400, help="casual chats arriving at once")
+    parser.add_argument("--crisis", type=int, default=10, help="crisis messages arriving just after")
+    parser.add_argument("--latency", type=float, default=0.5, help="fake model latency in seconds")
+    parser.add_argument("--upstream-concurrency", type=int, default=20, help="model calls in flight at once")
+    parser.add_argument("--max-active", type=int, default=20, help="turns admitted at once")
+    parser.add_argument("--max-waiting", type=int, default=100, help="turns allowed to wait")
+    parser.add_argument("--flood", type=int, default=50, help="messages one session sends at once")
+    parser.add_argument("--port", type=int, default=8782)
+    args = parser.parse_args()
+
+    os.environ["GOOGLE_GEMINI_BASE_URL"] = run_in_thread(args.port, latency=args.latency)
+    os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+    os.environ.setdefault("WELLCARE_HISTORY_SUMMARY", "extractive")
+    os.environ["WELLCARE_UPSTREAM_CONCURRENCY"] = str(args.upstream_concurrency)
+    os.environ["WELLCARE_UPSTREAM_QUEUE"] = str(args.chats * 4)
+    import asgi_app
+    from wellcare_core.admission import AdmissionControl
+
+    # Every simulated client shares one address here, so only the per-session limit applies
+    unlimited_ip = {"ip_rate": 1e9, "ip_burst": 1e9}
+    modes = (
+        ("no admission control", AdmissionControl(enabled=False)),
+        ("admission control", AdmissionControl(max_active=args.max_active, max_waiting=args.max_waiting,
+                                               **unlimited_ip)),
+    )
+
+    async def run_all():
+        # One event loop throughout: the app's async model client is bound to the loop it first ran on
+        results = []
+        for _, admission in modes:
+            asgi_app.admission = admission
+            results.append(await overload(asgi_app.app, args.chats, args.crisis))
+        asgi_app.admission = AdmissionControl(**unlimited_ip)
+        return results, await flood(asgi_app.app, args.flood)
+
+    results, (statuses, retry_after) = asyncio.run(run_all())
+
+    print(f"{'overload':<22}{'ok':>6}{'429':>6}{'mean ms':>8}{'max ms':>8}{'crisis mean':>13}{'max':>8}")
+    for (mode, _), (casual, urgent) in zip(modes, results):
+        ok = [seconds for status, seconds in casual if status == 200]
+        shed = [seconds for status, seconds in casual if status == 429]
+        crisis_ok = [seconds for status, seconds in urgent if status == 200]
+        print(f"{mode:<22}{len(ok):>6}{len(shed):>6}{ms(ok)}{'':>5}{ms(crisis_ok)}"
+              f"   (crisis answered {len(crisis_ok)}/{len(urgent)})")
+        if shed:
+            print(f"{'':<22}shed turns answered in {statistics.fmean(shed) * 1000:.0f} ms on average")
+
+    print(f"\nflood: {statuses.count(200)} answered, {statuses.count(429)} rate limited "
+          f"(Retry-After {retry_after}s) out of {len(statuses)} messages from one session")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Population assessment reports: columnar aggregation and incremental refresh.
+
+Generates --records synthetic PHQ-9 assessments (with item answers) from
+--people people over two years and measures:
+
+- aggregation: a per-record Python loop against the columnar NumPy fold
+  in wellcare_core.analytics, over the same records
+- storage: the records bulk-loaded into a temporary progress store, the
+  first (cold) refresh that folds them all in and saves the rollups, a
+  restarted worker loading those rollups, then --new assessments
+  recorded and a report that folds in only those, against recomputing the
+  weekly severity figures with a SQL GROUP BY over every stored score
+
+    python benchmarks/analytics_bench.py --records 2000000 --people 200000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from wellcare_core.analytics import AssessmentAnalytics, ScaleAggregates  # noqa: E402
+from wellcare_core.progress import ProgressStore  # noqa: E402
+
+DAY = 86400
+ITEMS = 9
+
+
+def generate(records: int, people: int, now: float, seed: int = 0):
+    """(owners, ts, scores, answers) for synthetic PHQ-9 assessments."""
+    rng = np.random.default_rng(seed)
+    owners = np.char.add("user-", rng.integers(0, people, records).astype(str)).astype(object)
+    ts = np.sort(now - rng.uniform(0, 730 * DAY, records))
+    # Skewed towards low answers, like a general population
+    answers = rng.choice(4, size=(records, ITEMS), p=[0.5, 0.3, 0.12, 0.08]).astype(np.int64)
+    return owners, ts, answers.sum(axis=1), answers
+
+
+def naive(owners, ts, scores, answers) -> dict:
+    """The same aggregates built one record at a time in pure Python."""
+    bounds = (4, 9, 14, 19)
+    bands = [0] * 5
+    items = [[0] * 4 for _ in range(ITEMS)]
+    weeks, cohorts, first = {}, {}, {}
+    for owner, stamp, score, row in zip(owners.tolist(), ts.tolist(), scores.tolist(), answers.tolist()):
+        band = next((i for i, bound in enumerate(bounds) if score <= bound), len(bounds))
+        bands[band] += 1
+        for item, answer in enumerate(row):
+            items[item][answer] += 1
+        week = weeks.setdefault((int(stamp) // DAY + 3) // 7, [0, 0] + [0] * 5)
+        week[0] += 1
+        week[1] += score
+        week[2 + band] += 1
+        month = time.gmtime(stamp)
+        month = (month.tm_year - 1970) * 12 + month.tm_mon - 1
+        cohort = first.setdefault(owner, month)
+        cell = cohorts.setdefault((cohort, max(month - cohort, 0)), [0, 0])
+        cell[0] += 1
+        cell[1] += score
+    return {"bands": bands, "items": items, "weeks": weeks, "cohorts": cohorts}
+
+
+def bulk_load(store: ProgressStore, owners, ts, scores, answers):
+    """Writes the records straight into the store's tables (record() per row would take minutes)."""
+    conn = store._connection()
+    conn.execute("BEGIN")
+    conn.executemany("INSERT INTO entries VALUES (?, 'phq9', ?, ?, NULL)",
+                     zip(owners.tolist(), ts.tolist(), scores.astype(float).tolist()))
+    digits = ["".join(map(str, row)) for row in answers.tolist()]
+    conn.executemany("INSERT INTO answers VALUES (?, 'phq9', ?, ?)", zip(owners.tolist(), ts.tolist(), digits))
+    conn.execute("COMMIT")
+
+
+def sql_weekly(store: ProgressStore):
+    """Weekly counts, score totals and severity bands recomputed from every stored score."""
+    return store._connection().execute(
+        "SELECT (CAST(ts / 86400 AS INTEGER) + 3) / 7 AS week, COUNT(*), SUM(value), "
+        "SUM(value <= 4), SUM(value > 4 AND value <= 9), SUM(value > 9 AND value <= 14), "
+        "SUM(value > 14 AND value <= 19), SUM(value > 19) "
+        "FROM entries WHERE metric = 'phq9' GROUP BY week"
+    ).fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure columnar and incremental assessment reports.")
+    parser.add_argument("--records", type=int, default=2000000, help="stored assessments")
+    parser.add_argument("--people", type=int, default=200000)
+    parser.add_argument("--new", type=int, default=100, help="assessments recorded before the incremental report")
+    parser.add_argument("--repeat", type=int, default=20, help="reports timed")
+    args = parser.parse_args()
+
+    now = time.time()
+    owners, ts, scores, answers = generate(args.records, args.people, now)
+
+    start = time.perf_counter()
+    expected = naive(owners, ts, scores, answers)
+    naive_seconds = time.perf_counter() - start
+
+    aggregates = ScaleAggregates("phq9")
+    start = time.perf_counter()
+    aggregates.add_scores(owners, ts, scores)
+    aggregates.add_answers(answers)
+    columnar_seconds = time.perf_counter() - start
+
+    assert aggregates.bands.tolist() == expected["bands"]
+    assert aggregates.item_answers.tolist() == expected["items"]
+    assert {week: row.tolist() for week, row in aggregates.weeks.items()} == expected["weeks"]
+    assert {(key >> 20, key & 0xFFFFF): row.tolist() for key, row in aggregates.cohort_months.items()} \
+        == expected["cohorts"]
+
+    print(f"aggregating {args.records:,} assessments from {args.people:,} people")
+    print(f"  python loop   {naive_seconds:>8.2f} s")
+    print(f"  numpy columns {columnar_seconds:>8.2f} s   ({naive_seconds / columnar_seconds:.0f}x)")
+
+    with tempfile.TemporaryDirectory() as root:
+        store = ProgressStore(os.path.join(root, "progress.db"))
+        bulk_load(store, owners, ts, scores, answers)
+        analytics = AssessmentAnalytics(store)
+
+        start = time.perf_counter()
+        analytics.refresh()
+        cold_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        AssessmentAnalytics(store).refresh()
+        restart_seconds = time.perf_counter() - start
+
+        rng = np.random.default_rng(1)
+        for i in range(args.new):
+            row = rng.integers(0, 4, ITEMS).tolist()
+            store.record(f"new-{i}", {"phq9": sum(row)}, answers={"phq9": row})
+        start = time.perf_counter()
+        report = analytics.report("phq9")
+        incremental_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            analytics.report("phq9")
+        steady_ms = (time.perf_counter() - start) / args.repeat * 1000
+
+        start = time.perf_counter()
+        for _ in range(max(1, args.repeat // 10)):
+            sql_weekly(store)
+        sql_ms = (time.perf_counter() - start) / max(1, args.repeat // 10) * 1000
+
+    assert report["phq9"]["assessments"] == args.records + args.new
+    print(f"\nprogress store with {args.records:,} assessments")
+    print(f"  cold refresh (fold every stored row)        {cold_seconds:>9.2f} s")
+    print(f"  restart (load the saved rollups)            {restart_seconds:>9.2f} s")
+    print(f"  report after {args.new} new assessments          {incremental_ms:>9.1f} ms")
+    print(f"  report with nothing new                     {steady_ms:>9.1f} ms")
+    print(f"  SQL GROUP BY of weekly severity (no items)  {sql_ms:>9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
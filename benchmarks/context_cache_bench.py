@@ -0,0 +1,67 @@
+"""
+Per-turn prompt tokens with and without context caching.
+
+Runs the same conversation against benchmarks/fake_gemini.py twice: once
+sending each agent's instruction and tool declarations inline on every turn,
+and once referencing them through wellcare_core.context_cache.
+
+    python benchmarks/context_cache_bench.py --turns 10
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from google.genai import Client  # noqa: E402
+
+from agents.wellcare.agent import interactive_wellcare_agent  # noqa: E402
+from fake_gemini import run_in_thread  # noqa: E402
+from wellcare_core.chat import run_turn  # noqa: E402
+from wellcare_core.context_cache import ContextCache  # noqa: E402
+
+MESSAGES = [
+    "Hi, I've been having a hard time sleeping",
+    "It's mostly racing thoughts about work",
+    "Can you help me make a plan for the evenings?",
+]
+
+
+def run_conversation(client: Client, cache: ContextCache, turns: int) -> dict:
+    """Plays `turns` user messages through one chat, rebuilding it each turn like the web apps."""
+    agent = interactive_wellcare_agent
+    history = []
+    for turn in range(turns):
+        config = cache.config(agent.model, agent.instruction, agent.tools)
+        # Let the background upload land before the next turn, as it would between real turns
+        cache.wait()
+        chat = client.chats.create(model=agent.model, config=config, history=history)
+        run_turn(chat, MESSAGES[turn % len(MESSAGES)], agent.tools, cache.usage)
+        history = chat.get_history()
+    return cache.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure prompt tokens per turn with context caching.")
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--port", type=int, default=8767)
+    args = parser.parse_args()
+
+    base_url = run_in_thread(args.port, latency=0.0)
+    client = Client(api_key="fake-key", http_options={"base_url": base_url})
+
+    inline = run_conversation(client, ContextCache(client, enabled=False), args.turns)
+    # The fake server caches any prefix, so don't hold it to Gemini's minimum size
+    cached = run_conversation(client, ContextCache(client, enabled=True, min_tokens=1), args.turns)
+
+    print(f"{'mode':<10}{'prompt tok/turn':>18}{'uncached tok/turn':>20}")
+    for name, stats in (("inline", inline), ("cached", cached)):
+        print(f"{name:<10}{stats['prompt_tokens_per_request']:>18.0f}"
+              f"{stats['uncached_prompt_tokens_per_request']:>20.0f}")
+    saved = 1 - cached["uncached_prompt_tokens_per_request"] / inline["uncached_prompt_tokens_per_request"]
+    print(f"uncached input tokens reduced by {saved:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Crisis detector latency as the lexicon grows.
+
+Compares the compiled single-pass detector in wellcare_core.crisis with the
+original one-substring-scan-per-keyword approach on the same message.
+
+    python benchmarks/crisis_bench.py --sizes 10 100 1000 5000
+"""
+
+import argparse
+import random
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from wellcare_core.crisis import DEFAULT_LEXICON, CrisisDetector  # noqa: E402
+
+WORDS = [
+    "feel", "never", "again", "alone", "empty", "tired", "dark", "lost", "hopeless", "worthless",
+    "trapped", "burden", "pain", "scared", "broken", "numb", "gone", "quiet", "forever", "tonight",
+    "leave", "disappear", "sleep", "escape", "stop", "nobody", "anymore", "inside", "cannot", "help",
+]
+
+MESSAGE = (
+    "Lately I've been struggling with work and sleep. Some days I feel okay and other days "
+    "everything seems heavy. My friends say I should talk to someone, and honestly I think "
+    "they're right, but I don't know where to start or what to say. "
+) * 3
+
+
+def synthetic_lexicon(size: int, seed: int = 7) -> dict:
+    """Builds a lexicon of `size` random two-to-four word phrases plus the defaults."""
+    rng = random.Random(seed)
+    lexicon = {indicator: list(variants) for indicator, variants in DEFAULT_LEXICON.items()}
+    phrases = set()
+    while len(phrases) < size:
+        phrases.add(" ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 4))))
+    lexicon["synthetic"] = sorted(phrases)
+    return lexicon
+
+
+def substring_scan(phrases: list, text: str) -> list:
+    """The original approach: one `in` scan per keyword."""
+    text = text.lower()
+    return [phrase for phrase in phrases if phrase in text]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark crisis detection against lexicon size.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 2500, 5000])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"message length: {len(MESSAGE)} chars")
+    print(f"{'phrases':>8}{'compile ms':>12}{'compiled us':>13}{'substring us':>14}")
+    for size in args.sizes:
+        lexicon = synthetic_lexicon(size)
+        phrases = [p for variants in lexicon.values() for p in variants]
+
+        start = timeit.default_timer()
+        detector = CrisisDetector(lexicon)
+        compile_ms = (timeit.default_timer() - start) * 1000
+
+        compiled = min(timeit.repeat(lambda: detector.assess(MESSAGE), number=args.repeat, repeat=3))
+        scan = min(timeit.repeat(lambda: substring_scan(phrases, MESSAGE), number=args.repeat, repeat=3))
+        print(f"{len(phrases):>8}{compile_ms:>12.1f}"
+              f"{compiled / args.repeat * 1e6:>13.1f}{scan / args.repeat * 1e6:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
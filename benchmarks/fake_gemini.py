@@ -0,0 +1,347 @@
+"""
+Local stand-in for the Gemini REST API used by the benchmarks.
+
+Implements generateContent, streamGenerateContent and cachedContents with a
+configurable first-token latency and output token rate, so the web
+interfaces can be load tested without an API key or network access. Script
+rules make it answer matching user messages with a tool call (when the
+request declares that tool) or a fixed reply. Faults (an error rate, and
+429s above a concurrency cap) can be injected at startup or changed at
+runtime with POST /faults; GET /stats reports the requests received. Point the genai client at it with:
+
+    GOOGLE_GEMINI_BASE_URL=http://127.0.0.1:8765 python app.py
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import uvicorn
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+DEFAULT_REPLY = (
+    "Thank you for sharing that with me. It sounds like you're carrying a lot right now, "
+    "and it's okay to feel this way. Would you like to try a short breathing exercise together?"
+)
+
+
+def count_tokens(text: str) -> int:
+    """Approximates Gemini token counts at four characters per token."""
+    return max(1, len(text) // 4) if text else 0
+
+
+def prompt_text(body: dict) -> str:
+    """Concatenates every text part of a generateContent request body."""
+    contents = list(body.get("contents", []))
+    if body.get("systemInstruction"):
+        contents.append(body["systemInstruction"])
+    return "".join(
+        part.get("text", "")
+        for content in contents
+        for part in content.get("parts", [])
+    )
+
+
+def prefix_tokens(body: dict) -> int:
+    """Approximates the tokens in a request's system instruction and tool declarations."""
+    tokens = 0
+    if body.get("systemInstruction"):
+        tokens += count_tokens(prompt_text({"systemInstruction": body["systemInstruction"]}))
+    if body.get("tools"):
+        tokens += count_tokens(json.dumps(body["tools"]))
+    return tokens
+
+
+def declared_tools(body: dict) -> set:
+    """Names of the function declarations in a request body."""
+    return {
+        declaration["name"]
+        for tool in body.get("tools") or []
+        for declaration in tool.get("functionDeclarations") or tool.get("function_declarations") or []
+    }
+
+
+def last_user_text(body: dict):
+    """The latest user message text, or None if the request answers a tool call."""
+    contents = body.get("contents") or []
+    if not contents:
+        return None
+    parts = contents[-1].get("parts", [])
+    if any("functionResponse" in part for part in parts):
+        return None
+    return "".join(part.get("text", "") for part in parts)
+
+
+def scripted_reply(rules: list, body: dict, tools: set, default: str, model: str = ""):
+    """
+    Picks the reply for a request from the script rules.
+
+    Args:
+        rules: Dicts with a "match" regex and either "call" ({"name", "args"}) or "reply", plus
+            optionally a "model" regex the rule is limited to and a "finish" reason (default STOP)
+        body: generateContent request body
+        tools: Tool names available to the request
+        default: Reply used when no rule applies
+        model: Model the request is for
+
+    Returns:
+        (text, function_call, finish_reason) with exactly one of text and function_call set
+    """
+    text = last_user_text(body)
+    if text is not None:
+        for rule in rules:
+            if not re.search(rule["match"], text, re.IGNORECASE):
+                continue
+            if rule.get("model") and not re.search(rule["model"], model):
+                continue
+            call = rule.get("call")
+            if call and call["name"] in tools:
+                return None, call, "STOP"
+            if "reply" in rule:
+                return rule["reply"], None, rule.get("finish", "STOP")
+    return default, None, "STOP"
+
+
+def make_response(model: str, text: str, prompt_tokens: int, finished: bool = True,
+                  cached_tokens: int = 0, function_call: dict = None, finish_reason: str = "STOP") -> dict:
+    """Builds a GenerateContentResponse payload."""
+    part = {"functionCall": function_call} if function_call else {"text": text}
+    candidate = {
+        "content": {"role": "model", "parts": [part]},
+        "index": 0,
+    }
+    if finished:
+        candidate["finishReason"] = finish_reason
+
+    output_tokens = count_tokens(json.dumps(function_call) if function_call else text)
+    usage = {
+        "promptTokenCount": prompt_tokens + cached_tokens,
+        "candidatesTokenCount": output_tokens,
+        "totalTokenCount": prompt_tokens + cached_tokens + output_tokens,
+    }
+    if cached_tokens:
+        usage["cachedContentTokenCount"] = cached_tokens
+    return {
+        "candidates": [candidate],
+        "usageMetadata": usage,
+        "modelVersion": model,
+    }
+
+
+def create_app(latency: float = 0.5, reply: str = DEFAULT_REPLY, chunks: int = 8,
+               token_rate: float = None, rules=(), faults: dict = None, model_latency: dict = None) -> Starlette:
+    """Creates the fake Gemini ASGI app.
+
+    Args:
+        latency: Seconds to wait before the first token is returned
+        reply: Text returned when no script rule matches
+        chunks: Number of pieces the reply is split into when streaming
+        token_rate: Output tokens per second after the first token (None: instant)
+        rules: Script rules, see scripted_reply
+        model_latency: Model name substring -> latency, overriding latency for matching models
+        faults: Injected failures: "error_rate" (share of model calls failed), "status" (their
+            status, default 503), "retry_after" (seconds, sent with failures when set) and
+            "max_concurrency" (model calls above it get a 429)
+    """
+    stats = {"requests": 0, "prompt_tokens": 0, "function_calls": 0, "faults": 0, "in_flight": 0,
+             "peak_in_flight": 0}
+    caches = {}
+    faults = dict(faults or {})
+    rng = random.Random(0)
+
+    def injected_fault():
+        """Error response for this model call, if one is due."""
+        status = None
+        if faults.get("max_concurrency") and stats["in_flight"] > faults["max_concurrency"]:
+            status = 429
+        elif rng.random() < faults.get("error_rate", 0):
+            status = faults.get("status", 503)
+        if status is None:
+            return None
+        stats["faults"] += 1
+        headers = {"Retry-After": str(faults["retry_after"])} if faults.get("retry_after") is not None else {}
+        return JSONResponse({"error": {"code": status, "message": "Injected fault", "status": "UNAVAILABLE"}},
+                            status_code=status, headers=headers)
+
+    def generation_time(tokens: int) -> float:
+        return tokens / token_rate if token_rate else 0.0
+
+    async def generate(request):
+        stats["in_flight"] += 1
+        stats["peak_in_flight"] = max(stats["peak_in_flight"], stats["in_flight"])
+        try:
+            return injected_fault() or await respond(request)
+        finally:
+            stats["in_flight"] -= 1
+
+    async def respond(request):
+        version = request.path_params["version"]
+        model, _, action = request.path_params["model_action"].partition(":")
+        body = await request.json()
+        prompt_tokens = count_tokens(prompt_text({"contents": body.get("contents", [])})) + prefix_tokens(body)
+        cache = caches.get(body.get("cachedContent"), {})
+        cached_tokens = cache.get("tokens", 0)
+        text, function_call, finish_reason = scripted_reply(
+            rules, body, declared_tools(body) | cache.get("tools", set()), reply, model)
+        stats["requests"] += 1
+        stats["prompt_tokens"] += prompt_tokens
+        stats["function_calls"] += bool(function_call)
+
+        await asyncio.sleep(next((seconds for name, seconds in (model_latency or {}).items() if name in model),
+                                 latency))
+
+        if action == "generateContent" or (action == "streamGenerateContent" and function_call):
+            payload = make_response(model, text, prompt_tokens, cached_tokens=cached_tokens,
+                                    function_call=function_call, finish_reason=finish_reason)
+            if action == "generateContent":
+                await asyncio.sleep(generation_time(count_tokens(text or "")))
+                return JSONResponse(payload)
+
+            async def single():
+                yield f"data: {json.dumps(payload)}\r\n\r\n"
+
+            return StreamingResponse(single(), media_type="text/event-stream")
+
+        if action == "streamGenerateContent":
+            step = max(1, len(text) // chunks)
+            pieces = [text[i:i + step] for i in range(0, len(text), step)] or [""]
+
+            async def stream():
+                for i, piece in enumerate(pieces):
+                    if i:
+                        await asyncio.sleep(generation_time(count_tokens(piece)))
+                    payload = make_response(model, piece, prompt_tokens, finished=i == len(pieces) - 1,
+                                            cached_tokens=cached_tokens, finish_reason=finish_reason)
+                    yield f"data: {json.dumps(payload)}\r\n\r\n"
+
+            return StreamingResponse(stream(), media_type="text/event-stream")
+
+        return JSONResponse({"error": {"code": 404, "message": f"Unknown action {action} ({version})"}}, status_code=404)
+
+    def cache_resource(name: str) -> dict:
+        entry = caches[name]
+        return {
+            "name": name,
+            "model": entry["model"],
+            "expireTime": entry["expire_time"].isoformat().replace("+00:00", "Z"),
+            "usageMetadata": {"totalTokenCount": entry["tokens"]},
+        }
+
+    def expiry(body: dict) -> datetime:
+        seconds = float(body.get("ttl", "3600s").rstrip("s"))
+        return datetime.now(timezone.utc) + timedelta(seconds=seconds)
+
+    async def create_cache(request):
+        body = await request.json()
+        name = f"cachedContents/{uuid.uuid4().hex[:12]}"
+        caches[name] = {"model": body.get("model"), "tokens": prefix_tokens(body), "expire_time": expiry(body),
+                        "tools": declared_tools(body)}
+        return JSONResponse(cache_resource(name))
+
+    async def update_cache(request):
+        name = f"cachedContents/{request.path_params['cache_id']}"
+        if name not in caches:
+            return JSONResponse({"error": {"code": 404, "message": f"{name} not found"}}, status_code=404)
+        caches[name]["expire_time"] = expiry(await request.json())
+        return JSONResponse(cache_resource(name))
+
+    async def set_faults(request):
+        faults.clear()
+        faults.update(await request.json())
+        return JSONResponse(faults)
+
+    async def get_stats(request):
+        return JSONResponse(stats)
+
+    app = Starlette(routes=[
+        Route("/faults", set_faults, methods=["POST"]),
+        Route("/stats", get_stats),
+        Route("/{version}/models/{model_action}", generate, methods=["POST"]),
+        Route("/{version}/cachedContents", create_cache, methods=["POST"]),
+        Route("/{version}/cachedContents/{cache_id}", update_cache, methods=["PATCH"]),
+    ])
+    app.state.stats = stats
+    app.state.faults = faults
+    return app
+
+
+def run_in_thread(port: int = 8765, **kwargs) -> str:
+    """Starts the fake server on a daemon thread and returns its base URL."""
+    config = uvicorn.Config(create_app(**kwargs), host="127.0.0.1", port=port,
+                            log_level="warning", backlog=4096)
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError(f"Fake Gemini server failed to start on port {port} (is it in use?)")
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}"
+
+
+def run_in_process(port: int = 8765, latency: float = 0.5, timeout: float = 30.0):
+    """
+    Starts the fake server in a child process, so it doesn't compete with the app under test for the GIL.
+
+    Returns:
+        (base URL, Popen); terminate the process when done
+    """
+    with socket.socket() as probe:
+        try:
+            probe.bind(("127.0.0.1", port))
+        except OSError:
+            raise RuntimeError(f"Port {port} is in use; pass another --port") from None
+    process = subprocess.Popen([sys.executable, __file__, "--port", str(port), "--latency", str(latency)],
+                               stdout=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + timeout
+    while True:
+        if process.poll() is not None:
+            raise RuntimeError(f"Fake Gemini server exited with status {process.returncode}")
+        try:
+            httpx.get(f"{url}/stats", timeout=1)
+            return url, process
+        except httpx.TransportError:
+            if time.monotonic() > deadline:
+                process.kill()
+                raise RuntimeError(f"Fake Gemini server did not start within {timeout}s") from None
+            time.sleep(0.05)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local fake Gemini API server.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds before the first token")
+    parser.add_argument("--token-rate", type=float, help="output tokens per second (default: instant)")
+    parser.add_argument("--script", help="JSON file with a \"rules\" list (see benchmarks/conversations.json)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of model calls that fail")
+    parser.add_argument("--error-status", type=int, default=503, help="status of injected failures")
+    parser.add_argument("--max-concurrency", type=int, help="model calls in flight before returning 429")
+    args = parser.parse_args()
+
+    rules = []
+    if args.script:
+        with open(args.script, encoding="utf-8") as f:
+            rules = json.load(f).get("rules", [])
+
+    print(f"Fake Gemini listening on http://127.0.0.1:{args.port} (latency {args.latency}s)")
+    faults = {"error_rate": args.error_rate, "status": args.error_status, "max_concurrency": args.max_concurrency}
+    uvicorn.run(create_app(latency=args.latency, token_rate=args.token_rate, rules=rules, faults=faults),
+                host="127.0.0.1", port=args.port, log_level="warning", backlog=4096)
+
+
+if __name__ == "__main__":
+    main()
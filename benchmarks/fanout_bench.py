@@ -0,0 +1,82 @@
+"""
+Full-plan turns: specialists one after another versus fanned out.
+
+Sends the same full-plan request to the planner and the resource
+specialist, first sequentially (as the coordinator would delegate) and
+then through wellcare_core.fanout, in both app.py (thread pool) and
+asgi_app.py (asyncio tasks), with benchmarks/fake_gemini.py answering
+model calls. Each branch makes one model call of --latency seconds plus
+generation time, so the fan-out turn should take about one branch.
+
+    python benchmarks/fanout_bench.py --requests 20 --latency 0.5
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fake_gemini import run_in_thread  # noqa: E402
+
+MESSAGE = "Can you put together a full wellness plan for me and suggest some support groups?"
+
+
+def summarize(label: str, samples: list):
+    print(f"{label:<28}{statistics.fmean(samples) * 1000:>10.0f}{max(samples) * 1000:>10.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare sequential and fanned-out full-plan turns.")
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.5, help="fake model latency in seconds")
+    parser.add_argument("--port", type=int, default=8779)
+    args = parser.parse_args()
+
+    os.environ["GOOGLE_GEMINI_BASE_URL"] = run_in_thread(args.port, latency=args.latency)
+    os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+    os.environ.setdefault("WELLCARE_HISTORY_SUMMARY", "extractive")
+    import app as flask_app
+    import asgi_app
+
+    fanout = flask_app.fanout
+    print(f"branches: {', '.join(branch.agent.name for branch in fanout.branches)}")
+    print(f"{'mode':<28}{'mean ms':>10}{'max ms':>10}")
+
+    sequential, fanned = [], []
+    for _ in range(args.requests):
+        start = time.perf_counter()
+        for branch in fanout.branches:
+            flask_app.run_branch(branch.agent, [], fanout.prompt(branch, MESSAGE))
+        sequential.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        fanout.run([], MESSAGE, flask_app.run_branch)
+        fanned.append(time.perf_counter() - start)
+    summarize("flask sequential", sequential)
+    summarize("flask fan-out", fanned)
+
+    async def run_async():
+        sequential, fanned = [], []
+        for _ in range(args.requests):
+            start = time.perf_counter()
+            for branch in asgi_app.fanout.branches:
+                await asgi_app.run_branch(branch.agent, [], asgi_app.fanout.prompt(branch, MESSAGE))
+            sequential.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            await asgi_app.fanout.arun([], MESSAGE, asgi_app.run_branch)
+            fanned.append(time.perf_counter() - start)
+        return sequential, fanned
+
+    sequential, fanned = asyncio.run(run_async())
+    summarize("asgi sequential", sequential)
+    summarize("asgi fan-out", fanned)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Prompt tokens per turn with and without history windowing.
+
+Plays a long conversation against benchmarks/fake_gemini.py twice: once
+resending the full history every turn, and once compacting it with
+wellcare_core.history between turns (summaries come from the fake model).
+
+    python benchmarks/history_bench.py --turns 40
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from google.genai import Client  # noqa: E402
+
+from agents.wellcare.agent import interactive_wellcare_agent  # noqa: E402
+from fake_gemini import run_in_thread  # noqa: E402
+from wellcare_core.chat import inline_config, run_turn  # noqa: E402
+from wellcare_core.history import HistoryManager, model_summarizer  # noqa: E402
+
+MESSAGES = [
+    "I've been feeling low for a few weeks and I can't really explain why",
+    "Work has been stressful, my manager keeps adding deadlines",
+    "I tried going for walks but I keep skipping them",
+    "Sleep is the worst part, I wake up at 4am most nights",
+]
+
+
+def run_conversation(client: Client, turns: int, manager=None) -> list:
+    """Returns the prompt token count of every turn."""
+    agent = interactive_wellcare_agent
+    config = inline_config(agent.instruction, agent.tools)
+    history, tokens = [], []
+    for turn in range(turns):
+        chat = client.chats.create(model=agent.model, config=config, history=history)
+        response = run_turn(chat, MESSAGES[turn % len(MESSAGES)], agent.tools)
+        tokens.append(response.usage_metadata.prompt_token_count)
+        history = chat.get_history()
+        if manager:
+            history = manager.compact(history)
+    return tokens
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure prompt tokens per turn with history windowing.")
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--window", type=int, default=10)
+    parser.add_argument("--port", type=int, default=8768)
+    args = parser.parse_args()
+
+    base_url = run_in_thread(args.port, latency=0.0)
+    client = Client(api_key="fake-key", http_options={"base_url": base_url})
+    manager = HistoryManager(args.window, model_summarizer(client, interactive_wellcare_agent.model))
+
+    full = run_conversation(client, args.turns)
+    windowed = run_conversation(client, args.turns, manager)
+
+    print(f"{'turn':>6}{'full history':>16}{'windowed':>12}")
+    for turn in sorted({1, 10, 20, args.turns} & set(range(1, args.turns + 1))):
+        print(f"{turn:>6}{full[turn - 1]:>16}{windowed[turn - 1]:>12}")
+    print(f"total prompt tokens: {sum(full)} full vs {sum(windowed)} windowed "
+          f"({1 - sum(windowed) / sum(full):.0%} fewer)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Load test comparing the threaded Flask app with the async ASGI app.
+
+Both apps are driven in-process against benchmarks/fake_gemini.py, so the
+numbers reflect how many chats each request path can keep in flight while
+waiting on the model, not Gemini itself. The fake server runs in its own
+process: on a thread it would share the GIL with the app under test, and
+answering hundreds of concurrent calls would slow the async path most.
+
+The run fails (exit status 1) if the ASGI app isn't at least --min-speedup
+times faster, so a regression on the async request path shows up in CI.
+The gap only opens once model latency outweighs the CPU each turn costs:
+with a few milliseconds of latency both paths are CPU bound, so pass
+--min-speedup 0 there.
+
+    python benchmarks/load_test.py --chats 2000 --workers 16 --latency 0.5
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fake_gemini import run_in_process  # noqa: E402
+
+MESSAGE = "I've been feeling anxious about work lately"
+
+
+def run_sync(chats: int, workers: int) -> float:
+    """Runs one chat per request through the Flask app on a fixed worker pool."""
+    import app as flask_app
+
+    def one_chat(_):
+        with flask_app.app.test_client() as http:
+            session_id = http.post('/start_session').json['session_id']
+            reply = http.post('/send_message', json={'session_id': session_id, 'message': MESSAGE})
+            assert reply.status_code == 200, reply.json
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(one_chat, range(chats)))
+    return time.perf_counter() - start
+
+
+async def run_async(chats: int) -> float:
+    """Runs every chat concurrently through the ASGI app on one event loop."""
+    import httpx
+    import asgi_app
+
+    transport = httpx.ASGITransport(app=asgi_app.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://wellcare", timeout=None) as http:
+        async def one_chat():
+            session_id = (await http.post('/start_session')).json()['session_id']
+            reply = await http.post('/send_message', json={'session_id': session_id, 'message': MESSAGE})
+            assert reply.status_code == 200, reply.json()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one_chat() for _ in range(chats)))
+        return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare Flask (threaded) and ASGI (async) throughput.")
+    parser.add_argument("--chats", type=int, default=1000, help="number of chats to run")
+    parser.add_argument("--workers", type=int, default=16, help="worker threads for the Flask app")
+    parser.add_argument("--latency", type=float, default=0.5, help="fake model latency in seconds")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--min-speedup", type=float, default=2.0,
+                        help="fail unless the ASGI app is at least this many times faster (0 to only report)")
+    args = parser.parse_args()
+
+    base_url, server = run_in_process(args.port, latency=args.latency)
+    os.environ["GOOGLE_GEMINI_BASE_URL"] = base_url
+    os.environ.setdefault("GOOGLE_API_KEY", "fake-key")
+    # Every simulated client comes from one address; don't rate limit them as one flooding client
+    os.environ.setdefault("WELLCARE_ADMISSION", "0")
+
+    try:
+        sync_elapsed = run_sync(args.chats, args.workers)
+        async_elapsed = asyncio.run(run_async(args.chats))
+    finally:
+        server.terminate()
+
+    print(f"{'path':<28}{'chats':>8}{'seconds':>10}{'req/s':>10}")
+    print(f"{f'flask ({args.workers} threads)':<28}{args.chats:>8}{sync_elapsed:>10.2f}{args.chats / sync_elapsed:>10.1f}")
+    print(f"{'asgi (async)':<28}{args.chats:>8}{async_elapsed:>10.2f}{args.chats / async_elapsed:>10.1f}")
+    speedup = sync_elapsed / async_elapsed
+    print(f"speedup: {speedup:.1f}x")
+    if speedup < args.min_speedup:
+        sys.exit(f"FAIL: the ASGI app is {speedup:.1f}x the Flask app's throughput, below --min-speedup "
+                 f"{args.min_speedup}")
+
+
+if __name__ == "__main__":
+    main()
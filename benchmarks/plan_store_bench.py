@@ -0,0 +1,85 @@
+"""
+Wellness plan saves: direct file writes versus the plan store.
+
+Simulates many sessions saving plans at once, some regenerating a plan
+they already saved. The baseline is the old save_wellness_plan (open() on
+the request thread, shared default filename); the plan store writes on a
+background thread, per session and deduplicated. Reports time spent on the
+caller's thread per save, time until everything is on disk, and how many
+plans survive.
+
+    python benchmarks/plan_store_bench.py --sessions 200 --saves 5
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from wellcare_core.plan_store import PlanStore  # noqa: E402
+
+
+def plan_text(session: int, version: int) -> str:
+    return (f"# Wellness plan for session {session} (v{version})\n\n" +
+            "- Five minutes of box breathing before bed.\n" * 40)
+
+
+def run(save, sessions: int, saves: int, workers: int) -> list:
+    """Returns the caller-side latency of every save."""
+    def one_session(session):
+        latencies = []
+        for i in range(saves):
+            # Every other save regenerates the previous plan unchanged
+            start = time.perf_counter()
+            save(session, plan_text(session, i // 2))
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return [latency for latencies in pool.map(one_session, range(sessions)) for latency in latencies]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare direct plan writes with the background plan store.")
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--saves", type=int, default=5, help="saves per session")
+    parser.add_argument("--workers", type=int, default=16)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        shared = os.path.join(root, "my_wellness_plan.md")
+
+        def direct(session, content):
+            with open(shared, "w", encoding="utf-8") as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+
+        start = time.perf_counter()
+        baseline = run(direct, args.sessions, args.saves, args.workers)
+        baseline_total = time.perf_counter() - start
+
+        store = PlanStore(os.path.join(root, "plans"))
+        start = time.perf_counter()
+        stored = run(lambda session, content: store.save(str(session), content),
+                     args.sessions, args.saves, args.workers)
+        store.flush()
+        store_total = time.perf_counter() - start
+        kept = sum(len(store.list(str(session))) for session in range(args.sessions))
+
+    print(f"{'':<14}{'p50 us':>10}{'max us':>10}{'total s':>10}{'plans kept':>12}")
+    print(f"{'direct open()':<14}{statistics.median(baseline) * 1e6:>10.0f}{max(baseline) * 1e6:>10.0f}"
+          f"{baseline_total:>10.2f}{1:>12}")
+    print(f"{'plan store':<14}{statistics.median(stored) * 1e6:>10.0f}{max(stored) * 1e6:>10.0f}"
+          f"{store_total:>10.2f}{kept:>12}")
+    print(f"plan store: {store.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Progress summaries versus sending raw mood logs to the model.
+
+Fills a temporary progress store with several check-ins a day for one
+user, then compares the get_progress_summary payload against the raw
+entries the progress agent would otherwise need in its prompt: size in
+(approximate) tokens and time to build. Also reports insert throughput.
+
+    python benchmarks/progress_bench.py --days 730 --per-day 3
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from wellcare_core.progress import ProgressStore  # noqa: E402
+
+
+def tokens(payload) -> int:
+    """Rough token count of a JSON payload (4 characters per token)."""
+    return len(json.dumps(payload)) // 4
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare progress summaries with raw mood logs.")
+    parser.add_argument("--days", type=int, default=730)
+    parser.add_argument("--per-day", type=int, default=3, help="check-ins per day")
+    parser.add_argument("--repeat", type=int, default=200, help="summaries timed")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as root:
+        store = ProgressStore(os.path.join(root, "progress.db"))
+        now = time.time()
+        start = time.perf_counter()
+        for day in range(args.days, 0, -1):
+            for _ in range(args.per_day):
+                ts = now - day * 86400 + rng.uniform(0, 86400)
+                store.record("user", {"mood": rng.randint(3, 8), "energy": rng.randint(2, 9),
+                                      "sleep_hours": round(rng.uniform(5, 9), 1)}, ts=ts)
+            if day % 14 == 0:
+                store.record("user", {"phq9": rng.randint(4, 16), "gad7": rng.randint(3, 12)},
+                             ts=now - day * 86400)
+        insert_seconds = time.perf_counter() - start
+        entries = store.stats()["entries"]
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            summary = store.summary("user")
+        summary_ms = (time.perf_counter() - start) / args.repeat * 1000
+
+        conn = store._connection()
+        start = time.perf_counter()
+        raw = [{"metric": metric, "ts": ts, "value": value} for metric, ts, value in conn.execute(
+            "SELECT metric, ts, value FROM entries WHERE owner = ? ORDER BY ts", ("user",))]
+        raw_ms = (time.perf_counter() - start) * 1000
+
+    print(f"entries stored        {entries} ({entries / insert_seconds:,.0f} inserts/s)")
+    print(f"{'':<22}{'tokens':>10}{'ms':>10}")
+    print(f"{'raw entries':<22}{tokens(raw):>10,}{raw_ms:>10.2f}")
+    print(f"{'progress summary':<22}{tokens(summary):>10,}{summary_ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
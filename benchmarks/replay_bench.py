@@ -0,0 +1,236 @@
+"""
+Replays scripted conversations against the apps with a local fake Gemini.
+
+Runs the assessment, crisis and plan-generation scripts from
+benchmarks/conversations.json through app.py (threaded Flask), asgi_app.py
+(async) and wellcare_agent_simple.py (terminal loop, one user at a time),
+with benchmarks/fake_gemini.py answering model calls. Reports turns/sec,
+p50/p95/p99 turn latency and retained memory per session. Needs no API key
+or network, so it can run in CI:
+
+    python benchmarks/replay_bench.py --sessions 200 --latency 0.2 --token-rate 200 --json results.json
+"""
+
+import argparse
+import asyncio
+import builtins
+import contextlib
+import gc
+import io
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fake_gemini import run_in_thread  # noqa: E402
+
+SCRIPT = Path(__file__).resolve().parent / "conversations.json"
+
+
+def percentiles(samples: list) -> dict:
+    """p50/p95/p99 of samples in milliseconds."""
+    if len(samples) < 2:
+        value = samples[0] * 1000 if samples else 0.0
+        return {"p50_ms": value, "p95_ms": value, "p99_ms": value}
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return {"p50_ms": cuts[49] * 1000, "p95_ms": cuts[94] * 1000, "p99_ms": cuts[98] * 1000}
+
+
+def schedule(conversations: dict, sessions: int) -> list:
+    """Cycles through the scripted conversations until `sessions` are scheduled."""
+    scripts = list(conversations.values())
+    return [scripts[i % len(scripts)] for i in range(sessions)]
+
+
+def retained_memory(run, sessions: int) -> float:
+    """Bytes still allocated per session after `run()` replays `sessions` conversations."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    run()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return max(0, after - before) / sessions
+
+
+def replay_flask(plan: list, concurrency: int, memory_sessions: int) -> dict:
+    """Replays conversations through the Flask app on a thread pool."""
+    import app as flask_app
+
+    latencies, errors = [], []
+
+    def one_conversation(messages):
+        with flask_app.app.test_client() as http:
+            session_id = http.post('/start_session').json['session_id']
+            for message in messages:
+                start = time.perf_counter()
+                reply = http.post('/send_message', json={'session_id': session_id, 'message': message})
+                latencies.append(time.perf_counter() - start)
+                if reply.status_code != 200 or 'error' in reply.json:
+                    errors.append(reply.json)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one_conversation, plan))
+    elapsed = time.perf_counter() - start
+    turns = len(latencies)
+
+    memory = retained_memory(lambda: [one_conversation(messages) for messages in plan[:memory_sessions]],
+                             memory_sessions)
+    return {"turns": turns, "errors": len(errors), "seconds": elapsed, "memory_per_session": memory,
+            "latencies": latencies[:turns]}
+
+
+def replay_asgi(plan: list, concurrency: int, memory_sessions: int) -> dict:
+    """Replays conversations through the ASGI app, `concurrency` at a time on one event loop."""
+    import httpx
+    import asgi_app
+
+    latencies, errors = [], []
+
+    async def run(conversations, limit):
+        transport = httpx.ASGITransport(app=asgi_app.app)
+        gate = asyncio.Semaphore(limit)
+        async with httpx.AsyncClient(transport=transport, base_url="http://wellcare", timeout=None) as http:
+            async def one_conversation(messages):
+                async with gate:
+                    session_id = (await http.post('/start_session')).json()['session_id']
+                    for message in messages:
+                        start = time.perf_counter()
+                        reply = await http.post('/send_message', json={'session_id': session_id, 'message': message})
+                        latencies.append(time.perf_counter() - start)
+                        if reply.status_code != 200 or 'error' in reply.json():
+                            errors.append(reply.json())
+
+            await asyncio.gather(*(one_conversation(messages) for messages in conversations))
+
+    async def main():
+        # One event loop for both passes: the genai async client is bound to the loop it first ran on
+        start = time.perf_counter()
+        await run(plan, concurrency)
+        elapsed = time.perf_counter() - start
+        turns = len(latencies)
+
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        await run(plan[:memory_sessions], concurrency)
+        gc.collect()
+        after = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        return elapsed, turns, max(0, after - before) / memory_sessions
+
+    elapsed, turns, memory = asyncio.run(main())
+    return {"turns": turns, "errors": len(errors), "seconds": elapsed, "memory_per_session": memory,
+            "latencies": latencies[:turns]}
+
+
+def replay_simple(plan: list, memory_sessions: int) -> dict:
+    """Replays conversations through wellcare_agent_simple.main() by scripting input()."""
+    import wellcare_agent_simple as simple
+
+    latencies, errors, peaks = [], [], []
+
+    def one_conversation(messages):
+        script = iter([*messages, "exit"])
+        sent_at = None
+
+        def scripted_input(prompt=""):
+            nonlocal sent_at
+            if sent_at is not None:
+                latencies.append(time.perf_counter() - sent_at)
+            if tracemalloc.is_tracing():
+                peaks.append(tracemalloc.get_traced_memory()[0])
+            message = next(script)
+            sent_at = time.perf_counter() if message != "exit" else None
+            return message
+
+        output = io.StringIO()
+        original_input = builtins.input
+        builtins.input = scripted_input
+        try:
+            with contextlib.redirect_stdout(output):
+                simple.main()
+        finally:
+            builtins.input = original_input
+        errors.extend(line for line in output.getvalue().splitlines() if line.startswith("Error:"))
+
+    start = time.perf_counter()
+    for messages in plan:
+        one_conversation(messages)
+    elapsed = time.perf_counter() - start
+    turns = len(latencies)
+
+    # The terminal app keeps a single conversation alive, so measure memory held at its last turn
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    held = []
+    for messages in plan[:memory_sessions]:
+        peaks.clear()
+        one_conversation(messages)
+        held.append(max(peaks) - before)
+    tracemalloc.stop()
+    return {"turns": turns, "errors": len(errors), "seconds": elapsed,
+            "memory_per_session": max(0.0, statistics.mean(held)), "latencies": latencies[:turns]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay scripted conversations against a fake Gemini server.")
+    parser.add_argument("--apps", nargs="+", choices=["flask", "asgi", "simple"], default=["flask", "asgi", "simple"])
+    parser.add_argument("--sessions", type=int, default=90, help="conversations replayed per app")
+    parser.add_argument("--concurrency", type=int, default=16, help="conversations in flight (web apps)")
+    parser.add_argument("--simple-sessions", type=int, default=6, help="conversations replayed by the terminal app")
+    parser.add_argument("--memory-sessions", type=int, default=30, help="conversations used to measure memory")
+    parser.add_argument("--latency", type=float, default=0.2, help="fake model first-token latency in seconds")
+    parser.add_argument("--token-rate", type=float, default=200, help="fake model output tokens per second")
+    parser.add_argument("--script", default=str(SCRIPT), help="conversation script (JSON)")
+    parser.add_argument("--port", type=int, default=8770)
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args()
+
+    with open(args.script, encoding="utf-8") as f:
+        script = json.load(f)
+
+    os.environ["GOOGLE_GEMINI_BASE_URL"] = run_in_thread(args.port, latency=args.latency,
+                                                         token_rate=args.token_rate, rules=script["rules"])
+    os.environ.setdefault("GOOGLE_API_KEY", "fake-key")
+    # Every simulated client comes from one address; don't rate limit them as one flooding client
+    os.environ.setdefault("WELLCARE_ADMISSION", "0")
+
+    results = {}
+    for name in args.apps:
+        if name == "simple":
+            plan = schedule(script["conversations"], args.simple_sessions)
+            result = replay_simple(plan, min(args.memory_sessions, len(plan)))
+        else:
+            plan = schedule(script["conversations"], args.sessions)
+            replay = replay_flask if name == "flask" else replay_asgi
+            result = replay(plan, args.concurrency, min(args.memory_sessions, len(plan)))
+
+        latencies = result.pop("latencies")
+        result["turns_per_second"] = result["turns"] / result["seconds"]
+        result.update(percentiles(latencies))
+        results[name] = result
+
+    print(f"{'app':<8}{'turns':>7}{'errors':>8}{'turns/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'KB/session':>12}")
+    for name, result in results.items():
+        print(f"{name:<8}{result['turns']:>7}{result['errors']:>8}{result['turns_per_second']:>10.1f}"
+              f"{result['p50_ms']:>9.0f}{result['p95_ms']:>9.0f}{result['p99_ms']:>9.0f}"
+              f"{result['memory_per_session'] / 1024:>12.1f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"settings": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
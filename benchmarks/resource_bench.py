@@ -0,0 +1,109 @@
+"""
+Resource directory lookups: grid and inverted indexes versus a linear scan.
+
+Builds a synthetic directory of providers spread over a few countries,
+checks that indexed "nearest N matching" queries return the same results
+as scanning every record, and times both.
+
+    python benchmarks/resource_bench.py --providers 50000 --queries 2000
+"""
+
+import argparse
+import heapq
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from wellcare_core.resources import COST_LEVELS, ResourceDirectory, _key, haversine_km  # noqa: E402
+
+# Country -> (lat range, lon range), roughly
+COUNTRIES = {
+    "US": ((25, 49), (-124, -67)),
+    "UK": ((50, 58), (-6, 2)),
+    "IN": ((8, 32), (69, 89)),
+    "AU": ((-38, -12), (114, 153)),
+}
+TYPES = ("therapist", "psychiatrist", "clinic", "support_group")
+SERVICES = ("anxiety", "depression", "trauma", "youth", "lgbtq", "substance_use", "grief")
+COSTS = ("free", "low", "sliding scale", "standard", "standard")
+
+QUERIES = [
+    {"resource_type": "therapist", "max_cost": "low"},
+    {"resource_type": "support_group", "service": "grief"},
+    {"resource_type": "psychiatrist", "max_cost": "free", "service": "youth"},
+    {},
+]
+
+
+def synthetic_records(count: int, rng: random.Random) -> list:
+    records = []
+    for i in range(count):
+        country = rng.choice(list(COUNTRIES))
+        (lat_low, lat_high), (lon_low, lon_high) = COUNTRIES[country]
+        records.append({
+            "name": f"Provider {i}", "type": rng.choice(TYPES), "country": country,
+            "lat": rng.uniform(lat_low, lat_high), "lon": rng.uniform(lon_low, lon_high),
+            "cost": rng.choice(COSTS), "services": rng.sample(SERVICES, 2),
+        })
+    return records
+
+
+def linear_search(records: list, lat: float, lon: float, limit: int, resource_type=None, max_cost=None,
+                  service=None) -> list:
+    """Reference implementation: filter and rank every record."""
+    level = COST_LEVELS.index(max_cost) if max_cost else len(COST_LEVELS) - 1
+    scored = []
+    for record in records:
+        cost = _key(record["cost"])
+        if COST_LEVELS.index("low" if cost == "sliding scale" else cost) > level:
+            continue
+        if resource_type and record["type"] != resource_type:
+            continue
+        if service and service not in record["services"]:
+            continue
+        scored.append((haversine_km(lat, lon, record["lat"], record["lon"]), record["name"]))
+    return [name for _, name in heapq.nsmallest(limit, scored)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time indexed resource lookups against a linear scan.")
+    parser.add_argument("--providers", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--limit", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    records = synthetic_records(args.providers, rng)
+    start = time.perf_counter()
+    directory = ResourceDirectory(records)
+    build_ms = (time.perf_counter() - start) * 1000
+    print(f"indexed {len(directory):,} records in {build_ms:.0f} ms")
+
+    points = []
+    for _ in range(args.queries):
+        (lat_low, lat_high), (lon_low, lon_high) = COUNTRIES[rng.choice(list(COUNTRIES))]
+        points.append((rng.uniform(lat_low, lat_high), rng.uniform(lon_low, lon_high)))
+
+    print(f"{'query':<58}{'indexed us':>12}{'linear us':>12}{'speedup':>10}")
+    for filters in QUERIES:
+        start = time.perf_counter()
+        indexed = [[r["name"] for r in directory.search(lat, lon, limit=args.limit, **filters)]
+                   for lat, lon in points]
+        indexed_us = (time.perf_counter() - start) / len(points) * 1e6
+
+        sample = points[:max(1, len(points) // 20)]
+        start = time.perf_counter()
+        linear = [linear_search(records, lat, lon, args.limit, **filters) for lat, lon in sample]
+        linear_us = (time.perf_counter() - start) / len(sample) * 1e6
+
+        if linear != indexed[:len(sample)]:
+            raise SystemExit(f"Indexed results differ from the linear scan for {filters}")
+        label = ", ".join(f"{key}={value}" for key, value in filters.items()) or "(no filters)"
+        print(f"{label:<58}{indexed_us:>12.1f}{linear_us:>12.0f}{linear_us / indexed_us:>9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
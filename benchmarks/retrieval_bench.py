@@ -0,0 +1,95 @@
+"""
+Coping-content retrieval: prompt size and search time as the library grows.
+
+For the built-in library and for synthetic libraries up to --max-size
+snippets, compares the tokens needed to inline the whole library in an
+agent prompt with the tokens of the top-k snippets actually attached to
+a message, and times index build, memory-mapped open and search.
+
+    python benchmarks/retrieval_bench.py --max-size 50000 --k 3
+"""
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from wellcare_core.retrieval import CopingIndex, build_index, load_corpus, tokenize  # noqa: E402
+
+QUERIES = [
+    "I can't sleep, my mind keeps racing at night",
+    "I've been feeling really down and unmotivated",
+    "I get panic attacks at work",
+    "I keep procrastinating on my thesis",
+    "I feel lonely since I moved",
+    "my boss makes me so angry",
+]
+
+
+def tokens(text: str) -> int:
+    """Rough token count (4 characters per token)."""
+    return len(text) // 4
+
+
+def synthetic_corpus(base: list, size: int, rng: random.Random) -> list:
+    """Grows the real library to size snippets by recombining its sentences and vocabulary."""
+    sentences = [sentence.strip() + "." for snippet in base for sentence in snippet["text"].split(".") if sentence.strip()]
+    tags = sorted({tag for snippet in base for tag in snippet.get("tags", [])})
+    corpus = list(base)
+    while len(corpus) < size:
+        source = rng.choice(base)
+        corpus.append({
+            "id": f"synthetic-{len(corpus)}", "title": f"{source['title']} ({len(corpus)})",
+            "category": source["category"], "tags": rng.sample(tags, 4),
+            "text": " ".join(rng.sample(sentences, 3)),
+        })
+    return corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure coping-content retrieval against inlining the library.")
+    parser.add_argument("--max-size", type=int, default=50000, help="largest synthetic library")
+    parser.add_argument("--k", type=int, default=3, help="snippets attached per message")
+    parser.add_argument("--repeat", type=int, default=200, help="searches timed per query")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    base = load_corpus()
+    sizes = [len(base)] + [size for size in (1000, 10000, 50000, 200000) if size <= args.max_size]
+
+    print(f"{'snippets':>9}{'inline tokens':>15}{'top-k tokens':>14}{'build ms':>10}{'open ms':>9}{'search us':>11}")
+    for size in sizes:
+        corpus = synthetic_corpus(base, size, rng)
+        with tempfile.TemporaryDirectory() as directory:
+            start = time.perf_counter()
+            build_index(corpus, directory)
+            build_ms = (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            index = CopingIndex(corpus, directory)
+            open_ms = (time.perf_counter() - start) * 1000
+
+            attached = []
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                for query in QUERIES:
+                    index.search(query, args.k)
+            search_us = (time.perf_counter() - start) / (args.repeat * len(QUERIES)) * 1e6
+            for query in QUERIES:
+                attached.append(sum(tokens(f"{snippet['title']}: {snippet['text']}")
+                                    for _, snippet in index.search(query, args.k)))
+
+        inline = sum(tokens(f"{snippet['title']}: {snippet['text']}") for snippet in corpus)
+        print(f"{size:>9,}{inline:>15,}{sum(attached) // len(attached):>14,}{build_ms:>10.0f}{open_ms:>9.2f}"
+              f"{search_us:>11.1f}")
+
+    terms = {term for snippet in base for term in tokenize(snippet["text"])}
+    print(f"\nbuilt-in library: {len(base)} snippets, {len(terms)} distinct terms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Intent router coverage, accuracy and cost per message.
+
+Classifies a labeled set of messages with wellcare_core.router and reports
+how many turns go straight to a specialist (skipping the coordinator's
+delegation call), how many of those land on the right agent, and how long
+classification takes. The scripted turns in benchmarks/conversations.json
+are routed too, as a rough "real conversation" direct rate.
+
+    python benchmarks/router_bench.py --repeat 2000
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from agents.wellcare.agent import interactive_wellcare_agent  # noqa: E402
+from wellcare_core.router import IntentRouter  # noqa: E402
+
+SCRIPT = Path(__file__).resolve().parent / "conversations.json"
+
+# Message -> agent that should answer it (None: the coordinator should decide)
+LABELED = [
+    ("Can we do the PHQ-9?", "wellness_assessor_agent"),
+    ("I'd like to take the GAD-7 questionnaire", "wellness_assessor_agent"),
+    ("Could you screen me for depression? Am I depressed?", "wellness_assessor_agent"),
+    ("Is there an anxiety test I can take?", "wellness_assessor_agent"),
+    ("Can you help me find a therapist near Denver?", "community_resource_agent"),
+    ("Are there any support groups for grief?", "community_resource_agent"),
+    ("I need a counselor who does sliding scale fees", "community_resource_agent"),
+    ("Please make me a plan for better sleep", "personalized_wellness_planner"),
+    ("I want a self-care plan for exam season", "personalized_wellness_planner"),
+    ("Can you build a daily routine that helps with my mood?", "personalized_wellness_planner"),
+    ("How have I been doing since we started?", "wellness_progress_agent"),
+    ("Show me my mood trends", "wellness_progress_agent"),
+    ("I want to look at my progress", "wellness_progress_agent"),
+    ("Hi there", None),
+    ("I've been feeling kind of off lately", None),
+    ("My partner and I keep arguing", None),
+    ("Thanks, that helps", None),
+    ("Work has been overwhelming", None),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure intent router coverage and classification cost.")
+    parser.add_argument("--repeat", type=int, default=2000, help="passes over the labeled set for timing")
+    parser.add_argument("--script", default=str(SCRIPT), help="conversation script (JSON)")
+    args = parser.parse_args()
+
+    router = IntentRouter(interactive_wellcare_agent)
+    routed = [(router.classify(message).intent, expected) for message, expected in LABELED]
+    direct = [(intent, expected) for intent, expected in routed if intent]
+    correct = sum(intent == expected for intent, expected in routed)
+    wrong = sum(intent != expected for intent, expected in direct)
+    specialist = sum(1 for _, expected in LABELED if expected)
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        for message, _ in LABELED:
+            router.classify(message)
+    per_message = (time.perf_counter() - start) / (args.repeat * len(LABELED))
+
+    with open(args.script, encoding="utf-8") as f:
+        turns = [message for messages in json.load(f)["conversations"].values() for message in messages]
+    scripted = sum(1 for message in turns if router.classify(message).intent)
+
+    print(f"labeled messages      {len(LABELED)} ({specialist} with a clear specialist intent)")
+    print(f"routed directly       {len(direct)} ({len(direct) / specialist:.0%} of clear intents)")
+    print(f"misrouted             {wrong}")
+    print(f"overall accuracy      {correct / len(LABELED):.0%}")
+    print(f"scripted turns direct {scripted}/{len(turns)}")
+    print(f"classification        {per_message * 1e6:.1f} us/message")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Batch questionnaire scoring throughput versus the scalar tool functions.
+
+Generates random PHQ-9 and GAD-7 responses, checks that
+wellcare_core.scoring.score_batch agrees with conduct_phq9_assessment and
+conduct_gad7_assessment on every row, then times both.
+
+    python benchmarks/scoring_bench.py --rows 1000000
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np  # noqa: E402
+
+from agents.wellcare.agent import conduct_gad7_assessment, conduct_phq9_assessment  # noqa: E402
+from wellcare_core.scoring import get_scale, score_batch  # noqa: E402
+
+SCALAR = {"phq9": conduct_phq9_assessment, "gad7": conduct_gad7_assessment}
+
+
+def scalar_rows(scale: str, answers: np.ndarray) -> list:
+    columns = [f"q{i}" for i in range(1, answers.shape[1] + 1)]
+    return [SCALAR[scale](dict(zip(columns, row))) for row in answers.tolist()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare batch and scalar questionnaire scoring.")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--scalar-rows", type=int, default=100_000, help="rows timed with the scalar functions")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'scale':<7}{'scalar rows/s':>16}{'batch rows/s':>16}{'speedup':>10}")
+    for scale in ("phq9", "gad7"):
+        answers = rng.integers(0, 4, size=(args.rows, get_scale(scale).items))
+
+        sample = answers[:args.scalar_rows]
+        start = time.perf_counter()
+        expected = scalar_rows(scale, sample)
+        scalar_rate = len(sample) / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        result = score_batch(scale, answers)
+        batch_rate = args.rows / (time.perf_counter() - start)
+
+        for i, row in enumerate(expected):
+            assert row["score"] == result["score"][i], (scale, i)
+            assert row["severity"] == result["severity"][i], (scale, i)
+            assert row["interpretation"] == result["interpretation"][i], (scale, i)
+
+        print(f"{scale:<7}{scalar_rate:>16,.0f}{batch_rate:>16,.0f}{batch_rate / scalar_rate:>9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
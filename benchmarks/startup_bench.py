@@ -0,0 +1,103 @@
+"""
+Cold-start cost of the web apps.
+
+Starts fresh interpreters that import app.py (or asgi_app.py) and serve one
+session start plus one chat turn against benchmarks/fake_gemini.py, and
+reports the median import time and time to first served reply. With
+--importtime, also lists the slowest imports from `python -X importtime`.
+
+    python benchmarks/startup_bench.py --runs 5 --importtime
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from fake_gemini import run_in_thread  # noqa: E402
+
+FLASK_CHILD = """
+import json, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+client = app.app.test_client()
+session_id = client.post('/start_session').json['session_id']
+first = time.perf_counter()
+reply = client.post('/send_message', json={'session_id': session_id, 'message': 'hello'}).json
+assert 'response' in reply, reply
+print(json.dumps({'import': imported - start, 'first_request': first - start,
+                  'first_reply': time.perf_counter() - start}))
+"""
+
+ASGI_CHILD = """
+import json, time
+start = time.perf_counter()
+import asgi_app
+imported = time.perf_counter()
+from starlette.testclient import TestClient
+client = TestClient(asgi_app.app)
+session_id = client.post('/start_session').json()['session_id']
+first = time.perf_counter()
+reply = client.post('/send_message', json={'session_id': session_id, 'message': 'hello'}).json()
+assert 'response' in reply, reply
+print(json.dumps({'import': imported - start, 'first_request': first - start,
+                  'first_reply': time.perf_counter() - start}))
+"""
+
+
+def run_child(code: str, env: dict) -> dict:
+    """Runs one cold start and returns its timings, including interpreter startup."""
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    timings = json.loads(output.strip().splitlines()[-1])
+    timings["process"] = time.perf_counter() - start
+    return timings
+
+
+def slowest_imports(module: str, env: dict, top: int = 10) -> list:
+    """Returns (cumulative microseconds, module) for the slowest imports of module."""
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if line.startswith("import time:") and "|" in line and "cumulative" not in line:
+            _, cumulative, name = line[len("import time:"):].split("|")
+            rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure web app cold-start time.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8769)
+    parser.add_argument("--importtime", action="store_true", help="list the slowest imports")
+    args = parser.parse_args()
+
+    base_url = run_in_thread(args.port, latency=0.0)
+    env = {**os.environ, "GOOGLE_API_KEY": "fake-key", "GOOGLE_GEMINI_BASE_URL": base_url,
+           "WELLCARE_CONTEXT_CACHE": "0"}
+
+    print(f"{'app':<8}{'import':>10}{'1st request':>14}{'1st reply':>12}{'process':>10}  (median seconds)")
+    for name, code in (("flask", FLASK_CHILD), ("asgi", ASGI_CHILD)):
+        runs = [run_child(code, env) for _ in range(args.runs)]
+        median = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+        print(f"{name:<8}{median['import']:>10.3f}{median['first_request']:>14.3f}"
+              f"{median['first_reply']:>12.3f}{median['process']:>10.3f}")
+
+    if args.importtime:
+        print("\nslowest imports of app (cumulative ms):")
+        for cumulative, module in slowest_imports("app", env):
+            print(f"{cumulative / 1000:>10.1f}  {module}")
+
+
+if __name__ == "__main__":
+    main()
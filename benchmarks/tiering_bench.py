@@ -0,0 +1,93 @@
+"""
+Model tiering: turn latency and full-model tokens with and without a lite tier.
+
+Sends a mix of small talk, resource requests and general messages through
+the Flask app, first with every turn on the agents' own model and then
+with wellcare_core.tiering choosing the tier. benchmarks/fake_gemini.py
+answers lite-model calls after --lite-latency and full-model calls after
+--latency, and returns an empty, truncated (MAX_TOKENS) lite reply to
+insurance questions so those turns escalate.
+
+    python benchmarks/tiering_bench.py --rounds 20 --latency 0.4 --lite-latency 0.1
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fake_gemini import run_in_thread  # noqa: E402
+
+# (category, message); resources and general messages alternate wording so no turn is a cache hit
+MESSAGES = [
+    ("small talk", "hi there!"),
+    ("small talk", "thanks, that helps"),
+    ("resources", "can you find me a therapist near Austin?"),
+    ("resources", "does my insurance cover therapy? I need low-cost therapy"),
+    ("general", "I've been feeling stressed about work and can't switch off"),
+    ("crisis", "I don't want to be alive anymore"),
+]
+
+# Lite replies to insurance questions come back empty and cut off, which fails validation
+RULES = [{"match": "insurance", "model": "lite", "reply": "", "finish": "MAX_TOKENS"}]
+
+
+def run(http, rounds: int) -> dict:
+    """Seconds per turn by category."""
+    samples = {}
+    for _ in range(rounds):
+        session_id = http.post('/start_session').json['session_id']
+        for category, message in MESSAGES:
+            start = time.perf_counter()
+            reply = http.post('/send_message', json={'session_id': session_id, 'message': message})
+            assert reply.status_code == 200, reply.json
+            samples.setdefault(category, []).append(time.perf_counter() - start)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare single-model and tiered turns.")
+    parser.add_argument("--rounds", type=int, default=20, help="conversations per mode")
+    parser.add_argument("--latency", type=float, default=0.4, help="full model latency in seconds")
+    parser.add_argument("--lite-latency", type=float, default=0.1, help="lite model latency in seconds")
+    parser.add_argument("--port", type=int, default=8781)
+    args = parser.parse_args()
+
+    os.environ["GOOGLE_GEMINI_BASE_URL"] = run_in_thread(
+        args.port, latency=args.latency, model_latency={"lite": args.lite_latency}, rules=RULES)
+    os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+    # Every simulated client comes from one address; don't rate limit them as one flooding client
+    os.environ.setdefault("WELLCARE_ADMISSION", "0")
+    os.environ.setdefault("WELLCARE_HISTORY_SUMMARY", "extractive")
+    import app as flask_app
+    from wellcare_core.tiering import ModelTiers, create_tiers
+
+    results = {}
+    with flask_app.app.test_client() as http:
+        for mode, tiers in (("single model", ModelTiers(enabled=False)), ("tiered", create_tiers())):
+            flask_app.tiers = tiers
+            results[mode] = (run(http, args.rounds), tiers.stats())
+
+    categories = [category for category in dict(MESSAGES)]
+    print(f"{'mean ms per turn':<18}" + "".join(f"{category:>12}" for category in categories) + f"{'all':>10}")
+    for mode, (samples, _) in results.items():
+        everything = [sample for category in categories for sample in samples[category]]
+        print(f"{mode:<18}" + "".join(f"{statistics.fmean(samples[category]) * 1000:>12.0f}" for category in categories)
+              + f"{statistics.fmean(everything) * 1000:>10.0f}")
+
+    stats = results["tiered"][1]
+    print(f"\nlite share {stats['lite_share']:.0%}, escalations {stats['escalations']} "
+          f"(rate {stats['escalation_rate']:.0%})")
+    print(f"full-model tokens avoided: {stats['full_model_tokens_avoided']:,}, "
+          f"estimated time saved: {stats['estimated_seconds_saved']}s")
+    for name, tier in stats["tiers"].items():
+        print(f"  {name:<5} turns {tier['turns']:>4}  mean {tier['mean_seconds']}s  "
+              f"prompt tokens {tier['prompt_tokens']:,}  output tokens {tier['output_tokens']:,}")
+
+
+if __name__ == "__main__":
+    main()
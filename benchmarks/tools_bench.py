@@ -0,0 +1,121 @@
+"""
+Tool calls: sequential execution versus wellcare_core.tools.
+
+- concurrency: turns in which the model asks for --calls tools at once,
+  each taking --tool-latency seconds (like a directory or retrieval
+  lookup over the network), run one after another as before and through
+  the runtime, first with caching off and then with it on (repeat turns)
+- overhead: microseconds per call of the agents' real tools, with and
+  without argument validation
+- validation: out-of-range and malformed arguments, which the tools used
+  to score or act on and now reject
+
+    python benchmarks/tools_bench.py --calls 4 --tool-latency 0.05 --turns 20
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from google.genai import types
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Keep the agents' plan and progress files out of the working tree
+os.environ.setdefault("WELLCARE_PLAN_DIR", tempfile.mkdtemp())
+os.environ.setdefault("WELLCARE_PROGRESS_DB", os.path.join(tempfile.mkdtemp(), "progress.db"))
+
+from agents.wellcare import agent  # noqa: E402
+from wellcare_core.tools import ToolRuntime, tool  # noqa: E402
+
+LATENCY = 0.05
+
+
+@tool(pure=True)
+def lookup(topic: str) -> dict:
+    """Stand-in for a pure lookup that waits on I/O."""
+    time.sleep(LATENCY)
+    return {"topic": topic}
+
+
+def sequential(function_calls, tools) -> list:
+    """Tool execution as it was: one call after another, no validation or caching."""
+    registry = {fn.__name__: getattr(fn, "__wrapped__", fn) for fn in tools}
+    parts = []
+    for call in function_calls:
+        try:
+            result = registry[call.name](**(call.args or {}))
+        except Exception as e:
+            result = {"error": str(e)}
+        parts.append(types.Part.from_function_response(name=call.name, response=result))
+    return parts
+
+
+def turns(run, calls: int, count: int) -> list:
+    """Milliseconds per batch of tool calls."""
+    samples = []
+    for _ in range(count):
+        batch = [types.FunctionCall(name="lookup", args={"topic": f"topic {i}"}) for i in range(calls)]
+        start = time.perf_counter()
+        run(batch, [lookup])
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def per_call_us(fn, kwargs: dict, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(**kwargs)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    global LATENCY
+    parser = argparse.ArgumentParser(description="Compare sequential tool calls with the tool runtime.")
+    parser.add_argument("--calls", type=int, default=4, help="tool calls per model turn")
+    parser.add_argument("--tool-latency", type=float, default=0.05, help="seconds per simulated tool call")
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=20000, help="calls timed per real tool")
+    args = parser.parse_args()
+    LATENCY = args.tool_latency
+
+    uncached = ToolRuntime(cache_size=0)
+    cached = ToolRuntime()
+    print(f"{args.calls} tool calls per turn, {args.tool_latency * 1000:.0f} ms each: mean ms per turn")
+    for mode, run in (("sequential", sequential), ("runtime", uncached.run), ("runtime + cache", cached.run)):
+        print(f"  {mode:<16}{statistics.fmean(turns(run, args.calls, args.turns)):>8.1f}")
+    print(f"  cache hits: {cached.stats()['cache_hits']} of {cached.stats()['calls']} calls")
+
+    phq9 = {"responses": {f"q{i}": i % 4 for i in range(1, 10)}}
+    print(f"\n{'overhead (us per call)':<28}{'unchecked':>10}{'validated':>10}")
+    for fn, kwargs in ((agent.conduct_phq9_assessment, phq9),
+                       (agent.assess_crisis_risk, {"user_input": "I've had a rough week at work"}),
+                       (agent.get_crisis_hotlines, {"country": "US"})):
+        print(f"  {fn.__name__:<26}{per_call_us(fn.__wrapped__, kwargs, args.repeat):>10.1f}"
+              f"{per_call_us(fn, kwargs, args.repeat):>10.1f}")
+
+    bad = [
+        (agent.conduct_phq9_assessment, {"responses": {f"q{i}": 9 for i in range(1, 10)}}),
+        (agent.conduct_phq9_assessment, {"responses": {"q1": 3, "q2": 3}}),
+        (agent.conduct_gad7_assessment, {"responses": {f"q{i}": -2 for i in range(1, 8)}}),
+        (agent.log_mood, {"mood": 42}),
+        (agent.find_resources, {"latitude": 512.0, "longitude": 0.5}),
+    ]
+    print("\nmalformed arguments")
+    for fn, kwargs in bad:
+        try:
+            before = fn.__wrapped__(**kwargs)
+        except Exception as e:
+            before = {"error": str(e)}
+        issues = fn(**kwargs).get("invalid_arguments", ["accepted"])
+        outcome = "rejected" if "error" in before else f"accepted {str(before)[:32]}...}}"
+        more = f" (+{len(issues) - 1} more)" if len(issues) > 1 else ""
+        print(f"  {fn.__name__:<26}before: {outcome:<50}now: {issues[0]}{more}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Model calls against a faulty upstream, with and without wellcare_core.upstream.
+
+Runs bursts of generateContent calls through a genai client using its
+default transport and through the managed transport, against
+benchmarks/fake_gemini.py with injected faults:
+
+- flaky: a share of calls fail with 503 (sync client on threads)
+- overload: the server returns 429 above a concurrency cap
+- duplicates: concurrent callers send the identical request, with coalescing
+  enabled on the managed transport
+- outage: every call fails; the breaker and retry budget bound the extra load
+- recovery: the server is healthy again; one trial call closes the breaker,
+  then the rest go through
+
+For each it reports calls that succeeded, requests the server received
+and wall time.
+
+    python benchmarks/upstream_bench.py --calls 200 --latency 0.2
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import httpx
+from google import genai
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fake_gemini import run_in_thread  # noqa: E402
+from wellcare_core.upstream import CircuitBreaker, UpstreamPolicy, http_options  # noqa: E402
+
+MODEL_ID = "gemini-2.0-flash-exp"
+
+
+def make_client(managed: bool, **policy_args):
+    """A genai client on its default transport, or on a managed one with its own policy."""
+    if not managed:
+        return genai.Client(api_key="benchmark"), None
+    breaker = CircuitBreaker(failure_threshold=5, reset_after=policy_args.pop("reset_after", 15.0))
+    policy = UpstreamPolicy(base_delay=0.05, breaker=breaker, **policy_args)
+    return genai.Client(api_key="benchmark", http_options=http_options(policy, timeout=30)), policy
+
+
+def set_faults(base_url: str, **faults):
+    httpx.post(f"{base_url}/faults", json=faults).raise_for_status()
+
+
+def model_requests(base_url: str) -> int:
+    """Model calls the fake server has received, including failed ones."""
+    stats = httpx.get(f"{base_url}/stats").json()
+    return stats["requests"] + stats["faults"]
+
+
+def measure(base_url: str, run):
+    """(calls that succeeded, requests the server received, seconds) for one burst."""
+    before = model_requests(base_url)
+    start = time.perf_counter()
+    ok = run()
+    return ok, model_requests(base_url) - before, time.perf_counter() - start
+
+
+def sync_burst(client, calls: int, workers: int) -> int:
+    def call(i):
+        try:
+            client.models.generate_content(model=MODEL_ID, contents=f"message {i}")
+            return 1
+        except Exception:
+            return 0
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return sum(pool.map(call, range(calls)))
+
+
+def async_burst(client, calls: int, same: bool = False) -> int:
+    async def call(i):
+        try:
+            await client.aio.models.generate_content(model=MODEL_ID, contents="same" if same else f"message {i}")
+            return 1
+        except Exception:
+            return 0
+
+    async def run():
+        return sum(await asyncio.gather(*(call(i) for i in range(calls))))
+
+    return asyncio.run(run())
+
+
+def report(scenario: str, managed: bool, calls: int, result, policy=None):
+    ok, served, seconds = result
+    extra = ""
+    if policy is not None:
+        stats = policy.stats()
+        extra = (f"  retries={stats['retries']} denied={stats['retries_denied']} coalesced={stats['coalesced']} "
+                 f"rejected={stats['rejected_open'] + stats['rejected_queue']} breaker={stats['breaker']}")
+    print(f"{scenario:<12}{'managed' if managed else 'default':<10}{ok:>5}/{calls:<6}{served:>9}{seconds:>9.2f}{extra}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the managed upstream transport against injected faults.")
+    parser.add_argument("--calls", type=int, default=200, help="calls per scenario")
+    parser.add_argument("--latency", type=float, default=0.2, help="fake model latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.2, help="share of calls failed in the flaky scenario")
+    parser.add_argument("--server-concurrency", type=int, default=20, help="429 above this many calls in flight")
+    parser.add_argument("--port", type=int, default=8780)
+    args = parser.parse_args()
+
+    base_url = run_in_thread(args.port, latency=args.latency)
+    os.environ["GOOGLE_GEMINI_BASE_URL"] = base_url
+
+    print(f"{'scenario':<12}{'client':<10}{'ok/calls':>12}{'requests':>9}{'seconds':>9}")
+
+    set_faults(base_url, error_rate=args.error_rate, status=503)
+    for managed in (False, True):
+        client, policy = make_client(managed)
+        report("flaky", managed, args.calls, measure(
+            base_url, lambda: sync_burst(client, args.calls, 16)), policy)
+
+    set_faults(base_url, max_concurrency=args.server_concurrency, retry_after=0)
+    for managed in (False, True):
+        client, policy = make_client(managed, max_concurrency=args.server_concurrency)
+        report("overload", managed, args.calls, measure(
+            base_url, lambda: async_burst(client, args.calls)), policy)
+
+    set_faults(base_url)
+    for managed in (False, True):
+        client, policy = make_client(managed, coalesce=True)
+        report("duplicates", managed, args.calls, measure(
+            base_url, lambda: async_burst(client, args.calls, same=True)), policy)
+
+    set_faults(base_url, error_rate=1.0, status=503)
+    for managed in (False, True):
+        client, policy = make_client(managed, max_concurrency=8, reset_after=1.0)
+        report("outage", managed, args.calls, measure(
+            base_url, lambda: sync_burst(client, args.calls, 8)), policy)
+
+    set_faults(base_url)
+    time.sleep(1.0)
+    report("recovery", True, args.calls, measure(
+        base_url, lambda: sync_burst(client, 1, 1) + sync_burst(client, args.calls - 1, 8)), policy)
+
+
+if __name__ == "__main__":
+    main()
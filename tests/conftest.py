@@ -0,0 +1,13 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Keep plan, progress and content files written during tests out of the working tree
+_root = tempfile.mkdtemp(prefix="wellcare-tests-")
+os.environ.setdefault("WELLCARE_PLAN_DIR", os.path.join(_root, "plans"))
+os.environ.setdefault("WELLCARE_PROGRESS_DB", os.path.join(_root, "progress.db"))
+os.environ.setdefault("WELLCARE_CONTENT_INDEX", os.path.join(_root, "content"))
+os.environ.setdefault("GOOGLE_API_KEY", "test")
@@ -0,0 +1,164 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from wellcare_core.admission import AdmissionControl, Overloaded
+
+CRISIS_ALERT = {"crisis_indicators": ["suicide"]}
+
+
+def controller(**kwargs):
+    return AdmissionControl(**{"max_active": 1, "max_waiting": 8, "crisis_reserve": 0, **kwargs})
+
+
+def queue_in_order(control, alerts):
+    """Queues one waiting thread per alert, in order, behind a held slot; returns the admission order."""
+    order, lock = [], threading.Lock()
+
+    def turn(label, alert):
+        ticket = control.acquire(alert)
+        with lock:
+            order.append(label)
+        ticket.release()
+
+    threads = []
+    for label, alert in alerts:
+        thread = threading.Thread(target=turn, args=(label, alert))
+        thread.start()
+        threads.append(thread)
+        while control.stats()["waiting"] < len(threads):
+            time.sleep(0.001)
+    return threads, order
+
+
+def test_crisis_turns_go_ahead_and_each_lane_is_first_come_first_served():
+    control = controller()
+    held = control.acquire()
+    threads, order = queue_in_order(control, [("a", None), ("b", None), ("crisis 1", CRISIS_ALERT),
+                                              ("c", None), ("crisis 2", CRISIS_ALERT)])
+    held.release()
+    for thread in threads:
+        thread.join(5)
+    assert order == ["crisis 1", "crisis 2", "a", "b", "c"]
+
+
+def test_crisis_turns_use_the_reserve_without_waiting():
+    control = controller(max_waiting=0, crisis_reserve=1)
+    held = control.acquire()
+    with pytest.raises(Overloaded):
+        control.acquire()
+    ticket = control.acquire(CRISIS_ALERT)
+    assert control.stats()["active"] == 2
+    ticket.release()
+    held.release()
+
+
+def test_full_queue_sheds_normal_turns_but_not_crisis_turns():
+    control = controller(max_waiting=1, wait_timeout=5)
+    held = control.acquire()
+    threads, order = queue_in_order(control, [("a", None)])
+    with pytest.raises(Overloaded) as shed:
+        control.acquire()
+    assert shed.value.reason == "queue_full"
+    assert shed.value.headers()["Retry-After"].isdigit()
+    more, crisis_order = queue_in_order(control, [("crisis", CRISIS_ALERT)])
+    held.release()
+    for thread in threads + more:
+        thread.join(5)
+    assert order + crisis_order == ["a", "crisis"]
+    assert control.stats()["shed_queue_full"] == 1
+
+
+def test_waiting_past_the_timeout_is_shed_and_frees_the_place():
+    control = controller(wait_timeout=0.05)
+    held = control.acquire()
+    with pytest.raises(Overloaded) as shed:
+        control.acquire()
+    assert shed.value.reason == "queue_timeout"
+    held.release()
+    control.acquire().release()
+    stats = control.stats()
+    assert (stats["active"], stats["waiting"], stats["shed_timeout"]) == (0, 0, 1)
+
+
+def test_released_tickets_are_counted_once():
+    control = controller()
+    ticket = control.acquire()
+    ticket.release()
+    ticket.release()
+    assert control.stats()["active"] == 0
+
+
+def test_crisis_turns_have_their_own_larger_rate_limits():
+    control = AdmissionControl(session_rate=0.001, session_burst=1, crisis_factor=3)
+    control.limit("s", "ip")
+    with pytest.raises(Overloaded) as limited:
+        control.limit("s", "ip")
+    assert limited.value.reason == "rate_limited"
+    for _ in range(3):
+        control.limit("s", "ip", CRISIS_ALERT)
+    with pytest.raises(Overloaded):
+        control.limit("s", "ip", CRISIS_ALERT)
+    assert control.stats()["crisis_rate_limited"] == 1
+
+
+def test_crisis_flood_from_one_ip_is_shed():
+    control = AdmissionControl(ip_rate=0.001, ip_burst=2, crisis_factor=5, max_active=1, crisis_reserve=0,
+                               max_crisis_waiting=2, crisis_timeout=0.5)
+    # New session ids don't get around the IP's crisis bucket
+    allowed = 0
+    for n in range(50):
+        try:
+            control.limit(f"session {n}", "10.0.0.1", CRISIS_ALERT)
+            allowed += 1
+        except Overloaded:
+            pass
+    assert allowed == 10
+    control.limit("other", "10.0.0.2", CRISIS_ALERT)
+
+    # Past the rate limit, the crisis queue is bounded too, and waits end
+    held = control.acquire()
+    outcomes = []
+
+    def turn():
+        try:
+            control.acquire(CRISIS_ALERT).release()
+            outcomes.append("admitted")
+        except Overloaded as e:
+            outcomes.append(e.reason)
+
+    threads = [threading.Thread(target=turn) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    held.release()
+    assert sorted(outcomes) == ["queue_full", "queue_full", "queue_timeout", "queue_timeout"]
+    stats = control.stats()
+    assert (stats["active"], stats["waiting"], stats["crisis_shed"]) == (0, 0, 4)
+
+
+def test_async_admission_order_matches():
+    async def run():
+        control = controller()
+        held = await control.aacquire()
+        order = []
+
+        async def turn(label, alert):
+            async with control.aadmit(alert):
+                order.append(label)
+
+        tasks = []
+        for label, alert in [("a", None), ("crisis", CRISIS_ALERT), ("b", None)]:
+            tasks.append(asyncio.create_task(turn(label, alert)))
+            while control.stats()["waiting"] < len(tasks):
+                await asyncio.sleep(0)
+        held.release()
+        await asyncio.gather(*tasks)
+        return order, control.stats()
+
+    order, stats = asyncio.run(run())
+    assert order == ["crisis", "a", "b"]
+    assert stats["active"] == 0
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from wellcare_core.analytics import MAX_REPORT_WEEKS, AssessmentAnalytics, parse_weeks
+from wellcare_core.progress import ProgressStore
+
+DAY = 86400
+NOW = 1760000000.0
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ProgressStore(str(tmp_path / "progress.db"))
+
+
+def record(store, count, start=0):
+    rng = np.random.default_rng(start)
+    for i in range(start, start + count):
+        answers = rng.integers(0, 4, 9).tolist()
+        store.record(f"user-{i % 7}", {"phq9": sum(answers)}, ts=NOW - (count - i) * 3 * DAY,
+                     answers={"phq9": answers})
+    store.record("user-gad", {"gad7": 5}, ts=NOW)
+
+
+def test_restart_loads_saved_rollups_and_folds_only_new_rows(store):
+    record(store, 40)
+    first = AssessmentAnalytics(store)
+    assert first.refresh() == 81
+    record(store, 10, start=40)
+
+    restarted = AssessmentAnalytics(store)
+    # 10 new PHQ-9 scores with answers and one GAD-7 score
+    assert restarted.refresh() == 21
+    assert restarted.stats()["rollups_loaded"] > 0
+    expected = first.report()
+    assert restarted.report() == expected
+
+    # The same figures as folding every stored assessment from scratch
+    store._connection().execute("DELETE FROM rollup_watermark")
+    assert AssessmentAnalytics(store).report() == expected
+
+
+def test_workers_sharing_a_store_keep_the_rollups_consistent(store):
+    record(store, 20)
+    behind, ahead = AssessmentAnalytics(store), AssessmentAnalytics(store)
+    behind.refresh()
+    record(store, 15, start=20)
+    ahead.refresh()
+    saved = store.load_rollups()[0]
+    record(store, 5, start=35)
+    # Catches up past the other worker's save; its own changes since then go out
+    behind.refresh()
+    assert store.load_rollups()[0] > saved
+    assert AssessmentAnalytics(store).report() == behind.report()
+    # A worker whose fold is behind the stored watermark doesn't overwrite it
+    assert ahead.refresh() > 0
+    assert AssessmentAnalytics(store).report() == ahead.report()
+
+
+@pytest.mark.parametrize("weeks, expected", [("12", 12), (0, 0), (" 4 ", 4), ("100000", MAX_REPORT_WEEKS)])
+def test_weeks_are_clamped(weeks, expected):
+    assert parse_weeks(weeks) == expected
+
+
+@pytest.mark.parametrize("weeks", ["abc", "-1", "1.5", "1e3"])
+def test_bad_weeks_are_rejected(store, weeks):
+    with pytest.raises(ValueError):
+        AssessmentAnalytics(store).report(weeks=weeks)
+
+
+def test_reports_endpoint_validates_weeks(monkeypatch):
+    import app
+
+    monkeypatch.setattr(app, "ADMIN_TOKEN", "secret")
+    client = app.app.test_client()
+    headers = {"Authorization": "Bearer secret"}
+    assert client.get("/reports?weeks=abc", headers=headers).status_code == 400
+    assert client.get("/reports?weeks=-3", headers=headers).status_code == 400
+    response = client.get("/reports?weeks=99999", headers=headers)
+    assert response.status_code == 200
+    assert client.get("/reports?weeks=4").status_code == 403
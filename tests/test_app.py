@@ -0,0 +1,69 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+app = pytest.importorskip("app")
+
+from wellcare_core.admission import AdmissionControl  # noqa: E402
+from wellcare_core.session_store import MemorySessionStore  # noqa: E402
+
+
+def test_json_crisis_turn_does_not_wait_for_the_model(monkeypatch):
+    store = MemorySessionStore()
+    monkeypatch.setattr(app, "sessions", store)
+    monkeypatch.setattr(app, "admission", AdmissionControl(max_active=1, max_waiting=1))
+    calls = []
+
+    def slow_model(*args, **kwargs):
+        calls.append(args)
+        time.sleep(3)
+        return SimpleNamespace(text="A considered reply")
+
+    monkeypatch.setattr(app, "run_tiered", slow_model)
+
+    with app.app.test_client() as client:
+        session_id = client.post("/start_session").json["session_id"]
+        started = time.perf_counter()
+        response = client.post("/send_message", json={"session_id": session_id, "message": "I want to end my life"})
+        elapsed = time.perf_counter() - started
+        # As a WSGI server does once the body is sent; the exchange is saved then
+        response.close()
+
+    assert response.status_code == 200
+    assert elapsed < 1
+    assert response.json["crisis"]["crisis_indicators"] == ["suicide"]
+    assert response.json["response"] == response.json["crisis"]["message"]
+    assert not calls
+    # The exchange is kept, with the crisis pinned for later turns
+    history = store.get(session_id)
+    assert "Crisis screen flagged (suicide)" in history[0].parts[0].text
+    assert history[2].parts[0].text == "I want to end my life"
+
+
+def test_session_owner_is_issued_by_the_server(monkeypatch):
+    monkeypatch.setattr(app, "sessions", MemorySessionStore())
+    with app.app.test_client() as client:
+        first = client.post("/start_session").json
+        # The id comes back in a signed cookie, so the browser's next session has the same owner
+        assert client.post("/start_session").json["user_id"] == first["user_id"]
+        # A user_id in the body is not an identity
+        client.post("/send_message", json={"session_id": first["session_id"], "user_id": "victim",
+                                           "message": "I want to end my life"}).close()
+        assert app.sessions.owner(first["session_id"]) == first["user_id"]
+        assert client.get(f"/plans/victim?session_id={first['session_id']}").status_code == 403
+        assert client.get(f"/plans/{first['user_id']}?session_id={first['session_id']}").status_code == 200
+
+    with app.app.test_client() as other:
+        other.set_cookie("wellcare_user", "victim.forged")
+        assert other.post("/start_session").json["user_id"] not in ("victim", first["user_id"])
+
+
+def test_stats_need_the_admin_token(monkeypatch):
+    monkeypatch.setattr(app, "ADMIN_TOKEN", "secret")
+    stats = [rule.rule for rule in app.app.url_map.iter_rules() if rule.rule.endswith("_stats")]
+    assert "/session_stats" in stats
+    with app.app.test_client() as client:
+        for route in stats:
+            assert client.get(route).status_code == 403, route
+        assert client.get("/session_stats", headers={"Authorization": "Bearer secret"}).status_code == 200
@@ -0,0 +1,135 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+asgi_app = pytest.importorskip("asgi_app")
+
+from wellcare_core.admission import AdmissionControl  # noqa: E402
+from wellcare_core.session_store import MemorySessionStore, SQLiteSessionStore  # noqa: E402
+
+
+class ThreadCheckingStore(SQLiteSessionStore):
+    """Fails a call made on the event loop's thread."""
+
+    loop_thread = None
+
+    def _check(self):
+        assert threading.get_ident() != self.loop_thread, "session store called on the event loop"
+
+    def get(self, session_id):
+        self._check()
+        return super().get(session_id)
+
+    def put(self, session_id, history):
+        self._check()
+        return super().put(session_id, history)
+
+    def create(self, session_id, owner=None):
+        self._check()
+        return super().create(session_id, owner)
+
+    def owner(self, session_id):
+        self._check()
+        return super().owner(session_id)
+
+
+def test_questionnaire_stream_stays_off_the_loop_and_releases_its_slot(monkeypatch, tmp_path):
+    store = ThreadCheckingStore(str(tmp_path / "sessions.db"))
+    admission = AdmissionControl(max_active=2, max_waiting=2)
+    monkeypatch.setattr(asgi_app, "sessions", store)
+    monkeypatch.setattr(asgi_app, "admission", admission)
+    if not asgi_app.questionnaires:
+        pytest.skip("questionnaires disabled")
+
+    async def run():
+        store.loop_thread = threading.get_ident()
+        transport = httpx.ASGITransport(app=asgi_app.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            session_id = (await client.post("/start_session")).json()["session_id"]
+            body = {"session_id": session_id, "message": "I'd like to take the PHQ-9 questionnaire"}
+            response = await client.post("/send_message_stream", json=body)
+            return response
+
+    response = asyncio.run(run())
+    assert response.status_code == 200
+    assert "event: questionnaire" in response.text
+    stats = admission.stats()
+    assert (stats["admitted"], stats["active"]) == (1, 0)
+
+
+def test_json_crisis_turn_does_not_wait_for_the_model(monkeypatch):
+    store = MemorySessionStore()
+    monkeypatch.setattr(asgi_app, "sessions", store)
+    monkeypatch.setattr(asgi_app, "admission", AdmissionControl(max_active=1, max_waiting=1))
+    calls = []
+
+    async def slow_model(*args, **kwargs):
+        calls.append(args)
+        await asyncio.sleep(3)
+        return SimpleNamespace(text="A considered reply")
+
+    monkeypatch.setattr(asgi_app, "run_tiered", slow_model)
+
+    async def run():
+        transport = httpx.ASGITransport(app=asgi_app.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            session_id = (await client.post("/start_session")).json()["session_id"]
+            started = time.perf_counter()
+            response = await client.post("/send_message", json={"session_id": session_id,
+                                                                 "message": "I want to end my life"})
+            return session_id, response, time.perf_counter() - started
+
+    session_id, response, elapsed = asyncio.run(run())
+    assert response.status_code == 200
+    assert elapsed < 1
+    data = response.json()
+    assert data["crisis"]["crisis_indicators"] == ["suicide"]
+    assert data["response"] == data["crisis"]["message"]
+    assert not calls
+    # The exchange is kept, with the crisis pinned for later turns
+    history = store.get(session_id)
+    assert "Crisis screen flagged (suicide)" in history[0].parts[0].text
+    assert history[2].parts[0].text == "I want to end my life"
+
+
+def test_session_owner_is_issued_by_the_server(monkeypatch):
+    monkeypatch.setattr(asgi_app, "sessions", MemorySessionStore())
+
+    async def run():
+        transport = httpx.ASGITransport(app=asgi_app.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            first = (await client.post("/start_session")).json()
+            again = (await client.post("/start_session")).json()
+            claimed = await client.get(f"/plans/victim?session_id={first['session_id']}")
+            own = await client.get(f"/plans/{first['user_id']}?session_id={first['session_id']}")
+        async with httpx.AsyncClient(transport=transport, base_url="http://test",
+                                     cookies={"wellcare_user": "victim.forged"}) as other:
+            forged = (await other.post("/start_session")).json()
+        return first, again, claimed, own, forged
+
+    first, again, claimed, own, forged = asyncio.run(run())
+    assert again["user_id"] == first["user_id"]
+    assert asgi_app.sessions.owner(first["session_id"]) == first["user_id"]
+    assert (claimed.status_code, own.status_code) == (403, 200)
+    assert forged["user_id"] not in ("victim", first["user_id"])
+
+
+def test_stats_need_the_admin_token(monkeypatch):
+    monkeypatch.setattr(asgi_app, "ADMIN_TOKEN", "secret")
+    stats = [route.path for route in asgi_app.app.routes if route.path.endswith("_stats")]
+    assert "/session_stats" in stats
+
+    async def run():
+        transport = httpx.ASGITransport(app=asgi_app.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            closed = [(await client.get(route)).status_code for route in stats]
+            opened = await client.get("/session_stats", headers={"Authorization": "Bearer secret"})
+        return closed, opened
+
+    closed, opened = asyncio.run(run())
+    assert set(closed) == {403}
+    assert opened.status_code == 200
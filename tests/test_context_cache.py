@@ -0,0 +1,165 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from wellcare_core.context_cache import ContextCache, create_context_cache, min_tokens
+
+
+def tool_a():
+    """A tool."""
+
+
+class StubCaches:
+    """Counts uploads; each one takes `delay` seconds, like a network round trip."""
+
+    def __init__(self, delay: float = 0.05, fail: bool = False):
+        self.delay = delay
+        self.fail = fail
+        self.creates = 0
+        self.updates = 0
+        self._lock = threading.Lock()
+
+    def _cached(self):
+        with self._lock:
+            self.creates += 1
+            name = f"cachedContents/{self.creates}"
+        return SimpleNamespace(name=name, expire_time=datetime.now(timezone.utc) + timedelta(hours=1))
+
+    def create(self, model, config):
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("prefix too small")
+        return self._cached()
+
+    def update(self, name, config):
+        self.updates += 1
+        return SimpleNamespace(name=name, expire_time=datetime.now(timezone.utc) + timedelta(hours=1))
+
+
+class StubAioCaches:
+    def __init__(self, caches: StubCaches):
+        self.caches = caches
+
+    async def create(self, model, config):
+        await asyncio.sleep(self.caches.delay)
+        if self.caches.fail:
+            raise RuntimeError("prefix too small")
+        return self.caches._cached()
+
+    async def update(self, name, config):
+        return self.caches.update(name, config)
+
+
+def stub_client(**kwargs):
+    caches = StubCaches(**kwargs)
+    return SimpleNamespace(caches=caches, aio=SimpleNamespace(caches=StubAioCaches(caches)))
+
+
+def test_concurrent_sync_turns_create_once():
+    client = stub_client()
+    cache = ContextCache(client, min_tokens=1)
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        list(pool.map(lambda _: cache.config("model", "instruction", [tool_a]), range(64)))
+    cache.wait()
+    assert client.caches.creates == 1
+    assert cache.config("model", "instruction", [tool_a])["cached_content"] == "cachedContents/1"
+
+
+def test_upload_is_off_the_request_path():
+    client = stub_client(delay=0.5)
+    cache = ContextCache(client, min_tokens=1)
+    started = time.perf_counter()
+    config = cache.config("model", "instruction", [tool_a])
+    # The first turn goes inline rather than waiting for the upload
+    assert time.perf_counter() - started < 0.2
+    assert config["system_instruction"] == "instruction"
+    assert cache.stats()["uploads_in_flight"] == 1
+    cache.wait()
+    assert cache.config("model", "instruction", [tool_a])["cached_content"] == "cachedContents/1"
+
+
+def test_concurrent_async_turns_create_once():
+    client = stub_client(delay=0.5)
+    cache = ContextCache(client, min_tokens=1)
+
+    async def turns():
+        configs = await asyncio.gather(*(cache.aconfig("model", "instruction", [tool_a]) for _ in range(200)))
+        # Every turn was answered while the upload was still running
+        uploading = [task.done() for task in cache._inflight.values()]
+        await asyncio.gather(*cache._inflight.values())
+        return configs, uploading, await cache.aconfig("model", "instruction", [tool_a])
+
+    configs, uploading, after = asyncio.run(turns())
+    assert uploading == [False]
+    assert all("cached_content" not in config for config in configs)
+    assert client.caches.creates == 1
+    assert after["cached_content"] == "cachedContents/1"
+    assert not cache._inflight
+
+
+def test_expiring_handle_is_used_while_it_is_extended():
+    client = stub_client()
+    cache = ContextCache(client, min_tokens=1)
+    cache.config("model", "instruction", [tool_a])
+    cache.wait()
+    key, (name, _) = next(iter(cache._handles.items()))
+    cache._handles[key] = (name, datetime.now(timezone.utc) + timedelta(seconds=60))
+    assert cache.config("model", "instruction", [tool_a])["cached_content"] == name
+    cache.wait()
+    assert client.caches.updates == 1
+    assert cache._handles[key][1] > datetime.now(timezone.utc) + timedelta(minutes=30)
+
+
+def test_failed_upload_falls_back_inline_and_backs_off():
+    client = stub_client(fail=True)
+    cache = ContextCache(client, min_tokens=1)
+    assert cache.config("model", "instruction", [tool_a])["system_instruction"] == "instruction"
+    cache.wait()
+    assert client.caches.creates == 0
+    # Within the back-off no new upload is attempted
+    client.caches.fail = False
+    assert "cached_content" not in cache.config("model", "instruction", [tool_a])
+    assert cache.stats()["uploads_in_flight"] == 0
+    cache.wait()
+    assert client.caches.creates == 0
+
+
+def test_prefix_below_model_minimum_is_never_uploaded():
+    client = stub_client(delay=0)
+    cache = ContextCache(client)
+    for _ in range(3):
+        assert "cached_content" not in cache.config("gemini-2.0-flash", "Be kind.", [tool_a])
+        cache.wait()
+    assert client.caches.creates == 0
+    assert cache.stats()["prefixes_below_minimum"] == 1
+
+    long_instruction = "Be kind and listen carefully. " * 1000
+    cache.config("gemini-2.0-flash", long_instruction, [tool_a])
+    cache.wait()
+    assert client.caches.creates == 1
+
+
+def test_min_tokens_by_model():
+    assert min_tokens("gemini-2.5-flash-lite") == 1024
+    assert min_tokens("gemini-2.5-pro") == 4096
+    assert min_tokens("gemini-2.0-flash") == 4096
+
+
+def test_caching_is_opt_in(monkeypatch):
+    monkeypatch.delenv("WELLCARE_CONTEXT_CACHE", raising=False)
+    assert not create_context_cache(stub_client()).enabled
+    monkeypatch.setenv("WELLCARE_CONTEXT_CACHE", "1")
+    monkeypatch.setenv("WELLCARE_CONTEXT_CACHE_MIN_TOKENS", "2048")
+    cache = create_context_cache(stub_client())
+    assert cache.enabled and cache.min_tokens == 2048
+
+
+def test_disabled_cache_is_inline():
+    client = stub_client()
+    config = ContextCache(client, enabled=False).config("model", "instruction", [tool_a], temperature=0.2)
+    assert "cached_content" not in config
+    assert config["temperature"] == 0.2
+    assert client.caches.creates == 0
@@ -0,0 +1,87 @@
+from unittest.mock import patch
+
+import pytest
+
+from wellcare_core.crisis import DEFAULT_LEXICON, CrisisDetector, detector
+
+
+def indicators(text: str) -> list:
+    return [match["indicator"] for match in detector.find(text)]
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("I want to die", ["better off dead"]),
+    ("thinking about self-harm again", ["self harm"]),
+    ("I just cant go on", ["no reason to live"]),
+    ("I can’t go on", ["no reason to live"]),
+    ("honestly i wanna kms", ["kill myself"]),
+    ("I keep thinking about SUICIDE.", ["suicide"]),
+    ("the suicides squad", ["suicide"]),
+    ("we talked about overdoses of caffeine", ["overdose"]),
+    ("I overdosed last year", ["overdose"]),
+    ("I self-harmed again", ["self harm"]),
+    ("I nearly killed myself", ["kill myself"]),
+    ("having suicidal thoughts", ["suicide"]),
+])
+def test_finds_phrases(text, expected):
+    assert indicators(text) == expected
+
+
+@pytest.mark.parametrize("text", [
+    "I want to diet before summer",
+    "I ran 10 kms today",
+    "going on a diet to die for",
+    "the cutting board is by myself",
+])
+def test_matches_whole_words_only(text):
+    assert indicators(text) == []
+
+
+@pytest.mark.parametrize("text", ["SUİCİDE", "ſuicide", "suıcıde"])
+def test_case_fold_variants_resolve_to_their_indicator(text):
+    found = detector.find(text)
+    assert [match["indicator"] for match in found] == ["suicide"]
+    assert found[0]["text"] == text
+
+
+def test_longest_phrase_wins():
+    assert detector.find("I will commit suicide")[0]["text"] == "commit suicide"
+
+
+def test_offsets():
+    text = "tonight I might end it all"
+    [match] = detector.find(text)
+    assert text[match["start"]:match["end"]] == "end it all"
+
+
+def test_assess():
+    assert detector.assess("had a nice walk")["risk_level"] == "low"
+    result = detector.assess("I want to die and end it all")
+    assert result["risk_level"] == "high"
+    assert result["immediate_action_required"]
+    assert result["crisis_indicators"] == ["better off dead", "end it all"]
+
+
+def test_custom_lexicon_with_shared_variants():
+    custom = CrisisDetector({"a": ["give up"], "b": ["give up", "giving up"]})
+    assert [match["indicator"] for match in custom.find("giving up, give up")] == ["b", "a"]
+
+
+def test_large_lexicon():
+    lexicon = {**DEFAULT_LEXICON, **{f"term {i}": [f"phrase number {i}"] for i in range(2000)}}
+    large = CrisisDetector(lexicon)
+    assert [match["indicator"] for match in large.find("phrase number 1999 then phrase number 19")] \
+        == ["term 1999", "term 19"]
+
+
+def test_crisis_screen_is_traced():
+    from agents.wellcare.agent import assess_crisis_risk, get_crisis_hotlines
+    from wellcare_core.chat import crisis_alert
+    from wellcare_core.tracing import Tracer
+
+    tracer = Tracer()
+    with patch("wellcare_core.chat.tracer", tracer):
+        assert crisis_alert("I want to die", assess_crisis_risk, get_crisis_hotlines)["crisis_indicators"] \
+            == ["better off dead"]
+        assert crisis_alert("hello", assess_crisis_risk, get_crisis_hotlines) is None
+    assert 'wellcare_span_duration_seconds_count{kind="screen",name="crisis_screen"} 2' in tracer.prometheus()
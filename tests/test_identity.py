@@ -0,0 +1,18 @@
+from wellcare_core.identity import Identities
+
+
+def test_cookie_round_trip():
+    identities = Identities("key")
+    user_id = identities.new_id()
+    assert identities.verify(identities.cookie(user_id)) == user_id
+    assert identities.new_id() != user_id
+
+
+def test_forged_or_foreign_cookies_are_rejected():
+    identities = Identities("key")
+    cookie = identities.cookie("alice")
+    assert identities.verify("alice") is None
+    assert identities.verify("alice.0000") is None
+    assert identities.verify(cookie.replace("alice", "mallory")) is None
+    assert Identities("other key").verify(cookie) is None
+    assert identities.verify(None) is None
@@ -0,0 +1,103 @@
+import json
+import os
+import threading
+
+from wellcare_core.plan_store import PlanStore, plan_id
+
+
+def test_save_is_deduplicated(tmp_path):
+    store = PlanStore(str(tmp_path), background=False)
+    first = store.save("alice", "# Sleep plan\nLights out at 11")
+    again = store.save("alice", "# Sleep plan\nLights out at 11")
+    assert not first["deduplicated"] and again["deduplicated"]
+    assert first["id"] == plan_id("# Sleep plan\nLights out at 11")
+    assert [plan["title"] for plan in store.list("alice")] == ["Sleep plan"]
+    assert store.list("bob") == []
+
+
+def test_background_writes_are_readable_before_and_after_flush(tmp_path):
+    store = PlanStore(str(tmp_path))
+    plan = store.save("alice", "Walk every morning", title="morning_walk.md")
+    assert store.get("alice", plan["id"]) == "Walk every morning"
+    store.flush()
+    assert store.get("alice", plan["id"]) == "Walk every morning"
+    assert store.stats()["pending"] == 0
+    assert store.get("alice", "not-an-id") is None
+    assert store.get("bob", plan["id"]) is None
+
+
+def test_workers_merge_into_one_index(tmp_path):
+    # Two stores on one directory behave like two worker processes
+    workers = [PlanStore(str(tmp_path), background=False) for _ in range(2)]
+    for worker in workers:
+        worker.list("alice")
+    saved = set()
+    threads = []
+    for i in range(40):
+        worker = workers[i % 2]
+        content = f"Plan number {i}"
+        saved.add(plan_id(content))
+        threads.append(threading.Thread(target=worker.save, args=("alice", content)))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for worker in workers:
+        assert {plan["id"] for plan in worker.list("alice")} == saved
+    directory = workers[0]._directory("alice")
+    with open(os.path.join(directory, "index.json"), encoding="utf-8") as f:
+        assert {plan["id"] for plan in json.load(f)} == saved
+    # A plan saved by the other worker can be read back
+    assert workers[0].get("alice", plan_id("Plan number 1")) == "Plan number 1"
+
+
+def test_damaged_index_is_rebuilt_from_plan_files(tmp_path):
+    store = PlanStore(str(tmp_path), background=False)
+    plan = store.save("alice", "# Breathing\nBox breathing twice a day")
+    with open(os.path.join(store._directory("alice"), "index.json"), "w", encoding="utf-8") as f:
+        f.write("{not json")
+    assert [item["id"] for item in PlanStore(str(tmp_path)).list("alice")] == [plan["id"]]
+
+
+def flush(store, timeout=5.0):
+    """flush() with a deadline, so a dead writer fails the test instead of hanging it."""
+    flusher = threading.Thread(target=store.flush, daemon=True)
+    flusher.start()
+    flusher.join(timeout)
+    assert not flusher.is_alive(), "writer thread stopped"
+
+
+def test_index_of_the_wrong_shape_is_rebuilt_by_the_writer(tmp_path):
+    store = PlanStore(str(tmp_path))
+    first = store.save("alice", "# Sleep\nNo screens after 10")
+    flush(store)
+    with open(os.path.join(store._directory("alice"), "index.json"), "w", encoding="utf-8") as f:
+        json.dump({"plans": "not a list of plans"}, f)
+    second = store.save("alice", "# Walk\nTen minutes outside")
+    flush(store)
+    assert {plan["id"] for plan in PlanStore(str(tmp_path)).list("alice")} == {first["id"], second["id"]}
+    assert store.stats()["write_errors"] == 0
+
+
+def test_writer_survives_a_failed_write(tmp_path, monkeypatch):
+    store = PlanStore(str(tmp_path))
+    load_index = store._load_index
+    calls = []
+
+    def fail_once(directory):
+        calls.append(directory)
+        if len(calls) == 1:
+            raise RuntimeError("bad index")
+        return load_index(directory)
+
+    monkeypatch.setattr(store, "_load_index", fail_once)
+    # The directory doesn't exist yet, so save() doesn't read the index and the writer's read is the first
+    store.save("alice", "First plan")
+    flush(store)
+    later = store.save("alice", "Second plan")
+    flush(store)
+    stats = store.stats()
+    assert stats["write_errors"] == 1 and stats["written"] == 1
+    assert stats["last_error"] == "RuntimeError: bad index"
+    assert later["id"] in {plan["id"] for plan in PlanStore(str(tmp_path)).list("alice")}
@@ -0,0 +1,119 @@
+import pytest
+
+from agents.wellcare.agent import conduct_gad7_assessment, conduct_phq9_assessment
+from wellcare_core.questionnaire import CRISIS_INDICATOR, QuestionnaireManager, detect_scale, parse_answer
+from wellcare_core.session_store import MemorySessionStore, SQLiteSessionStore
+
+ASSESSMENTS = {"phq9": conduct_phq9_assessment, "gad7": conduct_gad7_assessment}
+
+
+@pytest.fixture
+def manager():
+    sessions = MemorySessionStore()
+    sessions.put("s", [])
+    return QuestionnaireManager(ASSESSMENTS, sessions)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("2", 2),
+    ("3)", 3),
+    (" 0. ", 0),
+    ("1 - Several days", 1),
+    ("Nearly every day", 3),
+    ("more than half the days.", 2),
+    ("NOT AT ALL", 0),
+    ("not at all sure, nearly every day", None),
+    ("several days, maybe nearly every day", None),
+    ("2.5", None),
+    ("30", None),
+    ("days", None),
+    ("", None),
+])
+def test_parse_answer(text, expected):
+    assert parse_answer(text) == expected
+
+
+def test_detect_scale():
+    assert detect_scale("can I take the PHQ-9?") == "phq9"
+    assert detect_scale("I want an anxiety check") == "gad7"
+    assert detect_scale("depression and anxiety") is None
+
+
+def answer_all(manager, session_id, answers):
+    step = None
+    for answer in answers:
+        step = manager.step(session_id, str(answer))
+    return step
+
+
+def test_runs_a_questionnaire_to_completion(manager):
+    step = manager.step("s", "I'd like the GAD-7", "wellness_assessor_agent")
+    assert step.prompt["step"] == 1 and step.prompt["total"] == 7
+    step = answer_all(manager, "s", [1, 2, 3, 0, 1, 2])
+    assert step.prompt["step"] == 7
+    step = manager.step("s", "Nearly every day")
+    completion = step.completion
+    assert completion.answers == [1, 2, 3, 0, 1, 2, 3]
+    assert completion.result["score"] == 12
+    assert completion.result["severity"] == "moderate"
+    assert not completion.crisis
+    assert manager.step("s", "2") is None
+    assert manager.stats()["completed"] == 1
+
+
+def test_only_starts_for_the_assessor(manager):
+    assert manager.step("s", "I'd like the PHQ-9", "coordinator") is None
+    assert manager.step("s", "I'd like the PHQ-9 and GAD-7", "wellness_assessor_agent") is None
+
+
+def test_invalid_answer_repeats_the_question(manager):
+    manager.step("s", "PHQ-9 please", "wellness_assessor_agent")
+    step = manager.step("s", "not at all sure, nearly every day")
+    assert step.completion is None and step.prompt["step"] == 1
+    assert manager.stats()["invalid"] == 1
+
+
+def test_stop(manager):
+    manager.step("s", "PHQ-9 please", "wellness_assessor_agent")
+    step = manager.step("s", "stop please")
+    assert step.prompt is None and "stopped" in step.text
+    assert manager.step("s", "1") is None
+
+
+@pytest.mark.parametrize("answer, flagged", [("0", []), ("Not at all", []), ("1", [CRISIS_INDICATOR]),
+                                             ("Nearly every day", [CRISIS_INDICATOR])])
+def test_item9_is_a_crisis_flag(manager, answer, flagged):
+    manager.step("s", "PHQ-9 please", "wellness_assessor_agent")
+    answer_all(manager, "s", [0] * 7)
+    # Earlier items are never flagged, whatever the answer
+    assert manager.crisis_flags("s", "3") == []
+    manager.step("s", "3")
+    assert manager.crisis_flags("s", answer) == flagged
+    completion = manager.step("s", answer).completion
+    assert completion.crisis == bool(flagged)
+    assert "Thoughts that you would be better off dead" in completion.transcript
+
+
+def test_gad7_has_no_crisis_item(manager):
+    manager.step("s", "GAD-7", "wellness_assessor_agent")
+    answer_all(manager, "s", [3] * 6)
+    assert manager.crisis_flags("s", "3") == []
+    assert not manager.step("s", "3").completion.crisis
+
+
+def test_no_flags_without_a_questionnaire(manager):
+    assert manager.crisis_flags("s", "3") == []
+
+
+def test_progress_is_shared_by_workers_on_one_store(tmp_path):
+    # Two workers, each with its own manager and connection to the same SQLite file
+    path = str(tmp_path / "sessions.db")
+    first, second = (QuestionnaireManager(ASSESSMENTS, SQLiteSessionStore(path)) for _ in range(2))
+    first.sessions.put("s", [])
+    first.step("s", "PHQ-9 please", "wellness_assessor_agent")
+    answer_all(second, "s", [1] * 4)
+    answer_all(first, "s", [1] * 4)
+    assert second.crisis_flags("s", "2") == [CRISIS_INDICATOR]
+    completion = second.step("s", "2").completion
+    assert completion.answers == [1] * 8 + [2] and completion.crisis
+    assert first.step("s", "2") is None
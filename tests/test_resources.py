@@ -0,0 +1,22 @@
+import pytest
+
+from agents.wellcare.agent import get_crisis_hotlines
+from wellcare_core.resources import CRISIS_HOTLINES, ResourceDirectory, hotline_records
+
+
+@pytest.mark.parametrize("country", ["", "  ", "XX", "us", " US "])
+def test_missing_or_unknown_country_gets_us_hotlines(country):
+    assert get_crisis_hotlines(country) == CRISIS_HOTLINES["US"]
+
+
+def test_known_country_is_case_insensitive():
+    assert get_crisis_hotlines("uk") == CRISIS_HOTLINES["UK"]
+
+
+def test_directory_never_mixes_countries():
+    directory = ResourceDirectory(hotline_records() + [
+        {"name": "Local Line", "type": "hotline", "country": "NZ", "phone": "1737"},
+    ])
+    assert directory.hotlines("") == {}
+    assert directory.hotlines(None) == {}
+    assert directory.hotlines("NZ") == {"local_line": "1737"}
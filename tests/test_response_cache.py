@@ -0,0 +1,54 @@
+from types import SimpleNamespace
+
+from google.genai import types
+
+from wellcare_core.response_cache import ResponseCache, cached_exchange
+from wellcare_core.tiering import FULL, LITE, Tier
+
+AGENT = SimpleNamespace(name="wellcare_coordinator", model="gemini-2.0-flash")
+OTHER = SimpleNamespace(name="community_resource_agent", model="gemini-2.0-flash")
+
+
+def tool_turn(message):
+    call = types.FunctionCall(name="log_mood", args={"mood": 6})
+    return [
+        types.Content(role="user", parts=[types.Part(text=message)]),
+        types.Content(role="model", parts=[types.Part(function_call=call)]),
+        types.Content(role="user", parts=[types.Part.from_function_response(name="log_mood", response={"ok": 1})]),
+        types.Content(role="model", parts=[types.Part(text="Logged your mood.")]),
+    ]
+
+
+def test_openers_are_cached_and_normalized():
+    cache = ResponseCache()
+    key = cache.key_for("Hello!", AGENT, [], None)
+    cache.put(key, "Hi, how are you feeling?", 0.4, cached_exchange("Hello!", "Hi, how are you feeling?"))
+    assert cache.get(cache.key_for("hello", AGENT, [], None)) == "Hi, how are you feeling?"
+
+
+def test_turns_that_called_a_tool_are_not_cached():
+    cache = ResponseCache()
+    key = cache.key_for("I feel like a 6 today", AGENT, [], None)
+    cache.put(key, "Logged your mood.", 0.4, tool_turn("I feel like a 6 today"))
+    assert cache.get(key) is None
+    assert cache.stats()["tool_turns"] == 1
+
+
+def test_key_depends_on_agent_and_tier():
+    cache = ResponseCache()
+    lite = Tier(LITE, "gemini-2.0-flash-lite", "small_talk")
+    full = Tier(FULL, "gemini-2.0-flash", "default")
+    keys = {
+        cache.key_for("hi", AGENT, [], None, lite),
+        cache.key_for("hi", AGENT, [], None, full),
+        cache.key_for("hi", OTHER, [], None, lite),
+        cache.key_for("hi", AGENT, [], None),
+    }
+    assert len(keys) == 4
+
+
+def test_crisis_and_follow_up_turns_are_never_keyed():
+    cache = ResponseCache()
+    assert cache.key_for("hi", AGENT, [], {"crisis_indicators": ["suicide"]}) is None
+    assert cache.key_for("hi", AGENT, cached_exchange("a", "b"), None) is None
+    assert cache.stats()["bypasses"] == 1
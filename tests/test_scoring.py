@@ -0,0 +1,91 @@
+import json
+
+import numpy as np
+import pytest
+
+from agents.wellcare.agent import conduct_gad7_assessment, conduct_phq9_assessment
+from wellcare_core.scoring import get_scale, score_batch, score_text
+
+SCALAR = {"phq9": conduct_phq9_assessment, "gad7": conduct_gad7_assessment}
+
+
+@pytest.mark.parametrize("scale", ["phq9", "gad7"])
+def test_batch_matches_per_record_scorer(scale):
+    items = get_scale(scale).items
+    rng = np.random.default_rng(0)
+    answers = rng.integers(0, 4, size=(2000, items))
+    # Every possible total, so each band boundary is covered
+    answers[:items * 3 + 1] = [[min(3, max(0, total - 3 * i)) for i in range(items)]
+                               for total in range(items * 3 + 1)]
+    result = score_batch(scale, answers)
+    for row, score, severity, interpretation in zip(answers.tolist(), result["score"].tolist(),
+                                                    result["severity"].tolist(),
+                                                    result["interpretation"].tolist()):
+        # The unvalidated per-record function, as the tool scored before batch scoring existed
+        expected = SCALAR[scale].__wrapped__({f"q{i + 1}": answer for i, answer in enumerate(row)})
+        assert (score, severity, interpretation) == \
+            (expected["score"], expected["severity"], expected["interpretation"])
+
+
+def test_csv_and_jsonl_agree():
+    rows = [[1, 2, 3, 0, 1, 2, 3], [0, 0, 0, 0, 0, 0, 1]]
+    csv_text = "id,q1,q2,q3,q4,q5,q6,q7\n" + "".join(f"r{i}," + ",".join(map(str, row)) + "\n"
+                                                     for i, row in enumerate(rows))
+    jsonl_text = "\n".join(json.dumps({"id": f"r{i}", "responses": {f"q{j + 1}": answer
+                                                                    for j, answer in enumerate(row)}})
+                           for i, row in enumerate(rows))
+    from_csv, from_jsonl = score_text("gad7", csv_text), score_text("gad7", jsonl_text, "jsonl")
+    assert from_csv["ids"] == from_jsonl["ids"] == ["r0", "r1"]
+    assert from_csv["score"].tolist() == from_jsonl["score"].tolist() == [12, 1]
+
+
+def flat(**overrides) -> str:
+    record = {f"q{i}": 0 for i in range(1, 8)}
+    record.update(overrides)
+    return json.dumps(record)
+
+
+@pytest.mark.parametrize("text", [
+    flat(q1=2.9),
+    flat(q1=None),
+    flat(q1=True),
+    flat(q1="2"),
+    flat(q1=4),
+    flat(q1=-1),
+    '{"q1": 0}',
+    "[0, 1, 2]",
+    '{"responses": [0, 1, 2]}',
+    "{not json",
+])
+def test_bad_jsonl_raises_value_error(text):
+    with pytest.raises(ValueError):
+        score_text("gad7", text, "jsonl")
+
+
+@pytest.mark.parametrize("text", [
+    "q1,q2,q3,q4,q5,q6,q7\n0,1,2,2.9,0,0,0\n",
+    "q1,q2,q3,q4,q5,q6,q7\n0,1,2\n",
+    "q1,q2,q3,q4,q5,q6,q7\n0,1,2,x,0,0,0\n",
+    "q1,q2,q3,q4,q5,q6,q7\n0,1,2,,0,0,0\n",
+    "q1,q2,q3,q4,q5,q6,q7\n0,1,2,9,0,0,0\n",
+    "q1,q2,q3\n0,1,2\n",
+])
+def test_bad_csv_raises_value_error(text):
+    with pytest.raises(ValueError):
+        score_text("gad7", text)
+
+
+def test_whole_number_spellings_are_accepted():
+    assert score_text("gad7", flat(q1=2.0), "jsonl")["score"].tolist() == [2]
+    assert score_text("gad7", "q1,q2,q3,q4,q5,q6,q7\n 2,0,0,0,0,0,0\n")["score"].tolist() == [2]
+
+
+def test_score_endpoint_returns_400_on_bad_upload():
+    import app as flask_app
+
+    with flask_app.app.test_client() as http:
+        reply = http.post("/score/gad7", data=flat(q1=None), content_type="application/jsonl")
+        assert reply.status_code == 400
+        reply = http.post("/score/gad7", data="q1,q2,q3,q4,q5,q6,q7\n1,1,1,1,1,1,1\n", content_type="text/csv")
+        assert reply.status_code == 200
+        assert reply.json["score"] == [7]
@@ -0,0 +1,58 @@
+import pytest
+
+from wellcare_core.session_store import MemorySessionStore, SessionStore, SQLiteSessionStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemorySessionStore()
+    return SQLiteSessionStore(str(tmp_path / "sessions.db"))
+
+
+def test_owner_defaults_to_the_session(store):
+    assert store.owner("s1") is None
+    store.put("s1", [])
+    assert store.owner("s1") == "s1"
+
+
+def test_owner_is_bound_at_creation(store):
+    store.create("s1", "alice")
+    assert store.owner("s1") == "alice"
+    # Rewriting the history keeps the binding
+    store.put("s1", [])
+    assert store.owner("s1") == "alice"
+    assert store.get("s1") == []
+    store.create("s2")
+    assert store.owner("s2") == "s2"
+    store.delete("s1")
+    assert store.owner("s1") is None
+
+
+def test_state_is_kept_with_the_session(store):
+    store.put_state("s1", "questionnaire", {"scale": "phq9"})
+    assert store.get_state("s1", "questionnaire") is None
+    store.put("s1", [])
+    store.put_state("s1", "questionnaire", {"scale": "phq9", "answers": [1, 2]})
+    store.put_state("s1", "other", 3)
+    # Rewriting the history keeps the state, and values come back as copies
+    store.put("s1", [])
+    state = store.get_state("s1", "questionnaire")
+    state["answers"].append(3)
+    assert store.get_state("s1", "questionnaire") == {"scale": "phq9", "answers": [1, 2]}
+    store.put_state("s1", "questionnaire", None)
+    assert (store.get_state("s1", "questionnaire"), store.get_state("s1", "other")) == (None, 3)
+    store.delete("s1")
+    assert store.get_state("s1", "other") is None
+
+
+def test_backends_must_implement_the_interface():
+    class Partial(SessionStore):
+        def get(self, session_id):
+            return None
+
+        def put(self, session_id, history):
+            pass
+
+    with pytest.raises(TypeError, match="owner"):
+        Partial()
@@ -0,0 +1,83 @@
+from types import SimpleNamespace
+
+import pytest
+from google.genai import types
+
+from wellcare_core.tiering import FULL, LITE, ModelTiers
+from wellcare_core.tools import ToolRuntime, tool
+
+COORDINATOR = SimpleNamespace(name="wellcare_coordinator", model="gemini-2.0-flash")
+
+
+@pytest.mark.parametrize("message", ["hi", "Hello there!", "thanks!", "Thank you so much :)", "ok", "okay.", "bye"])
+def test_greetings_and_thanks_are_small_talk(message):
+    assert ModelTiers().select(COORDINATOR, message).name == LITE
+
+
+@pytest.mark.parametrize("message", [
+    "yes",
+    "no",
+    "ok but I still can't sleep",
+    "yes I want to hurt myself",
+    "thanks, I'm going to end things tonight",
+    "hi, I feel hopeless",
+])
+def test_messages_with_content_stay_on_the_full_tier(message):
+    assert ModelTiers().select(COORDINATOR, message).name == FULL
+
+
+def test_crisis_turns_are_never_lite():
+    tiers = ModelTiers(lite_agents=("community_resource_agent",))
+    alert = {"crisis_indicators": ["self-harm thoughts (PHQ-9 item 9)"]}
+    assert tiers.select(COORDINATOR, "ok", alert).reason == "crisis"
+    agent = SimpleNamespace(name="community_resource_agent", model="gemini-2.0-flash")
+    assert tiers.select(agent, "find me a therapist", alert).name == FULL
+
+
+class Reply:
+    def __init__(self, text, finish="STOP"):
+        part = SimpleNamespace(text=text, thought=False)
+        self.candidates = [SimpleNamespace(content=SimpleNamespace(parts=[part]), finish_reason=finish)]
+        self.prompt_feedback = None
+
+
+def test_escalation_does_not_repeat_side_effects():
+    logged = []
+
+    @tool()
+    def log_mood(mood: int) -> dict:
+        logged.append(mood)
+        return {"logged": len(logged)}
+
+    runtime = ToolRuntime()
+    call = types.FunctionCall(name="log_mood", args={"mood": 4})
+    results = []
+
+    def send(chat, usage):
+        results.append(runtime.run([call], [log_mood])[0].function_response.response)
+        return Reply("" if chat == "gemini-lite" else "Logged.")
+
+    tiers = ModelTiers(lite_model="gemini-lite")
+    turn = tiers.start(COORDINATOR, "thanks")
+    assert turn.tier.name == LITE
+    response = turn.run(lambda model: model, send)
+    assert turn.escalated == "empty"
+    assert response.candidates[0].content.parts[0].text == "Logged."
+    assert logged == [4]
+    assert results == [{"logged": 1}, {"logged": 1}]
+    assert runtime.stats()["replayed"] == 1
+
+
+def test_replay_is_limited_to_the_turn():
+    logged = []
+
+    @tool()
+    def log_mood(mood: int) -> dict:
+        logged.append(mood)
+        return {"logged": len(logged)}
+
+    runtime = ToolRuntime()
+    call = types.FunctionCall(name="log_mood", args={"mood": 4})
+    runtime.run([call], [log_mood])
+    runtime.run([call], [log_mood])
+    assert logged == [4, 4]
@@ -0,0 +1,135 @@
+import asyncio
+import time
+
+import pytest
+from google.genai import types
+
+from agents.wellcare.agent import conduct_phq9_assessment, find_resources, get_crisis_hotlines, log_mood
+from wellcare_core.tools import ToolArgs, ToolRuntime, tool
+
+
+def call(name, **args):
+    return types.FunctionCall(name=name, args=args)
+
+
+def responses(parts):
+    return [part.function_response.response for part in parts]
+
+
+@pytest.mark.parametrize("fn, kwargs", [
+    (conduct_phq9_assessment, {"responses": {f"q{i}": 9 for i in range(1, 10)}}),
+    (conduct_phq9_assessment, {"responses": {"q1": 3, "q2": 3}}),
+    (conduct_phq9_assessment, {"responses": {f"q{i}": "often" for i in range(1, 10)}}),
+    (conduct_phq9_assessment, {"answers": {}}),
+    (log_mood, {"mood": 42}),
+    (log_mood, {"mood": 5, "sleep_hours": -1}),
+    (find_resources, {"latitude": 512.0, "longitude": 0.5}),
+    (get_crisis_hotlines, {"country": "US", "extra": True}),
+])
+def test_bad_arguments_are_reported_not_acted_on(fn, kwargs):
+    result = fn(**kwargs)
+    assert result["error"].startswith("Invalid arguments")
+    assert result["invalid_arguments"]
+
+
+def test_answer_keys_are_normalized():
+    answers = {f"item {i}": 1 for i in range(1, 10)}
+    assert conduct_phq9_assessment(responses=answers)["score"] == 9
+
+
+def test_explicit_schema_and_signature_schema():
+    class Args(ToolArgs):
+        count: int
+
+    @tool(Args)
+    def explicit(count):
+        return {"count": count}
+
+    @tool()
+    def inferred(count: int, label: str = "x"):
+        return {"count": count, "label": label}
+
+    assert explicit(count="3") == {"count": 3}
+    assert inferred(count=2) == {"count": 2, "label": "x"}
+    assert "invalid_arguments" in inferred(count="many")
+    assert "invalid_arguments" in inferred()
+
+
+@tool(pure=True)
+def slow_lookup(seconds: float) -> dict:
+    time.sleep(seconds)
+    return {"slept": seconds}
+
+
+def test_deadline_starts_when_the_call_runs():
+    # One worker: the second call waits for the first, longer than the timeout in total
+    runtime = ToolRuntime(max_workers=1, timeout=0.3)
+    results = responses(runtime.run([call("slow_lookup", seconds=0.2), call("slow_lookup", seconds=0.21)],
+                                    [slow_lookup]))
+    assert results == [{"slept": 0.2}, {"slept": 0.21}]
+    assert runtime.stats()["timeouts"] == 0
+
+
+def test_pure_call_that_overruns_is_answered_with_an_error():
+    runtime = ToolRuntime(timeout=0.05)
+    started = time.perf_counter()
+    (result,) = responses(runtime.run([call("slow_lookup", seconds=0.3)], [slow_lookup]))
+    assert "did not finish" in result["error"]
+    assert time.perf_counter() - started < 0.25
+
+
+def test_started_call_with_side_effects_is_not_reported_as_timed_out():
+    effects = []
+
+    @tool()
+    def slow_save(text: str) -> dict:
+        time.sleep(0.15)
+        effects.append(text)
+        return {"saved": text}
+
+    runtime = ToolRuntime(timeout=0.05)
+    results = responses(runtime.run([call("slow_save", text="a"), call("slow_save", text="b")], [slow_save]))
+    assert results == [{"saved": "a"}, {"saved": "b"}]
+    assert effects == ["a", "b"]
+    assert runtime.stats()["timeouts"] == 0
+
+
+def test_async_runtime_applies_the_same_deadlines():
+    effects = []
+
+    @tool()
+    def slow_save(text: str) -> dict:
+        time.sleep(0.1)
+        effects.append(text)
+        return {"saved": text}
+
+    runtime = ToolRuntime(max_workers=2, timeout=0.05)
+    calls = [call("slow_save", text="a"), call("slow_lookup", seconds=0.01), call("slow_lookup", seconds=0.3)]
+    results = responses(asyncio.run(runtime.arun(calls, [slow_save, slow_lookup])))
+    assert results[0] == {"saved": "a"}
+    assert results[1] == {"slept": 0.01}
+    assert "did not finish" in results[2]["error"]
+    assert effects == ["a"]
+
+
+def test_side_effect_calls_keep_their_order_and_pure_results_are_cached():
+    order = []
+
+    @tool()
+    def write(n: int) -> dict:
+        order.append(n)
+        return {"n": n}
+
+    runtime = ToolRuntime()
+    calls = [call("write", n=i) for i in range(5)] + [call("slow_lookup", seconds=0.01)] * 2
+    results = responses(runtime.run(calls, [write, slow_lookup]))
+    assert order == [0, 1, 2, 3, 4]
+    assert results[-1] == results[-2] == {"slept": 0.01}
+    runtime.run([call("slow_lookup", seconds=0.01)], [slow_lookup])
+    stats = runtime.stats()
+    assert (stats["repeats"], stats["cache_hits"]) == (1, 1)
+
+
+def test_unknown_tool_is_an_error():
+    (result,) = responses(ToolRuntime().run([call("missing")], []))
+    assert result == {"error": "Unknown tool: missing"}
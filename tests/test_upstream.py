@@ -0,0 +1,91 @@
+import asyncio
+
+import httpx
+
+from wellcare_core.upstream import (AsyncManagedTransport, AsyncPoolShards, UpstreamPolicy, create_upstream_policy,
+                                   http_options)
+
+URL = "https://model.test/v1beta/models/m:generateContent"
+
+
+def test_timeouts_are_configured_separately(monkeypatch):
+    monkeypatch.setenv("WELLCARE_UPSTREAM_TIMEOUT", "45")
+    monkeypatch.setenv("WELLCARE_UPSTREAM_QUEUE_TIMEOUT", "5")
+    policy = create_upstream_policy()
+    assert policy.queue_timeout == 5
+    assert not policy.coalesce
+    options = http_options(policy, timeout=45)
+    assert options["timeout"] == 45000
+    assert options["httpx_client"].timeout.read == 45
+
+
+def test_idle_connections_are_capped():
+    pool = http_options(UpstreamPolicy(), max_connections=1000)["httpx_client"]._transport._transport._pool
+    assert (pool._max_connections, pool._max_keepalive_connections) == (1000, 64)
+    pool = http_options(UpstreamPolicy(), max_connections=8)["httpx_client"]._transport._transport._pool
+    assert pool._max_keepalive_connections == 8
+
+
+def test_async_pool_is_split_into_small_shards():
+    pools = [shard._pool for shard in
+             http_options(UpstreamPolicy(), max_connections=1000)["httpx_async_client"]._transport._transport._shards]
+    assert len(pools) == 32 and all(pool._max_connections <= 32 for pool in pools)
+    assert sum(pool._max_connections for pool in pools) >= 1000
+    assert sum(pool._max_keepalive_connections for pool in pools) == 64
+    # One SSL context for all of them
+    assert len({id(pool._ssl_context) for pool in pools}) == 1
+
+
+def test_calls_go_to_the_least_busy_shard():
+    shards = AsyncPoolShards(max_connections=4, max_keepalive=4, shard_size=2)
+    seen = []
+
+    def handler(index):
+        async def handle(request):
+            seen.append(index)
+            await asyncio.sleep(0.05)
+            return httpx.Response(200, content=body())
+        return handle
+
+    async def body():
+        yield b"{}"
+
+    shards._shards = [httpx.MockTransport(handler(index)) for index in range(2)]
+
+    async def run():
+        async with httpx.AsyncClient(transport=shards) as client:
+            await asyncio.gather(*(client.post(URL, json={}) for _ in range(4)))
+
+    asyncio.run(run())
+    assert sorted(seen) == [0, 0, 1, 1]
+    assert shards._in_flight == [0, 0]
+
+
+def test_coalescing_is_opt_in(monkeypatch):
+    monkeypatch.setenv("WELLCARE_UPSTREAM_COALESCE", "1")
+    assert create_upstream_policy().coalesce
+
+
+def upstream_calls(policy: UpstreamPolicy, callers: int) -> int:
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json={"candidates": [{"index": len(calls)}]})
+
+    async def run():
+        transport = AsyncManagedTransport(policy, httpx.MockTransport(handler))
+        async with httpx.AsyncClient(transport=transport) as client:
+            await asyncio.gather(*(client.post(URL, json={"contents": "same"}) for _ in range(callers)))
+
+    asyncio.run(run())
+    return len(calls)
+
+
+def test_identical_requests_each_go_upstream_by_default():
+    assert upstream_calls(UpstreamPolicy(), 5) == 5
+
+
+def test_identical_requests_share_one_call_when_enabled():
+    assert upstream_calls(UpstreamPolicy(coalesce=True), 5) == 1
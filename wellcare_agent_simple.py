@@ -3,17 +3,35 @@ Agent WellCare - Mental health support assistant using Gemini 2.0 Flash.
 Simplified version for direct interaction.
 """
 
-import os
-from google import genai
+from types import SimpleNamespace
+
 from dotenv import load_dotenv
+from wellcare_core.clients import LazyClient
+from wellcare_core.context_cache import create_context_cache
+from wellcare_core.crisis import detector as crisis_detector
+from wellcare_core.history import create_history_manager, crisis_pins, escape_user_text
+from wellcare_core.plan_store import current_owner, plan_store
+from wellcare_core.resources import CRISIS_HOTLINES, resource_directory
+from wellcare_core.retrieval import retriever, strip_context
+from wellcare_core.tiering import create_tiers
 
 # Load environment variables
 load_dotenv()
 
-# Initialize the client
-client = genai.Client(api_key=os.environ.get("GOOGLE_API_KEY"))
+# Initialize the client (pooled, rate-limited and retried through wellcare_core.upstream)
+client = LazyClient()
 MODEL_ID = "gemini-2.0-flash-exp"
 
+# Small talk goes to the lite model; other turns (and failed lite replies) use MODEL_ID
+tiers = create_tiers()
+assistant = SimpleNamespace(name="wellcare_assistant", model=MODEL_ID)
+
+# Uploads SYSTEM_INSTRUCTION once instead of resending it every turn
+context_cache = create_context_cache(client)
+
+# Bounds the history resent each turn: recent turns verbatim, older ones summarized
+history_manager = create_history_manager(client, MODEL_ID)
+
 
 # ============================================================================
 # TOOLS
@@ -96,28 +114,9 @@ def assess_crisis_risk(user_input: str) -> dict:
         user_input: User's text input
         
     Returns:
-        Dictionary with risk_level and crisis_indicators
+        Dictionary with risk_level, crisis_indicators and match offsets
     """
-    crisis_keywords = [
-        "suicide", "kill myself", "end it all", "no reason to live",
-        "better off dead", "hurt myself", "self harm"
-    ]
-    
-    user_lower = user_input.lower()
-    indicators = [kw for kw in crisis_keywords if kw in user_lower]
-    
-    if indicators:
-        return {
-            "risk_level": "high",
-            "crisis_indicators": indicators,
-            "immediate_action_required": True
-        }
-    
-    return {
-        "risk_level": "low",
-        "crisis_indicators": [],
-        "immediate_action_required": False
-    }
+    return crisis_detector.assess(user_input)
 
 
 def get_crisis_hotlines(country: str = "US") -> dict:
@@ -128,47 +127,26 @@ def get_crisis_hotlines(country: str = "US") -> dict:
         country: Country code (default: US)
         
     Returns:
-        Dictionary with crisis resources
+        Dictionary with crisis resources (the US ones for an empty or unknown country)
     """
-    resources = {
-        "US": {
-            "suicide_prevention": "988 (Suicide & Crisis Lifeline)",
-            "crisis_text": "Text HOME to 741741 (Crisis Text Line)",
-            "emergency": "911",
-            "website": "https://988lifeline.org"
-        },
-        "UK": {
-            "samaritans": "116 123",
-            "crisis_text": "Text SHOUT to 85258",
-            "emergency": "999",
-            "website": "https://www.samaritans.org"
-        },
-        "IN": {
-            "vandrevala": "+91 9999 666 555",
-            "aasra": "+91 22 2754 6669",
-            "emergency": "112",
-            "website": "http://www.aasra.info"
-        }
-    }
-    
-    return resources.get(country, resources["US"])
+    country = (country or "US").strip().upper()
+    return CRISIS_HOTLINES.get(country) or resource_directory.hotlines(country) or CRISIS_HOTLINES["US"]
 
 
 def save_wellness_plan(plan_content: str, filename: str = "my_wellness_plan.md") -> str:
     """
-    Saves wellness plan to a markdown file.
+    Saves wellness plan to the local plan store.
     
     Args:
         plan_content: The wellness plan content
-        filename: Output filename
+        filename: Name to show the plan under
         
     Returns:
-        Success message with file path
+        Success message with the plan id
     """
     try:
-        with open(filename, 'w', encoding='utf-8') as f:
-            f.write(plan_content)
-        return f"Wellness plan saved successfully to {filename}"
+        plan = plan_store.save(current_owner.get(), plan_content, title=filename)
+        return f"Wellness plan \"{plan['title']}\" saved successfully (plan id {plan['id']})"
     except Exception as e:
         return f"Error saving wellness plan: {str(e)}"
 
@@ -238,13 +216,7 @@ Crisis Resources:
 - UK: 116 123 (Samaritans), Text SHOUT to 85258
 - India: +91 9999 666 555 (Vandrevala), +91 22 2754 6669 (Aasra)
 
-Wellness Plan Components:
-- Cognitive strategies (CBT exercises, thought challenging)
-- Behavioral activation (activity scheduling, goal setting)
-- Mindfulness & relaxation (meditation, breathing exercises)
-- Physical wellness (exercise, sleep hygiene, nutrition)
-- Social connection (relationship building, support groups)
-- Crisis management (warning signs, coping strategies, emergency contacts)
+Wellness plans cover cognitive strategies, behavioral activation, mindfulness and relaxation, physical wellness, social connection and crisis management. Coping content relevant to the user's message is retrieved and sent with it; base specific techniques on it where it fits.
 
 Remember: You're here to support, guide, and connect - not to replace professional mental health care. Your goal is to make mental health support more accessible while ensuring users get appropriate professional help when needed.
 """
@@ -266,17 +238,10 @@ def main():
     print("\nType 'exit' to end the conversation.\n")
     print("=" * 70)
     
-    # Create chat with system instruction
-    chat = client.chats.create(
-        model=MODEL_ID,
-        config={
-            "system_instruction": SYSTEM_INSTRUCTION,
-            "temperature": 0.7,
-        }
-    )
+    history = []
     
     while True:
-        user_input = input("\nYou: ").strip()
+        user_input = escape_user_text(input("\nYou: ").strip())
         
         if user_input.lower() in ['exit', 'quit', 'bye']:
             print("\nAgent WellCare: Take care of yourself. Remember, support is always available when you need it. 💙")
@@ -285,23 +250,42 @@ def main():
         if not user_input:
             continue
         
+        # Check for crisis indicators locally, before the model round-trip
+        crisis_check = assess_crisis_risk(user_input)
+        
+        # If crisis detected, provide immediate resources
+        if crisis_check['immediate_action_required']:
+            print("\n" + "="*70)
+            print("⚠️  CRISIS RESOURCES - IMMEDIATE HELP AVAILABLE")
+            print("="*70)
+            hotlines = get_crisis_hotlines("US")
+            for key, value in hotlines.items():
+                print(f"{key}: {value}")
+            print("="*70)
+        
         try:
-            # Check for crisis indicators
-            crisis_check = assess_crisis_risk(user_input)
-            
-            # Send message and get response
-            response = chat.send_message(user_input)
+            # Rebuild the chat so an expiring cached prefix is refreshed between turns
+            # and long conversations are windowed to a bounded history
+            alert = crisis_check if crisis_check['immediate_action_required'] else None
+            history = history_manager.compact(strip_context(history), crisis_pins(alert))
+
+            def open_chat(model):
+                return client.chats.create(
+                    model=model,
+                    config=context_cache.config(model, SYSTEM_INSTRUCTION, temperature=0.7),
+                    history=history
+                )
+
+            def send(chat, usage):
+                # Relevant coping content goes along outside a crisis
+                response = chat.send_message(user_input if alert else retriever.augment(user_input))
+                usage.record(response.usage_metadata)
+                return response
+
+            turn = tiers.start(assistant, user_input, alert)
+            response = turn.run(open_chat, send, context_cache.usage)
+            history = turn.session.get_history()
             print(f"\nAgent WellCare: {response.text}")
-            
-            # If crisis detected, provide immediate resources
-            if crisis_check['immediate_action_required']:
-                print("\n" + "="*70)
-                print("⚠️  CRISIS RESOURCES - IMMEDIATE HELP AVAILABLE")
-                print("="*70)
-                hotlines = get_crisis_hotlines("US")
-                for key, value in hotlines.items():
-                    print(f"{key}: {value}")
-                print("="*70)
                 
         except Exception as e:
             print(f"\nError: {str(e)}")
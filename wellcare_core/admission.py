@@ -0,0 +1,368 @@
+"""
+Per-client rate limiting and admission control for chat turns.
+
+Two layers protect the send endpoints:
+
+- token buckets per session and per client IP, so one client can't flood
+  the service. Requests over the limit get a 429 with Retry-After.
+- a bounded admission queue in front of model work. At most `max_active`
+  turns run at once, and up to `max_waiting` more wait, each for at most
+  `wait_timeout` seconds. Beyond that, turns are shed at once with a 429
+  rather than piling up threads or tasks.
+
+Turns flagged by the crisis screen go first. They wait in a lane ahead of
+every other turn, and they may use `crisis_reserve` extra slots, so they
+don't wait behind a full house of casual conversations. They are still
+bounded, since anyone can type crisis words: their own token buckets are
+`crisis_factor` times larger, at most `max_crisis_waiting` of them wait,
+each for at most `crisis_timeout` seconds.
+
+The controller serves both apps: blocking acquire() for the threaded Flask
+app, and aacquire() for the ASGI app's event loop.
+
+WELLCARE_ADMISSION: set to 0 to disable rate limiting and admission control (default: enabled)
+WELLCARE_SESSION_RATE / WELLCARE_SESSION_BURST: messages per second per session, and burst (default: 1 / 10)
+WELLCARE_IP_RATE / WELLCARE_IP_BURST: messages per second per client IP, and burst (default: 5 / 30)
+WELLCARE_MAX_ACTIVE_TURNS: turns running at once (default: 64 in app.py, 1000 in asgi_app.py)
+WELLCARE_MAX_QUEUED_TURNS: turns allowed to wait for a slot (default: 128 in app.py, 4000 in asgi_app.py)
+WELLCARE_ADMISSION_TIMEOUT: seconds a turn may wait for a slot (default: 10)
+WELLCARE_CRISIS_RATE_FACTOR: how many times larger the crisis turns' rate limits are (default: 5)
+WELLCARE_MAX_QUEUED_CRISIS_TURNS: crisis turns allowed to wait for a slot (default: a quarter of the queue, at least 8)
+WELLCARE_CRISIS_ADMISSION_TIMEOUT: seconds a crisis turn may wait for a slot (default: 30)
+"""
+
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+
+# Admission lanes, lowest served first
+CRISIS, NORMAL = 0, 1
+
+
+class Overloaded(Exception):
+    """A request was rate limited or shed; the caller should answer 429 with Retry-After."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+    def headers(self) -> dict:
+        return {"Retry-After": str(self.retry_after)}
+
+    def payload(self) -> dict:
+        return {"error": "Too many requests, please try again shortly", "reason": self.reason,
+                "retry_after": self.retry_after}
+
+
+class RateLimiter:
+    """Token bucket per key (session or IP), keeping the most recently used max_keys buckets."""
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 100000):
+        """
+        Args:
+            rate: Tokens added per second
+            burst: Bucket size
+            max_keys: Buckets kept; the least recently used are dropped (as if full)
+        """
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key) -> float:
+        """Spends one token for key; returns 0 if allowed, else seconds until a token is available."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / self.rate
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return wait
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class _Waiter:
+    __slots__ = ("priority", "event", "future", "loop", "granted", "abandoned")
+
+    def __init__(self, priority: int, loop=None):
+        self.priority = priority
+        self.loop = loop
+        self.future = loop.create_future() if loop else None
+        self.event = None if loop else threading.Event()
+        self.granted = False
+        self.abandoned = False
+
+    def wake(self):
+        if self.event is not None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(lambda: self.future.done() or self.future.set_result(True))
+
+
+class Ticket:
+    """An admitted turn's slot; release() is idempotent, so it can be tied to several cleanup paths."""
+
+    def __init__(self, controller, priority: int):
+        self._controller = controller
+        self.priority = priority
+        self.started = time.perf_counter()
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._controller._release(self)
+
+    def __del__(self):
+        # A response dropped before its cleanup ran must not leak its slot
+        self.release()
+
+
+class AdmissionControl:
+    """Rate limits and admits chat turns, crisis turns first."""
+
+    def __init__(self, session_rate: float = 1.0, session_burst: float = 10, ip_rate: float = 5.0,
+                 ip_burst: float = 30, max_active: int = 64, max_waiting: int = 128, wait_timeout: float = 10.0,
+                 crisis_reserve: int = None, crisis_factor: float = 5, max_crisis_waiting: int = None,
+                 crisis_timeout: float = 30.0, enabled: bool = True):
+        """
+        Args:
+            session_rate: Messages per second per session
+            session_burst: Messages a session may send at once
+            ip_rate: Messages per second per client IP
+            ip_burst: Messages an IP may send at once
+            max_active: Turns running at once
+            max_waiting: Non-crisis turns allowed to wait for a slot
+            wait_timeout: Seconds a turn may wait before it is shed
+            crisis_reserve: Extra slots only crisis turns may use (default: a tenth of max_active, at least 1)
+            crisis_factor: How many times larger the crisis turns' per-session and per-IP buckets are
+            max_crisis_waiting: Crisis turns allowed to wait for a slot (default: a quarter of max_waiting, at least 8)
+            crisis_timeout: Seconds a crisis turn may wait before it is shed
+            enabled: When False, nothing is limited
+        """
+        self.sessions = RateLimiter(session_rate, session_burst)
+        self.ips = RateLimiter(ip_rate, ip_burst)
+        self.crisis_sessions = RateLimiter(session_rate * crisis_factor, session_burst * crisis_factor)
+        self.crisis_ips = RateLimiter(ip_rate * crisis_factor, ip_burst * crisis_factor)
+        self.max_active = max_active
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        self.crisis_reserve = max(1, max_active // 10) if crisis_reserve is None else crisis_reserve
+        self.max_crisis_waiting = max(8, max_waiting // 4) if max_crisis_waiting is None else max_crisis_waiting
+        self.crisis_timeout = crisis_timeout
+        self.enabled = enabled
+        # Reentrant: a Ticket collected by the garbage collector releases itself from whatever code is running
+        self._lock = threading.RLock()
+        self._active = 0
+        self._waiting = []
+        self._queued = 0
+        self._queued_crisis = 0
+        self._sequence = itertools.count()
+        # Moving average of how long a turn holds its slot, for Retry-After estimates
+        self._turn_seconds = 1.0
+        self._counters = {"admitted": 0, "admitted_crisis": 0, "queued": 0, "rate_limited": 0,
+                          "shed_queue_full": 0, "shed_timeout": 0, "crisis_rate_limited": 0, "crisis_shed": 0}
+
+    def limit(self, session_id: str, ip: str, alert=None):
+        """
+        Charges one message to the session's and the IP's buckets; crisis turns use their own, larger ones.
+
+        Raises:
+            Overloaded: Either bucket is empty
+        """
+        if not self.enabled:
+            return
+        sessions, ips = (self.crisis_sessions, self.crisis_ips) if alert else (self.sessions, self.ips)
+        # Charge both, so a client can't dodge the IP limit by opening new sessions
+        wait = max(sessions.take(session_id), ips.take(ip or "unknown"))
+        if wait:
+            self._count("crisis_rate_limited" if alert else "rate_limited")
+            raise Overloaded("rate_limited", wait)
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _retry_after(self) -> float:
+        # Time for the queue ahead to drain through the active slots
+        return self._turn_seconds * (self._queued + 1) / self.max_active
+
+    def _capacity(self, priority: int) -> int:
+        return self.max_active + (self.crisis_reserve if priority == CRISIS else 0)
+
+    def _enter(self, priority: int, loop=None):
+        """Takes a slot now (returns None) or queues a waiter; raises Overloaded when the queue is full."""
+        with self._lock:
+            ahead = self._waiting and self._waiting[0][0] <= priority
+            if self._active < self._capacity(priority) and not ahead:
+                self._admit(priority)
+                return None
+            if priority == CRISIS and self._queued_crisis >= self.max_crisis_waiting:
+                self._counters["crisis_shed"] += 1
+                raise Overloaded("queue_full", self._retry_after())
+            if priority != CRISIS and self._queued - self._queued_crisis >= self.max_waiting:
+                self._counters["shed_queue_full"] += 1
+                raise Overloaded("queue_full", self._retry_after())
+            waiter = _Waiter(priority, loop)
+            heapq.heappush(self._waiting, (priority, next(self._sequence), waiter))
+            self._queued += 1
+            if priority == CRISIS:
+                self._queued_crisis += 1
+            self._counters["queued"] += 1
+            return waiter
+
+    def _admit(self, priority: int):
+        self._active += 1
+        self._counters["admitted_crisis" if priority == CRISIS else "admitted"] += 1
+
+    def _dequeue(self, priority: int):
+        self._queued -= 1
+        if priority == CRISIS:
+            self._queued_crisis -= 1
+
+    def _abandon(self, waiter: _Waiter) -> bool:
+        """Gives up waiting; False if the waiter was granted a slot in the meantime."""
+        with self._lock:
+            if waiter.granted:
+                return False
+            waiter.abandoned = True
+            self._dequeue(waiter.priority)
+            self._counters["crisis_shed" if waiter.priority == CRISIS else "shed_timeout"] += 1
+            return True
+
+    def _release(self, ticket: Ticket):
+        with self._lock:
+            self._active -= 1
+            self._turn_seconds += 0.1 * (time.perf_counter() - ticket.started - self._turn_seconds)
+            while self._waiting:
+                priority, _, waiter = self._waiting[0]
+                if waiter.abandoned:
+                    heapq.heappop(self._waiting)
+                    continue
+                if self._active >= self._capacity(priority):
+                    break
+                heapq.heappop(self._waiting)
+                self._dequeue(priority)
+                waiter.granted = True
+                self._admit(priority)
+                waiter.wake()
+
+    def acquire(self, alert=None) -> Ticket:
+        """
+        Waits for a slot for one turn (blocking; for threaded servers).
+
+        Args:
+            alert: Crisis alert from the local screen; crisis turns go first, in their own bounded queue
+
+        Returns:
+            Ticket to release when the turn is done
+
+        Raises:
+            Overloaded: The queue is full or the wait timed out
+        """
+        priority = CRISIS if alert else NORMAL
+        if not self.enabled:
+            return Ticket(_NoAdmission, priority)
+        waiter = self._enter(priority)
+        if waiter is not None:
+            timeout = self.crisis_timeout if priority == CRISIS else self.wait_timeout
+            if not waiter.event.wait(timeout) and self._abandon(waiter):
+                raise Overloaded("queue_timeout", self._retry_after())
+        return Ticket(self, priority)
+
+    async def aacquire(self, alert=None) -> Ticket:
+        """acquire() for asyncio: waits without blocking the event loop."""
+        priority = CRISIS if alert else NORMAL
+        if not self.enabled:
+            return Ticket(_NoAdmission, priority)
+        waiter = self._enter(priority, asyncio.get_running_loop())
+        if waiter is not None:
+            timeout = self.crisis_timeout if priority == CRISIS else self.wait_timeout
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+            except asyncio.TimeoutError:
+                if self._abandon(waiter):
+                    raise Overloaded("queue_timeout", self._retry_after())
+            except asyncio.CancelledError:
+                # The client went away; hand the slot on if it was granted meanwhile
+                if not self._abandon(waiter):
+                    Ticket(self, priority).release()
+                raise
+        return Ticket(self, priority)
+
+    @contextmanager
+    def admit(self, alert=None):
+        """acquire() as a context manager."""
+        ticket = self.acquire(alert)
+        try:
+            yield ticket
+        finally:
+            ticket.release()
+
+    @asynccontextmanager
+    async def aadmit(self, alert=None):
+        """aacquire() as an async context manager."""
+        ticket = await self.aacquire(alert)
+        try:
+            yield ticket
+        finally:
+            ticket.release()
+
+    def stats(self) -> dict:
+        """Returns admission and shedding counters, active and queued turns, and tracked clients."""
+        with self._lock:
+            stats = {"enabled": self.enabled, **self._counters, "active": self._active, "waiting": self._queued}
+            turn_seconds = self._turn_seconds
+        stats.update(max_active=self.max_active, max_waiting=self.max_waiting,
+                     max_crisis_waiting=self.max_crisis_waiting,
+                     mean_turn_seconds=round(turn_seconds, 3),
+                     tracked_sessions=len(self.sessions), tracked_ips=len(self.ips))
+        return stats
+
+
+class _NoAdmission:
+    """Release target for tickets handed out while admission control is disabled."""
+
+    @staticmethod
+    def _release(ticket):
+        pass
+
+
+def create_admission(max_active: int = 64, max_waiting: int = 128) -> AdmissionControl:
+    """
+    Builds the admission controller configured by environment variables.
+
+    Args:
+        max_active: Default for WELLCARE_MAX_ACTIVE_TURNS
+        max_waiting: Default for WELLCARE_MAX_QUEUED_TURNS
+    """
+    return AdmissionControl(
+        session_rate=float(os.environ.get("WELLCARE_SESSION_RATE", "1")),
+        session_burst=float(os.environ.get("WELLCARE_SESSION_BURST", "10")),
+        ip_rate=float(os.environ.get("WELLCARE_IP_RATE", "5")),
+        ip_burst=float(os.environ.get("WELLCARE_IP_BURST", "30")),
+        max_active=int(os.environ.get("WELLCARE_MAX_ACTIVE_TURNS", str(max_active))),
+        max_waiting=int(os.environ.get("WELLCARE_MAX_QUEUED_TURNS", str(max_waiting))),
+        wait_timeout=float(os.environ.get("WELLCARE_ADMISSION_TIMEOUT", "10")),
+        crisis_factor=float(os.environ.get("WELLCARE_CRISIS_RATE_FACTOR", "5")),
+        max_crisis_waiting=(int(os.environ["WELLCARE_MAX_QUEUED_CRISIS_TURNS"])
+                            if os.environ.get("WELLCARE_MAX_QUEUED_CRISIS_TURNS") else None),
+        crisis_timeout=float(os.environ.get("WELLCARE_CRISIS_ADMISSION_TIMEOUT", "30")),
+        enabled=os.environ.get("WELLCARE_ADMISSION", "1").lower() in ("1", "true", "yes"),
+    )
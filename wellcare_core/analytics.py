@@ -0,0 +1,403 @@
+"""
+Population-level PHQ-9 and GAD-7 reports for clinic dashboards.
+
+AssessmentAnalytics keeps materialized aggregates over every assessment in
+the progress store: severity counts, per-question answer distributions,
+weekly trends and monthly entry cohorts. Each refresh reads only the rows
+stored since the last one (by rowid, so scores written by other workers
+are picked up too) and folds them in with a columnar NumPy group-by:
+group keys are factorized with np.unique and every count, sum and severity
+band is accumulated with np.bincount. A report reads the aggregates alone,
+so it takes milliseconds however many assessments are stored.
+
+The aggregates and the watermark (the last rowids folded) are saved to the
+progress store's rollup tables in the transaction after each refresh that
+folded anything, so a restarted worker loads them and folds only what was
+stored since, instead of every assessment on record. Only rows that changed
+are written. A worker never saves over a newer watermark another worker
+saved; the rows it would have written are already there.
+
+Per-question figures cover the assessments whose item answers were stored,
+i.e. those taken through the local questionnaire.
+
+A cohort is everyone whose first recorded assessment on a scale fell in
+the same month; it reports assessments and the mean score for each month
+since, so cohorts show whether people improve after they start.
+
+Weeks start on Monday, months are calendar months, both in UTC.
+
+WELLCARE_REPORT_WEEKS: weeks of trend included in reports (default: 26)
+
+A report may ask for 0 to MAX_REPORT_WEEKS weeks; longer requests are clamped.
+"""
+
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from wellcare_core.progress import ASSESSMENTS, ProgressStore, progress_store
+from wellcare_core.questionnaire import OPTIONS, QUESTIONS, TITLES
+from wellcare_core.scoring import get_scale
+
+_DAY = 86400
+
+# 1970-01-01 was a Thursday; shifting by three days starts weeks on Monday
+_WEEK_SHIFT = 3
+
+# Cohort aggregates are keyed by cohort month and months since, packed into one integer
+_MONTH_BITS = 20
+
+# Ten years of weekly trend
+MAX_REPORT_WEEKS = 520
+
+
+def _week_start(week: int) -> str:
+    return str(np.datetime64(week * 7 - _WEEK_SHIFT, "D"))
+
+
+def _month(month: int) -> str:
+    return str(np.datetime64(month, "M"))
+
+
+def _mean(total, count):
+    return round(float(total) / count, 2) if count else None
+
+
+def parse_weeks(weeks) -> int:
+    """
+    Weeks of trend requested for a report, clamped to MAX_REPORT_WEEKS.
+
+    Raises:
+        ValueError: Not a whole number, or negative
+    """
+    try:
+        value = int(str(weeks).strip())
+    except ValueError:
+        raise ValueError(f"weeks must be a whole number, got '{weeks}'") from None
+    if value < 0:
+        raise ValueError(f"weeks must be 0 or more, got {value}")
+    return min(value, MAX_REPORT_WEEKS)
+
+
+def _group(keys: np.ndarray, values: np.ndarray, bands: np.ndarray = None, band_count: int = 0):
+    """
+    Columnar group-by: per distinct key, row count, value sum and (optionally) band counts.
+
+    Returns:
+        (distinct keys, int64 array of shape (keys, 2 + band_count))
+    """
+    distinct, inverse = np.unique(keys, return_inverse=True)
+    rows = np.zeros((len(distinct), 2 + band_count), dtype=np.int64)
+    rows[:, 0] = np.bincount(inverse, minlength=len(distinct))
+    rows[:, 1] = np.bincount(inverse, weights=values, minlength=len(distinct))
+    if band_count:
+        rows[:, 2:] = np.bincount(inverse * band_count + bands,
+                                  minlength=len(distinct) * band_count).reshape(-1, band_count)
+    return distinct, rows
+
+
+def _merge(table: dict, keys: np.ndarray, rows: np.ndarray):
+    for key, row in zip(keys.tolist(), rows):
+        if key in table:
+            table[key] += row
+        else:
+            table[key] = row.copy()
+
+
+class ScaleAggregates:
+    """Materialized aggregates for one scale."""
+
+    def __init__(self, scale: str):
+        self.scale = scale
+        self.spec = get_scale(scale)
+        bands = len(self.spec.severities)
+        self.assessments = 0
+        self.score_total = 0
+        self.bands = np.zeros(bands, dtype=np.int64)
+        # Item -> how many people answered 0, 1, 2 and 3
+        self.item_answers = np.zeros((self.spec.items, len(OPTIONS)), dtype=np.int64)
+        # Week -> [assessments, score total, count per severity band]
+        self.weeks = {}
+        # Packed (cohort month, months since) -> [assessments, score total]
+        self.cohort_months = {}
+        # Owner -> month of their first recorded assessment, and people per cohort
+        self.first_month = {}
+        self.cohort_people = {}
+        # Changed since the last rollups() call
+        self._changed_weeks = set()
+        self._changed_cohorts = set()
+        self._new_owners = []
+
+    def add_scores(self, owners, ts, scores):
+        """
+        Folds a batch of scores into the aggregates.
+
+        Args:
+            owners: User or session per assessment
+            ts: Unix time per assessment
+            scores: Total score per assessment
+        """
+        scores = np.rint(np.asarray(scores, dtype=np.float64)).astype(np.int64)
+        if not scores.size:
+            return
+        seconds = np.asarray(ts, dtype=np.float64).astype(np.int64)
+        band_count = len(self.spec.severities)
+        bands = np.searchsorted(self.spec.upper_bounds, scores, side="left")
+        self.assessments += scores.size
+        self.score_total += int(scores.sum())
+        self.bands += np.bincount(bands, minlength=band_count)
+
+        weeks = (seconds // _DAY + _WEEK_SHIFT) // 7
+        keys, rows = _group(weeks, scores, bands, band_count)
+        _merge(self.weeks, keys, rows)
+        self._changed_weeks.update(keys.tolist())
+
+        # Factorize owners in arrival order, then find each one's first month in this batch
+        months = seconds.astype("datetime64[s]").astype("datetime64[M]").astype(np.int64)
+        codes = {}
+        owner_codes = np.fromiter((codes.setdefault(owner, len(codes)) for owner in owners),
+                                  dtype=np.int64, count=scores.size)
+        first = np.full(len(codes), np.iinfo(np.int64).max)
+        np.minimum.at(first, owner_codes, months)
+        cohorts = np.empty(len(codes), dtype=np.int64)
+        for code, (owner, month) in enumerate(zip(codes, first.tolist())):
+            cohort = self.first_month.get(owner)
+            if cohort is None:
+                cohort = self.first_month[owner] = month
+                self.cohort_people[cohort] = self.cohort_people.get(cohort, 0) + 1
+                self._new_owners.append(owner)
+            cohorts[code] = cohort
+        cohort = cohorts[owner_codes]
+        # Scores dated before a person's first recorded month count towards month 0
+        since = np.maximum(months - cohort, 0)
+        keys, rows = _group((cohort << _MONTH_BITS) | since, scores)
+        _merge(self.cohort_months, keys, rows)
+        self._changed_cohorts.update(keys.tolist())
+
+    def add_answers(self, answers):
+        """
+        Folds a batch of item answers into the per-question distributions.
+
+        Args:
+            answers: Array-like of shape (assessments, items) with answers 0-3
+        """
+        answers = np.asarray(answers, dtype=np.int64).reshape(-1, self.spec.items)
+        options = len(OPTIONS)
+        cells = (np.arange(self.spec.items) * options + answers).ravel()
+        self.item_answers += np.bincount(cells, minlength=self.spec.items * options).reshape(-1, options)
+
+    def rollups(self) -> list:
+        """
+        Rows for ProgressStore.save_rollups with everything changed since the last clear_changes().
+
+        Returns:
+            List of (scale, kind, key, JSON value) for the totals and each
+            changed week, cohort month and new owner
+        """
+        totals = {"assessments": self.assessments, "score_total": self.score_total, "bands": self.bands.tolist(),
+                  "item_answers": self.item_answers.tolist()}
+        rows = [(self.scale, "totals", "", json.dumps(totals))]
+        rows += [(self.scale, "week", str(week), json.dumps(self.weeks[week].tolist()))
+                 for week in self._changed_weeks]
+        rows += [(self.scale, "cohort", str(key), json.dumps(self.cohort_months[key].tolist()))
+                 for key in self._changed_cohorts]
+        rows += [(self.scale, "first", owner, str(self.first_month[owner])) for owner in self._new_owners]
+        return rows
+
+    def clear_changes(self):
+        """Marks everything as saved."""
+        self._changed_weeks = set()
+        self._changed_cohorts = set()
+        self._new_owners = []
+
+    def restore(self, kind: str, key: str, value: str):
+        """Loads one row saved by rollups()."""
+        value = json.loads(value)
+        if kind == "totals":
+            self.assessments = value["assessments"]
+            self.score_total = value["score_total"]
+            self.bands = np.array(value["bands"], dtype=np.int64)
+            self.item_answers = np.array(value["item_answers"], dtype=np.int64)
+        elif kind == "week":
+            self.weeks[int(key)] = np.array(value, dtype=np.int64)
+        elif kind == "cohort":
+            self.cohort_months[int(key)] = np.array(value, dtype=np.int64)
+        elif kind == "first":
+            self.first_month[key] = value
+            self.cohort_people[value] = self.cohort_people.get(value, 0) + 1
+
+    def report(self, weeks: int) -> dict:
+        """The scale's dashboard figures from the materialized aggregates."""
+        severities = self.spec.severities.tolist()
+        total = self.assessments
+        answered = self.item_answers.sum(axis=1)
+        item_totals = self.item_answers @ np.arange(len(OPTIONS))
+
+        items = []
+        for i, question in enumerate(QUESTIONS[self.scale]):
+            items.append({
+                "item": i + 1,
+                "question": question,
+                "answered": int(answered[i]),
+                "mean": _mean(item_totals[i], answered[i]),
+                "answers": dict(zip(OPTIONS, self.item_answers[i].tolist())),
+            })
+
+        trend = []
+        for week in sorted(self.weeks)[-weeks:] if weeks else ():
+            count, score_total, *bands = self.weeks[week].tolist()
+            trend.append({"week": _week_start(week), "assessments": count, "mean_score": _mean(score_total, count),
+                          "severity": dict(zip(severities, bands))})
+
+        cohorts = {}
+        for key in sorted(self.cohort_months):
+            cohort, since = key >> _MONTH_BITS, key & ((1 << _MONTH_BITS) - 1)
+            count, score_total = self.cohort_months[key].tolist()
+            entry = cohorts.setdefault(cohort, {"cohort": _month(cohort), "people": self.cohort_people[cohort],
+                                                "months": []})
+            entry["months"].append({"months_since_first": since, "assessments": count,
+                                    "mean_score": _mean(score_total, count)})
+
+        return {
+            "title": TITLES[self.scale],
+            "assessments": total,
+            "people": len(self.first_month),
+            "mean_score": _mean(self.score_total, total),
+            "severity": {
+                severity: {"count": count, "share": round(count / total, 4) if total else None}
+                for severity, count in zip(severities, self.bands.tolist())
+            },
+            "items": items,
+            "trend": trend,
+            "cohorts": list(cohorts.values()),
+        }
+
+
+class AssessmentAnalytics:
+    """Incrementally maintained population reports over the assessments in a progress store."""
+
+    def __init__(self, store: ProgressStore, weeks: int = 26, batch: int = 100000):
+        """
+        Args:
+            store: Progress store the assessments are read from
+            weeks: Weeks of trend included in reports
+            batch: Rows read from the store per fold
+        """
+        self.store = store
+        self.weeks = weeks
+        self.batch = batch
+        self.scales = {scale: ScaleAggregates(scale) for scale in ASSESSMENTS}
+        self._seen = (0, 0)
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._counters = {"refreshes": 0, "rows_folded": 0, "reports": 0, "rollups_loaded": 0, "rollups_saved": 0}
+        self._last_refresh_ms = 0.0
+        self._last_report_ms = 0.0
+
+    def _fold(self, scores: list, answers: list):
+        """Folds rows from ProgressStore.assessments_after into the aggregates. Call with the lock held."""
+        if scores:
+            _, owners, scales, ts, values = zip(*scores)
+            scales = np.array(scales)
+            owners = np.array(owners, dtype=object)
+            ts, values = np.array(ts), np.array(values)
+            for scale, aggregates in self.scales.items():
+                mask = scales == scale
+                if mask.any():
+                    aggregates.add_scores(owners[mask], ts[mask], values[mask])
+        if answers:
+            _, scales, digits = zip(*answers)
+            scales = np.array(scales)
+            for scale, aggregates in self.scales.items():
+                rows = [row for row, mask in zip(digits, scales == scale) if mask]
+                if rows:
+                    # Digit strings decode in one pass: ASCII code minus ord("0")
+                    aggregates.add_answers(np.frombuffer("".join(rows).encode(), dtype=np.uint8) - ord("0"))
+        self._counters["rows_folded"] += len(scores) + len(answers)
+
+    def _load(self):
+        """Starts from the rollups saved in the store, if any. Call with the lock held."""
+        watermark, rows = self.store.load_rollups()
+        if watermark is None:
+            return
+        for scale, kind, key, value in rows:
+            if scale in self.scales:
+                self.scales[scale].restore(kind, key, value)
+        self._seen = watermark
+        self._counters["rollups_loaded"] += len(rows)
+
+    def _save(self):
+        """Writes the changed rollups and the watermark. Call with the lock held."""
+        rows = [row for aggregates in self.scales.values() for row in aggregates.rollups()]
+        saved = self.store.save_rollups(self._seen, rows)
+        if saved == self._seen:
+            self._counters["rollups_saved"] += len(rows)
+        # Keep the changes for the next save unless the stored rollups already cover them
+        if all(stored >= seen for stored, seen in zip(saved, self._seen)):
+            for aggregates in self.scales.values():
+                aggregates.clear_changes()
+
+    def refresh(self) -> int:
+        """Folds in the assessments stored since the last refresh and saves the rollups; returns rows read."""
+        start = time.perf_counter()
+        folded = 0
+        with self._lock:
+            if not self._loaded:
+                self._load()
+                self._loaded = True
+            while True:
+                scores, answers = self.store.assessments_after(*self._seen, limit=self.batch)
+                if not scores and not answers:
+                    break
+                self._fold(scores, answers)
+                self._seen = (scores[-1][0] if scores else self._seen[0], answers[-1][0] if answers else self._seen[1])
+                folded += len(scores) + len(answers)
+            if folded:
+                self._save()
+            self._counters["refreshes"] += 1
+            self._last_refresh_ms = (time.perf_counter() - start) * 1000
+        return folded
+
+    def report(self, scale: str = None, weeks: int = None) -> dict:
+        """
+        Brings the aggregates up to date and builds the dashboard report.
+
+        Args:
+            scale: "phq9" or "gad7" (default: both)
+            weeks: Weeks of trend to include, as a number or query string (default: the configured number)
+
+        Returns:
+            Dictionary with, per scale, assessments, people, mean score, severity
+            distribution, per-question means and answer distributions, the weekly
+            trend and monthly cohorts
+
+        Raises:
+            ValueError: Unknown scale, or weeks that isn't a whole number of 0 or more
+        """
+        scales = list(self.scales) if scale is None else [scale.lower().replace("-", "").replace("_", "")]
+        for name in scales:
+            if name not in self.scales:
+                raise ValueError(f"Unknown scale '{scale}', expected one of: {', '.join(self.scales)}")
+        weeks = self.weeks if weeks is None or weeks == "" else parse_weeks(weeks)
+        self.refresh()
+        start = time.perf_counter()
+        with self._lock:
+            report = {name: self.scales[name].report(weeks) for name in scales}
+            self._counters["reports"] += 1
+            self._last_report_ms = (time.perf_counter() - start) * 1000
+        return report
+
+    def stats(self) -> dict:
+        """Returns refreshes, rows folded, rollups loaded and saved, reports built, assessments and last timings."""
+        with self._lock:
+            stats = dict(self._counters)
+            stats["assessments"] = {name: aggregates.assessments for name, aggregates in self.scales.items()}
+            stats["last_refresh_ms"] = round(self._last_refresh_ms, 3)
+            stats["last_report_ms"] = round(self._last_report_ms, 3)
+        return stats
+
+
+analytics = AssessmentAnalytics(progress_store, weeks=parse_weeks(os.environ.get("WELLCARE_REPORT_WEEKS", "26")))
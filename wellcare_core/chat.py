@@ -0,0 +1,199 @@
+"""Chat session helpers shared by the Flask and ASGI web interfaces."""
+
+import json
+import threading
+import time
+
+from wellcare_core.tools import runtime as tool_runtime
+from wellcare_core.tracing import record_usage, tracer
+
+# Upper bound on model -> tool -> model round trips within one user turn
+MAX_TOOL_ROUNDS = 5
+
+GREETING = "Hello! I'm Agent WellCare, your compassionate mental health support assistant. How can I help you today?"
+
+CRISIS_MESSAGE = (
+    "It sounds like you're going through something really painful right now, and you don't have to face it alone. "
+    "Please reach out to one of these services now - they're free, confidential and available 24/7."
+)
+
+
+def inline_config(system_instruction: str, tools=(), **extra) -> dict:
+    """
+    Builds a chat config that sends the static prefix with every request.
+
+    Tool calls are executed by run_turn/stream_turn rather than the SDK, so
+    the same turn loop works when the prefix lives in a context cache.
+    """
+    return {
+        "system_instruction": system_instruction,
+        "tools": list(tools),
+        "automatic_function_calling": {"disable": True},
+        **extra,
+    }
+
+
+class TokenUsage:
+    """Accumulates per-turn token counts from response usage metadata."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = {"requests": 0, "prompt_tokens": 0, "cached_tokens": 0, "output_tokens": 0}
+
+    def record(self, usage):
+        """Adds one model response's usage_metadata (ignored if missing)."""
+        if usage is None:
+            return
+        with self._lock:
+            self._totals["requests"] += 1
+            self._totals["prompt_tokens"] += usage.prompt_token_count or 0
+            self._totals["cached_tokens"] += usage.cached_content_token_count or 0
+            self._totals["output_tokens"] += usage.candidates_token_count or 0
+
+    def stats(self) -> dict:
+        """Returns totals plus per-request prompt tokens, split into cached and uncached."""
+        with self._lock:
+            stats = dict(self._totals)
+        requests = stats["requests"] or 1
+        stats["prompt_tokens_per_request"] = stats["prompt_tokens"] / requests
+        stats["uncached_prompt_tokens_per_request"] = (stats["prompt_tokens"] - stats["cached_tokens"]) / requests
+        return stats
+
+
+def run_tools(function_calls, tools) -> list:
+    """
+    Executes the model's function calls against the agent's tools.
+
+    Calls run concurrently where they are independent, pure tools' results
+    are cached and every call is timed (see wellcare_core.tools).
+
+    Args:
+        function_calls: FunctionCall objects from a model response
+        tools: The agent's tool callables
+
+    Returns:
+        List of function response Parts to send back to the model
+    """
+    return tool_runtime.run(function_calls, tools)
+
+
+async def arun_tools(function_calls, tools) -> list:
+    """Async run_tools: the tools run on a thread pool, off the event loop."""
+    return await tool_runtime.arun(function_calls, tools)
+
+
+def _record(span, response, usage: TokenUsage = None):
+    """Copies a response's token counts onto its span and the turn's usage totals."""
+    record_usage(span, response.usage_metadata)
+    span.set(function_calls=len(response.function_calls or []))
+    if usage:
+        usage.record(response.usage_metadata)
+
+
+def run_turn(chat, message, tools=(), usage: TokenUsage = None):
+    """Sends a message and resolves tool calls until the model replies with text."""
+    with tracer.span("generate", "model", round=0) as span:
+        response = chat.send_message(message)
+        _record(span, response, usage)
+    for round_number in range(1, MAX_TOOL_ROUNDS + 1):
+        if not response.function_calls:
+            break
+        parts = run_tools(response.function_calls, tools)
+        with tracer.span("generate", "model", round=round_number) as span:
+            response = chat.send_message(parts)
+            _record(span, response, usage)
+    return response
+
+
+def stream_turn(chat, message, tools=(), usage: TokenUsage = None):
+    """Streaming run_turn: yields every chunk, resolving tool calls between rounds."""
+    for round_number in range(MAX_TOOL_ROUNDS + 1):
+        calls = []
+        with tracer.span("generate", "model", round=round_number, stream=True) as span:
+            last = None
+            for chunk in chat.send_message_stream(message):
+                if last is None:
+                    span.set(first_chunk_ms=round((time.perf_counter() - span.start) * 1000, 3))
+                calls.extend(chunk.function_calls or [])
+                last = chunk
+                yield chunk
+            if last is not None:
+                record_usage(span, last.usage_metadata)
+                if usage:
+                    usage.record(last.usage_metadata)
+            span.set(function_calls=len(calls))
+        if not calls:
+            return
+        message = run_tools(calls, tools)
+
+
+async def arun_turn(chat, message, tools=(), usage: TokenUsage = None):
+    """Async run_turn for genai aio chats."""
+    with tracer.span("generate", "model", round=0) as span:
+        response = await chat.send_message(message)
+        _record(span, response, usage)
+    for round_number in range(1, MAX_TOOL_ROUNDS + 1):
+        if not response.function_calls:
+            break
+        parts = await arun_tools(response.function_calls, tools)
+        with tracer.span("generate", "model", round=round_number) as span:
+            response = await chat.send_message(parts)
+            _record(span, response, usage)
+    return response
+
+
+async def astream_turn(chat, message, tools=(), usage: TokenUsage = None):
+    """Async stream_turn for genai aio chats."""
+    for round_number in range(MAX_TOOL_ROUNDS + 1):
+        calls = []
+        with tracer.span("generate", "model", round=round_number, stream=True) as span:
+            last = None
+            async for chunk in await chat.send_message_stream(message):
+                if last is None:
+                    span.set(first_chunk_ms=round((time.perf_counter() - span.start) * 1000, 3))
+                calls.extend(chunk.function_calls or [])
+                last = chunk
+                yield chunk
+            if last is not None:
+                record_usage(span, last.usage_metadata)
+                if usage:
+                    usage.record(last.usage_metadata)
+            span.set(function_calls=len(calls))
+        if not calls:
+            return
+        message = await arun_tools(calls, tools)
+
+
+def sse_event(data: dict, event: str = None) -> str:
+    """Formats a payload as a Server-Sent Events frame."""
+    frame = f"event: {event}\n" if event else ""
+    return frame + f"data: {json.dumps(data)}\n\n"
+
+
+def crisis_alert(message: str, assess_crisis_risk, get_crisis_hotlines, country: str = "US", flagged=()):
+    """
+    Runs the local crisis screen before any model call.
+
+    Args:
+        message: User's message
+        assess_crisis_risk: Crisis risk tool from the agent module
+        get_crisis_hotlines: Hotline lookup tool from the agent module
+        country: Country code for hotline lookup
+        flagged: Crisis indicators raised outside the text screen (e.g. a
+            positive PHQ-9 item 9 answer)
+
+    Returns:
+        Crisis payload with hotlines for high-risk messages, otherwise None
+    """
+    # Runs before an agent is chosen, so the screen is a trace of its own
+    with tracer.span("crisis_screen", "screen") as span:
+        risk = assess_crisis_risk(message)
+        span.set(risk_level=risk.get("risk_level"), flagged=len(flagged))
+    if not risk.get("immediate_action_required") and not flagged:
+        return None
+
+    return {
+        "message": CRISIS_MESSAGE,
+        "crisis_indicators": [*risk.get("crisis_indicators", []), *flagged],
+        "hotlines": get_crisis_hotlines(country),
+    }
@@ -0,0 +1,62 @@
+"""
+Lazily constructed genai client.
+
+Building the Client at import time sets up its HTTP transports before any
+request needs them and raises on a missing API key in tooling that only
+imports the app. LazyClient defers construction until the first model call
+and then reuses the client for the life of the process.
+
+Clients route their requests through wellcare_core.upstream (connection
+pooling, a concurrency limit, retries and a circuit breaker) unless
+WELLCARE_UPSTREAM=0.
+"""
+
+import os
+import threading
+
+from dotenv import load_dotenv
+from google.genai import Client
+
+from wellcare_core.upstream import create_http_options
+
+
+def create_client(http_options: dict = None):
+    """
+    Builds a genai Client from GOOGLE_API_KEY.
+
+    Args:
+        http_options: Optional genai HttpOptions (as a dict); defaults to the managed upstream transports
+
+    Returns:
+        google.genai.Client
+
+    Raises:
+        ValueError: If GOOGLE_API_KEY is not set
+    """
+    load_dotenv()
+    api_key = os.environ.get("GOOGLE_API_KEY")
+    if not api_key:
+        raise ValueError("GOOGLE_API_KEY not found in environment variables")
+    if http_options is None:
+        http_options = create_http_options()
+    return Client(api_key=api_key, http_options=http_options)
+
+
+class LazyClient:
+    """Stands in for a genai Client and builds the real one on first attribute access."""
+
+    def __init__(self, factory=create_client):
+        self._factory = factory
+        self._client = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Returns the underlying client, building it once per process."""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._factory()
+        return self._client
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
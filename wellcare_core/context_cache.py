@@ -0,0 +1,254 @@
+"""
+Context caching for the static agent prefixes.
+
+Each agent's instruction and tool declarations are identical on every turn,
+so they can be uploaded once as a Gemini cached content and later turns refer
+to it by name instead of resending it. Gemini only caches prefixes of at
+least a minimum token count (MIN_TOKENS), and the agent prefixes are usually
+shorter, so caching is opt-in and a prefix estimated below the model's
+minimum is never uploaded. When caching is unavailable (disabled, prefix too
+small, API error) the inline prefix is used and, after an API error,
+creation is retried after a back-off.
+
+Uploads never run on the request path. A turn that finds no handle sends its
+prefix inline and starts the upload in the background; a handle close to
+expiry is still used while it is extended in the background. Uploads are
+single-flight per prefix, so concurrent turns start at most one.
+
+WELLCARE_CONTEXT_CACHE: set to 1 to enable (default: disabled)
+WELLCARE_CONTEXT_CACHE_TTL: lifetime of a cached prefix in seconds (default: 3600)
+WELLCARE_CONTEXT_CACHE_MIN_TOKENS: smallest prefix to upload (default: the model's minimum, MIN_TOKENS)
+"""
+
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from google.genai import types
+
+from wellcare_core.chat import TokenUsage, inline_config
+
+# Smallest prefix, in tokens, that Gemini will cache, by model name prefix
+MIN_TOKENS = {"gemini-2.5-flash": 1024, "gemini-2.5-pro": 4096}
+DEFAULT_MIN_TOKENS = 4096
+
+# Rough characters per token for English text and JSON, used to estimate a prefix's size
+CHARS_PER_TOKEN = 4
+
+
+def prefix_key(model: str, system_instruction: str, tools=()) -> str:
+    """Identifies a static prefix by model, instruction text and tool names."""
+    raw = "\x1f".join([model, system_instruction, *(tool.__name__ for tool in tools)])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def min_tokens(model: str) -> int:
+    """Returns the smallest prefix Gemini caches for model."""
+    matches = [prefix for prefix in MIN_TOKENS if model.startswith(prefix)]
+    return MIN_TOKENS[max(matches, key=len)] if matches else DEFAULT_MIN_TOKENS
+
+
+class ContextCache:
+    """Creates, reuses and refreshes cached-content handles for static prefixes."""
+
+    def __init__(self, client, enabled: bool = True, ttl: int = 3600,
+                 refresh_margin: int = 300, retry_after: float = 600, min_tokens: int = None):
+        """
+        Args:
+            client: genai Client
+            enabled: Whether to cache at all; when False every config is inline
+            ttl: Lifetime of a cached prefix in seconds
+            refresh_margin: Seconds before expiry at which a handle is extended
+            retry_after: Seconds to wait after a failed upload before trying again
+            min_tokens: Smallest prefix to upload; defaults to the model's minimum (see min_tokens())
+        """
+        self.client = client
+        self.enabled = enabled
+        self.ttl = ttl
+        self.refresh_margin = timedelta(seconds=refresh_margin)
+        self.retry_after = retry_after
+        self.min_tokens = min_tokens
+        self.usage = TokenUsage()
+        self._handles = {}
+        self._failed_until = {}
+        # Prefixes estimated below the model's minimum; never uploaded
+        self._too_small = set()
+        # Guards the dicts above; background uploads in flight (threads or tasks) by key
+        self._lock = threading.Lock()
+        self._inflight = {}
+
+    def _create_config(self, system_instruction: str, declarations) -> types.CreateCachedContentConfig:
+        return types.CreateCachedContentConfig(
+            system_instruction=system_instruction,
+            tools=[types.Tool(function_declarations=declarations)] if declarations else None,
+            ttl=f"{self.ttl}s",
+        )
+
+    def _declarations(self, tools) -> list:
+        return [types.FunctionDeclaration.from_callable_with_api_option(callable=tool) for tool in tools]
+
+    def _large_enough(self, key: str, model: str, system_instruction: str, declarations) -> bool:
+        """Estimates the prefix size; prefixes below the minimum are remembered and never uploaded."""
+        chars = len(system_instruction) + sum(
+            len(declaration.model_dump_json(exclude_none=True)) for declaration in declarations)
+        if chars / CHARS_PER_TOKEN >= (self.min_tokens or min_tokens(model)):
+            return True
+        with self._lock:
+            self._too_small.add(key)
+        return False
+
+    def _plan(self, key: str):
+        """Decides what to do for key: ('use', name), ('extend', name), ('create', None) or ('skip', None)."""
+        if not self.enabled or key in self._too_small or self._failed_until.get(key, 0) > time.monotonic():
+            return "skip", None
+
+        handle = self._handles.get(key)
+        if handle is None:
+            return "create", None
+
+        name, expire_time = handle
+        now = datetime.now(timezone.utc)
+        if expire_time - self.refresh_margin > now:
+            return "use", name
+        # Still usable while it is extended; once expired it has to be uploaded again
+        return ("extend", name) if expire_time > now else ("create", None)
+
+    def _store(self, key: str, cached) -> str:
+        with self._lock:
+            self._handles[key] = (cached.name, cached.expire_time or datetime.now(timezone.utc))
+            self._failed_until.pop(key, None)
+        return cached.name
+
+    def _fail(self, key: str):
+        with self._lock:
+            self._handles.pop(key, None)
+            self._failed_until[key] = time.monotonic() + self.retry_after
+
+    def _current(self, key: str):
+        with self._lock:
+            return self._plan(key)
+
+    def _config(self, name, system_instruction: str, tools, extra: dict) -> dict:
+        if name is None:
+            return inline_config(system_instruction, tools, **extra)
+        return {"cached_content": name, "automatic_function_calling": {"disable": True}, **extra}
+
+    def _refresh(self, key: str, model: str, system_instruction: str, tools):
+        """Extends or creates the handle for key; runs on a background thread started by config()."""
+        try:
+            action, name = self._current(key)
+            if action == "extend":
+                try:
+                    self._store(key, self.client.caches.update(
+                        name=name, config=types.UpdateCachedContentConfig(ttl=f"{self.ttl}s")))
+                    return
+                except Exception:
+                    # Already expired server-side: upload it again
+                    action = "create"
+            if action == "create":
+                declarations = self._declarations(tools)
+                if self._large_enough(key, model, system_instruction, declarations):
+                    self._store(key, self.client.caches.create(
+                        model=model, config=self._create_config(system_instruction, declarations)))
+        except Exception:
+            self._fail(key)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    async def _arefresh(self, key: str, model: str, system_instruction: str, tools):
+        """Async _refresh(); runs as a background task started by aconfig()."""
+        try:
+            action, name = self._current(key)
+            if action == "extend":
+                try:
+                    self._store(key, await self.client.aio.caches.update(
+                        name=name, config=types.UpdateCachedContentConfig(ttl=f"{self.ttl}s")))
+                    return
+                except Exception:
+                    action = "create"
+            if action == "create":
+                declarations = self._declarations(tools)
+                if self._large_enough(key, model, system_instruction, declarations):
+                    self._store(key, await self.client.aio.caches.create(
+                        model=model, config=self._create_config(system_instruction, declarations)))
+        except Exception:
+            self._fail(key)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def config(self, model: str, system_instruction: str, tools=(), **extra) -> dict:
+        """
+        Returns a chat config that references the cached prefix when possible.
+
+        Never waits for an upload: a missing handle is created, and one close
+        to expiry extended, on a background thread.
+
+        Args:
+            model: Model ID the prefix is cached for
+            system_instruction: Static system prompt
+            tools: Tool callables declared with the prefix
+            **extra: Additional generation settings (e.g. temperature)
+
+        Returns:
+            Chat config dict using cached_content, or the inline prefix as fallback
+        """
+        key = prefix_key(model, system_instruction, tools)
+        action, name = self._current(key)
+        if action in ("extend", "create"):
+            with self._lock:
+                thread = None
+                if key not in self._inflight:
+                    thread = self._inflight[key] = threading.Thread(
+                        target=self._refresh, args=(key, model, system_instruction, tools),
+                        name="context-cache-upload", daemon=True)
+            if thread is not None:
+                thread.start()
+
+        return self._config(name, system_instruction, tools, extra)
+
+    async def aconfig(self, model: str, system_instruction: str, tools=(), **extra) -> dict:
+        """Async config() for the ASGI app, uploading on a task of the running loop."""
+        key = prefix_key(model, system_instruction, tools)
+        action, name = self._current(key)
+        if action in ("extend", "create"):
+            loop = asyncio.get_running_loop()
+            with self._lock:
+                task = self._inflight.get(key)
+                # A task left on a closed loop (e.g. a previous asyncio.run) will never finish
+                if task is None or (isinstance(task, asyncio.Future) and task.get_loop() is not loop):
+                    self._inflight[key] = loop.create_task(self._arefresh(key, model, system_instruction, tools))
+
+        return self._config(name, system_instruction, tools, extra)
+
+    def wait(self, timeout: float = None):
+        """Waits for background uploads started by config(), e.g. before measuring or in tests."""
+        with self._lock:
+            threads = [task for task in self._inflight.values() if isinstance(task, threading.Thread)]
+        for thread in threads:
+            thread.join(timeout)
+
+    def stats(self) -> dict:
+        """Returns token usage per request and the number of live, skipped and uploading prefixes."""
+        stats = self.usage.stats()
+        with self._lock:
+            stats["cached_prefixes"] = len(self._handles)
+            stats["prefixes_below_minimum"] = len(self._too_small)
+            stats["uploads_in_flight"] = len(self._inflight)
+        stats["enabled"] = self.enabled
+        return stats
+
+
+def create_context_cache(client) -> ContextCache:
+    """Builds the context cache configured by environment variables."""
+    min_tokens_env = os.environ.get("WELLCARE_CONTEXT_CACHE_MIN_TOKENS")
+    return ContextCache(
+        client,
+        enabled=os.environ.get("WELLCARE_CONTEXT_CACHE", "0").lower() in ("1", "true", "yes"),
+        ttl=int(os.environ.get("WELLCARE_CONTEXT_CACHE_TTL", "3600")),
+        min_tokens=int(min_tokens_env) if min_tokens_env else None,
+    )
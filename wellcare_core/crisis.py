@@ -0,0 +1,183 @@
+"""
+Crisis phrase detection.
+
+The lexicon is compiled once at import into a single trie-shaped regular
+expression, so a message is scanned in one pass no matter how many phrases
+the lexicon holds. Spaces and hyphens in a phrase match any run of spaces or
+hyphens ("self harm" also matches "self-harm"), and apostrophes are optional
+("can't go on" also matches "cant go on"). Phrases match whole words,
+allowing a plural or inflection ending (INFLECTIONS), so "suicides",
+"overdosed" and "self-harmed" are caught while "want to die" does not match
+inside "want to diet". Short one-word slang that doubles as a unit ("kms")
+doesn't match right after a number ("ran 10 kms"). Inflections inside a
+phrase ("killed myself") are listed as variants.
+
+Each phrase ends in an empty named group, so a match reports which phrase
+it was through match.lastgroup rather than by looking its text up again
+(case-insensitive matching also accepts letters such as "İ" or "ſ" that
+don't lowercase back to the phrase).
+
+Set WELLCARE_CRISIS_LEXICON to a JSON file mapping each crisis indicator to
+its phrase variants to replace the built-in lexicon.
+"""
+
+import json
+import os
+import re
+
+DEFAULT_LEXICON = {
+    "suicide": ["suicide", "suicidal", "commit suicide", "take my own life", "taking my own life",
+                "end my life", "ending my life", "unalive myself"],
+    "kill myself": ["kill myself", "killing myself", "killed myself", "kms", "off myself", "offed myself",
+                    "shoot myself", "shot myself", "hang myself", "hanged myself"],
+    "end it all": ["end it all", "ending it all", "end it tonight", "finish it all"],
+    "no reason to live": ["no reason to live", "nothing to live for", "no point in living",
+                          "no point living", "don't want to live", "don't want to be alive",
+                          "can't go on", "cannot go on"],
+    "better off dead": ["better off dead", "better off without me", "wish i was dead",
+                        "wish i were dead", "want to die", "wanna die", "ready to die"],
+    "hurt myself": ["hurt myself", "hurting myself", "harm myself", "harming myself", "harmed myself",
+                    "cut myself", "cutting myself", "burn myself", "burning myself", "burned myself",
+                    "burnt myself"],
+    "self harm": ["self harm", "self harming", "self injury", "self injure"],
+    "overdose": ["overdose", "overdosing", "take all my pills", "swallow all the pills"],
+    "goodbye note": ["suicide note", "goodbye note", "writing my goodbyes", "saying my goodbyes"],
+}
+
+_SEPARATOR = r"[\s\-]+"
+_APOSTROPHE = "['’]?"
+
+# Endings allowed after the last word of a phrase: a missed alert costs far more than a false one
+INFLECTIONS = ("s", "es", "d", "ed", "ing")
+
+# One-word phrases up to this long are read as a unit, not slang, after a number
+_ABBREVIATION = 3
+
+
+def _char_pattern(char: str) -> str:
+    if char in " -":
+        return _SEPARATOR
+    if char in "'’":
+        return _APOSTROPHE
+    return re.escape(char)
+
+
+def _trie_pattern(node: dict) -> str:
+    """Turns a character trie into a regex with shared prefixes factored out."""
+    branches = [_char_pattern(char) + _trie_pattern(child)
+                for char, child in sorted(node.items()) if char]
+    # A phrase ending here is the last alternative, so longer phrases are tried first
+    if "" in node:
+        name, phrase = node[""]
+        guard = rf"(?<!\d\s{re.escape(phrase)})" if len(phrase) <= _ABBREVIATION and phrase.isalpha() else ""
+        branches.append(f"{guard}(?P<{name}>)")
+    return branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+
+
+def compile_lexicon(phrases) -> re.Pattern:
+    """
+    Compiles phrases into one regex that matches any of them in a single scan.
+
+    Args:
+        phrases: Iterable of crisis phrases
+
+    Returns:
+        Compiled case-insensitive pattern matching whole words, optionally
+        inflected (see INFLECTIONS); match.lastgroup is "p<i>", where i is
+        the position in phrases of the matched phrase (of the first one, for
+        variants that compile to the same pattern)
+    """
+    trie = {}
+    for i, phrase in enumerate(phrases):
+        node = trie
+        # Collapse separators so "self  harm" and "self-harm" share a trie path
+        phrase = re.sub(_SEPARATOR, " ", phrase.lower().strip())
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node.setdefault("", (f"p{i}", phrase))
+
+    endings = "|".join(INFLECTIONS)
+    return re.compile(rf"\b{_trie_pattern(trie)}(?:{endings})?(?!\w)", re.IGNORECASE)
+
+
+def load_lexicon(path: str = None) -> dict:
+    """
+    Loads a crisis lexicon from a JSON file.
+
+    Args:
+        path: JSON file mapping indicator -> list of phrase variants. Falls back
+            to DEFAULT_LEXICON when not given.
+
+    Returns:
+        Dictionary mapping indicator -> list of phrase variants
+    """
+    if not path:
+        return DEFAULT_LEXICON
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+class CrisisDetector:
+    """Single-pass multi-phrase matcher over a crisis lexicon."""
+
+    def __init__(self, lexicon: dict):
+        # Indicator per phrase, in compile order; match.lastgroup "p<i>" indexes it
+        self.indicators = []
+        phrases = []
+        for indicator, variants in lexicon.items():
+            for variant in [indicator, *variants]:
+                self.indicators.append(indicator)
+                phrases.append(variant)
+        self.pattern = compile_lexicon(phrases)
+
+    def find(self, text: str) -> list:
+        """
+        Finds every crisis phrase in text.
+
+        Args:
+            text: User's text input
+
+        Returns:
+            List of matches with indicator, matched text, start and end offsets
+        """
+        return [
+            {
+                "indicator": self.indicators[int(match.lastgroup[1:])],
+                "text": match.group(),
+                "start": match.start(),
+                "end": match.end(),
+            }
+            for match in self.pattern.finditer(text)
+        ]
+
+    def assess(self, text: str) -> dict:
+        """
+        Assesses crisis risk based on user input.
+
+        Args:
+            text: User's text input
+
+        Returns:
+            Dictionary with risk_level, crisis_indicators and match offsets
+        """
+        matches = self.find(text)
+        indicators = list(dict.fromkeys(match["indicator"] for match in matches))
+
+        if indicators:
+            return {
+                "risk_level": "high",
+                "crisis_indicators": indicators,
+                "immediate_action_required": True,
+                "matches": matches
+            }
+
+        return {
+            "risk_level": "low",
+            "crisis_indicators": [],
+            "immediate_action_required": False,
+            "matches": []
+        }
+
+
+# Built once per process
+detector = CrisisDetector(load_lexicon(os.environ.get("WELLCARE_CRISIS_LEXICON")))
@@ -0,0 +1,204 @@
+"""
+Parallel sub-agent fan-out for full wellness plans.
+
+A request for a complete plan ("make me a full wellness plan and find
+support groups") used to reach the planner and the resource specialist
+one after another through the coordinator. Here both run at once, each on
+its own chat with the same history (and so the same assessment results)
+plus a note on which part it covers, and their replies are merged under
+headings without a further model call. The turn takes about as long as
+the slowest branch instead of the sum of all of them.
+
+Branches run on a shared thread pool in the Flask app and as asyncio
+tasks in the ASGI app. Each branch keeps the caller's context, so tracing
+spans nest under the turn and tools see the same plan owner.
+
+WELLCARE_FANOUT: set to 0 to handle full-plan requests like any other message (default: enabled)
+WELLCARE_FANOUT_WORKERS: thread pool size for the Flask app (default: 16)
+"""
+
+import asyncio
+import contextvars
+import os
+import re
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from wellcare_core.tracing import tracer
+
+# Sub-agent name, section heading, and the part of the request that branch covers
+DEFAULT_BRANCHES = (
+    ("personalized_wellness_planner", "Your wellness plan",
+     "the personalized wellness plan itself: strategies, a starting schedule and why each step helps"),
+    ("community_resource_agent", "Support and resources",
+     "professional services, support groups and crisis contacts that fit this person's situation"),
+)
+
+# Requests for the whole onboarding outcome rather than one part of it
+DEFAULT_PATTERNS = [
+    r"\b(full|complete|whole|overall|comprehensive) (wellness |care |self[\s-]care |recovery )?plan\b",
+    r"\bplan\b.{0,80}\b(resources|support groups?|services|therapists?|where to get help)\b",
+    r"\b(resources|support groups?|services|therapists?)\b.{0,80}\bplan\b",
+]
+
+UNAVAILABLE = "This part couldn't be prepared just now. Ask me again in a moment and I'll pick it up."
+
+Branch = namedtuple("Branch", ["agent", "heading", "focus"])
+Section = namedtuple("Section", ["branch", "text", "error", "seconds"])
+
+
+class FanOut:
+    """Runs independent specialists concurrently for one request and merges their replies."""
+
+    def __init__(self, coordinator, branches=DEFAULT_BRANCHES, patterns=None, enabled: bool = True,
+                 max_workers: int = 16):
+        """
+        Args:
+            coordinator: Root agent; branches name its sub_agents
+            branches: (sub-agent name, heading, focus) triples, in merge order
+            patterns: Regexes for messages that fan out (default: DEFAULT_PATTERNS)
+            enabled: When False, matches() is always False
+            max_workers: Thread pool size for run()/stream()
+        """
+        agents = {agent.name: agent for agent in coordinator.sub_agents}
+        self.branches = [Branch(agents[name], heading, focus) for name, heading, focus in branches if name in agents]
+        self.patterns = [re.compile(pattern, re.IGNORECASE) for pattern in (patterns or DEFAULT_PATTERNS)]
+        self.enabled = enabled and len(self.branches) > 1
+        self.max_workers = max_workers
+        self._pool = None
+        self._lock = threading.Lock()
+        self._counters = {"requests": 0, "branch_errors": 0, "wall_seconds": 0.0, "branch_seconds": 0.0}
+
+    def matches(self, message, alert=None) -> bool:
+        """True for a full-plan request; crisis turns and tool responses never fan out."""
+        return (self.enabled and not alert and isinstance(message, str)
+                and any(pattern.search(message) for pattern in self.patterns))
+
+    def prompt(self, branch: Branch, message: str) -> str:
+        """The user's message plus which part of the answer this branch owns."""
+        others = "; ".join(other.focus for other in self.branches if other is not branch)
+        return (f"{message}\n\n[This reply is one section of a combined answer. Cover only {branch.focus}. "
+                f"Other specialists are covering {others}.]")
+
+    def merge(self, sections) -> str:
+        """Joins sections under their headings, in the order given."""
+        return "\n\n".join(f"## {section.branch.heading}\n\n{(section.text or UNAVAILABLE).strip()}"
+                           for section in sections)
+
+    def _order(self, section: Section) -> int:
+        return self.branches.index(section.branch)
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="fanout")
+            return self._pool
+
+    def _run_branch(self, run_branch, branch: Branch, history: list, message: str) -> Section:
+        started = time.perf_counter()
+        try:
+            with tracer.span(branch.agent.name, "agent", fanout=True):
+                text = run_branch(branch.agent, history, self.prompt(branch, message))
+            return Section(branch, text, None, time.perf_counter() - started)
+        except Exception as e:
+            return Section(branch, None, str(e), time.perf_counter() - started)
+
+    async def _arun_branch(self, run_branch, branch: Branch, history: list, message: str) -> Section:
+        started = time.perf_counter()
+        try:
+            with tracer.span(branch.agent.name, "agent", fanout=True):
+                text = await run_branch(branch.agent, history, self.prompt(branch, message))
+            return Section(branch, text, None, time.perf_counter() - started)
+        except Exception as e:
+            return Section(branch, None, str(e), time.perf_counter() - started)
+
+    def _record(self, sections: list, started: float):
+        with self._lock:
+            self._counters["requests"] += 1
+            self._counters["branch_errors"] += sum(1 for section in sections if section.error)
+            self._counters["wall_seconds"] += time.perf_counter() - started
+            self._counters["branch_seconds"] += sum(section.seconds for section in sections)
+        if all(section.error for section in sections):
+            raise RuntimeError(sections[0].error)
+
+    def stream(self, history: list, message: str, run_branch):
+        """
+        Runs every branch on the thread pool, yielding sections as they finish.
+
+        Args:
+            history: Conversation so far, shared by all branches
+            message: The user's request
+            run_branch: Callable (agent, history, prompt) -> reply text
+
+        Yields:
+            Section per branch, fastest first
+
+        Raises:
+            RuntimeError: Every branch failed (raised after the last one finishes)
+        """
+        started = time.perf_counter()
+        pool = self._executor()
+        futures = [pool.submit(contextvars.copy_context().run, self._run_branch, run_branch, branch, history, message)
+                   for branch in self.branches]
+        sections = []
+        for future in as_completed(futures):
+            section = future.result()
+            sections.append(section)
+            if section.text is not None:
+                yield section
+        self._record(sections, started)
+        for section in sections:
+            if section.text is None:
+                yield section
+
+    def run(self, history: list, message: str, run_branch):
+        """stream() collected into (merged reply, sections in branch order)."""
+        sections = sorted(self.stream(history, message, run_branch), key=self._order)
+        return self.merge(sections), sections
+
+    async def astream(self, history: list, message: str, run_branch):
+        """Async stream(): run_branch is a coroutine function and branches are asyncio tasks."""
+        started = time.perf_counter()
+        tasks = [asyncio.ensure_future(self._arun_branch(run_branch, branch, history, message))
+                 for branch in self.branches]
+        sections = []
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                section = await next_done
+                sections.append(section)
+                if section.text is not None:
+                    yield section
+        finally:
+            for task in tasks:
+                task.cancel()
+        self._record(sections, started)
+        for section in sections:
+            if section.text is None:
+                yield section
+
+    async def arun(self, history: list, message: str, run_branch):
+        """Async run()."""
+        sections = [section async for section in self.astream(history, message, run_branch)]
+        sections.sort(key=self._order)
+        return self.merge(sections), sections
+
+    def stats(self) -> dict:
+        """Returns fan-out requests, failed branches, and wall time against the branches' combined time."""
+        with self._lock:
+            stats = {"enabled": self.enabled, "branches": [branch.agent.name for branch in self.branches],
+                     **self._counters}
+        requests = stats["requests"]
+        stats["mean_wall_seconds"] = round(stats.pop("wall_seconds") / requests, 3) if requests else None
+        stats["mean_sequential_seconds"] = round(stats.pop("branch_seconds") / requests, 3) if requests else None
+        return stats
+
+
+def create_fanout(coordinator) -> FanOut:
+    """Builds the fan-out orchestrator configured by environment variables."""
+    return FanOut(
+        coordinator,
+        enabled=os.environ.get("WELLCARE_FANOUT", "1").lower() in ("1", "true", "yes"),
+        max_workers=int(os.environ.get("WELLCARE_FANOUT_WORKERS", "16")),
+    )
@@ -0,0 +1,209 @@
+"""
+Conversation history windowing.
+
+Keeps the most recent turns verbatim and folds older ones into a running
+summary carried at the start of the history, so per-turn prompt size stays
+roughly flat as a conversation grows. Assessment scores and crisis events
+are pinned in that memory block and never summarized away.
+
+The block is a user/model pair recognized by its MEMORY_HEADER and reply,
+so the web and terminal apps pass every user message through
+escape_user_text() first: a message that starts with the header could
+otherwise pose as the block and plant "pinned facts" that outlive
+summarization.
+
+WELLCARE_HISTORY_TURNS: turns kept verbatim (default: 10)
+WELLCARE_HISTORY_SUMMARY: "model" (default) or "extractive" (no model call)
+"""
+
+import os
+
+from google.genai import types
+
+from wellcare_core.tracing import record_usage, tracer
+
+MEMORY_HEADER = "[Conversation memory - earlier turns, summarized]"
+PINNED_HEADER = "Pinned facts:"
+MEMORY_ACK = "Understood. I'll keep this context in mind."
+
+SUMMARY_PROMPT = """You maintain a running summary of a mental health support conversation.
+Update the summary with the new transcript. Keep it under 150 words, factual and neutral.
+Preserve the user's concerns, goals, coping strategies tried and any resources shared.
+
+Current summary:
+{summary}
+
+New transcript:
+{transcript}
+
+Updated summary:"""
+
+# Tool results that must survive summarization, rendered as one line each
+_ASSESSMENT_LABELS = {
+    "conduct_phq9_assessment": "PHQ-9",
+    "conduct_gad7_assessment": "GAD-7",
+}
+
+
+def _text(content) -> str:
+    return "".join(part.text for part in content.parts or [] if part.text)
+
+
+def _is_user_message(content) -> bool:
+    return content.role == "user" and any(part.text for part in content.parts or [])
+
+
+def escape_user_text(message):
+    """Escapes a leading MEMORY_HEADER in a user message, so it is never read as the memory block."""
+    if isinstance(message, str) and message.startswith(MEMORY_HEADER):
+        return "\\" + message
+    return message
+
+
+def _is_memory(history: list) -> bool:
+    return (len(history) > 1 and history[0].role == "user" and _text(history[0]).startswith(MEMORY_HEADER)
+            and history[1].role == "model" and _text(history[1]) == MEMORY_ACK)
+
+
+def pinned_facts(history: list) -> list:
+    """
+    Extracts assessment scores and crisis events from tool responses.
+
+    Args:
+        history: List of genai Content objects
+
+    Returns:
+        List of one-line facts, in conversation order
+    """
+    facts = []
+    for content in history:
+        for part in content.parts or []:
+            response = part.function_response
+            if response is None or not isinstance(response.response, dict):
+                continue
+            result = response.response
+            if response.name in _ASSESSMENT_LABELS and "score" in result:
+                facts.append(f"{_ASSESSMENT_LABELS[response.name]} score {result['score']}/"
+                             f"{result.get('max_score')} ({result.get('severity')})")
+            elif response.name == "assess_crisis_risk" and result.get("risk_level") == "high":
+                facts.append(f"Crisis risk flagged ({', '.join(result.get('crisis_indicators', []))})")
+    return facts
+
+
+def crisis_pins(alert) -> list:
+    """Pins a crisis flagged by the local screen, which never appears in tool history."""
+    if not alert:
+        return []
+    return [f"Crisis screen flagged ({', '.join(alert['crisis_indicators'])}); hotlines shared"]
+
+
+def transcript(turns: list) -> str:
+    """Renders turns as plain "User:/Assistant:" text for summarization."""
+    lines = []
+    for turn in turns:
+        for content in turn:
+            text = _text(content).strip()
+            if text:
+                lines.append(f"{'User' if content.role == 'user' else 'Assistant'}: {text}")
+    return "\n".join(lines)
+
+
+def extractive_summary(summary: str, new_transcript: str, max_chars: int = 1500) -> str:
+    """Summarizer that needs no model: keeps the opening of each user message."""
+    notes = [
+        "User: " + line[len("User: "):].split(". ")[0][:200]
+        for line in new_transcript.splitlines() if line.startswith("User: ")
+    ]
+    combined = "\n".join(filter(None, [summary, *notes]))
+    return combined[-max_chars:]
+
+
+def model_summarizer(client, model: str):
+    """Builds a summarizer that asks the model to update the running summary."""
+    def summarize(summary: str, new_transcript: str) -> str:
+        try:
+            with tracer.span("summarize", "model") as span:
+                response = client.models.generate_content(
+                    model=model,
+                    contents=SUMMARY_PROMPT.format(summary=summary or "(none)", transcript=new_transcript),
+                    config={"temperature": 0.2, "max_output_tokens": 300},
+                )
+                record_usage(span, response.usage_metadata)
+            return (response.text or "").strip() or extractive_summary(summary, new_transcript)
+        except Exception:
+            # History must still be bounded when the model is unavailable
+            return extractive_summary(summary, new_transcript)
+    return summarize
+
+
+class HistoryManager:
+    """Windows chat history to the last max_turns turns plus a memory block."""
+
+    def __init__(self, max_turns: int = 10, summarize=extractive_summary, summarize_every: int = 4):
+        """
+        Args:
+            max_turns: User turns kept verbatim
+            summarize: Callable(summary, transcript) -> updated summary
+            summarize_every: Extra turns allowed to accumulate before summarizing,
+                so the summarizer runs once every few turns instead of every turn
+        """
+        self.max_turns = max_turns
+        self.summarize = summarize
+        self.summarize_every = summarize_every
+
+    def _split(self, history: list):
+        """Separates the memory block (summary, pins) from the conversation turns."""
+        summary, pins = "", []
+        if _is_memory(history):
+            body = _text(history[0])[len(MEMORY_HEADER):].strip()
+            summary, _, pinned = body.partition(PINNED_HEADER)
+            summary = summary.strip()
+            pins = [line[2:] for line in pinned.strip().splitlines() if line.startswith("- ")]
+            history = history[2:]
+
+        turns = []
+        for content in history:
+            if _is_user_message(content) or not turns:
+                turns.append([])
+            turns[-1].append(content)
+        return summary, pins, turns
+
+    def _memory(self, summary: str, pins: list) -> list:
+        text = MEMORY_HEADER + "\n" + (summary or "(no earlier turns)")
+        if pins:
+            text += f"\n\n{PINNED_HEADER}\n" + "\n".join(f"- {pin}" for pin in pins)
+        return [
+            types.Content(role="user", parts=[types.Part(text=text)]),
+            types.Content(role="model", parts=[types.Part(text=MEMORY_ACK)]),
+        ]
+
+    def compact(self, history: list, pins=()) -> list:
+        """
+        Bounds history for storage between turns.
+
+        Args:
+            history: Full chat history (may start with a memory block)
+            pins: Extra facts to pin, e.g. crisis events from the local screen
+
+        Returns:
+            History with at most max_turns + summarize_every verbatim turns
+        """
+        summary, pinned, turns = self._split(history)
+        for fact in [*pinned_facts(history), *pins]:
+            if fact not in pinned:
+                pinned.append(fact)
+
+        if len(turns) > self.max_turns + self.summarize_every:
+            old, turns = turns[:-self.max_turns], turns[-self.max_turns:]
+            summary = self.summarize(summary, transcript(old))
+
+        if not summary and not pinned:
+            return history
+        return self._memory(summary, pinned) + [content for turn in turns for content in turn]
+
+
+def create_history_manager(client, model: str) -> HistoryManager:
+    """Builds the history manager configured by environment variables."""
+    mode = os.environ.get("WELLCARE_HISTORY_SUMMARY", "model")
+    summarize = model_summarizer(client, model) if mode == "model" else extractive_summary
+    return HistoryManager(max_turns=int(os.environ.get("WELLCARE_HISTORY_TURNS", "10")), summarize=summarize)
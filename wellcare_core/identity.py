@@ -0,0 +1,64 @@
+"""
+Server-issued user identities for the web apps.
+
+Plans and progress are filed under a user id. The server picks that id and
+hands it to the browser in a signed, HttpOnly cookie, so a client can only
+present an id it was given, never choose someone else's. /start_session
+reads the cookie (issuing a new id if it is missing or forged) and binds the
+id to the new session as its owner.
+
+WELLCARE_SECRET_KEY: key that signs identity cookies (default: a random key
+per process, so ids don't carry across workers or restarts; set it when
+running more than one worker)
+"""
+
+import hashlib
+import hmac
+import os
+import secrets
+
+COOKIE_NAME = "wellcare_user"
+
+# Browsers keep the identity for a year, so plans and progress carry over between sessions
+COOKIE_MAX_AGE = 365 * 24 * 3600
+
+
+class Identities:
+    """Issues user ids and signs and verifies their cookies."""
+
+    def __init__(self, secret_key: str):
+        self._key = secret_key.encode("utf-8")
+
+    def _signature(self, user_id: str) -> str:
+        return hmac.new(self._key, user_id.encode("utf-8"), hashlib.sha256).hexdigest()
+
+    def new_id(self) -> str:
+        """A fresh, unguessable user id."""
+        return secrets.token_hex(16)
+
+    def cookie(self, user_id: str) -> str:
+        """The signed cookie value for user_id."""
+        return f"{user_id}.{self._signature(user_id)}"
+
+    def verify(self, cookie: str):
+        """
+        Reads a cookie issued by cookie().
+
+        Args:
+            cookie: Cookie value from the request, or None
+
+        Returns:
+            The user id, or None if the cookie is missing or its signature doesn't match
+        """
+        user_id, _, signature = (cookie or "").rpartition(".")
+        if user_id and hmac.compare_digest(signature, self._signature(user_id)):
+            return user_id
+        return None
+
+
+def create_identities() -> Identities:
+    """Builds the identity issuer keyed by WELLCARE_SECRET_KEY."""
+    return Identities(os.environ.get("WELLCARE_SECRET_KEY") or secrets.token_hex(32))
+
+
+identities = create_identities()
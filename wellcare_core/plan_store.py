@@ -0,0 +1,280 @@
+"""
+Content-addressed storage for saved wellness plans.
+
+Plans are filed under one directory per owner (the client's user_id or
+chat session, or "local" for the terminal app), named by a hash of the owner so neither
+session ids nor model-chosen filenames ever become paths. Each plan is
+stored as <sha256 prefix>.md, so saving an identical plan again is a no-op.
+
+Writes happen on a background thread: save() records the plan as pending
+and returns straight away, and the writer puts the file in place with a
+temp file plus os.replace, so readers never see a half-written plan. Each
+owner directory keeps an index.json for listing plans without opening them.
+
+Every worker process writes to the same directories, so the index on disk
+is the source of truth: the writer re-reads it and adds its plan under an
+exclusive lock on the owner's .lock file, and readers reload it whenever
+the file has been replaced since they last read it. Plans this process has
+saved but not yet written are merged in on top.
+
+WELLCARE_PLAN_DIR: root directory for saved plans (default: wellness_plans)
+"""
+
+import atexit
+import contextvars
+import hashlib
+import json
+import os
+import queue
+import re
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: index updates are only serialized within one process
+    fcntl = None
+
+_PLAN_ID = re.compile(r"^[0-9a-f]{16}$")
+
+# Owner of plans and progress entries saved by tools in the current turn (set by the web apps)
+current_owner = contextvars.ContextVar("wellcare_plan_owner", default="local")
+
+
+@contextmanager
+def plan_owner(owner: str):
+    """Files plans and progress entries saved by tools inside the block under `owner`."""
+    token = current_owner.set(owner)
+    try:
+        yield
+    finally:
+        current_owner.reset(token)
+
+
+def plan_id(content: str) -> str:
+    """Content address of a plan: the first 16 hex digits of its SHA-256."""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
+
+
+def plan_title(content: str, hint: str = None) -> str:
+    """Title from a filename hint, else the plan's first heading or line."""
+    if hint:
+        title = os.path.splitext(os.path.basename(hint.replace("\\", "/")))[0]
+        title = re.sub(r"[_\-]+", " ", title).strip()
+        if title:
+            return title[:80]
+    for line in content.splitlines():
+        line = line.strip().lstrip("#").strip()
+        if line:
+            return line[:80]
+    return "Wellness plan"
+
+
+@contextmanager
+def locked(directory: str):
+    """Holds an exclusive lock on directory's .lock file across processes."""
+    with open(os.path.join(directory, ".lock"), "a") as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def write_atomic(path: str, data: bytes):
+    """Writes data to a temp file in the same directory, then renames it over path."""
+    directory = os.path.dirname(path)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+class PlanStore:
+    """Per-owner, deduplicated plan files written atomically by a background thread."""
+
+    def __init__(self, root: str, background: bool = True):
+        """
+        Args:
+            root: Directory holding one subdirectory per owner
+            background: Write on a writer thread (False writes inside save())
+        """
+        self.root = os.path.abspath(root)
+        self.background = background
+        # Owner -> (index.json version, plan id -> metadata) as last read from disk
+        self._indexes = {}
+        # Owner -> plan id -> (content, metadata) for plans saved here and not yet written
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._writer = None
+        self._counters = {"saved": 0, "deduplicated": 0, "written": 0, "write_errors": 0}
+        self._last_error = None
+
+    def _directory(self, owner: str) -> str:
+        return os.path.join(self.root, hashlib.sha256(owner.encode("utf-8")).hexdigest()[:24])
+
+    def _index(self, owner: str) -> dict:
+        """Plan id -> metadata for owner: the index on disk plus pending plans. Call with the lock held."""
+        directory = self._directory(owner)
+        try:
+            # os.replace gives every new index.json a new inode
+            stat = os.stat(os.path.join(directory, "index.json"))
+            version = (stat.st_ino, stat.st_mtime_ns)
+        except FileNotFoundError:
+            version = None
+        cached = self._indexes.get(owner)
+        if cached is None or cached[0] != version:
+            cached = self._indexes[owner] = (version, self._load_index(directory) if version else {})
+        index = dict(cached[1])
+        for identifier, (_, plan) in self._pending.get(owner, {}).items():
+            index.setdefault(identifier, plan)
+        return index
+
+    def _load_index(self, directory: str) -> dict:
+        try:
+            with open(os.path.join(directory, "index.json"), encoding="utf-8") as f:
+                return {plan["id"]: plan for plan in json.load(f)}
+        except FileNotFoundError:
+            return {}
+        except (ValueError, KeyError, TypeError):
+            # A damaged index (bad bytes, bad JSON or the wrong shape) is rebuilt from the plan files themselves
+            index = {}
+            for entry in os.scandir(directory):
+                name, ext = os.path.splitext(entry.name)
+                if ext == ".md" and _PLAN_ID.match(name):
+                    with open(entry.path, encoding="utf-8", errors="replace") as f:
+                        content = f.read()
+                    index[name] = {"id": name, "title": plan_title(content), "bytes": entry.stat().st_size,
+                                   "saved_at": entry.stat().st_mtime}
+            return index
+
+    def save(self, owner: str, content: str, title: str = None) -> dict:
+        """
+        Stores a plan for owner, skipping the write if the same plan is already stored.
+
+        Args:
+            owner: Namespace for the plan (session id or user id)
+            content: Plan markdown
+            title: Optional display name, e.g. the filename the model asked for
+
+        Returns:
+            The plan's metadata: id, title, bytes, saved_at and deduplicated
+        """
+        if not content or not content.strip():
+            raise ValueError("Plan content is empty")
+        identifier = plan_id(content)
+        with self._lock:
+            index = self._index(owner)
+            if identifier in index:
+                self._counters["deduplicated"] += 1
+                return {**index[identifier], "deduplicated": True}
+            plan = {"id": identifier, "title": plan_title(content, title),
+                    "bytes": len(content.encode("utf-8")), "saved_at": time.time()}
+            self._pending.setdefault(owner, {})[identifier] = (content, plan)
+            self._counters["saved"] += 1
+
+        job = (owner, identifier, content, plan)
+        if self.background:
+            self._start_writer()
+            self._queue.put(job)
+        else:
+            self._write(*job)
+        return {**plan, "deduplicated": False}
+
+    def list(self, owner: str) -> list:
+        """Owner's plan metadata, newest first."""
+        with self._lock:
+            plans = list(self._index(owner).values())
+        return sorted(plans, key=lambda plan: plan["saved_at"], reverse=True)
+
+    def get(self, owner: str, identifier: str):
+        """Returns a plan's markdown, or None if owner has no plan with that id."""
+        if not _PLAN_ID.match(identifier or ""):
+            return None
+        with self._lock:
+            if identifier not in self._index(owner):
+                return None
+            pending = self._pending.get(owner, {}).get(identifier)
+        if pending is not None:
+            return pending[0]
+        try:
+            with open(os.path.join(self._directory(owner), identifier + ".md"), encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _start_writer(self):
+        if self._writer is None:
+            with self._lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._run, name="plan-writer", daemon=True)
+                    self._writer.start()
+                    atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                self._write(*job)
+            except Exception as e:
+                # One bad plan must not stop the writer: later plans still get written and flush() returns
+                self._failed(e)
+            finally:
+                self._queue.task_done()
+
+    def _failed(self, error: Exception):
+        with self._lock:
+            self._counters["write_errors"] += 1
+            self._last_error = f"{type(error).__name__}: {error}"
+
+    def _write(self, owner: str, identifier: str, content: str, plan: dict):
+        directory = self._directory(owner)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, identifier + ".md")
+            if not os.path.exists(path):
+                write_atomic(path, content.encode("utf-8"))
+            # Other workers may have added plans since this one was saved: merge, don't overwrite
+            with locked(directory):
+                index = self._load_index(directory)
+                if identifier not in index:
+                    index[identifier] = plan
+                    snapshot = sorted(index.values(), key=lambda item: item["saved_at"])
+                    write_atomic(os.path.join(directory, "index.json"), json.dumps(snapshot).encode("utf-8"))
+        except OSError as e:
+            # Keep the plan in memory so it can still be read back from this process
+            self._failed(e)
+            return
+        with self._lock:
+            pending = self._pending.get(owner, {})
+            pending.pop(identifier, None)
+            if not pending:
+                self._pending.pop(owner, None)
+            self._counters["written"] += 1
+
+    def flush(self):
+        """Blocks until every queued plan is on disk."""
+        self._queue.join()
+
+    def stats(self) -> dict:
+        """Returns save, dedupe and write counters, writes still queued and the last write error."""
+        with self._lock:
+            stats = dict(self._counters)
+            stats["pending"] = sum(len(plans) for plans in self._pending.values())
+            stats["last_error"] = self._last_error
+        return stats
+
+
+plan_store = PlanStore(os.environ.get("WELLCARE_PLAN_DIR", "wellness_plans"))
@@ -0,0 +1,295 @@
+"""
+Longitudinal progress store: mood logs and assessment scores over time.
+
+Every entry is appended to an SQLite table indexed by (owner, metric, ts),
+and a per-day rollup (count and sum per metric) is updated in the same
+transaction. Summaries read at most 30 rollup rows per metric plus a few
+indexed lookups for assessment scores, so their cost does not grow with
+the number of raw entries. The progress agent gets the compact summary from
+the get_progress_summary tool instead of raw logs in its prompt.
+
+The rollups and rollup_watermark tables hold the population report
+aggregates that wellcare_core.analytics saves between refreshes.
+
+Days are UTC calendar days.
+
+WELLCARE_PROGRESS_DB: SQLite file path (default: progress.db)
+"""
+
+import os
+import sqlite3
+import statistics
+import threading
+import time
+from datetime import datetime, timezone
+
+# Metric -> (lowest, highest) accepted value
+METRICS = {
+    "mood": (1, 10),
+    "energy": (1, 10),
+    "sleep_hours": (0, 24),
+    "phq9": (0, 27),
+    "gad7": (0, 21),
+}
+
+ASSESSMENTS = ("phq9", "gad7")
+
+# Assessment -> number of items, each answered 0-3
+ITEMS = {"phq9": 9, "gad7": 7}
+
+WINDOWS = (7, 30)
+
+_DAY = 86400
+
+
+def _day(ts: float) -> int:
+    return int(ts // _DAY)
+
+
+def _date(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).date().isoformat()
+
+
+class ProgressStore:
+    """Append-only progress entries with daily rollups for rolling aggregates."""
+
+    def __init__(self, path: str = "progress.db"):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+        self._counters = {"entries": 0, "summaries": 0}
+
+    def _connection(self) -> sqlite3.Connection:
+        """Opens the database on first use, so importing the tools creates no file. Call with the lock held."""
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "owner TEXT NOT NULL, metric TEXT NOT NULL, ts REAL NOT NULL, value REAL NOT NULL, note TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_owner_metric_ts ON entries (owner, metric, ts)")
+            # Item answers as a digit string, e.g. "012300121"
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                "owner TEXT NOT NULL, scale TEXT NOT NULL, ts REAL NOT NULL, answers TEXT NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS daily ("
+                "owner TEXT NOT NULL, metric TEXT NOT NULL, day INTEGER NOT NULL, "
+                "count INTEGER NOT NULL, total REAL NOT NULL, PRIMARY KEY (owner, metric, day))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rollups ("
+                "scale TEXT NOT NULL, kind TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+                "PRIMARY KEY (scale, kind, key))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rollup_watermark ("
+                "id INTEGER PRIMARY KEY CHECK (id = 0), entry_id INTEGER NOT NULL, answers_id INTEGER NOT NULL)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def record(self, owner: str, values: dict, ts: float = None, note: str = None, answers: dict = None):
+        """
+        Appends one observation per metric and updates the daily rollups.
+
+        Args:
+            owner: User or session the entries belong to
+            values: Metric -> value, e.g. {"mood": 6, "sleep_hours": 7.5}
+            ts: Unix time of the observation (default: now)
+            note: Optional free-text note stored with the entries
+            answers: Assessment -> item answers (0-3) behind its score in values, e.g. {"gad7": [1, 2, 0, 1, 1, 0, 2]}
+
+        Raises:
+            ValueError: Unknown metric, value out of range, or answers that don't match their score
+        """
+        for metric, value in values.items():
+            if metric not in METRICS:
+                raise ValueError(f"Unknown metric '{metric}', expected one of: {', '.join(METRICS)}")
+            low, high = METRICS[metric]
+            if not low <= value <= high:
+                raise ValueError(f"{metric} must be between {low} and {high}, got {value}")
+        for scale, items in (answers or {}).items():
+            if scale not in values or scale not in ITEMS:
+                raise ValueError(f"Answers given for '{scale}' without its score")
+            if len(items) != ITEMS[scale] or any(answer not in (0, 1, 2, 3) for answer in items):
+                raise ValueError(f"{scale} needs {ITEMS[scale]} answers between 0 and 3")
+            if sum(items) != values[scale]:
+                raise ValueError(f"{scale} answers add up to {sum(items)}, not the score {values[scale]}")
+        ts = time.time() if ts is None else ts
+        rows = [(owner, metric, ts, float(value), note) for metric, value in values.items()]
+        answer_rows = [(owner, scale, ts, "".join(map(str, items))) for scale, items in (answers or {}).items()]
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN")
+            try:
+                conn.executemany("INSERT INTO entries VALUES (?, ?, ?, ?, ?)", rows)
+                conn.executemany(
+                    "INSERT INTO daily VALUES (?, ?, ?, 1, ?) ON CONFLICT (owner, metric, day) "
+                    "DO UPDATE SET count = count + 1, total = total + excluded.total",
+                    [(owner, metric, _day(ts), value) for owner, metric, ts, value, _ in rows],
+                )
+                conn.executemany("INSERT INTO answers VALUES (?, ?, ?, ?)", answer_rows)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            self._counters["entries"] += len(rows)
+
+    def summary(self, owner: str, now: float = None) -> dict:
+        """
+        Rolling aggregates for one owner.
+
+        Args:
+            owner: User or session to summarize
+            now: Reference time (default: now)
+
+        Returns:
+            Dictionary with, per logged metric, the latest daily mean, 7/30-day
+            means, days logged and the 30-day trend (change per week), and per
+            assessment the latest score and its change since the previous and
+            first score
+        """
+        today = _day(time.time() if now is None else now)
+        with self._lock:
+            conn = self._connection()
+            self._counters["summaries"] += 1
+            daily = conn.execute(
+                "SELECT metric, day, total / count FROM daily WHERE owner = ? AND day > ? ORDER BY metric, day",
+                (owner, today - max(WINDOWS)),
+            ).fetchall()
+            assessments = {
+                scale: (
+                    conn.execute(
+                        "SELECT ts, value FROM entries WHERE owner = ? AND metric = ? ORDER BY ts DESC LIMIT 2",
+                        (owner, scale),
+                    ).fetchall(),
+                    conn.execute(
+                        "SELECT ts, value, (SELECT COUNT(*) FROM entries WHERE owner = ?1 AND metric = ?2) "
+                        "FROM entries WHERE owner = ?1 AND metric = ?2 ORDER BY ts LIMIT 1",
+                        (owner, scale),
+                    ).fetchone(),
+                )
+                for scale in ASSESSMENTS
+            }
+
+        by_metric = {}
+        for metric, day, mean in daily:
+            by_metric.setdefault(metric, []).append((day, mean))
+
+        summary = {"metrics": {}, "assessments": {}}
+        for metric, days in by_metric.items():
+            if metric in ASSESSMENTS:
+                continue
+            stats = {"latest": round(days[-1][1], 2), "latest_date": _date(days[-1][0] * _DAY)}
+            for window in WINDOWS:
+                recent = [mean for day, mean in days if day > today - window]
+                stats[f"mean_{window}d"] = round(statistics.fmean(recent), 2) if recent else None
+                stats[f"days_logged_{window}d"] = len(recent)
+            if len(days) >= 2:
+                slope, _ = statistics.linear_regression([day for day, _ in days], [mean for _, mean in days])
+                stats["trend_per_week_30d"] = round(slope * 7, 2)
+            summary["metrics"][metric] = stats
+
+        for scale, (latest, first) in assessments.items():
+            if not latest:
+                continue
+            (latest_ts, latest_score), previous = latest[0], latest[1] if len(latest) > 1 else None
+            first_ts, first_score, taken = first
+            summary["assessments"][scale] = {
+                "latest": latest_score,
+                "latest_date": _date(latest_ts),
+                "change_since_previous": latest_score - previous[1] if previous else None,
+                "change_since_first": latest_score - first_score if taken > 1 else None,
+                "first_date": _date(first_ts),
+                "times_taken": taken,
+            }
+        return summary
+
+    def assessments_after(self, entry_id: int = 0, answers_id: int = 0, limit: int = 100000) -> tuple:
+        """
+        Assessment rows added after the given row ids, oldest first, for incremental aggregation.
+
+        Args:
+            entry_id: Last entries rowid already seen
+            answers_id: Last answers rowid already seen
+            limit: Most rows returned from each table
+
+        Returns:
+            (scores, answers): lists of (rowid, owner, scale, ts, score) and (rowid, scale, answers)
+        """
+        with self._lock:
+            conn = self._connection()
+            scores = conn.execute(
+                "SELECT rowid, owner, metric, ts, value FROM entries WHERE rowid > ? "
+                f"AND metric IN ({', '.join('?' * len(ASSESSMENTS))}) ORDER BY rowid LIMIT ?",
+                (entry_id, *ASSESSMENTS, limit),
+            ).fetchall()
+            answers = conn.execute(
+                "SELECT rowid, scale, answers FROM answers WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                (answers_id, limit),
+            ).fetchall()
+        return scores, answers
+
+    def load_rollups(self) -> tuple:
+        """
+        The report aggregates saved by save_rollups.
+
+        Returns:
+            (watermark, rows): the (entry_id, answers_id) they cover, or None if
+            nothing was saved, and a list of (scale, kind, key, value)
+        """
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN")
+            try:
+                watermark = conn.execute("SELECT entry_id, answers_id FROM rollup_watermark").fetchone()
+                rows = conn.execute("SELECT scale, kind, key, value FROM rollups").fetchall() if watermark else []
+            finally:
+                conn.execute("COMMIT")
+        return watermark, rows
+
+    def save_rollups(self, watermark: tuple, rows: list) -> tuple:
+        """
+        Upserts report aggregate rows and the watermark they cover, in one transaction.
+
+        Nothing is written if the stored watermark isn't behind this one in
+        both tables, i.e. another worker saved the same or newer aggregates.
+
+        Args:
+            watermark: (entry_id, answers_id) the rows include
+            rows: (scale, kind, key, value) rows that changed since the last save
+
+        Returns:
+            The watermark stored afterwards
+        """
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                stored = conn.execute("SELECT entry_id, answers_id FROM rollup_watermark").fetchone()
+                if stored is None or (stored != tuple(watermark)
+                                      and all(old <= new for old, new in zip(stored, watermark))):
+                    conn.executemany(
+                        "INSERT INTO rollups VALUES (?, ?, ?, ?) ON CONFLICT (scale, kind, key) "
+                        "DO UPDATE SET value = excluded.value",
+                        rows,
+                    )
+                    conn.execute("INSERT OR REPLACE INTO rollup_watermark VALUES (0, ?, ?)", tuple(watermark))
+                    stored = tuple(watermark)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return tuple(stored)
+
+    def stats(self) -> dict:
+        """Returns entries recorded and summaries served by this process."""
+        with self._lock:
+            return dict(self._counters)
+
+
+progress_store = ProgressStore(os.environ.get("WELLCARE_PROGRESS_DB", "progress.db"))
@@ -0,0 +1,286 @@
+"""
+Local PHQ-9 and GAD-7 administration.
+
+The questionnaires are fixed text, so there is no need for a model turn per
+question. QuestionnaireManager serves each question, validates the 0-3
+answer (typed as a number or as one of the option labels) and, after the
+last item, scores the answers with the agent's conduct_phq9_assessment or
+conduct_gad7_assessment tool. Only the final step reaches the model: the
+answers and the tool result are appended to the history as an ordinary
+tool call, and the model writes the empathetic summary from there.
+
+PHQ-9 item 9 asks about thoughts of being better off dead or of self-harm.
+Any answer above "Not at all" is a crisis flag: crisis_flags() reports it
+before the turn is admitted, so the apps raise the crisis alert (hotlines,
+crisis pin, priority lane, crisis agent) exactly as for a flagged message.
+
+Questionnaire progress is kept with the session in the SessionStore, so
+with a shared backend (WELLCARE_SESSION_BACKEND=sqlite) the next answer can
+reach any worker and is still scored, and still screened for item 9.
+
+WELLCARE_LOCAL_QUESTIONNAIRES: set to 0 to let the model administer them (default: enabled)
+"""
+
+import os
+import re
+import threading
+from collections import namedtuple
+
+from google.genai import types
+
+INTRO = "Over the last 2 weeks, how often have you been bothered by the following problem?"
+
+OPTIONS = ("Not at all", "Several days", "More than half the days", "Nearly every day")
+
+QUESTIONS = {
+    "phq9": (
+        "Little interest or pleasure in doing things",
+        "Feeling down, depressed, or hopeless",
+        "Trouble falling or staying asleep, or sleeping too much",
+        "Feeling tired or having little energy",
+        "Poor appetite or overeating",
+        "Feeling bad about yourself - or that you are a failure or have let yourself or your family down",
+        "Trouble concentrating on things, such as reading the newspaper or watching television",
+        "Moving or speaking so slowly that other people could have noticed, or the opposite - "
+        "being so fidgety or restless that you have been moving around a lot more than usual",
+        "Thoughts that you would be better off dead, or of hurting yourself in some way",
+    ),
+    "gad7": (
+        "Feeling nervous, anxious, or on edge",
+        "Not being able to stop or control worrying",
+        "Worrying too much about different things",
+        "Trouble relaxing",
+        "Being so restless that it is hard to sit still",
+        "Becoming easily annoyed or irritable",
+        "Feeling afraid, as if something awful might happen",
+    ),
+}
+
+TITLES = {"phq9": "PHQ-9", "gad7": "GAD-7"}
+
+# Tool that scores each scale, as named in the agent definitions
+ASSESSMENT_TOOLS = {"phq9": "conduct_phq9_assessment", "gad7": "conduct_gad7_assessment"}
+
+_SCALE_PATTERNS = {
+    "phq9": re.compile(r"\bphq[\s-]?9\b|\bdepress", re.IGNORECASE),
+    "gad7": re.compile(r"\bgad[\s-]?7\b|\banxi", re.IGNORECASE),
+}
+# A leading 0-3 on its own or before punctuation: "2", "3)", "1 - Several days", but not "2.5" or "30"
+_NUMBER = re.compile(r"^\s*([0-3])\s*(?:$|[.):,\-](?!\d))")
+_LABELS = {label.lower(): value for value, label in enumerate(OPTIONS)}
+_PUNCTUATION = " \t\n.!,;:\"'"
+_STOP = re.compile(r"^\s*(stop|cancel|quit|exit)\b", re.IGNORECASE)
+
+# Session state key for the questionnaire in progress
+STATE_KEY = "questionnaire"
+
+# Item (1-based) whose non-zero answer is a crisis flag, and the indicator reported for it
+CRISIS_ITEMS = {"phq9": 9}
+CRISIS_INDICATOR = "self-harm thoughts (PHQ-9 item 9)"
+
+# A finished questionnaire: its answers, history to append and the tool result the model summarizes
+# crisis is set when a crisis item was answered above 0; transcript is the answers as one user message
+Completion = namedtuple("Completion", ["scale", "answers", "result", "history", "message", "crisis", "transcript"])
+
+# What one questionnaire turn produced; completion is None until the last answer
+Step = namedtuple("Step", ["text", "prompt", "completion"])
+
+
+def detect_scale(message: str):
+    """Returns "phq9" or "gad7" when the message names exactly one scale, else None."""
+    found = [scale for scale, pattern in _SCALE_PATTERNS.items() if pattern.search(message)]
+    return found[0] if len(found) == 1 else None
+
+
+def parse_answer(text: str):
+    """
+    Reads a 0-3 answer from a button value or free text.
+
+    Only a leading digit or a whole option label counts, so a reply that
+    merely mentions a label ("not at all sure, nearly every day") is asked
+    again rather than guessed.
+
+    Args:
+        text: User's reply, e.g. "2", "3) Nearly every day" or "nearly every day."
+
+    Returns:
+        The answer as an int, or None if the text is not a valid answer
+    """
+    match = _NUMBER.match(text)
+    if match:
+        return int(match.group(1))
+    return _LABELS.get(" ".join(text.strip(_PUNCTUATION).lower().split()))
+
+
+class Questionnaire:
+    """Progress through one scale: the answers given so far."""
+
+    def __init__(self, scale: str, answers=()):
+        self.scale = scale
+        self.answers = list(answers)
+
+    @property
+    def done(self) -> bool:
+        return len(self.answers) == len(QUESTIONS[self.scale])
+
+    def prompt(self) -> dict:
+        """The current question as rendered by the UI's answer buttons."""
+        questions = QUESTIONS[self.scale]
+        return {
+            "scale": self.scale,
+            "title": TITLES[self.scale],
+            "step": len(self.answers) + 1,
+            "total": len(questions),
+            "intro": INTRO,
+            "question": questions[len(self.answers)],
+            "options": [{"value": value, "label": label} for value, label in enumerate(OPTIONS)],
+        }
+
+    def text(self) -> str:
+        """The current question as plain text, for clients without buttons."""
+        prompt = self.prompt()
+        options = ", ".join(f"{option['value']} = {option['label']}" for option in prompt["options"])
+        return (f"{prompt['title']} question {prompt['step']} of {prompt['total']}. {INTRO}\n\n"
+                f"{prompt['question']}\n\n{options}")
+
+    def crisis_answer(self, answer: int) -> bool:
+        """Whether answer, given to the current question, is a crisis flag."""
+        return answer > 0 and CRISIS_ITEMS.get(self.scale) == len(self.answers) + 1
+
+    def responses(self) -> dict:
+        """Answers keyed q1..qN, the shape the assessment tools expect."""
+        return {f"q{i}": answer for i, answer in enumerate(self.answers, start=1)}
+
+    def transcript(self) -> str:
+        """The completed questionnaire as one user message."""
+        lines = [f"I completed the {TITLES[self.scale]} questionnaire. {INTRO}"]
+        for i, (question, answer) in enumerate(zip(QUESTIONS[self.scale], self.answers), start=1):
+            lines.append(f"{i}. {question}: {OPTIONS[answer]} ({answer})")
+        return "\n".join(lines)
+
+
+class QuestionnaireManager:
+    """Runs questionnaires for many sessions, answering locally until the last item."""
+
+    def __init__(self, assessments: dict, sessions):
+        """
+        Args:
+            assessments: Scale -> scoring tool (conduct_phq9_assessment, conduct_gad7_assessment)
+            sessions: SessionStore that keeps each session's questionnaire in progress
+        """
+        self.assessments = assessments
+        self.sessions = sessions
+        self._lock = threading.Lock()
+        self._counters = {"started": 0, "completed": 0, "cancelled": 0, "local_steps": 0, "invalid": 0}
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _load(self, session_id: str):
+        state = self.sessions.get_state(session_id, STATE_KEY)
+        return Questionnaire(state["scale"], state["answers"]) if state else None
+
+    def _save(self, session_id: str, questionnaire):
+        state = questionnaire and {"scale": questionnaire.scale, "answers": questionnaire.answers}
+        self.sessions.put_state(session_id, STATE_KEY, state)
+
+    def start(self, session_id: str, scale: str) -> Step:
+        """Starts (or restarts) a questionnaire and returns its first question."""
+        questionnaire = Questionnaire(scale)
+        self._save(session_id, questionnaire)
+        self._count("started")
+        self._count("local_steps")
+        return Step(questionnaire.text(), questionnaire.prompt(), None)
+
+    def cancel(self, session_id: str) -> bool:
+        """Drops a session's questionnaire; returns whether one was in progress."""
+        if self._load(session_id) is None:
+            return False
+        self._save(session_id, None)
+        self._count("cancelled")
+        return True
+
+    def crisis_flags(self, session_id: str, message: str) -> list:
+        """
+        Screens a questionnaire answer before the turn is handled.
+
+        Args:
+            session_id: Chat session
+            message: User's message
+
+        Returns:
+            [CRISIS_INDICATOR] when message answers a crisis item above 0, else []
+        """
+        questionnaire = self._load(session_id)
+        answer = questionnaire and parse_answer(message)
+        return [CRISIS_INDICATOR] if answer and questionnaire.crisis_answer(answer) else []
+
+    def step(self, session_id: str, message: str, intent: str = None):
+        """
+        Handles a message if it belongs to a questionnaire.
+
+        A message starts a questionnaire when the router sent it to the
+        assessor and it names one scale; while one is in progress, every
+        message is read as the answer to the current question.
+
+        Args:
+            session_id: Chat session
+            message: User's message
+            intent: Intent chosen by the router for this message
+
+        Returns:
+            A Step, or None when the message should go to the model as usual
+        """
+        questionnaire = self._load(session_id)
+        if questionnaire is None:
+            scale = detect_scale(message) if intent == "wellness_assessor_agent" else None
+            return self.start(session_id, scale) if scale in self.assessments else None
+
+        if _STOP.match(message):
+            self.cancel(session_id)
+            return Step(f"Okay, I've stopped the {TITLES[questionnaire.scale]} questionnaire. "
+                        "We can pick it up again whenever you like.", None, None)
+
+        answer = parse_answer(message)
+        self._count("local_steps")
+        if answer is None:
+            self._count("invalid")
+            return Step("Please answer with a number from 0 to 3, or type \"stop\" to end the "
+                        "questionnaire.\n\n" + questionnaire.text(), questionnaire.prompt(), None)
+        questionnaire.answers.append(answer)
+        if not questionnaire.done:
+            self._save(session_id, questionnaire)
+            return Step(questionnaire.text(), questionnaire.prompt(), None)
+        self._save(session_id, None)
+        self._count("completed")
+
+        return Step(None, None, self._complete(questionnaire))
+
+    def _complete(self, questionnaire: Questionnaire) -> Completion:
+        """Scores the answers and records them as a tool call for the model to summarize."""
+        name = ASSESSMENT_TOOLS[questionnaire.scale]
+        responses = questionnaire.responses()
+        result = self.assessments[questionnaire.scale](responses)
+        history = [
+            types.Content(role="user", parts=[types.Part(text=questionnaire.transcript())]),
+            types.Content(role="model", parts=[
+                types.Part.from_function_call(name=name, args={"responses": responses}),
+            ]),
+        ]
+        message = [types.Part.from_function_response(name=name, response=result)]
+        crisis = CRISIS_ITEMS.get(questionnaire.scale)
+        return Completion(questionnaire.scale, list(questionnaire.answers), result, history, message,
+                          bool(crisis and questionnaire.answers[crisis - 1]), questionnaire.transcript())
+
+    def stats(self) -> dict:
+        """Returns this process's questionnaire counters."""
+        with self._lock:
+            return dict(self._counters)
+
+
+def create_questionnaire_manager(assessments: dict, sessions):
+    """Builds the questionnaire manager over the app's session store, or None if WELLCARE_LOCAL_QUESTIONNAIRES=0."""
+    if os.environ.get("WELLCARE_LOCAL_QUESTIONNAIRES", "1").lower() not in ("1", "true", "yes"):
+        return None
+    return QuestionnaireManager(assessments, sessions)
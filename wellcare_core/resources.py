@@ -0,0 +1,290 @@
+"""
+Indexed directory of mental health providers and hotlines.
+
+Records (therapists, clinics, support groups, hotlines...) are loaded once
+at startup and indexed two ways:
+
+- inverted indexes from country, region, type, cost and service to record
+  ids, so filtered lookups touch only matching records
+- uniform lat/lon grids (one over everything, one per resource type),
+  searched ring by ring outward from the query point until no unvisited
+  cell can hold anything closer than the current k-th best match
+
+Selective filters (a few hundred candidates or fewer) are answered by
+scanning the filtered ids directly; broad ones walk the grid. Either way a
+"nearest low-cost therapist" query touches a handful of records rather
+than the whole directory.
+
+Set WELLCARE_RESOURCES to a JSON (list of records) or CSV file to load a
+directory; services are ";"-separated in CSV. Without one, the directory
+holds the built-in crisis hotlines only.
+"""
+
+import csv
+import heapq
+import json
+import math
+import os
+import re
+from collections import defaultdict
+
+CRISIS_HOTLINES = {
+    "US": {
+        "suicide_prevention": "988 (Suicide & Crisis Lifeline)",
+        "crisis_text": "Text HOME to 741741 (Crisis Text Line)",
+        "emergency": "911",
+        "website": "https://988lifeline.org"
+    },
+    "UK": {
+        "samaritans": "116 123",
+        "crisis_text": "Text SHOUT to 85258",
+        "emergency": "999",
+        "website": "https://www.samaritans.org"
+    },
+    "IN": {
+        "vandrevala": "+91 9999 666 555",
+        "aasra": "+91 22 2754 6669",
+        "emergency": "112",
+        "website": "http://www.aasra.info"
+    }
+}
+
+# Cheapest first; "low" includes sliding-scale fees
+COST_LEVELS = ("free", "low", "standard")
+
+FIELDS = ("name", "type", "country", "region", "city", "lat", "lon", "cost", "services", "phone", "website")
+
+# Below this many filtered candidates, scanning them beats walking the grid
+SCAN_LIMIT = 256
+
+_EARTH_KM = 6371.0088
+_KM_PER_DEGREE = math.pi * _EARTH_KM / 180
+
+
+def _key(value) -> str:
+    return re.sub(r"[\s_\-]+", " ", str(value)).strip().lower()
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance in kilometres."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * _EARTH_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def hotline_records(hotlines: dict = CRISIS_HOTLINES) -> list:
+    """Directory records for the built-in crisis hotlines."""
+    return [
+        {"name": name.replace("_", " "), "type": "hotline", "country": country, "cost": "free",
+         "services": ["crisis"], "phone": contact}
+        for country, contacts in hotlines.items()
+        for name, contact in contacts.items() if name != "website"
+    ]
+
+
+def load_resources(path: str) -> list:
+    """
+    Reads directory records from a JSON list or a CSV file.
+
+    Args:
+        path: .json or .csv file; CSV columns are FIELDS, services ";"-separated
+
+    Returns:
+        List of record dicts
+    """
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".csv"):
+            records = []
+            for row in csv.DictReader(f):
+                row = {key: value for key, value in row.items() if value not in (None, "")}
+                row["services"] = [s.strip() for s in row.get("services", "").split(";") if s.strip()]
+                records.append(row)
+            return records
+        return json.load(f)
+
+
+class ResourceDirectory:
+    """Providers and hotlines with inverted and spatial indexes."""
+
+    def __init__(self, records: list, cell_degrees: float = 0.5):
+        """
+        Args:
+            records: Dicts with FIELDS; lat/lon optional (hotlines, online services)
+            cell_degrees: Grid cell size in degrees
+        """
+        self.cell_degrees = cell_degrees
+        self._lon_cells = round(360 / cell_degrees)
+        self.records = []
+        self._coords = []
+        self._cost = []
+        self._index = {field: defaultdict(set) for field in ("country", "region", "type", "cost", "service")}
+        # One grid over every located record, plus one per resource type
+        self._grids = defaultdict(lambda: defaultdict(list))
+        self._counters = {"searches": 0, "grid_searches": 0, "scanned_searches": 0}
+        for record in records:
+            self._add(record)
+
+    def _cell(self, lat: float, lon: float) -> tuple:
+        """Grid cell of a point; longitude cells wrap around the antimeridian."""
+        return (int(math.floor(lat / self.cell_degrees)),
+                int(math.floor(lon / self.cell_degrees)) % self._lon_cells)
+
+    def _add(self, record: dict):
+        record = {key: record[key] for key in FIELDS if record.get(key) not in (None, "")}
+        cost = _key(record.get("cost", "standard"))
+        record["cost"] = "low" if cost in ("sliding scale", "low cost") else cost
+        if record["cost"] not in COST_LEVELS:
+            raise ValueError(f"Unknown cost '{cost}' for {record.get('name')}, expected one of: {COST_LEVELS}")
+        services = record.get("services", [])
+        record["services"] = [services] if isinstance(services, str) else list(services)
+
+        rid = len(self.records)
+        self.records.append(record)
+        self._cost.append(COST_LEVELS.index(record["cost"]))
+        for field in ("country", "region", "type", "cost"):
+            if field in record:
+                self._index[field][_key(record[field])].add(rid)
+        for service in record["services"]:
+            self._index["service"][_key(service)].add(rid)
+
+        coords = None
+        if "lat" in record and "lon" in record:
+            coords = record["lat"], record["lon"] = float(record["lat"]), float(record["lon"])
+            cell = self._cell(*coords)
+            self._grids[None][cell].append(rid)
+            if "type" in record:
+                self._grids[_key(record["type"])][cell].append(rid)
+        self._coords.append(coords)
+
+    def __len__(self):
+        return len(self.records)
+
+    def _filters(self, country=None, region=None, resource_type=None, max_cost=None, service=None):
+        """Index sets for the exact-match filters (smallest first) and the highest cost level allowed."""
+        sets = [self._index[field].get(_key(value), set())
+                for field, value in (("country", country), ("region", region), ("type", resource_type),
+                                     ("service", service)) if value]
+        level = len(COST_LEVELS) - 1
+        if max_cost and _key(max_cost) in COST_LEVELS:
+            level = COST_LEVELS.index(_key(max_cost))
+        return sorted(sets, key=len), level
+
+    def _matches(self, rid: int, sets: list, level: int) -> bool:
+        return self._cost[rid] <= level and all(rid in ids for ids in sets)
+
+    def _nearest_in_grid(self, grid, lat, lon, limit, accept, max_km):
+        """Ring-by-ring grid walk; returns (distance, id) pairs, nearest first."""
+        best = []  # max-heap of (-distance, id)
+        worst = math.inf if max_km is None else max_km
+        qi, qj = self._cell(lat, lon)
+        lat_low, lat_high = self._cell(-90, 0)[0], self._cell(90, 0)[0]
+        visited, remaining = set(), len(grid)
+        ring = 0
+        while remaining:
+            for i in range(max(qi - ring, lat_low), min(qi + ring, lat_high) + 1):
+                edge = abs(i - qi) == ring
+                for j in (range(qj - ring, qj + ring + 1) if edge else (qj - ring, qj + ring)):
+                    cell = (i, j % self._lon_cells)
+                    if cell in visited:
+                        continue
+                    visited.add(cell)
+                    ids = grid.get(cell)
+                    if not ids:
+                        continue
+                    remaining -= 1
+                    for rid in ids:
+                        point = self._coords[rid]
+                        # Latitude difference alone is a lower bound on distance, and far cheaper
+                        if abs(point[0] - lat) * _KM_PER_DEGREE > worst or not accept(rid):
+                            continue
+                        distance = haversine_km(lat, lon, *point)
+                        if distance > worst:
+                            continue
+                        if len(best) < limit:
+                            heapq.heappush(best, (-distance, rid))
+                        else:
+                            heapq.heapreplace(best, (-distance, rid))
+                        if len(best) == limit:
+                            worst = -best[0][0]
+
+            # Unvisited cells are over `ring` whole cells away in latitude or in longitude;
+            # a degree of longitude shrinks towards the poles, so bound it at the highest latitude reachable
+            edge_lat = math.radians(min(90.0, abs(lat) + (ring + 1) * self.cell_degrees))
+            span = math.radians(min(180.0, ring * self.cell_degrees))
+            reach_km = min(ring * self.cell_degrees * _KM_PER_DEGREE,
+                           2 * _EARTH_KM * math.asin(math.cos(edge_lat) * math.sin(span / 2)))
+            if reach_km >= worst:
+                break
+            ring += 1
+        return sorted((-negative, rid) for negative, rid in best)
+
+    def search(self, lat: float = None, lon: float = None, country: str = None, region: str = None,
+               resource_type: str = None, max_cost: str = None, service: str = None,
+               limit: int = 5, max_km: float = None) -> list:
+        """
+        Finds resources matching the filters, nearest first when a location is given.
+
+        Args:
+            lat, lon: Query location (omit for a cheapest-first filtered listing)
+            country, region, resource_type, service: Exact-match filters (case-insensitive)
+            max_cost: "free", "low" or "standard" - the most expensive level to include
+            limit: Maximum results
+            max_km: Ignore located resources further away than this
+
+        Returns:
+            List of record dicts; located results carry distance_km
+        """
+        sets, level = self._filters(country, region, resource_type, max_cost, service)
+        self._counters["searches"] += 1
+        if lat is None or lon is None:
+            ids = [rid for rid in (sets[0] if sets else range(len(self.records)))
+                   if self._matches(rid, sets[1:], level)]
+            ranked = sorted(ids, key=lambda rid: (self._cost[rid], self.records[rid].get("name", "")))
+            return [dict(self.records[rid]) for rid in ranked[:limit]]
+
+        if sets and len(sets[0]) <= SCAN_LIMIT:
+            self._counters["scanned_searches"] += 1
+            scored = []
+            for rid in sets[0]:
+                if self._coords[rid] is None or not self._matches(rid, sets[1:], level):
+                    continue
+                distance = haversine_km(lat, lon, *self._coords[rid])
+                if max_km is None or distance <= max_km:
+                    scored.append((distance, rid))
+            nearest = heapq.nsmallest(limit, scored)
+        else:
+            self._counters["grid_searches"] += 1
+            grid = self._grids.get(_key(resource_type) if resource_type else None, {})
+            nearest = self._nearest_in_grid(grid, lat, lon, limit, lambda rid: self._matches(rid, sets, level), max_km)
+        return [{**self.records[rid], "distance_km": round(distance, 1)} for distance, rid in nearest]
+
+    def hotlines(self, country: str) -> dict:
+        """Hotline name -> phone for a country, in the shape get_crisis_hotlines returns; empty if none listed."""
+        if not country:
+            # No country filter would return every country's hotlines mixed together
+            return {}
+        sets, _ = self._filters(country=country, resource_type="hotline")
+        ids = sets[0].intersection(*sets[1:])
+        return {_key(self.records[rid]["name"]).replace(" ", "_"): self.records[rid].get("phone", "")
+                for rid in sorted(ids)}
+
+    def stats(self) -> dict:
+        """Returns directory size, grid occupancy and search counters."""
+        return {
+            "records": len(self.records),
+            "located": sum(coords is not None for coords in self._coords),
+            "types": {kind: len(ids) for kind, ids in sorted(self._index["type"].items())},
+            "grid_cells": len(self._grids[None]),
+            **self._counters,
+        }
+
+
+def create_resource_directory() -> ResourceDirectory:
+    """Builds the directory from WELLCARE_RESOURCES (if set) plus the built-in hotlines."""
+    path = os.environ.get("WELLCARE_RESOURCES")
+    records = load_resources(path) if path else []
+    return ResourceDirectory(hotline_records() + records)
+
+
+resource_directory = create_resource_directory()
@@ -0,0 +1,144 @@
+"""
+Opt-in cache of model replies to common conversation openers.
+
+Entries are keyed on the normalized message plus the agent name and the
+model tier and model ID the turn runs on, bounded by an LRU size limit and
+a TTL. Only opening turns are cached, since a reply later in a conversation
+depends on the history before it, and messages flagged by the crisis screen
+always go to the model. Replies from turns that called a tool are not
+cached either: the tool saved or read something for that user, and a
+cached copy would skip the call and repeat someone else's result.
+
+Enable with WELLCARE_RESPONSE_CACHE=1.
+"""
+
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from google.genai import types
+
+
+def normalize_message(message: str) -> str:
+    """Lowercases and strips punctuation so trivially different openers share an entry."""
+    return " ".join(re.sub(r"[^\w\s]", " ", message.lower()).split())
+
+
+def called_tools(contents: list) -> bool:
+    """Whether a turn's contents include a function call."""
+    return any(part.function_call for content in contents for part in content.parts or ())
+
+
+def cached_exchange(message: str, reply: str) -> list:
+    """Builds the history entries recorded when a reply is served from cache."""
+    return [
+        types.Content(role="user", parts=[types.Part(text=message)]),
+        types.Content(role="model", parts=[types.Part(text=reply)]),
+    ]
+
+
+class ResponseCache:
+    """LRU + TTL cache of opening replies with hit-rate and latency accounting."""
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "bypasses": 0, "tool_turns": 0, "evictions": 0, "saved_seconds": 0.0}
+
+    def key_for(self, message: str, agent, history: list, crisis, tier=None) -> str:
+        """
+        Returns the cache key for a turn, or None if the turn must not be cached.
+
+        Args:
+            message: User's message
+            agent: ADK agent answering the turn
+            history: Conversation history before this turn
+            crisis: Crisis alert for the message, if any
+            tier: Tier the turn runs on (tiering.Tier; default: the agent's own model)
+
+        Returns:
+            Cache key string, or None for crisis messages and follow-up turns
+        """
+        if crisis:
+            with self._lock:
+                self._stats["bypasses"] += 1
+            return None
+        if history:
+            return None
+
+        tier_name, model = (tier.name, tier.model) if tier else ("", agent.model)
+        raw = "\x1f".join([agent.name, tier_name, model, normalize_message(message)])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        """Returns the cached reply for key, or None on a miss."""
+        start = time.perf_counter()
+        with self._lock:
+            item = self._items.get(key)
+            if item is None or item[2] <= time.monotonic():
+                if item is not None:
+                    del self._items[key]
+                    self._stats["evictions"] += 1
+                self._stats["misses"] += 1
+                return None
+
+            text, model_latency, _ = item
+            self._items.move_to_end(key)
+            self._stats["hits"] += 1
+            self._stats["saved_seconds"] += max(0.0, model_latency - (time.perf_counter() - start))
+            return text
+
+    def put(self, key: str, text: str, model_latency: float, contents: list = ()):
+        """
+        Stores a model reply, unless the turn called a tool.
+
+        Args:
+            key: Key from key_for
+            text: Model reply text
+            model_latency: Seconds the model call took, credited on every later hit
+            contents: The turn's contents (e.g. the chat history), checked for function calls
+        """
+        if not text:
+            return
+        if called_tools(contents):
+            with self._lock:
+                self._stats["tool_turns"] += 1
+            return
+        with self._lock:
+            self._items[key] = (text, model_latency, time.monotonic() + self.ttl)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def stats(self) -> dict:
+        """Returns counters, hit rate and average latency saved per hit."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._items)
+
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        stats["saved_ms_per_hit"] = stats["saved_seconds"] * 1000 / stats["hits"] if stats["hits"] else 0.0
+        return stats
+
+
+def create_response_cache():
+    """
+    Builds the response cache if enabled by environment variables.
+
+    WELLCARE_RESPONSE_CACHE: set to 1 to enable (default: disabled)
+    WELLCARE_RESPONSE_CACHE_SIZE: maximum cached replies (default: 1024)
+    WELLCARE_RESPONSE_CACHE_TTL: seconds a reply stays valid (default: 3600)
+    """
+    if os.environ.get("WELLCARE_RESPONSE_CACHE", "0").lower() not in ("1", "true", "yes"):
+        return None
+    return ResponseCache(
+        max_entries=int(os.environ.get("WELLCARE_RESPONSE_CACHE_SIZE", "1024")),
+        ttl=float(os.environ.get("WELLCARE_RESPONSE_CACHE_TTL", "3600")),
+    )
@@ -0,0 +1,297 @@
+"""
+Retrieval over the curated coping-content library.
+
+Snippets (coping_content.json, plus WELLCARE_CONTENT if set) are indexed
+once with BM25 over hashed terms: every term maps to one of BUCKETS
+posting lists, so the index needs no vocabulary and is four flat arrays.
+They are saved as .npy files next to a digest of the corpus and
+memory-mapped by every process, and rebuilt only when the corpus changes.
+
+Each turn, the top-k snippets relevant to the user's message travel with
+it as a separate part, and are stripped again before the history is
+stored. Agent instructions no longer spell out every technique, so prompt
+size stays flat however large the library grows.
+
+WELLCARE_RETRIEVAL: "0" disables per-turn retrieval (default: "1")
+WELLCARE_CONTENT: Extra JSON list of snippets (id, title, category, tags, text)
+WELLCARE_CONTENT_INDEX: Index directory (default: content_index)
+WELLCARE_RETRIEVAL_K: Snippets per message (default: 3)
+"""
+
+import hashlib
+import io
+import json
+import math
+import os
+import re
+import threading
+import time
+import zlib
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+from google.genai import types
+
+from wellcare_core.plan_store import write_atomic
+
+CONTEXT_HEADER = "[Coping content retrieved for this message - draw on it where it fits]"
+
+CORPUS_PATH = Path(__file__).with_name("coping_content.json")
+
+# Hashed term space; collisions only merge the statistics of two rare terms
+BUCKETS = 1 << 16
+
+# BM25 parameters and the score below which a snippet is not worth its tokens
+K1 = 1.2
+B = 0.75
+MIN_SCORE = 3.0
+
+ARRAYS = ("offsets", "docs", "freqs", "lengths")
+
+STOPWORDS = frozenset(
+    "a about am an and any are as at be been but by can could do does for from get got had has have how i "
+    "if im in into is it its just me my of on or so some than that the their them then there they this to "
+    "too very was we what when which who will with would you your".split()
+)
+
+_INDEX_VERSION = 1
+
+
+def _stem(word: str) -> str:
+    """Strips the commonest English suffixes so "worrying", "worries" and "worry" share a term."""
+    if len(word) > 5 and word.endswith("ies"):
+        return word[:-3] + "y"
+    for suffix in ("ation", "ing", "ed"):
+        if len(word) - len(suffix) >= 3 and word.endswith(suffix):
+            return word[:-len(suffix)]
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+def tokenize(text: str) -> list:
+    """Lowercased, stemmed terms without stopwords."""
+    return [_stem(word) for word in re.findall(r"[a-z0-9]+", text.lower().replace("'", ""))
+            if word not in STOPWORDS]
+
+
+def _bucket(term: str) -> int:
+    # crc32 rather than hash(): bucket numbers must match across processes and restarts
+    return zlib.crc32(term.encode("utf-8")) & (BUCKETS - 1)
+
+
+def _document(snippet: dict) -> str:
+    """Indexed text of a snippet; the title counts twice."""
+    return " ".join([snippet["title"], snippet["title"], snippet.get("category", "").replace("_", " "),
+                     *snippet.get("tags", []), snippet["text"]])
+
+
+def load_corpus(extra_path: str = None) -> list:
+    """
+    Reads the built-in snippets plus an optional extra file.
+
+    Args:
+        extra_path: JSON list of snippets; entries replace built-in ones with the same id
+
+    Returns:
+        List of snippet dicts
+
+    Raises:
+        ValueError: A snippet without id, title or text
+    """
+    snippets = {}
+    for path in (CORPUS_PATH, extra_path):
+        if not path:
+            continue
+        with open(path, encoding="utf-8") as f:
+            for snippet in json.load(f):
+                missing = [field for field in ("id", "title", "text") if not snippet.get(field)]
+                if missing:
+                    raise ValueError(f"Snippet {snippet.get('id', '?')} in {path} is missing: {', '.join(missing)}")
+                snippets[snippet["id"]] = snippet
+    return list(snippets.values())
+
+
+def corpus_digest(snippets: list) -> str:
+    payload = json.dumps([_INDEX_VERSION, BUCKETS, snippets], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def build_index(snippets: list, directory: str):
+    """
+    Writes the hashed BM25 index for snippets into directory.
+
+    Posting lists are stored bucket by bucket: docs[offsets[b]:offsets[b + 1]]
+    are the snippets containing a term in bucket b, freqs the term counts.
+    meta.json is written last, so a half-written index is never loaded.
+    """
+    os.makedirs(directory, exist_ok=True)
+    postings, lengths = [], []
+    for doc, snippet in enumerate(snippets):
+        counts = Counter(_bucket(term) for term in tokenize(_document(snippet)))
+        postings.extend((bucket, doc, freq) for bucket, freq in counts.items())
+        lengths.append(sum(counts.values()))
+    postings.sort()
+    buckets = np.array([bucket for bucket, _, _ in postings], dtype=np.int64)
+    arrays = {
+        "offsets": np.concatenate(([0], np.cumsum(np.bincount(buckets, minlength=BUCKETS)))).astype(np.int32),
+        "docs": np.array([doc for _, doc, _ in postings], dtype=np.int32),
+        "freqs": np.array([freq for _, _, freq in postings], dtype=np.float32),
+        "lengths": np.array(lengths, dtype=np.float32),
+    }
+    for name, array in arrays.items():
+        buffer = io.BytesIO()
+        np.save(buffer, array)
+        write_atomic(os.path.join(directory, f"{name}.npy"), buffer.getvalue())
+    meta = {"digest": corpus_digest(snippets), "documents": len(snippets),
+            "avg_length": float(np.mean(lengths)) if lengths else 1.0}
+    write_atomic(os.path.join(directory, "meta.json"), json.dumps(meta).encode("utf-8"))
+
+
+class CopingIndex:
+    """Memory-mapped hashed BM25 index over coping snippets."""
+
+    def __init__(self, snippets: list, directory: str):
+        """
+        Args:
+            snippets: The corpus the index in directory was built from
+            directory: Index directory written by build_index
+        """
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.snippets = snippets
+        self.avg_length = meta["avg_length"]
+        self._offsets, self._docs, self._freqs, self._lengths = (
+            np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r") for name in ARRAYS)
+
+    @classmethod
+    def open(cls, snippets: list, directory: str) -> "CopingIndex":
+        """Loads the index in directory, rebuilding it first if it was built from a different corpus."""
+        try:
+            with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+                current = json.load(f).get("digest") == corpus_digest(snippets)
+        except (OSError, ValueError):
+            current = False
+        if not current:
+            build_index(snippets, directory)
+        return cls(snippets, directory)
+
+    def search(self, query: str, k: int = 3, min_score: float = 0.0) -> list:
+        """
+        Ranks snippets against a query.
+
+        Args:
+            query: Free text, e.g. the user's message
+            k: Maximum results
+            min_score: Drop results scoring at or below this
+
+        Returns:
+            List of (score, snippet) pairs, best first
+        """
+        documents = len(self.snippets)
+        scores = np.zeros(documents, dtype=np.float32)
+        for bucket in {_bucket(term) for term in tokenize(query)}:
+            start, end = int(self._offsets[bucket]), int(self._offsets[bucket + 1])
+            if start == end:
+                continue
+            docs, freqs = self._docs[start:end], self._freqs[start:end]
+            idf = math.log(1 + (documents - (end - start) + 0.5) / (end - start + 0.5))
+            norm = K1 * (1 - B + B * self._lengths[docs] / self.avg_length)
+            scores[docs] += idf * freqs * (K1 + 1) / (freqs + norm)
+        top = np.argpartition(-scores, k)[:k] if documents > k else np.arange(documents)
+        ranked = sorted(top, key=lambda doc: -scores[doc])
+        return [(float(scores[doc]), self.snippets[doc]) for doc in ranked if scores[doc] > min_score]
+
+
+class ContentRetriever:
+    """Adds the coping snippets relevant to a message to that message only."""
+
+    def __init__(self, directory: str = "content_index", extra_path: str = None, k: int = 3,
+                 min_score: float = MIN_SCORE, enabled: bool = True):
+        """
+        Args:
+            directory: Where the index is built and memory-mapped from
+            extra_path: Optional JSON file of additional snippets
+            k: Snippets added per message
+            min_score: BM25 score a snippet needs to be added
+            enabled: Add snippets to messages (search() works either way)
+        """
+        self.enabled = enabled
+        self.directory = directory
+        self.extra_path = extra_path
+        self.k = k
+        self.min_score = min_score
+        self._index = None
+        self._lock = threading.Lock()
+        self._counters = {"messages": 0, "augmented": 0, "snippets": 0, "search_ms": 0.0}
+
+    def index(self) -> CopingIndex:
+        """Opens (building if needed) the index on first use, keeping imports and startup cheap."""
+        with self._lock:
+            if self._index is None:
+                self._index = CopingIndex.open(load_corpus(self.extra_path), self.directory)
+            return self._index
+
+    def search(self, query: str, k: int = None) -> list:
+        """Top snippets for a query that clear the score threshold."""
+        return [snippet for _, snippet in self.index().search(query, k or self.k, self.min_score)]
+
+    def augment(self, message):
+        """
+        Returns the message with relevant snippets as a leading part.
+
+        Args:
+            message: User message; non-text messages (e.g. tool responses) pass through
+
+        Returns:
+            The message unchanged when nothing relevant is found, else a list of Parts
+        """
+        if not self.enabled or not isinstance(message, str):
+            return message
+        started = time.perf_counter()
+        snippets = self.search(message)
+        with self._lock:
+            self._counters["messages"] += 1
+            self._counters["search_ms"] += (time.perf_counter() - started) * 1000
+            if snippets:
+                self._counters["augmented"] += 1
+                self._counters["snippets"] += len(snippets)
+        if not snippets:
+            return message
+        block = "\n\n".join(f"{snippet['title']}: {snippet['text']}" for snippet in snippets)
+        return [types.Part.from_text(text=f"{CONTEXT_HEADER}\n{block}"), types.Part.from_text(text=message)]
+
+    def stats(self) -> dict:
+        """Returns messages searched, how many got snippets, and mean search time."""
+        with self._lock:
+            stats = {"enabled": self.enabled, **self._counters}
+            documents = len(self._index.snippets) if self._index else None
+        stats["documents"] = documents
+        stats["mean_search_ms"] = round(stats.pop("search_ms") / stats["messages"], 3) if stats["messages"] else None
+        return stats
+
+
+def strip_context(history: list) -> list:
+    """Removes retrieved snippets from user turns so they are sent with one message only."""
+    stripped = []
+    for content in history:
+        parts = content.parts or []
+        if content.role == "user" and any(part.text and part.text.startswith(CONTEXT_HEADER) for part in parts):
+            content = content.model_copy(update={
+                "parts": [part for part in parts if not (part.text and part.text.startswith(CONTEXT_HEADER))]})
+        stripped.append(content)
+    return stripped
+
+
+def create_retriever() -> ContentRetriever:
+    """Builds the retriever configured by environment variables."""
+    return ContentRetriever(
+        directory=os.environ.get("WELLCARE_CONTENT_INDEX", "content_index"),
+        extra_path=os.environ.get("WELLCARE_CONTENT") or None,
+        k=int(os.environ.get("WELLCARE_RETRIEVAL_K", "3")),
+        enabled=os.environ.get("WELLCARE_RETRIEVAL", "1") != "0",
+    )
+
+
+retriever = create_retriever()
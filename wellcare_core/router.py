@@ -0,0 +1,129 @@
+"""
+Deterministic intent routing to the specialist sub-agents.
+
+Clear intents ("can we do the PHQ-9", "find me a therapist") are matched
+with precompiled keyword patterns and answered directly by the matching
+sub-agent, with its narrower instruction and tools. Messages flagged by the
+crisis screen always go to crisis_support_agent. Anything ambiguous, or
+with no match, falls back to the coordinator agent.
+
+WELLCARE_ROUTER: set to 0 to send every message to the coordinator (default: enabled)
+"""
+
+import os
+import re
+import threading
+from collections import namedtuple
+
+# Sub-agent name -> patterns that signal a clear request for that specialist
+DEFAULT_INTENTS = {
+    "wellness_assessor_agent": [
+        r"\b(phq|gad)[\s-]?[97]\b",
+        r"\b(screening|questionnaire|self[\s-]assessment)\b",
+        r"\b(assess|screen|test) me\b",
+        r"\b(depression|anxiety) (test|screening|assessment|score)\b",
+        r"\bam i (depressed|anxious)\b",
+    ],
+    "community_resource_agent": [
+        r"\b(find|recommend|looking for|need) (a |an )?(therapist|counsell?or|psychiatrist|psychologist)\b",
+        r"\b(therapists?|counsell?ors?|psychiatrists?) near\b",
+        r"\bsupport groups?\b",
+        r"\b(sliding scale|low[\s-]cost therapy|free therapy|insurance cover|employee assistance|eap)\b",
+        r"\b(mental health )?(resources|services) (near|in my area|nearby)\b",
+    ],
+    "personalized_wellness_planner": [
+        r"\b(wellness|self[\s-]care|coping|sleep|exercise|mindfulness) plan\b",
+        r"\b(make|create|build|design|write) (me )?(a )?(plan|routine|schedule)\b",
+        r"\bsleep hygiene\b",
+        r"\bdaily routine\b",
+    ],
+    "wellness_progress_agent": [
+        r"\b(my|track(ing)?( my)?) progress\b",
+        r"\bmood (log|journal|entries|trends?)\b",
+        r"\b(log|record|track|rate) my (mood|sleep|energy)\b",
+        r"\bhow (am i|have i been) doing\b",
+        r"\b(getting|feeling) better (than|since) (last|before)\b",
+    ],
+}
+
+Route = namedtuple("Route", ["agent", "intent", "matches"])
+
+
+class IntentRouter:
+    """Picks the agent for a message: a sub-agent for clear intents, else the coordinator."""
+
+    def __init__(self, coordinator, intents: dict = None, enabled: bool = True):
+        """
+        Args:
+            coordinator: Root agent; its sub_agents are the routing targets
+            intents: Sub-agent name -> regex patterns (default: DEFAULT_INTENTS)
+            enabled: When False, every message goes to the coordinator
+        """
+        self.coordinator = coordinator
+        self.enabled = enabled
+        self.agents = {agent.name: agent for agent in coordinator.sub_agents}
+        self.patterns = {
+            name: [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+            for name, patterns in (intents or DEFAULT_INTENTS).items()
+            if name in self.agents
+        }
+        self._lock = threading.Lock()
+        self._counts = {}
+
+    def classify(self, message: str, alert=None) -> Route:
+        """
+        Classifies a message without recording stats.
+
+        Args:
+            message: User's message
+            alert: Crisis alert from the local screen, if any
+
+        Returns:
+            Route with the chosen agent, the intent name (None for the
+            coordinator) and how many patterns matched
+        """
+        if alert and "crisis_support_agent" in self.agents:
+            return Route(self.agents["crisis_support_agent"], "crisis_support_agent", 1)
+        if not self.enabled:
+            return Route(self.coordinator, None, 0)
+
+        scores = {}
+        for name, patterns in self.patterns.items():
+            hits = sum(1 for pattern in patterns if pattern.search(message))
+            if hits:
+                scores[name] = hits
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        # Low confidence: nothing matched, or two specialists matched equally
+        if not ranked or (len(ranked) > 1 and ranked[0][1] == ranked[1][1]):
+            return Route(self.coordinator, None, ranked[0][1] if ranked else 0)
+        name, hits = ranked[0]
+        return Route(self.agents[name], name, hits)
+
+    def route(self, message: str, alert=None) -> Route:
+        """classify() plus per-agent routing counters."""
+        route = self.classify(message, alert)
+        with self._lock:
+            self._counts[route.agent.name] = self._counts.get(route.agent.name, 0) + 1
+        return route
+
+    def stats(self) -> dict:
+        """Returns turns routed to each agent and the share that skipped the coordinator."""
+        with self._lock:
+            counts = dict(self._counts)
+        total = sum(counts.values())
+        direct = total - counts.get(self.coordinator.name, 0)
+        return {
+            "enabled": self.enabled,
+            "turns": total,
+            "routed": counts,
+            "direct_rate": direct / total if total else 0.0,
+        }
+
+
+def create_router(coordinator) -> IntentRouter:
+    """Builds the intent router configured by environment variables."""
+    return IntentRouter(
+        coordinator,
+        enabled=os.environ.get("WELLCARE_ROUTER", "1").lower() in ("1", "true", "yes"),
+    )
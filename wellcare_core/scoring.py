@@ -0,0 +1,212 @@
+"""
+Batch PHQ-9 and GAD-7 scoring.
+
+Scores many completed questionnaires in one vectorized pass: item responses
+are summed per row and mapped to severity bands with np.searchsorted over
+the band upper bounds. Results match conduct_phq9_assessment and
+conduct_gad7_assessment row for row.
+
+    python -m wellcare_core.scoring phq9 responses.csv > scored.csv
+    python -m wellcare_core.scoring gad7 responses.jsonl --format jsonl
+
+CSV input has a header with item columns q1..qN and an optional id column.
+JSONL input has one object per line, either flat ({"id": .., "q1": ..}) or
+with the items under "responses". Answers must be whole numbers from 0 to 3
+("2", 2 and 2.0 are accepted; "2.9", 2.9, null or a missing cell are not);
+any malformed input raises ValueError.
+"""
+
+import argparse
+import csv
+import io
+import json
+import sys
+from collections import namedtuple
+
+import numpy as np
+
+Scale = namedtuple("Scale", ["items", "max_score", "upper_bounds", "severities", "interpretations"])
+
+# Band upper bounds are inclusive, as in the scalar if/elif chains
+SCALES = {
+    "phq9": Scale(
+        items=9,
+        max_score=27,
+        upper_bounds=np.array([4, 9, 14, 19]),
+        severities=np.array(["minimal", "mild", "moderate", "moderately_severe", "severe"]),
+        interpretations=np.array([
+            "Minimal or no depression", "Mild depression", "Moderate depression",
+            "Moderately severe depression", "Severe depression",
+        ]),
+    ),
+    "gad7": Scale(
+        items=7,
+        max_score=21,
+        upper_bounds=np.array([4, 9, 14]),
+        severities=np.array(["minimal", "mild", "moderate", "severe"]),
+        interpretations=np.array(["Minimal anxiety", "Mild anxiety", "Moderate anxiety", "Severe anxiety"]),
+    ),
+}
+
+
+def get_scale(name: str) -> Scale:
+    """Looks up a scale by name ("phq9" or "gad7"), ignoring case and dashes."""
+    key = name.lower().replace("-", "").replace("_", "")
+    if key not in SCALES:
+        raise ValueError(f"Unknown scale '{name}', expected one of: {', '.join(SCALES)}")
+    return SCALES[key]
+
+
+def score_batch(scale: str, responses) -> dict:
+    """
+    Scores a batch of questionnaires.
+
+    Args:
+        scale: "phq9" or "gad7"
+        responses: Array-like of shape (rows, items) with answers 0-3
+
+    Returns:
+        Dictionary of arrays: score, severity, interpretation (one entry per row)
+    """
+    spec = get_scale(scale)
+    answers = np.asarray(responses)
+    if answers.ndim != 2 or answers.shape[1] != spec.items:
+        raise ValueError(f"Expected responses of shape (rows, {spec.items}), got {answers.shape}")
+
+    invalid = np.flatnonzero(((answers < 0) | (answers > 3)).any(axis=1))
+    if invalid.size:
+        raise ValueError(f"Answers must be between 0 and 3 (first invalid row: {invalid[0]})")
+
+    scores = answers.sum(axis=1, dtype=np.int64)
+    bands = np.searchsorted(spec.upper_bounds, scores, side="left")
+    return {
+        "score": scores,
+        "severity": spec.severities[bands],
+        "interpretation": spec.interpretations[bands],
+    }
+
+
+def _item_columns(items: int) -> list:
+    return [f"q{i}" for i in range(1, items + 1)]
+
+
+def _answers(rows: list, items: int) -> np.ndarray:
+    """Converts parsed rows of answers into an int64 array, rejecting anything but whole numbers."""
+    try:
+        values = np.array(rows, dtype=np.float64).reshape(-1, items)
+    except (TypeError, ValueError):
+        raise ValueError("Answers must be whole numbers between 0 and 3") from None
+    # null answers become NaN, which fails the whole-number check along with fractions
+    invalid = np.flatnonzero((~np.isfinite(values) | (values != np.floor(values))).any(axis=1))
+    if invalid.size:
+        raise ValueError(f"Answers must be whole numbers between 0 and 3 (first invalid row: {invalid[0]})")
+    return values.astype(np.int64)
+
+
+def read_csv(text: str, items: int):
+    """Parses CSV text into (ids or None, answers array)."""
+    reader = csv.reader(io.StringIO(text))
+    header = [column.strip() for column in next(reader, [])]
+    missing = [column for column in _item_columns(items) if column not in header]
+    if missing:
+        raise ValueError(f"Missing item columns: {', '.join(missing)}")
+
+    rows = [row for row in reader if row]
+    columns = [header.index(column) for column in _item_columns(items)]
+    short = next((i for i, row in enumerate(rows) if len(row) < len(header)), None)
+    if short is not None:
+        raise ValueError(f"Row {short} has {len(rows[short])} columns, expected {len(header)}")
+    answers = _answers([[row[i].strip() for i in columns] for row in rows], items)
+    ids = [row[header.index("id")] for row in rows] if "id" in header else None
+    return ids, answers
+
+
+def read_jsonl(text: str, items: int):
+    """Parses JSONL text into (ids or None, answers array)."""
+    records = [json.loads(line) for line in text.splitlines() if line.strip()]
+    columns = _item_columns(items)
+    try:
+        rows = [[record.get("responses", record)[column] for column in columns] for record in records]
+    except KeyError as e:
+        raise ValueError(f"Missing item {e.args[0]}") from None
+    except (AttributeError, TypeError):
+        raise ValueError("Each line must be a JSON object of answers, or one with a \"responses\" object") from None
+    # bool is an int subtype, but true/false aren't answers
+    if any(isinstance(value, (bool, str)) for row in rows for value in row):
+        raise ValueError("Answers must be whole numbers between 0 and 3")
+    answers = _answers(rows, items)
+    ids = [record.get("id") for record in records] if any("id" in record for record in records) else None
+    return ids, answers
+
+
+def score_text(scale: str, text: str, fmt: str = "csv") -> dict:
+    """
+    Parses and scores a CSV or JSONL upload.
+
+    Args:
+        scale: "phq9" or "gad7"
+        text: File contents
+        fmt: "csv" or "jsonl"
+
+    Returns:
+        Dictionary with ids (or None), score, severity and interpretation arrays
+    """
+    items = get_scale(scale).items
+    ids, answers = read_jsonl(text, items) if fmt == "jsonl" else read_csv(text, items)
+    return {"ids": ids, **score_batch(scale, answers)}
+
+
+def to_json(scale: str, result: dict) -> dict:
+    """JSON-serializable scores plus a count per severity band."""
+    spec = get_scale(scale)
+    return {
+        "scale": scale,
+        "count": len(result["score"]),
+        "max_score": spec.max_score,
+        "ids": result["ids"],
+        "score": result["score"].tolist(),
+        "severity": result["severity"].tolist(),
+        "severity_counts": {
+            severity: int(np.count_nonzero(result["severity"] == severity))
+            for severity in spec.severities.tolist()
+        },
+    }
+
+
+def write_results(result: dict, out, fmt: str = "csv"):
+    """Writes scored rows as CSV (id,score,severity,interpretation) or JSONL."""
+    ids = result["ids"] or range(len(result["score"]))
+    rows = zip(ids, result["score"].tolist(), result["severity"].tolist(), result["interpretation"].tolist())
+    if fmt == "jsonl":
+        for row_id, score, severity, interpretation in rows:
+            out.write(json.dumps({"id": row_id, "score": score, "severity": severity,
+                                  "interpretation": interpretation}) + "\n")
+        return
+    writer = csv.writer(out)
+    writer.writerow(["id", "score", "severity", "interpretation"])
+    writer.writerows(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score PHQ-9 or GAD-7 questionnaires in bulk.")
+    parser.add_argument("scale", choices=sorted(SCALES))
+    parser.add_argument("path", help="CSV or JSONL file, or - for stdin")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="input/output format (default: from extension)")
+    args = parser.parse_args()
+
+    fmt = args.format or ("jsonl" if args.path.endswith((".jsonl", ".ndjson")) else "csv")
+    if args.path == "-":
+        text = sys.stdin.read()
+    else:
+        with open(args.path, encoding="utf-8") as f:
+            text = f.read()
+
+    try:
+        result = score_text(args.scale, text, fmt)
+    except ValueError as e:
+        sys.exit(f"Error: {e}")
+    write_results(result, sys.stdout, fmt)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+"""
+Session stores for chat conversation history.
+
+Conversations are kept as compact, compressed JSON so any worker can rebuild
+a chat from the stored history. Two backends are provided:
+
+- MemorySessionStore: per-process LRU + TTL cache with a hard session cap
+- SQLiteSessionStore: a shared file that every gunicorn/uvicorn worker can use
+
+Each session also records its owner: the user id the server gave the
+client that created it (see wellcare_core/identity.py), or the session id
+itself. The owner is fixed when the session is created, never taken from a
+later request. Saved plans and progress are filed under the owner, and the
+web apps only serve them to a live session that owns them.
+
+Small JSON values can be kept with a session under a key (get_state and
+put_state), such as the questionnaire in progress, so that every worker
+sharing the store sees them. They expire with the session.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+from google.genai import types
+
+
+def _is_text_part(part: dict) -> bool:
+    return set(part) == {"text"}
+
+
+def serialize_history(history: list) -> bytes:
+    """
+    Encodes chat history as compressed JSON.
+
+    Streamed replies are recorded as one Content per chunk, so consecutive
+    turns from the same role and adjacent plain-text parts are merged first.
+
+    Args:
+        history: List of genai Content objects
+
+    Returns:
+        zlib-compressed JSON bytes
+    """
+    payload = []
+    for content in history:
+        item = content.model_dump(mode="json", exclude_none=True)
+        parts = item.get("parts", [])
+        if payload and payload[-1].get("role") == item.get("role"):
+            merged = payload[-1].setdefault("parts", [])
+        else:
+            item["parts"] = merged = []
+            payload.append(item)
+
+        for part in parts:
+            if merged and _is_text_part(merged[-1]) and _is_text_part(part):
+                merged[-1] = {"text": merged[-1]["text"] + part["text"]}
+            else:
+                merged.append(part)
+
+    return zlib.compress(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+
+
+def deserialize_history(data: bytes) -> list:
+    """
+    Decodes history written by serialize_history.
+
+    Args:
+        data: zlib-compressed JSON bytes
+
+    Returns:
+        List of genai Content objects
+    """
+    return [types.Content.model_validate(item) for item in json.loads(zlib.decompress(data))]
+
+
+class SessionStore(ABC):
+    """Interface for session backends. Values are serialized history bytes."""
+
+    # Calls may wait on disk or on other processes, so async callers run them in a thread
+    blocking = False
+
+    def __init__(self):
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0}
+        self._counter_lock = threading.Lock()
+
+    def _count(self, name: str, amount: int = 1):
+        with self._counter_lock:
+            self._counters[name] += amount
+
+    @abstractmethod
+    def get(self, session_id: str):
+        """Returns the stored history for session_id, or None if unknown or expired."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def put(self, session_id: str, history: list):
+        """Stores history for session_id, creating the session if needed."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def create(self, session_id: str, owner: str = None):
+        """
+        Starts session_id with an empty history, filed under owner.
+
+        Args:
+            session_id: New chat session
+            owner: Server-issued user id whose plans and progress the session uses; None files them under session_id
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def owner(self, session_id: str):
+        """Returns the owner bound when session_id was created, else session_id; None if unknown or expired."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_state(self, session_id: str, key: str):
+        """Returns the JSON value stored under key for session_id, or None if unset, unknown or expired."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def put_state(self, session_id: str, key: str, value):
+        """Stores a JSON value under key for a live session_id; None clears it. Unknown sessions are ignored."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, session_id: str):
+        """Removes session_id if present."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def __len__(self):
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        """Returns hit, miss and eviction counters plus the live session count."""
+        with self._counter_lock:
+            counters = dict(self._counters)
+        counters["sessions"] = len(self)
+        return counters
+
+
+class MemorySessionStore(SessionStore):
+    """In-process LRU store that evicts idle sessions after ttl seconds."""
+
+    def __init__(self, max_sessions: int = 10000, ttl: float = 3600):
+        super().__init__()
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str):
+        with self._lock:
+            item = self._items.get(session_id)
+            if item is None:
+                self._count("misses")
+                return None
+
+            data, expires_at, owner, state = item
+            if expires_at <= time.monotonic():
+                del self._items[session_id]
+                self._count("evictions")
+                self._count("misses")
+                return None
+
+            # Reading a session keeps it alive
+            self._items[session_id] = (data, time.monotonic() + self.ttl, owner, state)
+            self._items.move_to_end(session_id)
+            self._count("hits")
+
+        return deserialize_history(data)
+
+    def put(self, session_id: str, history: list):
+        data = serialize_history(history)
+        with self._lock:
+            _, _, owner, state = self._items.get(session_id, (None, None, None, {}))
+            self._items[session_id] = (data, time.monotonic() + self.ttl, owner, state)
+            self._items.move_to_end(session_id)
+            self._evict()
+
+    def create(self, session_id: str, owner: str = None):
+        data = serialize_history([])
+        with self._lock:
+            self._items[session_id] = (data, time.monotonic() + self.ttl, owner, {})
+            self._items.move_to_end(session_id)
+            self._evict()
+
+    def owner(self, session_id: str):
+        with self._lock:
+            item = self._items.get(session_id)
+            if item is None or item[1] <= time.monotonic():
+                return None
+        return item[2] or session_id
+
+    def get_state(self, session_id: str, key: str):
+        with self._lock:
+            item = self._items.get(session_id)
+            if item is None or item[1] <= time.monotonic() or key not in item[3]:
+                return None
+            # Stored as JSON text, so callers can't change it in place, as with the SQLite store
+            return json.loads(item[3][key])
+
+    def put_state(self, session_id: str, key: str, value):
+        with self._lock:
+            item = self._items.get(session_id)
+            if item is None or item[1] <= time.monotonic():
+                return
+            if value is None:
+                item[3].pop(key, None)
+            else:
+                item[3][key] = json.dumps(value)
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._items.pop(session_id, None)
+
+    def __len__(self):
+        return len(self._items)
+
+    def _evict(self):
+        """Drops expired sessions from the LRU end, then enforces max_sessions."""
+        now = time.monotonic()
+        evicted = 0
+        while self._items:
+            session_id, (_, expires_at, _, _) = next(iter(self._items.items()))
+            if expires_at > now and len(self._items) <= self.max_sessions:
+                break
+            del self._items[session_id]
+            evicted += 1
+        if evicted:
+            self._count("evictions", evicted)
+
+
+class SQLiteSessionStore(SessionStore):
+    """SQLite-backed store shared by every worker process on the host."""
+
+    blocking = True
+
+    def __init__(self, path: str = "sessions.db", ttl: float = 3600):
+        super().__init__()
+        self.ttl = ttl
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, history BLOB NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_expires_at ON sessions (expires_at)")
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(sessions)")}
+        # Databases created before sessions recorded their owner or state
+        if "owner" not in columns:
+            self._conn.execute("ALTER TABLE sessions ADD COLUMN owner TEXT")
+        if "state" not in columns:
+            self._conn.execute("ALTER TABLE sessions ADD COLUMN state TEXT")
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT history, expires_at FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if row is None:
+                self._count("misses")
+                return None
+
+            data, expires_at = row
+            if expires_at <= now:
+                self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+                self._count("evictions")
+                self._count("misses")
+                return None
+
+            self._conn.execute(
+                "UPDATE sessions SET expires_at = ? WHERE session_id = ?", (now + self.ttl, session_id)
+            )
+            self._count("hits")
+
+        return deserialize_history(data)
+
+    def put(self, session_id: str, history: list):
+        data = serialize_history(history)
+        now = time.time()
+        with self._lock:
+            # Upsert rather than replace, so the session keeps its owner
+            self._conn.execute(
+                "INSERT INTO sessions (session_id, history, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (session_id) DO UPDATE SET history = excluded.history, expires_at = excluded.expires_at",
+                (session_id, data, now + self.ttl)
+            )
+            evicted = self._conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,)).rowcount
+        if evicted:
+            self._count("evictions", evicted)
+
+    def create(self, session_id: str, owner: str = None):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, history, expires_at, owner) VALUES (?, ?, ?, ?)",
+                (session_id, serialize_history([]), now + self.ttl, owner)
+            )
+            evicted = self._conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,)).rowcount
+        if evicted:
+            self._count("evictions", evicted)
+
+    def owner(self, session_id: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT owner FROM sessions WHERE session_id = ? AND expires_at > ?", (session_id, time.time())
+            ).fetchone()
+        if row is None:
+            return None
+        return row[0] or session_id
+
+    def get_state(self, session_id: str, key: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT state FROM sessions WHERE session_id = ? AND expires_at > ?", (session_id, time.time())
+            ).fetchone()
+        return json.loads(row[0]).get(key) if row and row[0] else None
+
+    def put_state(self, session_id: str, key: str, value):
+        # Set or remove the one key in SQL, so workers updating different keys don't overwrite each other
+        path = "$." + json.dumps(key)
+        with self._lock:
+            if value is None:
+                self._conn.execute("UPDATE sessions SET state = json_remove(state, ?) "
+                                   "WHERE session_id = ? AND state IS NOT NULL", (path, session_id))
+            else:
+                self._conn.execute("UPDATE sessions SET state = json_set(coalesce(state, '{}'), ?, json(?)) "
+                                   "WHERE session_id = ? AND expires_at > ?",
+                                   (path, json.dumps(value), session_id, time.time()))
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+def create_session_store() -> SessionStore:
+    """
+    Builds the session store selected by environment variables.
+
+    WELLCARE_SESSION_BACKEND: "memory" (default) or "sqlite"
+    WELLCARE_SESSION_DB: SQLite file path (default: sessions.db)
+    WELLCARE_SESSION_TTL: idle seconds before a session expires (default: 3600)
+    WELLCARE_MAX_SESSIONS: memory backend session cap (default: 10000)
+    """
+    backend = os.environ.get("WELLCARE_SESSION_BACKEND", "memory")
+    ttl = float(os.environ.get("WELLCARE_SESSION_TTL", "3600"))
+
+    if backend == "sqlite":
+        return SQLiteSessionStore(os.environ.get("WELLCARE_SESSION_DB", "sessions.db"), ttl=ttl)
+    if backend == "memory":
+        return MemorySessionStore(int(os.environ.get("WELLCARE_MAX_SESSIONS", "10000")), ttl=ttl)
+    raise ValueError(f"Unknown WELLCARE_SESSION_BACKEND: {backend}")
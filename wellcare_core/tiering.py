@@ -0,0 +1,375 @@
+"""
+Per-agent and per-turn model selection with escalation.
+
+Every agent used to run on the same model, including for "hi" and "thanks".
+Here each turn runs on one of two tiers:
+
+- full: the agent's own model (or WELLCARE_MODEL_FULL). Crisis turns (any
+  turn the crisis screen or the questionnaire flagged), the crisis and
+  planner agents, and anything not listed below always use it.
+- lite: a smaller, faster model (WELLCARE_MODEL_LITE) for the agents in
+  WELLCARE_LITE_AGENTS and for small talk addressed to any other agent.
+  Small talk is a message that is only a greeting, thanks or a bare
+  acknowledgement ("hi", "thanks!", "ok"); "yes", "no" and anything with
+  more words after the greeting carry meaning and stay on the full tier.
+
+A lite reply that fails validation (the call errored, the reply is empty,
+or generation stopped for any reason but STOP, e.g. SAFETY or MAX_TOKENS)
+is discarded and the turn is rerun on the full model from the same history.
+The rerun runs under tools.tool_replay: a call to a tool with side effects
+(saving a plan, logging a mood) that the lite attempt already made is
+answered with that attempt's result instead of running again. A streamed reply can only be escalated until its first
+text reaches the user; after that it is kept as it is.
+
+Each attempt is traced as a span of kind "tier" (so /metrics has latency
+and token counts per tier), and stats() estimates the time and full-model
+tokens saved.
+
+WELLCARE_TIERING: set to 0 to run every turn on the agent's own model (default: enabled)
+WELLCARE_MODEL_LITE: model for lite turns (default: gemini-2.0-flash-lite)
+WELLCARE_MODEL_FULL: model for full turns (default: each agent's own model)
+WELLCARE_LITE_AGENTS: comma-separated agents that run on the lite tier (default: community_resource_agent)
+"""
+
+import os
+import re
+import threading
+import time
+from collections import namedtuple
+
+from wellcare_core.chat import TokenUsage
+from wellcare_core.tools import ToolReplay, tool_replay
+from wellcare_core.tracing import tracer
+
+LITE, FULL = "lite", "full"
+
+DEFAULT_LITE_MODEL = "gemini-2.0-flash-lite"
+DEFAULT_LITE_AGENTS = ("community_resource_agent",)
+# Never downgraded, whatever the message looks like
+FULL_AGENTS = ("crisis_support_agent", "personalized_wellness_planner")
+
+# Whole messages that are only a greeting, thanks or acknowledgement and need no reasoning
+SMALL_TALK = re.compile(
+    r"^\s*(?:(?:hi|hiya|hello|hey)(?: there)?|good (?:morning|afternoon|evening|night)|"
+    r"thanks?(?: (?:so much|a lot))?|thank you(?: (?:so much|very much))?|thx|cheers|ok(?:ay)?|cool|great|nice|"
+    r"bye|goodbye|see you)[\s!.,:)]*$",
+    re.IGNORECASE,
+)
+SMALL_TALK_MAX_CHARS = 60
+
+# Finish reasons that mean the reply is complete
+_FINISHED = ("STOP", "FINISH_REASON_UNSPECIFIED")
+
+Tier = namedtuple("Tier", ["name", "model", "reason"])
+
+
+def reply_text(response) -> str:
+    """Text parts of a response (without the SDK's warning about non-text parts)."""
+    candidates = getattr(response, "candidates", None) or []
+    content = candidates[0].content if candidates else None
+    return "".join(part.text or "" for part in (content and content.parts) or [] if not part.thought)
+
+
+def failure(response, text: str = None):
+    """
+    Why a reply fails validation, or None if it is usable.
+
+    Args:
+        response: Final GenerateContentResponse of a turn (for streams, the last chunk)
+        text: Reply text, when it was gathered elsewhere (streams)
+
+    Returns:
+        "empty", "blocked" or a lower-cased finish reason such as "safety", else None
+    """
+    if response is None:
+        return "empty"
+    feedback = getattr(response, "prompt_feedback", None)
+    if feedback is not None and feedback.block_reason:
+        return "blocked"
+    candidates = response.candidates or []
+    finish = candidates[0].finish_reason if candidates else None
+    finish = getattr(finish, "name", finish)
+    if finish and finish not in _FINISHED:
+        return str(finish).lower()
+    if not (reply_text(response) if text is None else text).strip():
+        return "empty"
+    return None
+
+
+class _TurnUsage(TokenUsage):
+    """Token counts for one attempt, also added to the shared totals."""
+
+    def __init__(self, parent: TokenUsage = None):
+        super().__init__()
+        self.parent = parent
+
+    def record(self, usage):
+        super().record(usage)
+        if self.parent:
+            self.parent.record(usage)
+
+
+class TieredTurn:
+    """One user turn on its selected tier, escalated to the full tier if the reply fails validation."""
+
+    def __init__(self, tiers, tier: Tier, full: Tier):
+        self.tiers = tiers
+        self.tier = tier
+        self._full = full
+        # Chat the accepted reply came from, for reading back history
+        self.session = None
+        self.escalated = None
+
+    def _can_escalate(self) -> bool:
+        return self.tier.name == LITE and self._full.model != self.tier.model
+
+    def _escalate(self, reason: str):
+        self.escalated = reason
+        self.tier = self._full._replace(reason=f"escalated:{reason}")
+
+    def run(self, open_chat, send, usage: TokenUsage = None):
+        """
+        Runs the turn, escalating once if the lite reply fails validation.
+
+        Args:
+            open_chat: Callable (model) -> new chat with the turn's history
+            send: Callable (chat, usage) -> final response (e.g. a run_turn wrapper)
+            usage: Shared token totals to add this turn's counts to
+
+        Returns:
+            The accepted response
+        """
+        with tool_replay(ToolReplay()) as replay:
+            while True:
+                turn_usage = _TurnUsage(usage)
+                started = time.perf_counter()
+                with tracer.span(self.tier.name, "tier", model=self.tier.model, reason=self.tier.reason) as span:
+                    try:
+                        self.session = open_chat(self.tier.model)
+                        response = send(self.session, turn_usage)
+                        reason = failure(response)
+                    except Exception:
+                        if not self._can_escalate():
+                            raise
+                        reason = "error"
+                    escalate = reason is not None and self._can_escalate()
+                    self.tiers.record(self.tier.name, time.perf_counter() - started, turn_usage, reason, escalate)
+                    span.set(**_token_attributes(turn_usage), escalated=escalate)
+                if not escalate:
+                    return response
+                replay.next_attempt()
+                self._escalate(reason)
+
+    def stream(self, open_chat, send, usage: TokenUsage = None):
+        """
+        Streaming run(): send returns a chunk iterator. Escalates only if no text was yielded yet.
+
+        Yields:
+            Response chunks of the accepted attempt
+        """
+        with tool_replay(ToolReplay()) as replay:
+            while True:
+                turn_usage = _TurnUsage(usage)
+                started = time.perf_counter()
+                text, last = [], None
+                with tracer.span(self.tier.name, "tier", model=self.tier.model, reason=self.tier.reason,
+                                 stream=True) as span:
+                    try:
+                        self.session = open_chat(self.tier.model)
+                        for chunk in send(self.session, turn_usage):
+                            last = chunk
+                            text.append(reply_text(chunk))
+                            yield chunk
+                        reason = failure(last, "".join(text))
+                    except Exception:
+                        if "".join(text).strip() or not self._can_escalate():
+                            raise
+                        reason = "error"
+                    escalate = reason is not None and not "".join(text).strip() and self._can_escalate()
+                    self.tiers.record(self.tier.name, time.perf_counter() - started, turn_usage, reason, escalate)
+                    span.set(**_token_attributes(turn_usage), escalated=escalate)
+                if not escalate:
+                    return
+                replay.next_attempt()
+                self._escalate(reason)
+
+    async def arun(self, open_chat, send, usage: TokenUsage = None):
+        """Async run(): open_chat and send are coroutine functions."""
+        with tool_replay(ToolReplay()) as replay:
+            while True:
+                turn_usage = _TurnUsage(usage)
+                started = time.perf_counter()
+                with tracer.span(self.tier.name, "tier", model=self.tier.model, reason=self.tier.reason) as span:
+                    try:
+                        self.session = await open_chat(self.tier.model)
+                        response = await send(self.session, turn_usage)
+                        reason = failure(response)
+                    except Exception:
+                        if not self._can_escalate():
+                            raise
+                        reason = "error"
+                    escalate = reason is not None and self._can_escalate()
+                    self.tiers.record(self.tier.name, time.perf_counter() - started, turn_usage, reason, escalate)
+                    span.set(**_token_attributes(turn_usage), escalated=escalate)
+                if not escalate:
+                    return response
+                replay.next_attempt()
+                self._escalate(reason)
+
+    async def astream(self, open_chat, send, usage: TokenUsage = None):
+        """Async stream(): open_chat is a coroutine function and send returns an async iterator."""
+        with tool_replay(ToolReplay()) as replay:
+            while True:
+                turn_usage = _TurnUsage(usage)
+                started = time.perf_counter()
+                text, last = [], None
+                with tracer.span(self.tier.name, "tier", model=self.tier.model, reason=self.tier.reason,
+                                 stream=True) as span:
+                    try:
+                        self.session = await open_chat(self.tier.model)
+                        async for chunk in send(self.session, turn_usage):
+                            last = chunk
+                            text.append(reply_text(chunk))
+                            yield chunk
+                        reason = failure(last, "".join(text))
+                    except Exception:
+                        if "".join(text).strip() or not self._can_escalate():
+                            raise
+                        reason = "error"
+                    escalate = reason is not None and not "".join(text).strip() and self._can_escalate()
+                    self.tiers.record(self.tier.name, time.perf_counter() - started, turn_usage, reason, escalate)
+                    span.set(**_token_attributes(turn_usage), escalated=escalate)
+                if not escalate:
+                    return
+                replay.next_attempt()
+                self._escalate(reason)
+
+
+def _token_attributes(usage: TokenUsage) -> dict:
+    totals = usage.stats()
+    return {"prompt_tokens": totals["prompt_tokens"], "output_tokens": totals["output_tokens"]}
+
+
+class ModelTiers:
+    """Chooses the model tier for each turn and keeps per-tier latency, token and escalation counters."""
+
+    def __init__(self, lite_model: str = DEFAULT_LITE_MODEL, full_model: str = None,
+                 lite_agents=DEFAULT_LITE_AGENTS, enabled: bool = True):
+        """
+        Args:
+            lite_model: Model for lite turns
+            full_model: Model for full turns (default: each agent's own model)
+            lite_agents: Agent names that always run on the lite tier
+            enabled: When False, every turn runs on the agent's own model
+        """
+        self.lite_model = lite_model
+        self.full_model = full_model
+        self.lite_agents = set(lite_agents) - set(FULL_AGENTS)
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._tiers = {name: {"turns": 0, "seconds": 0.0, "prompt_tokens": 0, "output_tokens": 0}
+                       for name in (LITE, FULL)}
+        self._escalations = {}
+        self._failures = {}
+        self._escalation_seconds = 0.0
+
+    def full(self, agent) -> Tier:
+        """The full tier for an agent."""
+        return Tier(FULL, (self.full_model or agent.model) if self.enabled else agent.model, "default")
+
+    def select(self, agent, message, alert=None) -> Tier:
+        """
+        Picks the tier for a turn.
+
+        Args:
+            agent: Agent answering the turn
+            message: User's message (non-text messages never count as small talk)
+            alert: Crisis alert from the local screen, if any
+
+        Returns:
+            Tier with the model to use and why it was chosen
+        """
+        if not self.enabled:
+            return Tier(FULL, agent.model, "disabled")
+        if alert:
+            return self.full(agent)._replace(reason="crisis")
+        if agent.name in FULL_AGENTS:
+            return self.full(agent)._replace(reason="agent")
+        if agent.name in self.lite_agents:
+            return Tier(LITE, self.lite_model, "agent")
+        if isinstance(message, str) and len(message) <= SMALL_TALK_MAX_CHARS and SMALL_TALK.match(message):
+            return Tier(LITE, self.lite_model, "small_talk")
+        return self.full(agent)
+
+    def start(self, agent, message, alert=None) -> TieredTurn:
+        """A TieredTurn on the tier select() picks."""
+        return TieredTurn(self, self.select(agent, message, alert), self.full(agent))
+
+    def record(self, tier: str, seconds: float, usage: TokenUsage, failure: str = None, escalated: bool = False):
+        """
+        Adds one attempt.
+
+        Args:
+            tier: Tier the attempt ran on
+            seconds: Attempt duration
+            usage: The attempt's token counts
+            failure: Why the reply failed validation, if it did
+            escalated: The attempt was discarded for a full-tier rerun; it counts as overhead, not as a turn
+        """
+        totals = usage.stats()
+        with self._lock:
+            if escalated:
+                self._escalations[failure] = self._escalations.get(failure, 0) + 1
+                self._escalation_seconds += seconds
+                return
+            if failure:
+                self._failures[failure] = self._failures.get(failure, 0) + 1
+            counters = self._tiers[tier]
+            counters["turns"] += 1
+            counters["seconds"] += seconds
+            counters["prompt_tokens"] += totals["prompt_tokens"]
+            counters["output_tokens"] += totals["output_tokens"]
+
+    def stats(self) -> dict:
+        """Returns turns, mean latency and tokens per tier, escalations and failures, and estimated savings."""
+        with self._lock:
+            tiers = {name: dict(counters) for name, counters in self._tiers.items()}
+            escalations = dict(self._escalations)
+            failures = dict(self._failures)
+            escalation_seconds = self._escalation_seconds
+
+        for counters in tiers.values():
+            turns = counters["turns"]
+            counters["mean_seconds"] = round(counters.pop("seconds") / turns, 3) if turns else None
+        lite, full = tiers[LITE], tiers[FULL]
+        attempted = lite["turns"] + sum(escalations.values())
+        saved = None
+        if lite["mean_seconds"] is not None and full["mean_seconds"] is not None:
+            saved = round(lite["turns"] * (full["mean_seconds"] - lite["mean_seconds"]) - escalation_seconds, 3)
+        return {
+            "enabled": self.enabled,
+            "lite_model": self.lite_model,
+            "full_model": self.full_model,
+            "tiers": tiers,
+            "lite_share": lite["turns"] / (lite["turns"] + full["turns"]) if lite["turns"] + full["turns"] else 0.0,
+            "escalations": escalations,
+            "escalation_rate": sum(escalations.values()) / attempted if attempted else 0.0,
+            # Replies that failed validation but were kept (full tier, or a stream already shown)
+            "unescalated_failures": failures,
+            # Time the lite tier saved against full-tier turns, net of failed lite attempts
+            "estimated_seconds_saved": saved,
+            # Tokens served by the lite model that the full model would otherwise have processed
+            "full_model_tokens_avoided": lite["prompt_tokens"] + lite["output_tokens"],
+        }
+
+
+def create_tiers() -> ModelTiers:
+    """Builds the model tiers configured by environment variables."""
+    lite_agents = os.environ.get("WELLCARE_LITE_AGENTS")
+    return ModelTiers(
+        lite_model=os.environ.get("WELLCARE_MODEL_LITE", DEFAULT_LITE_MODEL),
+        full_model=os.environ.get("WELLCARE_MODEL_FULL") or None,
+        lite_agents=DEFAULT_LITE_AGENTS if lite_agents is None else
+        [name.strip() for name in lite_agents.split(",") if name.strip()],
+        enabled=os.environ.get("WELLCARE_TIERING", "1").lower() in ("1", "true", "yes"),
+    )
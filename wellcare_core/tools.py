@@ -0,0 +1,429 @@
+"""
+Validated, concurrent execution of the agents' tool calls.
+
+Tools used to run one after another on the request thread, with whatever
+arguments the model sent. Now:
+
+- each tool declared with @tool checks its arguments against a pydantic
+  schema, given explicitly or built from its signature. The check is part
+  of the tool, so direct callers (ADK, the local questionnaire) get it too.
+  Bad arguments come back as {"error": ..., "invalid_arguments": [...]}
+  for the model to correct, instead of producing a wrong score.
+- the calls from one model turn run concurrently on a shared thread pool,
+  off the event loop in the ASGI app. Pure tools run side by side. Tools
+  with side effects or that read user state keep their order on a single
+  worker, so a log_mood followed by get_progress_summary still sees the
+  new entry. Responses go back in call order.
+- results of pure tools are cached, keyed by tool name and arguments, and
+  a pure call repeated within one turn runs once.
+- every invocation is timed per tool. A pure call has a deadline counted
+  from when it starts running, not while it waits for a pool thread; if
+  it overruns it is answered with an error and its thread is left to
+  finish. A call with side effects is waited for once it has started,
+  since answering "timed out" would hide an effect that still happens.
+- inside tool_replay(), a turn that is rerun (e.g. escalated to another
+  model) gets back the first attempt's result for each repeated call to a
+  tool with side effects, instead of running it, and saving a plan or
+  logging a mood, twice.
+
+Each call keeps the caller's context, so tracing spans nest under the
+turn and tools see the same plan owner.
+
+WELLCARE_TOOL_WORKERS: thread pool size (default: 16)
+WELLCARE_TOOL_TIMEOUT: seconds a pure tool call may run (default: 10)
+WELLCARE_TOOL_CACHE: pure-tool results kept, 0 to disable caching (default: 1024)
+"""
+
+import asyncio
+import contextvars
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from google.genai import types
+from pydantic import BaseModel, ConfigDict, ValidationError, create_model
+
+from wellcare_core.tracing import tracer
+
+
+class ToolArgs(BaseModel):
+    """Base for tool argument schemas: unknown arguments are rejected rather than ignored."""
+
+    model_config = ConfigDict(extra="forbid")
+
+
+def signature_schema(fn) -> type:
+    """A ToolArgs model with one field per parameter of fn, typed by its annotations."""
+    fields = {}
+    for name, parameter in inspect.signature(fn).parameters.items():
+        annotation = parameter.annotation if parameter.annotation is not inspect.Parameter.empty else object
+        default = parameter.default if parameter.default is not inspect.Parameter.empty else ...
+        fields[name] = (annotation, default)
+    return create_model(f"{fn.__name__}_args", __base__=ToolArgs, **fields)
+
+
+def _issues(error: ValidationError) -> list:
+    return [f"{'.'.join(map(str, issue['loc'])) or 'arguments'}: {issue['msg']}" for issue in error.errors()]
+
+
+def tool(schema: type = None, pure: bool = False):
+    """
+    Declares an agent tool: validates its arguments on every call and marks whether it is pure.
+
+    The wrapper keeps the function's name, docstring and signature, so
+    model function declarations and ADK tools are built from it unchanged.
+
+    Args:
+        schema: ToolArgs subclass with one field per parameter (default: built from the signature)
+        pure: The result depends only on the arguments, so it can be cached and run alongside other calls
+    """
+    def decorate(fn):
+        model = schema or signature_schema(fn)
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        def validated(*args, **kwargs):
+            try:
+                arguments = model.model_validate(signature.bind(*args, **kwargs).arguments)
+            except TypeError as e:
+                return {"error": f"Invalid arguments for {fn.__name__}", "invalid_arguments": [str(e)]}
+            except ValidationError as e:
+                return {"error": f"Invalid arguments for {fn.__name__}", "invalid_arguments": _issues(e)}
+            return fn(**{name: getattr(arguments, name) for name in model.model_fields})
+
+        validated.pure = pure
+        validated.args_schema = model
+        return validated
+
+    return decorate
+
+
+class ToolReplay:
+    """Results of side-effecting calls from a turn's earlier attempts, handed back when a rerun repeats them."""
+
+    def __init__(self):
+        self._previous = {}
+        self._current = {}
+        self._lock = threading.Lock()
+
+    def next_attempt(self):
+        """Makes the calls recorded so far available to the next attempt."""
+        with self._lock:
+            for key, results in self._current.items():
+                self._previous.setdefault(key, []).extend(results)
+            self._current = {}
+
+    def take(self, key):
+        """The earliest unused result of an earlier attempt's identical call, or None."""
+        with self._lock:
+            results = self._previous.get(key)
+            return results.pop(0) if results else None
+
+    def record(self, key, result: dict):
+        with self._lock:
+            self._current.setdefault(key, []).append(result)
+
+
+_replay = contextvars.ContextVar("wellcare_tool_replay", default=None)
+
+
+@contextmanager
+def tool_replay(replay: ToolReplay):
+    """Runs the block's tool calls against replay: impure calls made in an earlier attempt aren't run again."""
+    token = _replay.set(replay)
+    try:
+        yield replay
+    finally:
+        try:
+            _replay.reset(token)
+        except ValueError:
+            # Exited from a different context (e.g. a generator closed elsewhere)
+            _replay.set(None)
+
+
+def _call_key(call):
+    try:
+        return call.name, json.dumps(call.args or {}, sort_keys=True)
+    except TypeError:
+        return None
+
+
+def _timeout_result(name: str, timeout: float) -> dict:
+    return {"error": f"{name} did not finish within {timeout:g} seconds"}
+
+
+class _Progress:
+    """When each call of a batch started running, guarded by a condition the workers notify."""
+
+    def __init__(self, count: int, wake=None):
+        self.started = [None] * count
+        self.closed = False
+        self.condition = threading.Condition()
+        # Extra notification for asyncio waiters
+        self.wake = wake
+
+
+class ToolRuntime:
+    """Runs one model turn's tool calls concurrently, with caching for pure tools and per-tool timings."""
+
+    def __init__(self, max_workers: int = 16, timeout: float = 10.0, cache_size: int = 1024):
+        """
+        Args:
+            max_workers: Thread pool size
+            timeout: Seconds a pure tool call may run before it is answered with an error
+            cache_size: Pure-tool results kept (least recently used dropped first); 0 disables caching
+        """
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.cache_size = cache_size
+        self._pool = None
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._tools = {}
+        self._counters = {"batches": 0, "concurrent_batches": 0, "calls": 0, "cache_hits": 0, "repeats": 0,
+                          "replayed": 0, "timeouts": 0, "wall_seconds": 0.0, "call_seconds": 0.0}
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="tools")
+            return self._pool
+
+    def _tool_stats(self, name: str) -> dict:
+        """Counters for one tool. Call with the lock held."""
+        if name not in self._tools:
+            self._tools[name] = {"calls": 0, "cache_hits": 0, "errors": 0, "invalid": 0, "timeouts": 0,
+                                 "seconds": 0.0, "max_seconds": 0.0}
+        return self._tools[name]
+
+    def _cache_key(self, fn, call):
+        """Cache key for a pure tool's call, or None when it can't be cached."""
+        if not self.cache_size or not getattr(fn, "pure", False):
+            return None
+        return _call_key(call)
+
+    def _cached(self, key):
+        with self._lock:
+            result = self._cache.get(key) if key else None
+            if result is not None:
+                self._cache.move_to_end(key)
+                self._counters["cache_hits"] += 1
+                self._tool_stats(key[0])["cache_hits"] += 1
+        return result
+
+    def _execute(self, fn, call, key) -> dict:
+        """Runs one call inside its span and records its time, outcome and (if pure) result."""
+        # Unknown names come from the model, so they share one span name to bound metric labels
+        with tracer.span(call.name if fn else "unknown_tool", "tool") as span:
+            started = time.perf_counter()
+            try:
+                result = fn(**(call.args or {})) if fn else {"error": f"Unknown tool: {call.name}"}
+            except Exception as e:
+                result = {"error": str(e)}
+            seconds = time.perf_counter() - started
+            if not isinstance(result, dict):
+                result = {"result": result}
+            if "error" in result:
+                span.set(error=result["error"])
+        with self._lock:
+            self._counters["call_seconds"] += seconds
+            stats = self._tool_stats(call.name if fn else "unknown_tool")
+            stats["calls"] += 1
+            stats["seconds"] += seconds
+            stats["max_seconds"] = max(stats["max_seconds"], seconds)
+            if "error" in result:
+                stats["errors"] += 1
+                stats["invalid"] += "invalid_arguments" in result
+            elif key is not None:
+                self._cache[key] = result
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        replay = _replay.get()
+        if replay is not None and fn is not None and not getattr(fn, "pure", False):
+            replay.record(_call_key(call), result)
+        return result
+
+    def _plan(self, function_calls, tools):
+        """
+        Splits a turn's calls into jobs that can run concurrently.
+
+        Returns:
+            (registry, calls, results, jobs, copies): results has cache hits
+            filled in and None elsewhere; each job is a list of call indexes to
+            run in order; copies maps a repeated pure call to the one that runs
+        """
+        registry = {fn.__name__: fn for fn in tools}
+        calls = list(function_calls)
+        results = [None] * len(calls)
+        replay = _replay.get()
+        jobs, ordered, copies, first = [], [], {}, {}
+        for i, call in enumerate(calls):
+            fn = registry.get(call.name)
+            key = self._cache_key(fn, call)
+            cached = self._cached(key)
+            replayed = None
+            if replay is not None and fn is not None and not getattr(fn, "pure", False):
+                replayed = replay.take(_call_key(call))
+            if cached is not None:
+                with tracer.span(call.name, "tool", cached=True):
+                    results[i] = cached
+            elif replayed is not None:
+                with tracer.span(call.name, "tool", replayed=True):
+                    results[i] = replayed
+                    replay.record(_call_key(call), replayed)
+                with self._lock:
+                    self._counters["replayed"] += 1
+            elif key is not None and key in first:
+                copies[i] = first[key]
+            elif fn is not None and getattr(fn, "pure", False):
+                first[key] = i
+                jobs.append([i])
+            else:
+                ordered.append(i)
+        if ordered:
+            jobs.append(ordered)
+        return registry, calls, results, jobs, copies
+
+    def _job(self, registry: dict, calls: list, results: list, indexes: list, progress: _Progress):
+        for i in indexes:
+            with progress.condition:
+                if progress.closed:
+                    return
+                progress.started[i] = time.perf_counter()
+            fn = registry.get(calls[i].name)
+            result = self._execute(fn, calls[i], self._cache_key(fn, calls[i]))
+            with progress.condition:
+                if progress.closed:
+                    return
+                results[i] = result
+                progress.condition.notify_all()
+                if progress.wake is not None:
+                    progress.wake()
+
+    def _remaining(self, registry: dict, calls: list, results: list, jobs: list, progress: _Progress):
+        """
+        How long to wait for the batch. Call with the progress condition held.
+
+        Returns:
+            0 when every call finished or overran, seconds until the next
+            pure call's deadline, or None when only calls without a deadline
+            (queued, or with side effects and started) are left
+        """
+        now = time.perf_counter()
+        deadlines, unbounded = [], False
+        for job in jobs:
+            for i in job:
+                if results[i] is not None:
+                    continue
+                started = progress.started[i]
+                if started is None or not getattr(registry.get(calls[i].name), "pure", False):
+                    unbounded = True
+                elif now < started + self.timeout:
+                    deadlines.append(started + self.timeout - now)
+        if deadlines:
+            return min(deadlines)
+        return None if unbounded else 0
+
+    def _finish(self, calls: list, results: list, jobs: list, copies: dict, started: float) -> list:
+        """Answers repeated calls and calls that missed the deadline, and builds the function response parts."""
+        for i, source in copies.items():
+            results[i] = results[source]
+        timed_out = [i for i, result in enumerate(results) if result is None]
+        with self._lock:
+            self._counters["batches"] += 1
+            self._counters["concurrent_batches"] += len(jobs) > 1
+            self._counters["calls"] += len(calls)
+            self._counters["repeats"] += len(copies)
+            self._counters["timeouts"] += len(timed_out)
+            self._counters["wall_seconds"] += time.perf_counter() - started
+            for i in timed_out:
+                self._tool_stats(calls[i].name)["timeouts"] += 1
+        for i in timed_out:
+            results[i] = _timeout_result(calls[i].name, self.timeout)
+        return [types.Part.from_function_response(name=call.name, response=result)
+                for call, result in zip(calls, results)]
+
+    def run(self, function_calls, tools) -> list:
+        """
+        Executes the model's function calls against the agent's tools.
+
+        Args:
+            function_calls: FunctionCall objects from a model response
+            tools: The agent's tool callables
+
+        Returns:
+            List of function response Parts to send back to the model, in call order
+        """
+        started = time.perf_counter()
+        registry, calls, results, jobs, copies = self._plan(function_calls, tools)
+        if jobs:
+            pool = self._executor()
+            progress = _Progress(len(calls))
+            for job in jobs:
+                pool.submit(contextvars.copy_context().run, self._job, registry, calls, results, job, progress)
+            with progress.condition:
+                while (timeout := self._remaining(registry, calls, results, jobs, progress)) != 0:
+                    progress.condition.wait(timeout)
+                progress.closed = True
+        return self._finish(calls, results, jobs, copies, started)
+
+    async def arun(self, function_calls, tools) -> list:
+        """Async run(): tools run on the thread pool so the event loop stays free."""
+        started = time.perf_counter()
+        registry, calls, results, jobs, copies = self._plan(function_calls, tools)
+        if jobs:
+            loop = asyncio.get_running_loop()
+            pool = self._executor()
+            changed = asyncio.Event()
+            progress = _Progress(len(calls), lambda: loop.call_soon_threadsafe(changed.set))
+            for job in jobs:
+                loop.run_in_executor(pool, contextvars.copy_context().run, self._job, registry, calls, results, job,
+                                     progress)
+            try:
+                while True:
+                    with progress.condition:
+                        timeout = self._remaining(registry, calls, results, jobs, progress)
+                        if timeout == 0:
+                            break
+                        changed.clear()
+                    try:
+                        await asyncio.wait_for(changed.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        pass
+            finally:
+                with progress.condition:
+                    progress.closed = True
+        return self._finish(calls, results, jobs, copies, started)
+
+    def stats(self) -> dict:
+        """Returns call, cache, repeat, replay and timeout counts, batch wall vs sequential time, per-tool timings."""
+        with self._lock:
+            stats = {**self._counters, "cached_results": len(self._cache)}
+            tools = {name: dict(counters) for name, counters in self._tools.items()}
+        batches = stats["batches"]
+        stats["mean_wall_ms"] = round(stats.pop("wall_seconds") / batches * 1000, 3) if batches else None
+        stats["mean_sequential_ms"] = round(stats.pop("call_seconds") / batches * 1000, 3) if batches else None
+        for counters in tools.values():
+            seconds = counters.pop("seconds")
+            counters["mean_ms"] = round(seconds / counters["calls"] * 1000, 3) if counters["calls"] else None
+            counters["max_ms"] = round(counters.pop("max_seconds") * 1000, 3)
+        stats["tools"] = tools
+        return stats
+
+
+def create_tool_runtime() -> ToolRuntime:
+    """Builds the tool runtime configured by environment variables."""
+    return ToolRuntime(
+        max_workers=int(os.environ.get("WELLCARE_TOOL_WORKERS", "16")),
+        timeout=float(os.environ.get("WELLCARE_TOOL_TIMEOUT", "10")),
+        cache_size=int(os.environ.get("WELLCARE_TOOL_CACHE", "1024")),
+    )
+
+
+runtime = create_tool_runtime()
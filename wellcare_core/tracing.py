@@ -0,0 +1,240 @@
+"""
+Lightweight tracing for chat turns.
+
+Each turn is a trace: a root span for the agent handling it, with child spans
+for every model call and every tool invocation. The crisis screen runs
+before an agent is chosen and is recorded as a one-span trace of its own
+(kind "screen"), as is history summarization when it calls the model. Spans
+carry durations and token counts. Finished spans feed in-process Prometheus
+metrics (served at /metrics), and whole traces can be appended to a JSONL
+file for finding slow turns and runaway tool chains after the fact.
+
+WELLCARE_TRACE_FILE: append one JSON trace per turn to this file (default: off)
+"""
+
+import asyncio
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# Seconds; covers the local screen (sub-ms) up to slow multi-round model turns
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Model calls or tool calls per trace; a turn near MAX_TOOL_ROUNDS is a runaway chain
+HOP_BUCKETS = (1, 2, 3, 4, 5, 6, 8, 12)
+
+_current = contextvars.ContextVar("wellcare_span", default=None)
+
+
+class Span:
+    """One timed operation within a trace."""
+
+    def __init__(self, name: str, kind: str, parent=None, **attributes):
+        self.name = name
+        self.kind = kind
+        self.parent = parent
+        self.root = parent.root if parent else self
+        self.trace_id = self.root.trace_id if parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.attributes = attributes
+        self.status = "ok"
+        self.started_at = datetime.now(timezone.utc)
+        self.start = time.perf_counter()
+        self.duration = 0.0
+        self.finished = []
+
+    def set(self, **attributes):
+        """Adds attributes; keys ending in _tokens are also counted in metrics."""
+        for key, value in attributes.items():
+            if key.endswith("_tokens"):
+                self.attributes[key] = self.attributes.get(key, 0) + (value or 0)
+            else:
+                self.attributes[key] = value
+
+    def to_dict(self) -> dict:
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent.span_id if self.parent else None,
+            "name": self.name,
+            "kind": self.kind,
+            "offset_ms": round((self.start - self.root.start) * 1000, 3),
+            "duration_ms": round(self.duration * 1000, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+class Tracer:
+    """Records spans, aggregates them into metrics and exports finished traces."""
+
+    def __init__(self, trace_file: str = None, buckets=DEFAULT_BUCKETS):
+        self.trace_file = trace_file
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._durations = {}
+        self._tokens = {}
+        self._errors = {}
+        self._hops = {}
+        self._file = None
+
+    @contextmanager
+    def span(self, name: str, kind: str = "internal", **attributes):
+        """
+        Times a block as a span, nested under the current span if there is one.
+
+        Args:
+            name: Span name (agent, tool or operation name)
+            kind: Span category: agent, model, tool, screen or internal
+            **attributes: Initial attributes recorded on the span
+
+        Yields:
+            The Span, so callers can add attributes such as token counts
+        """
+        parent = _current.get()
+        span = Span(name, kind, parent, **attributes)
+        token = _current.set(span)
+        try:
+            yield span
+        except (GeneratorExit, asyncio.CancelledError):
+            # Client disconnected mid-stream
+            span.status = "cancelled"
+            raise
+        except BaseException as e:
+            span.status = "error"
+            span.attributes["error"] = type(e).__name__
+            raise
+        finally:
+            span.duration = time.perf_counter() - span.start
+            try:
+                _current.reset(token)
+            except ValueError:
+                # Exited from a different context (e.g. a generator closed elsewhere)
+                _current.set(parent)
+            self._finish(span)
+
+    def _finish(self, span: Span):
+        with self._lock:
+            key = (span.kind, span.name)
+            self._durations.setdefault(key, _Histogram(self.buckets)).observe(span.duration)
+            if span.status == "error":
+                self._errors[key] = self._errors.get(key, 0) + 1
+            for attribute, value in span.attributes.items():
+                if attribute.endswith("_tokens") and value:
+                    token_key = (*key, attribute[:-len("_tokens")])
+                    self._tokens[token_key] = self._tokens.get(token_key, 0) + value
+
+            span.root.finished.append(span)
+            if span.parent is not None:
+                return
+
+            spans = span.finished
+            for kind in ("model", "tool"):
+                hops = sum(1 for s in spans if s.kind == kind)
+                self._hops.setdefault((span.name, kind), _Histogram(HOP_BUCKETS)).observe(hops)
+            if self.trace_file:
+                self._export(span, spans)
+
+    def _export(self, root: Span, spans: list):
+        trace = {
+            "trace_id": root.trace_id,
+            "name": root.name,
+            "started_at": root.started_at.isoformat(),
+            "duration_ms": round(root.duration * 1000, 3),
+            "status": root.status,
+            "spans": [s.to_dict() for s in sorted(spans, key=lambda s: s.start)],
+        }
+        try:
+            if self._file is None:
+                self._file = open(self.trace_file, "a", encoding="utf-8")
+            self._file.write(json.dumps(trace, default=str) + "\n")
+            self._file.flush()
+        except OSError:
+            # Tracing must never fail a user's turn
+            pass
+
+    def prometheus(self) -> str:
+        """Renders all metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            lines += [
+                "# HELP wellcare_span_duration_seconds Duration of agent, model, tool and screen spans.",
+                "# TYPE wellcare_span_duration_seconds histogram",
+            ]
+            for (kind, name), histogram in sorted(self._durations.items()):
+                lines += self._histogram_lines("wellcare_span_duration_seconds", histogram, kind=kind, name=name)
+
+            lines += [
+                "# HELP wellcare_span_errors_total Spans that ended with an exception.",
+                "# TYPE wellcare_span_errors_total counter",
+            ]
+            for (kind, name), count in sorted(self._errors.items()):
+                lines.append(f"wellcare_span_errors_total{_labels(kind=kind, name=name)} {count}")
+
+            lines += [
+                "# HELP wellcare_tokens_total Tokens recorded on spans, by type (prompt, cached, output).",
+                "# TYPE wellcare_tokens_total counter",
+            ]
+            for (kind, name, token_type), count in sorted(self._tokens.items()):
+                lines.append(f"wellcare_tokens_total{_labels(kind=kind, name=name, type=token_type)} {count}")
+
+            lines += [
+                "# HELP wellcare_trace_hops Model or tool calls per traced turn.",
+                "# TYPE wellcare_trace_hops histogram",
+            ]
+            for (name, kind), histogram in sorted(self._hops.items()):
+                lines += self._histogram_lines("wellcare_trace_hops", histogram, name=name, kind=kind)
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _histogram_lines(metric: str, histogram: _Histogram, **labels) -> list:
+        lines = [
+            f"{metric}_bucket{_labels(**labels, le=bound)} {count}"
+            for bound, count in zip(histogram.buckets, histogram.counts)
+        ]
+        lines.append(f"{metric}_bucket{_labels(**labels, le='+Inf')} {histogram.count}")
+        lines.append(f"{metric}_sum{_labels(**labels)} {histogram.sum}")
+        lines.append(f"{metric}_count{_labels(**labels)} {histogram.count}")
+        return lines
+
+
+def record_usage(span: Span, usage):
+    """Copies a model response's usage_metadata onto a span."""
+    if usage is None:
+        return
+    span.set(
+        prompt_tokens=usage.prompt_token_count,
+        cached_tokens=usage.cached_content_token_count,
+        output_tokens=usage.candidates_token_count,
+    )
+
+
+# Shared by the chat helpers and the web apps; one per process
+tracer = Tracer(trace_file=os.environ.get("WELLCARE_TRACE_FILE"))
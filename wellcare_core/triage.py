@@ -0,0 +1,166 @@
+"""
+Offline crisis triage over exported chat logs and intake forms.
+
+Streams JSONL or CSV records through the crisis detector and writes only
+the flagged records, so memory stays constant however large the input is.
+With --workers, batches are fanned out to a process pool with a bounded
+number of batches in flight.
+
+    python -m wellcare_core.triage chats.jsonl -o flagged.jsonl --field message
+    python -m wellcare_core.triage intake.csv -o flagged.csv --workers 8
+
+Each flagged record is written unchanged plus a "crisis_indicators" field.
+Throughput (records/sec) is reported on stderr.
+"""
+
+import argparse
+import csv
+import json
+import multiprocessing
+import sys
+import time
+from collections import deque
+from itertools import islice
+
+from wellcare_core.crisis import detector
+
+# Used when no --field is given and the record has one of these keys
+DEFAULT_FIELDS = ("message", "text", "content", "body", "user_input")
+
+
+def read_records(f, fmt: str):
+    """
+    Yields records one at a time from an open JSONL or CSV file.
+
+    Malformed JSONL lines are yielded as None so they can be counted.
+    """
+    if fmt == "csv":
+        yield from csv.DictReader(f)
+        return
+    for line in f:
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            yield None
+            continue
+        yield record if isinstance(record, dict) else None
+
+
+def record_text(record: dict, fields=()) -> str:
+    """Joins the text fields of a record that should be screened."""
+    if fields:
+        return "\n".join(str(record[field]) for field in fields if record.get(field))
+    present = [field for field in DEFAULT_FIELDS if record.get(field)]
+    if present:
+        return "\n".join(str(record[field]) for field in present)
+    # Unknown layout: screen every string value
+    return "\n".join(value for value in record.values() if isinstance(value, str))
+
+
+def screen_batch(texts: list) -> list:
+    """Returns the crisis indicators found in each text (empty list when none)."""
+    return [detector.assess(text)["crisis_indicators"] for text in texts]
+
+
+def _batches(iterable, size: int):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def triage(records, fields=(), workers: int = 1, batch_size: int = 1000, stats: dict = None):
+    """
+    Screens records lazily and yields (record, crisis_indicators) for flagged ones.
+
+    Args:
+        records: Iterable of record dicts (None entries are counted as errors)
+        fields: Record fields holding the text to screen
+        workers: Processes to fan batches out to; 1 screens in this process
+        batch_size: Records per batch sent to a worker
+        stats: Optional dict updated with records, flagged and errors counts
+
+    Yields:
+        (record, crisis_indicators) for each record with at least one indicator
+    """
+    stats = stats if stats is not None else {}
+    stats.update(records=0, flagged=0, errors=0)
+
+    def prepared():
+        for batch in _batches(records, batch_size):
+            valid = [record for record in batch if record is not None]
+            stats["errors"] += len(batch) - len(valid)
+            yield valid, [record_text(record, fields) for record in valid]
+
+    def results():
+        if workers <= 1:
+            for batch, texts in prepared():
+                yield batch, screen_batch(texts)
+            return
+
+        with multiprocessing.Pool(workers) as pool:
+            # Bound the batches in flight; Pool.imap would read the whole input ahead
+            pending = deque()
+            for batch, texts in prepared():
+                pending.append((batch, pool.apply_async(screen_batch, (texts,))))
+                if len(pending) >= workers * 2:
+                    batch, result = pending.popleft()
+                    yield batch, result.get()
+            while pending:
+                batch, result = pending.popleft()
+                yield batch, result.get()
+
+    for batch, indicators in results():
+        stats["records"] += len(batch)
+        for record, found in zip(batch, indicators):
+            if found:
+                stats["flagged"] += 1
+                yield record, found
+
+
+def write_flagged(flagged, out, fmt: str):
+    """Writes flagged records with their crisis_indicators as JSONL or CSV."""
+    writer = None
+    for record, indicators in flagged:
+        if fmt == "csv":
+            if writer is None:
+                writer = csv.DictWriter(out, fieldnames=[*record, "crisis_indicators"], extrasaction="ignore")
+                writer.writeheader()
+            writer.writerow({**record, "crisis_indicators": ";".join(indicators)})
+        else:
+            out.write(json.dumps({**record, "crisis_indicators": indicators}, ensure_ascii=False) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Flag crisis language in JSONL or CSV records.")
+    parser.add_argument("path", help="JSONL or CSV file, or - for stdin")
+    parser.add_argument("-o", "--output", default="-", help="file for flagged records (default: stdout)")
+    parser.add_argument("--format", choices=["jsonl", "csv"], help="input/output format (default: from extension)")
+    parser.add_argument("--field", action="append", default=[], help="text field to screen (repeatable)")
+    parser.add_argument("--workers", type=int, default=1, help="processes to screen with")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    fmt = args.format or ("csv" if args.path.endswith(".csv") else "jsonl")
+    source = sys.stdin if args.path == "-" else open(args.path, encoding="utf-8", newline="")
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8", newline="")
+
+    stats = {}
+    start = time.perf_counter()
+    try:
+        flagged = triage(read_records(source, fmt), args.field, args.workers, args.batch_size, stats)
+        write_flagged(flagged, out, fmt)
+    finally:
+        for f in (source, out):
+            if f not in (sys.stdin, sys.stdout):
+                f.close()
+
+    elapsed = time.perf_counter() - start
+    rate = stats["records"] / elapsed if elapsed else 0.0
+    print(f"{stats['records']} records, {stats['flagged']} flagged, {stats['errors']} malformed "
+          f"in {elapsed:.2f}s ({rate:,.0f} records/sec)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,605 @@
+"""
+Managed transport for model calls.
+
+Every genai request (chats, summaries, context caches) goes through one
+httpx transport per process that adds:
+
+- a pooled connection transport with keep-alive, so TLS setup is paid once
+  per connection rather than per call, and explicit timeouts. At most
+  `max_keepalive` idle connections are kept: httpcore scans the whole pool
+  for each idle connection on every request, so a pool of a thousand idle
+  connections costs more CPU per call than the reconnects it saves. For the
+  same reason the async pool, which may hold a thousand busy connections,
+  is split into shards of 32
+- a concurrency limit: at most `max_concurrency` requests in flight, with
+  up to `max_queue` more waiting (each for at most `queue_timeout` seconds)
+- retries of 429/5xx responses and connection errors with full-jitter
+  exponential backoff (honouring Retry-After), limited by a retry budget
+  so that retries add at most ~`budget_ratio` extra load during an outage
+- a circuit breaker that fails fast for `reset_after` seconds after
+  `failure_threshold` consecutive failed calls, then lets one trial through
+- optionally, coalescing of identical in-flight non-streaming requests:
+  concurrent callers with the same URL and body share one upstream call.
+  It is off by default, since callers that send the same prompt at a
+  non-zero temperature expect independently sampled replies
+
+Locally rejected calls get a 503 response, which genai raises as a
+ServerError like any other upstream failure.
+
+WELLCARE_UPSTREAM: set to 0 to use genai's default transport (default: enabled)
+WELLCARE_UPSTREAM_CONCURRENCY: requests in flight per process (default: 1000)
+WELLCARE_UPSTREAM_QUEUE: requests allowed to wait for a slot (default: 4000)
+WELLCARE_UPSTREAM_KEEPALIVE: idle connections kept open per transport (default: 64)
+WELLCARE_UPSTREAM_TIMEOUT: seconds per attempt (default: 60)
+WELLCARE_UPSTREAM_QUEUE_TIMEOUT: longest wait for a slot, in seconds (default: 30)
+WELLCARE_UPSTREAM_ATTEMPTS: attempts per call, including the first (default: 3)
+WELLCARE_RETRY_BUDGET: retries allowed per call on average (default: 0.2)
+WELLCARE_BREAKER_FAILURES: consecutive failures that open the breaker (default: 5)
+WELLCARE_BREAKER_RESET: seconds the breaker stays open (default: 15)
+WELLCARE_UPSTREAM_COALESCE: set to 1 to share identical in-flight requests (default: disabled)
+"""
+
+import asyncio
+import hashlib
+import math
+import os
+import random
+import threading
+import time
+
+import httpx
+
+RETRY_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+
+# Headers that describe the wire encoding of a body, not the decoded content shared with coalesced callers
+_ENCODING_HEADERS = ("content-encoding", "content-length", "transfer-encoding")
+
+
+class RetryBudget:
+    """Token bucket of retries: each call deposits `ratio` tokens, each retry spends one."""
+
+    def __init__(self, ratio: float = 0.2, reserve: float = 10.0):
+        """
+        Args:
+            ratio: Retries earned per call
+            reserve: Bucket size, and the retries available at startup
+        """
+        self.ratio = ratio
+        self.reserve = reserve
+        self._tokens = reserve
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self.reserve, self._tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        """Takes a token for one retry; False when the budget is spent."""
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    @property
+    def tokens(self) -> float:
+        return self._tokens
+
+
+class CircuitBreaker:
+    """Closed -> open after consecutive failures -> half-open trial after reset_after seconds."""
+
+    def __init__(self, failure_threshold: int = 5, reset_after: float = 15.0):
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a call may go upstream now; in half-open state only one trial at a time."""
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_after:
+                self.state, self._trial = "half_open", False
+            if self.state == "closed":
+                return True
+            if self.state == "half_open" and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def record(self, success: bool):
+        with self._lock:
+            if success:
+                self.state, self._failures, self._trial = "closed", 0, False
+                return
+            self._failures += 1
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                self.state, self._opened_at, self._trial = "open", time.monotonic(), False
+
+    def retry_after(self) -> float:
+        """Seconds until the breaker allows a trial call."""
+        return max(0.0, self.reset_after - (time.monotonic() - self._opened_at))
+
+
+class UpstreamPolicy:
+    """Limits, retry and breaker settings shared by the sync and async transports, plus their counters."""
+
+    def __init__(self, max_concurrency: int = 64, max_queue: int = 256, queue_timeout: float = 30.0,
+                 attempts: int = 3, base_delay: float = 0.25, max_delay: float = 8.0,
+                 budget: RetryBudget = None, breaker: CircuitBreaker = None, coalesce: bool = False):
+        """
+        Args:
+            max_concurrency: Requests in flight at once
+            max_queue: Requests allowed to wait for a slot; more are rejected at once
+            queue_timeout: Seconds a request may wait for a slot
+            attempts: Attempts per call, including the first
+            base_delay: Backoff before the first retry is drawn from [0, base_delay]
+            max_delay: Cap on any backoff, including Retry-After
+            budget: Retry budget (default: RetryBudget())
+            breaker: Circuit breaker (default: CircuitBreaker())
+            coalesce: Share identical in-flight non-streaming requests (their callers all get one sampled reply)
+        """
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget or RetryBudget()
+        self.breaker = breaker or CircuitBreaker()
+        self.coalesce = coalesce
+        self._lock = threading.Lock()
+        self._counters = {"calls": 0, "attempts": 0, "retries": 0, "retries_denied": 0, "coalesced": 0,
+                          "failures": 0, "rejected_queue": 0, "rejected_open": 0}
+        self._gauges = {"in_flight": 0, "queued": 0}
+
+    def enqueue(self) -> bool:
+        """Takes a place in the wait queue; False when it is full."""
+        with self._lock:
+            if self._gauges["queued"] >= self.max_queue:
+                return False
+            self._gauges["queued"] += 1
+            return True
+
+    def count(self, name: str, amount: int = 1):
+        with self._lock:
+            if name in self._gauges:
+                self._gauges[name] += amount
+            else:
+                self._counters[name] += amount
+
+    def backoff(self, attempt: int, response: httpx.Response = None) -> float:
+        """Full-jitter exponential delay before retry number `attempt` (1-based), or the server's Retry-After."""
+        if response is not None:
+            try:
+                return min(self.max_delay, max(0.0, float(response.headers.get("retry-after", ""))))
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def stats(self) -> dict:
+        """Returns call, retry, coalescing and rejection counters, in-flight/queued gauges and breaker state."""
+        with self._lock:
+            stats = {**self._counters, **self._gauges}
+        stats["breaker"] = self.breaker.state
+        stats["retry_tokens"] = round(self.budget.tokens, 2)
+        stats["max_concurrency"] = self.max_concurrency
+        return stats
+
+
+def _coalesce_key(request: httpx.Request):
+    """Identity of a request that may share a response; None for streams and anything but model calls."""
+    url = str(request.url)
+    if request.method != "POST" or ":generateContent" not in url:
+        return None
+    digest = hashlib.sha256(request.content)
+    digest.update(url.encode("utf-8"))
+    digest.update(request.headers.get("x-goog-api-key", "").encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _rejection(request: httpx.Request, message: str, retry_after: float = 1.0) -> httpx.Response:
+    return httpx.Response(
+        503, request=request, headers={"Retry-After": str(max(1, round(retry_after)))},
+        json={"error": {"code": 503, "message": message, "status": "UNAVAILABLE"}},
+    )
+
+
+def _buffered(request: httpx.Request, status: int, headers: list, content: bytes) -> httpx.Response:
+    return httpx.Response(status, headers=headers, content=content, request=request)
+
+
+def _decoded_headers(response: httpx.Response) -> list:
+    return [(name, value) for name, value in response.headers.items() if name.lower() not in _ENCODING_HEADERS]
+
+
+class _ReleasingStream(httpx.SyncByteStream):
+    """Response body that frees the concurrency slot when closed (streams hold it until fully read)."""
+
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            self._free()
+
+    def _free(self):
+        release, self._release = self._release, None
+        if release:
+            release()
+
+    def __del__(self):
+        # An abandoned stream must not leak its slot
+        self._free()
+
+
+class _AsyncReleasingStream(httpx.AsyncByteStream):
+    """Async _ReleasingStream."""
+
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            self._free()
+
+    def _free(self):
+        release, self._release = self._release, None
+        if release:
+            release()
+
+    def __del__(self):
+        self._free()
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class ManagedTransport(httpx.BaseTransport):
+    """Sync transport applying an UpstreamPolicy around a pooled httpx transport."""
+
+    def __init__(self, policy: UpstreamPolicy, transport: httpx.BaseTransport = None):
+        self.policy = policy
+        self._transport = transport or httpx.HTTPTransport()
+        self._slots = threading.BoundedSemaphore(policy.max_concurrency)
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def _acquire(self) -> bool:
+        if not self._slots.acquire(blocking=False):
+            if not self.policy.enqueue():
+                return False
+            try:
+                if not self._slots.acquire(timeout=self.policy.queue_timeout):
+                    return False
+            finally:
+                self.policy.count("queued", -1)
+        self.policy.count("in_flight")
+        return True
+
+    def _release(self):
+        self.policy.count("in_flight", -1)
+        self._slots.release()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        key = self.policy.coalesce and _coalesce_key(request)
+        if not key:
+            return self._call(request)
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            self.policy.count("coalesced")
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return _buffered(request, *flight.result)
+        try:
+            response = self._call(request)
+            response.read()
+            flight.result = (response.status_code, _decoded_headers(response), response.content)
+            return _buffered(request, *flight.result)
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def _call(self, request: httpx.Request) -> httpx.Response:
+        policy = self.policy
+        policy.count("calls")
+        policy.budget.deposit()
+        attempt = 0
+        while True:
+            if not self._acquire():
+                policy.count("rejected_queue")
+                return _rejection(request, "Too many model calls queued")
+            # Retries of a call already let through don't need the breaker's permission again
+            if attempt == 0 and not policy.breaker.allow():
+                self._release()
+                policy.count("rejected_open")
+                return _rejection(request, "Model API circuit open after repeated failures",
+                                  policy.breaker.retry_after())
+
+            attempt += 1
+            policy.count("attempts")
+            response = error = None
+            try:
+                response = self._transport.handle_request(request)
+            except httpx.TransportError as e:
+                error = e
+            except BaseException:
+                self._release()
+                raise
+            failed = error is not None or response.status_code in RETRY_STATUSES
+
+            if failed and attempt < policy.attempts and policy.budget.withdraw():
+                if response is not None:
+                    response.read()
+                    response.close()
+                self._release()
+                policy.count("retries")
+                time.sleep(policy.backoff(attempt, response))
+                continue
+
+            if failed:
+                policy.count("failures")
+                if attempt < policy.attempts:
+                    policy.count("retries_denied")
+            policy.breaker.record(not failed)
+            if error is not None:
+                self._release()
+                raise error
+            response.stream = _ReleasingStream(response.stream, self._release)
+            return response
+
+    def close(self):
+        self._transport.close()
+
+
+class AsyncPoolShards(httpx.AsyncBaseTransport):
+    """
+    One async connection pool split into shards of at most `shard_size` connections.
+
+    httpcore rescans every connection in a pool, and every queued request,
+    each time a request starts or a response closes, so a single pool of
+    hundreds of busy connections spends more CPU on bookkeeping than on the
+    calls themselves. Each request goes to the shard with the fewest calls
+    in flight, which keeps every scan short.
+    """
+
+    def __init__(self, max_connections: int = 100, max_keepalive: int = 64, shard_size: int = 32):
+        """
+        Args:
+            max_connections: Connections across all shards
+            max_keepalive: Idle connections kept open across all shards
+            shard_size: Most connections per shard
+        """
+        count = max(1, math.ceil(max_connections / shard_size))
+        size = math.ceil(max_connections / count)
+        limits = httpx.Limits(max_connections=size,
+                              max_keepalive_connections=min(size, math.ceil(max_keepalive / count)))
+        # Loading the CA bundle takes tens of milliseconds, so the shards share one SSL context
+        ssl_context = httpx.create_ssl_context()
+        self._shards = [httpx.AsyncHTTPTransport(verify=ssl_context, limits=limits) for _ in range(count)]
+        self._in_flight = [0] * count
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        index = min(range(len(self._shards)), key=self._in_flight.__getitem__)
+        self._in_flight[index] += 1
+        try:
+            response = await self._shards[index].handle_async_request(request)
+        except BaseException:
+            self._done(index)
+            raise
+        response.stream = _AsyncReleasingStream(response.stream, lambda: self._done(index))
+        return response
+
+    def _done(self, index: int):
+        self._in_flight[index] -= 1
+
+    async def aclose(self):
+        for shard in self._shards:
+            await shard.aclose()
+
+
+class AsyncManagedTransport(httpx.AsyncBaseTransport):
+    """Async ManagedTransport, for the genai aio client."""
+
+    def __init__(self, policy: UpstreamPolicy, transport: httpx.AsyncBaseTransport = None):
+        self.policy = policy
+        self._transport = transport or httpx.AsyncHTTPTransport()
+        self._slots = asyncio.Semaphore(policy.max_concurrency)
+        self._flights = {}
+
+    async def _acquire(self) -> bool:
+        if self._slots.locked():
+            if not self.policy.enqueue():
+                return False
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.policy.queue_timeout)
+            except asyncio.TimeoutError:
+                return False
+            finally:
+                self.policy.count("queued", -1)
+        else:
+            await self._slots.acquire()
+        self.policy.count("in_flight")
+        return True
+
+    def _release(self):
+        self.policy.count("in_flight", -1)
+        self._slots.release()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        key = self.policy.coalesce and _coalesce_key(request)
+        if not key:
+            return await self._call(request)
+
+        flight = self._flights.get(key)
+        if flight is not None:
+            self.policy.count("coalesced")
+            try:
+                return _buffered(request, *await asyncio.shield(flight))
+            except asyncio.CancelledError:
+                if not flight.cancelled():
+                    raise
+                # The leader was cancelled, not this caller: make the call itself
+                return await self._call(request)
+        flight = self._flights[key] = asyncio.get_running_loop().create_future()
+        try:
+            response = await self._call(request)
+            await response.aread()
+            result = (response.status_code, _decoded_headers(response), response.content)
+            flight.set_result(result)
+            return _buffered(request, *result)
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        except BaseException as e:
+            flight.set_exception(e)
+            # Followers re-raise it; mark it retrieved so a lone leader's failure isn't logged as unhandled
+            flight.exception()
+            raise
+        finally:
+            del self._flights[key]
+
+    async def _call(self, request: httpx.Request) -> httpx.Response:
+        policy = self.policy
+        policy.count("calls")
+        policy.budget.deposit()
+        attempt = 0
+        while True:
+            if not await self._acquire():
+                policy.count("rejected_queue")
+                return _rejection(request, "Too many model calls queued")
+            # Retries of a call already let through don't need the breaker's permission again
+            if attempt == 0 and not policy.breaker.allow():
+                self._release()
+                policy.count("rejected_open")
+                return _rejection(request, "Model API circuit open after repeated failures",
+                                  policy.breaker.retry_after())
+
+            attempt += 1
+            policy.count("attempts")
+            response = error = None
+            try:
+                response = await self._transport.handle_async_request(request)
+            except httpx.TransportError as e:
+                error = e
+            except BaseException:
+                self._release()
+                raise
+            failed = error is not None or response.status_code in RETRY_STATUSES
+
+            if failed and attempt < policy.attempts and policy.budget.withdraw():
+                if response is not None:
+                    await response.aread()
+                    await response.aclose()
+                self._release()
+                policy.count("retries")
+                await asyncio.sleep(policy.backoff(attempt, response))
+                continue
+
+            if failed:
+                policy.count("failures")
+                if attempt < policy.attempts:
+                    policy.count("retries_denied")
+            policy.breaker.record(not failed)
+            if error is not None:
+                self._release()
+                raise error
+            response.stream = _AsyncReleasingStream(response.stream, self._release)
+            return response
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+def http_options(policy: UpstreamPolicy, max_connections: int = 100, timeout: float = 60.0,
+                 max_keepalive: int = 64) -> dict:
+    """
+    genai HttpOptions (as a dict) routing sync and async calls through managed, pooled transports.
+
+    Args:
+        policy: Limits, retries and breaker shared by both transports
+        max_connections: Connection pool size per transport
+        timeout: Seconds per attempt (connect, read and write), also sent as the server deadline
+        max_keepalive: Idle connections kept open per transport (capped at max_connections)
+
+    Returns:
+        Dict for genai Client(http_options=...)
+    """
+    limits = httpx.Limits(max_connections=max_connections,
+                          max_keepalive_connections=min(max_keepalive, max_connections))
+    timeouts = httpx.Timeout(timeout, connect=min(timeout, 10.0))
+    return {
+        "timeout": int(timeout * 1000),
+        "httpx_client": httpx.Client(
+            transport=ManagedTransport(policy, httpx.HTTPTransport(limits=limits)), timeout=timeouts),
+        "httpx_async_client": httpx.AsyncClient(
+            transport=AsyncManagedTransport(policy, AsyncPoolShards(max_connections, limits.max_keepalive_connections)),
+            timeout=timeouts),
+    }
+
+
+def create_upstream_policy() -> UpstreamPolicy:
+    """Builds the upstream policy configured by environment variables; None when WELLCARE_UPSTREAM=0."""
+    if os.environ.get("WELLCARE_UPSTREAM", "1").lower() not in ("1", "true", "yes"):
+        return None
+    return UpstreamPolicy(
+        max_concurrency=int(os.environ.get("WELLCARE_UPSTREAM_CONCURRENCY", "1000")),
+        max_queue=int(os.environ.get("WELLCARE_UPSTREAM_QUEUE", "4000")),
+        queue_timeout=float(os.environ.get("WELLCARE_UPSTREAM_QUEUE_TIMEOUT", "30")),
+        attempts=int(os.environ.get("WELLCARE_UPSTREAM_ATTEMPTS", "3")),
+        budget=RetryBudget(ratio=float(os.environ.get("WELLCARE_RETRY_BUDGET", "0.2"))),
+        breaker=CircuitBreaker(failure_threshold=int(os.environ.get("WELLCARE_BREAKER_FAILURES", "5")),
+                               reset_after=float(os.environ.get("WELLCARE_BREAKER_RESET", "15"))),
+        coalesce=os.environ.get("WELLCARE_UPSTREAM_COALESCE", "0").lower() in ("1", "true", "yes"),
+    )
+
+
+def create_http_options(max_connections: int = None) -> dict:
+    """
+    http_options() for the process-wide policy.
+
+    Args:
+        max_connections: Connection pool size (default: one per concurrency slot)
+
+    Returns:
+        Dict for genai Client(http_options=...), or None when WELLCARE_UPSTREAM=0
+    """
+    if policy is None:
+        return None
+    return http_options(policy, max_connections or policy.max_concurrency,
+                        float(os.environ.get("WELLCARE_UPSTREAM_TIMEOUT", "60")),
+                        int(os.environ.get("WELLCARE_UPSTREAM_KEEPALIVE", "64")))
+
+
+# Shared by every client in the process, so the limits hold across the sync and async apps
+policy = create_upstream_policy()